@@ -0,0 +1,66 @@
+"""
+Adaptation Benchmark
+Compares decisions/sec of adapt_difficulty fed by list slices vs. RecentWindow
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from adaptive_engine import AdaptiveEngine
+from tracker import PerformanceTracker
+
+
+def build_tracker(n: int, window_sizes) -> PerformanceTracker:
+    """Build a tracker holding n synthetic attempts"""
+    rng = random.Random(0)
+    tracker = PerformanceTracker(window_sizes=window_sizes)
+    tracker.attempts = [{
+        'timestamp': '',
+        'puzzle': '1 + 1',
+        'correct_answer': 2,
+        'user_answer': 2,
+        'is_correct': rng.random() < 0.7,
+        'time_spent': round(rng.uniform(1, 15), 2),
+        'difficulty': 'Medium',
+        'operation': '+'
+    } for _ in range(n)]
+    return tracker
+
+
+def decisions_per_sec(decide, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        decide()
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', type=int, default=200_000, help='decisions per run')
+    parser.add_argument('--window', type=int, default=3)
+    parser.add_argument('--trend-window', type=int, default=10)
+    args = parser.parse_args()
+
+    tracker = build_tracker(1000, (args.window, args.trend_window))
+    engine = AdaptiveEngine(window_size=args.window)
+    window = tracker.get_window(args.window)
+    trend = tracker.get_window(args.trend_window)
+
+    rates = {
+        'list slice': decisions_per_sec(
+            lambda: engine.adapt_difficulty(tracker.get_recent_performance(args.window), 'Medium'), args.n),
+        'ring window': decisions_per_sec(
+            lambda: engine.adapt_difficulty(window, 'Medium'), args.n),
+        'ring window + trend': decisions_per_sec(
+            lambda: engine.adapt_difficulty(window, 'Medium', trend_window=trend), args.n),
+    }
+    for label, rate in rates.items():
+        print(f"{label:<22} {rate:>14,.0f} decisions/s")
+
+
+if __name__ == '__main__':
+    main()
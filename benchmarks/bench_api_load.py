@@ -0,0 +1,106 @@
+"""
+API Load Generator
+Drives the asyncio API server with concurrent learners and reports
+p50/p99 latency and requests/sec for one and several worker processes
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / 'src'
+
+
+async def request(reader, writer, method: str, path: str, payload: dict = None) -> dict:
+    """Send one keep-alive request and return the decoded JSON response"""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    length = next(int(line.split(b':')[1]) for line in head.split(b'\r\n')
+                  if line.lower().startswith(b'content-length'))
+    return json.loads(await reader.readexactly(length))
+
+
+async def learner(host: str, port: int, learner_id: str, deadline: float, latencies: list):
+    """One simulated learner looping over next_puzzle/submit_answer/session_stats"""
+    rng = random.Random(learner_id)
+    reader, writer = await asyncio.open_connection(host, port)
+    count = 0
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await request(reader, writer, 'POST', '/next_puzzle', {'learner_id': learner_id})
+            latencies.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await request(reader, writer, 'POST', '/submit_answer',
+                          {'learner_id': learner_id, 'answer': rng.randint(0, 100)})
+            latencies.append(time.perf_counter() - start)
+
+            count += 1
+            if count % 5 == 0:
+                start = time.perf_counter()
+                await request(reader, writer, 'GET', f"/session_stats?learner_id={learner_id}")
+                latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def run_load(host: str, port: int, learners: int, duration: float, first: int = 0) -> list:
+    latencies = []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(learner(host, port, f"learner-{i}", deadline, latencies)
+                           for i in range(first, first + learners)))
+    return latencies
+
+
+def wait_for_port(host: str, port: int, timeout: float = 10.0):
+    async def probe():
+        _, writer = await asyncio.open_connection(host, port)
+        writer.close()
+
+    start = time.time()
+    while True:
+        try:
+            asyncio.run(probe())
+            return
+        except OSError:
+            if time.time() - start > timeout:
+                raise
+            time.sleep(0.1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--learners', type=int, default=200, help='concurrent learners (connections)')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per run')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'requests':>10} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for workers in args.workers:
+        server = subprocess.Popen([sys.executable, str(SRC / 'api_server.py'), '--host', args.host,
+                                   '--port', str(args.port), '--workers', str(workers)])
+        try:
+            wait_for_port(args.host, args.port)
+            latencies = asyncio.run(run_load(args.host, args.port, args.learners, args.duration))
+        finally:
+            server.terminate()
+            server.wait()
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000
+        print(f"{workers:>7} {len(latencies):>10,} {len(latencies) / args.duration:>10,.0f} {p50:>8.2f} {p99:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
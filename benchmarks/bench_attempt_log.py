@@ -0,0 +1,52 @@
+"""
+Attempt Log Benchmark
+Measures sustained attempts/sec written to AttemptLog under each fsync policy
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from attempt_log import FSYNC_POLICIES, AttemptLog
+
+
+def sample_record(i: int) -> dict:
+    return {
+        'kind': 'attempt',
+        'learner_id': f"learner-{i % 1000}",
+        'timestamp': '2025-11-09 10:00:00',
+        'puzzle': '12 × 7',
+        'correct_answer': 84,
+        'user_answer': 84,
+        'is_correct': True,
+        'time_spent': 4.25,
+        'difficulty': 'Medium',
+        'operation': '×'
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', type=int, default=200_000, help='attempts per policy')
+    parser.add_argument('--policies', nargs='+', default=list(FSYNC_POLICIES), choices=FSYNC_POLICIES)
+    args = parser.parse_args()
+
+    print(f"{'fsync':<10} {'append/s':>14} {'durable/s':>14}")
+    for policy in args.policies:
+        with tempfile.TemporaryDirectory() as directory:
+            log = AttemptLog(directory, fsync=policy)
+            start = time.perf_counter()
+            for i in range(args.n):
+                log.append(sample_record(i))
+            enqueued = time.perf_counter() - start
+            log.flush()
+            log.close()
+            written = time.perf_counter() - start
+        print(f"{policy:<10} {args.n / enqueued:>14,.0f} {args.n / written:>14,.0f}")
+
+
+if __name__ == '__main__':
+    main()
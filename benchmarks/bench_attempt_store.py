@@ -0,0 +1,98 @@
+"""
+Attempt Store Benchmark
+Compares memory and aggregation throughput of the dict-based PerformanceTracker
+against the columnar AttemptStore at 10k, 1M and 10M attempts
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from attempt_store import AttemptStore
+from puzzle_generator import PuzzleGenerator
+from tracker import PerformanceTracker
+
+
+def random_columns(n: int, seed: int = 0) -> dict:
+    """Build encoded columns for n synthetic attempts"""
+    rng = np.random.default_rng(seed)
+    batch = PuzzleGenerator().generate_batch('Hard', n, seed=seed)
+    return {
+        'timestamp': time.time() + np.arange(n, dtype=np.float64),
+        'time_spent': np.round(rng.gamma(2.0, 3.0, n), 2),
+        'is_correct': rng.random(n) < 0.7,
+        'difficulty': rng.integers(0, 3, n, dtype=np.int8),
+        'operation': batch.op,
+        'num1': batch.num1.astype(np.int32),
+        'num2': batch.num2.astype(np.int32),
+        'correct_answer': batch.answer,
+        'user_answer': batch.answer
+    }
+
+
+def dict_tracker(n: int) -> PerformanceTracker:
+    """Build a PerformanceTracker holding n attempt dicts"""
+    tracker = PerformanceTracker()
+    store = AttemptStore()
+    store.extend(**random_columns(n))
+    tracker.attempts = [store.row(i) for i in range(n)]
+    return tracker
+
+
+def measure(label: str, fn) -> float:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<32} {elapsed * 1000:>10.1f} ms")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument('--dict-limit', type=int, default=1_000_000,
+                        help='largest size at which the dict baseline is built')
+    args = parser.parse_args()
+
+    generator = PuzzleGenerator()
+    for n in args.sizes:
+        print(f"\n{n:,} attempts")
+
+        appends = min(n, 200_000)
+        store = AttemptStore()
+        puzzles = list(generator.generate_batch('Medium', 1000, seed=1))
+        start = time.perf_counter()
+        for i in range(appends):
+            store.append(puzzles[i % 1000], 0, True, 1.5)
+        rate = appends / (time.perf_counter() - start)
+        print(f"  {'AttemptStore.append':<32} {rate:>10,.0f} attempts/s")
+
+        store = AttemptStore()
+        store.extend(**random_columns(n))
+        print(f"  {'columnar bytes/attempt':<32} {store.nbytes / n:>10.1f}")
+        measure('columnar get_session_stats', store.session_stats)
+        measure('columnar difficulty_distribution', store.difficulty_distribution)
+        measure('columnar operation_performance', store.operation_performance)
+
+        if n > args.dict_limit:
+            print(f"  (dict baseline skipped above {args.dict_limit:,})")
+            continue
+
+        tracemalloc.start()
+        tracker = dict_tracker(n)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  {'dict bytes/attempt':<32} {current / n:>10.1f}")
+        measure('tracker get_session_stats', tracker.get_session_stats)
+        measure('tracker difficulty_distribution', tracker.get_difficulty_distribution)
+        measure('tracker operation_performance', tracker.get_operation_performance)
+        del tracker
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Difficulty Scale Benchmark
+Table build time and puzzles/sec per level for scales of 10 to 1,000 levels,
+against the three-level generate_puzzle
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from difficulty_scale import DifficultyScale, default_specs
+from puzzle_generator import PuzzleGenerator
+
+
+def puzzles_per_sec(generate, levels, n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        generate(levels[i % len(levels)])
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', type=int, default=200_000, help='puzzles per run')
+    parser.add_argument('--levels', type=int, nargs='+', default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    generator = PuzzleGenerator()
+    coarse = puzzles_per_sec(generator.generate_puzzle, list(PuzzleGenerator.DIFFICULTY_CONFIG), args.n)
+    print(f"{'levels':>7} {'build ms':>9} {'scalar/s':>12} {'batch/s':>12}")
+    print(f"{'3 (old)':>7} {'':>9} {coarse:>12,.0f}")
+    rng = random.Random(0)
+    for count in args.levels:
+        start = time.perf_counter()
+        scale = DifficultyScale(default_specs(count))
+        build_ms = (time.perf_counter() - start) * 1000
+        generator = PuzzleGenerator(scale)
+        names = scale.names()
+        levels = [rng.choice(names) for _ in range(1000)]
+        scalar = puzzles_per_sec(generator.generate_puzzle, levels, args.n)
+        start = time.perf_counter()
+        for level in levels[:100]:
+            generator.generate_batch(level, args.n // 100)
+        batch = args.n / (time.perf_counter() - start)
+        print(f"{count:>7} {build_ms:>9.1f} {scalar:>12,.0f} {batch:>12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Batch Generation Benchmark
+Compares puzzles/sec of generate_batch against the scalar generate_puzzle loop
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from puzzle_generator import PuzzleGenerator
+
+
+def bench_scalar(generator: PuzzleGenerator, difficulty: str, n: int) -> float:
+    """Return puzzles/sec for n calls to generate_puzzle"""
+    start = time.perf_counter()
+    for _ in range(n):
+        generator.generate_puzzle(difficulty)
+    return n / (time.perf_counter() - start)
+
+
+def bench_batch(generator: PuzzleGenerator, difficulty: str, n: int) -> float:
+    """Return puzzles/sec for a single generate_batch call of size n"""
+    start = time.perf_counter()
+    generator.generate_batch(difficulty, n, seed=0)
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', type=int, default=1_000_000, help='puzzles per run')
+    args = parser.parse_args()
+
+    generator = PuzzleGenerator()
+    print(f"{'difficulty':<10} {'scalar/s':>14} {'batch/s':>14} {'speedup':>9}")
+    for difficulty in PuzzleGenerator.DIFFICULTY_CONFIG:
+        scalar = bench_scalar(generator, difficulty, args.n // 10)
+        batch = bench_batch(generator, difficulty, args.n)
+        print(f"{difficulty:<10} {scalar:>14,.0f} {batch:>14,.0f} {batch / scalar:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
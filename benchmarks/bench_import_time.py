@@ -0,0 +1,106 @@
+"""
+Import Time Benchmark
+Cold import cost of the core and service modules, measured with
+`python -X importtime` in a fresh interpreter per run, and which heavy
+third-party packages each import drags in
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+SRC = Path(__file__).resolve().parent.parent / 'src'
+
+DEFAULT_MODULES = ('tracker', 'adaptive_engine', 'puzzle_generator', 'learner_state', 'puzzle_pool',
+                   'learning_service', 'api_server', 'snapshot', 'skill_model', 'summary_cache', 'ui', 'main')
+
+# Third-party packages worth flagging when an import pulls them in
+HEAVY = ('numpy', 'pandas', 'plotly', 'streamlit', 'yaml', 'zstandard', 'pyarrow')
+
+
+def parse_importtime(stderr: str) -> List[Tuple[int, int, int, str]]:
+    """
+    Parse -X importtime output
+
+    Returns:
+        List of (depth, self µs, cumulative µs, module name)
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((depth, int(self_us), int(cumulative_us), name.strip()))
+    return entries
+
+
+def measure(module: str) -> Tuple[float, List[Tuple[int, int, int, str]], str]:
+    """
+    Import module once in a fresh interpreter
+
+    Returns:
+        Tuple of (cumulative ms of the module's own import, parsed entries,
+        error message or '')
+    """
+    env = dict(os.environ, PYTHONPATH=str(SRC), PYTHONDONTWRITEBYTECODE='1')
+    # Importing a module from inside a package would run it in a fresh
+    # interpreter anyway; isolate it from the caller's cwd
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, env=env, cwd=str(SRC))
+    entries = parse_importtime(result.stderr)
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed'
+        return float('nan'), entries, error
+    total = next((cumulative for depth, _, cumulative, name in entries if depth == 0 and name == module), 0)
+    return total / 1000, entries, ''
+
+
+def heavy_packages(entries: List[Tuple[int, int, int, str]]) -> List[str]:
+    """Heavy top-level packages loaded during the import"""
+    loaded = {name.split('.')[0] for _, _, _, name in entries}
+    return [package for package in HEAVY if package in loaded]
+
+
+def slowest(entries: List[Tuple[int, int, int, str]], count: int) -> List[Tuple[str, float]]:
+    """Top-level packages by total self time, in ms"""
+    totals: Dict[str, int] = {}
+    for _, self_us, _, name in entries:
+        package = name.split('.')[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return [(name, us / 1000) for name, us in sorted(totals.items(), key=lambda item: -item[1])[:count]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--modules', nargs='+', default=DEFAULT_MODULES)
+    parser.add_argument('--repeats', type=int, default=7, help='fresh interpreters per module')
+    parser.add_argument('--top', type=int, default=0, help='also list the N slowest packages per module')
+    args = parser.parse_args()
+
+    # A throwaway run warms the OS file cache so the first module isn't penalized
+    measure('tracker')
+
+    print(f"{'module':>18} {'median ms':>10} {'min ms':>8}  heavy packages loaded")
+    for module in args.modules:
+        times = []
+        entries, error = [], ''
+        for _ in range(args.repeats):
+            elapsed, entries, error = measure(module)
+            if error:
+                break
+            times.append(elapsed)
+        if error:
+            print(f"{module:>18} {'-':>10} {'-':>8}  {error}")
+            continue
+        heavy = ', '.join(heavy_packages(entries)) or '-'
+        print(f"{module:>18} {statistics.median(times):>10.1f} {min(times):>8.1f}  {heavy}")
+        for name, ms in slowest(entries, args.top):
+            print(f"{'':>18} {'':>10} {ms:>8.1f}  {name}")
+
+
+if __name__ == '__main__':
+    main()
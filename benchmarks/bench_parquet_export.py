@@ -0,0 +1,254 @@
+"""
+Parquet Export Benchmark
+Checks that attempts and adaptation events of a LearningService log come
+back unchanged from the exported datasets, then writes 10M synthetic log
+records as partitioned Parquet, CSV and NDJSON and reports write
+throughput, peak memory, size on disk and the time of a full scan and of
+a one-day, one-level query
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from parquet_export import TABLES, ParquetExporter, export_log, open_dataset
+
+START = 1_790_000_000  # 2026-09-21
+DAYS = 30
+OPERATIONS = ('+', '-', '×', '÷')
+DIFFICULTIES = ('Easy', 'Medium', 'Hard')
+ATTEMPT_FIELDS = [name for name, _ in TABLES['attempts']] + ['difficulty']
+
+
+def check(learners: int, answers: int, directory: str) -> bool:
+    """Every attempt and adaptation the service logged, read back from Parquet"""
+    from attempt_log import AttemptLog
+    from learning_service import LearningService
+
+    rng = random.Random(1)
+    log = AttemptLog(os.path.join(directory, 'log'), fsync='never')
+    service = LearningService(seed=1, sink=log)
+    for _ in range(learners * answers):
+        learner_id = f"learner-{rng.randrange(learners)}"
+        service.next_puzzle(learner_id)
+        correct = service.sessions[learner_id].current_puzzle['answer']
+        roll = rng.random()
+        service.submit_answer(learner_id, None if roll < 0.05 else correct if roll < 0.7 else correct + 1,
+                              round(rng.uniform(1, 20), 2))
+    log.close()
+    history = sum(len(session.learner.difficulty_history) for session in service.sessions.values())
+
+    output = os.path.join(directory, 'parquet')
+    # Small batches and few open files, so partitions are flushed and reopened
+    counts = export_log(os.path.join(directory, 'log'), output, batch_rows=500, max_open_files=2)
+    logged = {'attempts': [], 'adaptations': []}
+    with AttemptLog(os.path.join(directory, 'log')) as reopened:
+        for record in reopened.replay():
+            logged['attempts' if record['kind'] == 'attempt' else 'adaptations'].append(record)
+
+    def rows(table: str, records) -> list:
+        names = [name for name, _ in TABLES[table]]
+        difficulty = 'difficulty' if table == 'attempts' else 'from'
+        return sorted(tuple(str(record.get(name)) for name in names) + (record['timestamp'][:10], record[difficulty])
+                      for record in records)
+
+    ok = True
+    for table in TABLES:
+        exported = open_dataset(output, table).to_table().to_pylist()
+        for row in exported:
+            row['timestamp'] = row['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
+        read_back = sorted(tuple(str(row[name]) for name, _ in TABLES[table]) + (row['date'], row['difficulty'])
+                           for row in exported)
+        ok &= read_back == rows(table, logged[table]) and counts[table] == len(logged[table])
+    ok &= counts['adaptations'] == history
+    print(f"{counts['attempts']:,} attempts and {counts['adaptations']:,} adaptations of {learners} learners "
+          f"in {counts['files']} files: {'match' if ok else 'MISMATCH'}")
+    return ok
+
+
+def records(rows: int):
+    """Synthetic log records over DAYS days, an adaptation after every 15th attempt"""
+    rng = random.Random(2)
+    templates = []
+    for _ in range(4096):
+        first, second = rng.randrange(1, 20), rng.randrange(1, 20)
+        operation = rng.choice(OPERATIONS)
+        answer = {'+': first + second, '-': first - second, '×': first * second, '÷': first}[operation]
+        correct = rng.random() < 0.7
+        templates.append({'puzzle': f"{first * second if operation == '÷' else first} {operation} {second}",
+                          'correct_answer': answer, 'user_answer': answer if correct else answer + 1,
+                          'is_correct': correct, 'time_spent': round(rng.uniform(1, 20), 2),
+                          'difficulty': rng.choice(DIFFICULTIES), 'operation': operation})
+    step = DAYS * 86400 / rows
+    timestamp, second = '', -1
+    for index in range(rows):
+        now = START + int(index * step)
+        if now != second:
+            timestamp, second = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(now)), now
+        template = templates[index & 4095]
+        learner_id = f"learner-{index * 7919 % 20_000}"
+        if index % 16 == 15:
+            level = template['difficulty']
+            yield {'kind': 'adaptation', 'learner_id': learner_id, 'timestamp': timestamp, 'attempt': index % 200,
+                   'from': level, 'to': DIFFICULTIES[(DIFFICULTIES.index(level) + 1) % 3], 'rule': 'promote',
+                   'rules': 'default', 'reason': "Great work! Moving on (accuracy: 3/3)", 'correct_count': 3,
+                   'total_attempts': 3, 'avg_time': template['time_spent']}
+        else:
+            yield {'kind': 'attempt', 'learner_id': learner_id, 'timestamp': timestamp, **template}
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write(fmt: str, rows: int, output: str) -> dict:
+    """Write the synthetic records in one format"""
+    start = time.perf_counter()
+    if fmt == 'generate':
+        for _ in records(rows):
+            pass
+    elif fmt == 'parquet':
+        with ParquetExporter(output) as exporter:
+            exporter.write(records(rows))
+    elif fmt == 'csv':
+        os.makedirs(output)
+        with open(os.path.join(output, 'attempts.csv'), 'w', newline='') as attempts, \
+                open(os.path.join(output, 'adaptations.csv'), 'w', newline='') as adaptations:
+            writers = {'attempt': csv.writer(attempts), 'adaptation': csv.writer(adaptations)}
+            names = {'attempt': ATTEMPT_FIELDS,
+                     'adaptation': [name for name, _ in TABLES['adaptations']]}
+            for kind, writer in writers.items():
+                writer.writerow(names[kind])
+            for record in records(rows):
+                kind = record['kind']
+                writers[kind].writerow([record.get(name) for name in names[kind]])
+    else:
+        os.makedirs(output)
+        # The attempt log's own format
+        with open(os.path.join(output, 'records.ndjson'), 'w', encoding='utf-8') as f:
+            for record in records(rows):
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    elapsed = time.perf_counter() - start
+    size = sum(entry.stat().st_size for entry in Path(output).rglob('*') if entry.is_file()) if fmt != 'generate' else 0
+    return {'seconds': elapsed, 'bytes': size, 'rss_mb': peak_rss_mb()}
+
+
+def scan(fmt: str, output: str, day: str, difficulty: str) -> dict:
+    """Accuracy and average time per operation, over everything and over one day and level"""
+    timings = {}
+    if fmt == 'parquet':
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+
+        dataset = open_dataset(output)
+        for query, condition in (('full', None),
+                                 ('day', (ds.field('date') == day) & (ds.field('difficulty') == difficulty))):
+            start = time.perf_counter()
+            table = dataset.to_table(columns=['operation', 'is_correct', 'time_spent'], filter=condition)
+            table = table.set_column(0, 'operation', pc.cast(table['operation'], 'string'))
+            result = table.group_by('operation').aggregate([('is_correct', 'mean'), ('time_spent', 'mean')])
+            timings[query] = (time.perf_counter() - start, sorted(result.column('operation').to_pylist()))
+    elif fmt == 'csv':
+        import pandas as pd
+
+        for query in ('full', 'day'):
+            start = time.perf_counter()
+            parts = []
+            columns = ['operation', 'is_correct', 'time_spent'] + (['timestamp', 'difficulty'] if query == 'day' else [])
+            for chunk in pd.read_csv(os.path.join(output, 'attempts.csv'), usecols=columns, chunksize=1_000_000):
+                if query == 'day':
+                    chunk = chunk[chunk['timestamp'].str.startswith(day) & (chunk['difficulty'] == difficulty)]
+                parts.append(chunk.groupby('operation').agg(correct=('is_correct', 'sum'),
+                                                            time=('time_spent', 'sum'),
+                                                            count=('is_correct', 'size')))
+            result = pd.concat(parts).groupby(level=0).sum()
+            timings[query] = (time.perf_counter() - start, sorted(result.index))
+    else:
+        decode = json.JSONDecoder().raw_decode
+        for query in ('full', 'day'):
+            start = time.perf_counter()
+            sums = {}
+            with open(os.path.join(output, 'records.ndjson'), 'rb') as f:
+                for line in f:
+                    record = decode(line.decode('utf-8'))[0]
+                    if record['kind'] != 'attempt':
+                        continue
+                    if query == 'day' and (record['difficulty'] != difficulty or record['timestamp'][:10] != day):
+                        continue
+                    entry = sums.setdefault(record['operation'], [0, 0, 0.0])
+                    entry[0] += 1
+                    entry[1] += record['is_correct']
+                    entry[2] += record['time_spent']
+            timings[query] = (time.perf_counter() - start, sorted(sums))
+    return {query: seconds for query, (seconds, _) in timings.items()}
+
+
+def run(mode: str, fmt: str, rows: int, output: str) -> dict:
+    """Run a step in a fresh interpreter so peak memory readings do not interfere"""
+    result = subprocess.run([sys.executable, __file__, '--mode', mode, '--format', fmt, '--rows', str(rows),
+                             '--output', output], check=True, capture_output=True, text=True)
+    return json.loads(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10_000_000, help='synthetic log records')
+    parser.add_argument('--mode', choices=['write', 'scan'])
+    parser.add_argument('--format', choices=['generate', 'parquet', 'csv', 'ndjson'])
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    day = time.strftime('%Y-%m-%d', time.gmtime(START + 10 * 86400))
+    if args.mode == 'write':
+        print(json.dumps(write(args.format, args.rows, args.output)))
+        return
+    if args.mode == 'scan':
+        print(json.dumps(scan(args.format, args.output, day, 'Medium')))
+        return
+
+    root = tempfile.mkdtemp()
+    try:
+        ok = check(200, 40, os.path.join(root, 'check'))
+
+        # Memory stays flat as the archive grows past the buffered rows
+        small_rows = min(args.rows, 1_000_000)
+        small = run('write', 'parquet', small_rows, os.path.join(root, 'small'))
+        shutil.rmtree(os.path.join(root, 'small'))
+
+        generate = run('write', 'generate', args.rows, '')['seconds']
+        print(f"\n{args.rows:,} records over {DAYS} days (1 in 16 an adaptation); "
+              f"generating them alone takes {generate:.1f} s")
+        print(f"{'format':>8} {'write s':>8} {'records/s':>10} {'peak MB':>8} {'disk MB':>8} "
+              f"{'full scan s':>12} {'day+level s':>12}")
+        for fmt in ('parquet', 'csv', 'ndjson'):
+            output = os.path.join(root, fmt)
+            written = run('write', fmt, args.rows, output)
+            scanned = run('scan', fmt, args.rows, output)
+            # Generation is shared by all formats and left out of the write time
+            seconds = written['seconds'] - generate
+            print(f"{fmt:>8} {seconds:>8.1f} {args.rows / seconds:>10,.0f} {written['rss_mb']:>8,.0f} "
+                  f"{written['bytes'] / 2**20:>8,.0f} {scanned['full']:>12.2f} {scanned['day']:>12.3f}")
+            if fmt == 'parquet':
+                print(f"{'':>8} peak {small['rss_mb']:,.0f} MB for {small_rows:,} records, "
+                      f"{written['rss_mb']:,.0f} MB for {args.rows:,}")
+                ok &= written['rss_mb'] < small['rss_mb'] * 1.25
+            shutil.rmtree(output)
+    finally:
+        shutil.rmtree(root)
+    if not ok:
+        print("\nPARQUET EXPORT CHECK FAILED")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
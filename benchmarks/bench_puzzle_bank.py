@@ -0,0 +1,168 @@
+"""
+Puzzle Bank Benchmark
+Checks that the bank holds exactly the puzzles generate_puzzle can produce
+and that constrained draws match their query, cover it uniformly and agree
+with a brute-force count; then times constrained draws against rejection
+sampling from generate_puzzle, and the learning loop with weak-operation focus
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from learning_service import LearningService
+from puzzle_bank import PuzzleBank, needs_regrouping, question_digits
+from puzzle_generator import PuzzleGenerator, puzzle_key
+
+QUERIES = [
+    ('Hard', {}),
+    ('Medium', {'operation': '×', 'answer': (50, 100)}),
+    ('Hard', {'operation': '-', 'regroup': True}),
+    ('Easy', {'operation': '+', 'regroup': True}),
+    ('Hard', {'operation': '+', 'answer': (90, 100), 'regroup': False}),
+    ('Hard', {'operation': '÷', 'digits': 4}),
+    ('Hard', {'operation': '×', 'answer': (2000, None)}),
+]
+
+
+def describe(difficulty: str, constraints: dict) -> str:
+    parts = [f"{key}={value}" for key, value in constraints.items()]
+    return f"{difficulty} {' '.join(parts) or '(any)'}"
+
+
+def matches(puzzle: dict, operation=None, answer=None, regroup=None, digits=None) -> bool:
+    """Brute-force check of a puzzle against a query"""
+    num1, num2 = puzzle['numbers']
+    if operation is not None and puzzle['operation'] != operation:
+        return False
+    if answer is not None:
+        low, high = answer
+        if (low is not None and puzzle['answer'] < low) or (high is not None and puzzle['answer'] > high):
+            return False
+    if regroup is not None and needs_regrouping(puzzle['operation'], num1, num2) != regroup:
+        return False
+    return digits is None or question_digits(num1, num2) == digits
+
+
+def all_puzzles(bank: PuzzleBank, difficulty: str):
+    level = bank.levels[difficulty]
+    return [bank._puzzle(level, row) for row in range(len(level))]
+
+
+def check(bank: PuzzleBank, draws: int) -> bool:
+    ok = True
+    generator = PuzzleGenerator(seed=1)
+    print(f"{'level':>8} {'puzzles':>8} {'generated ⊆ bank':>17} {'all reached':>12}")
+    for difficulty in PuzzleGenerator.DIFFICULTY_CONFIG:
+        keys = {puzzle_key(puzzle) for puzzle in all_puzzles(bank, difficulty)}
+        generated = {puzzle_key(generator.generate_puzzle(difficulty)) for _ in range(draws)}
+        subset, complete = generated <= keys, generated == keys
+        ok &= subset and complete
+        print(f"{difficulty:>8} {len(keys):>8,} {str(subset):>17} {str(complete):>12}")
+
+    rng = random.Random(2)
+    print(f"\n{'query':>52} {'count':>6} {'brute':>6} {'valid':>6} {'chi²/dof':>9}")
+    for difficulty, constraints in QUERIES:
+        expected = [puzzle for puzzle in all_puzzles(bank, difficulty) if matches(puzzle, **constraints)]
+        count = bank.count(difficulty, **constraints)
+        samples = [bank.sample(difficulty, rng=rng, **constraints) for _ in range(count * 50)]
+        valid = all(matches(puzzle, **constraints) for puzzle in samples)
+        frequency = dict.fromkeys((puzzle['question'] for puzzle in expected), 0)
+        for puzzle in samples:
+            frequency[puzzle['question']] += 1
+        # Pearson's chi-square against uniform; about 1 per degree of freedom,
+        # more than 4 standard deviations above that means a biased sampler
+        chi2 = sum((observed - 50) ** 2 / 50 for observed in frequency.values())
+        dof = max(count - 1, 1)
+        ok &= count == len(expected) and valid and chi2 < dof + 4 * (2 * dof) ** 0.5
+        print(f"{describe(difficulty, constraints):>52} {count:>6,} {len(expected):>6,} {str(valid):>6} "
+              f"{chi2 / dof:>9.2f}")
+    empty = bank.sample('Easy', operation='×') is None and bank.count('Medium', answer=(-5, -1)) == 0
+    print(f"{'empty queries return None / 0':>52} {str(empty):>6}")
+    return ok and empty
+
+
+def rejection_sample(generator: PuzzleGenerator, difficulty: str, constraints: dict, limit: int = 100_000):
+    """Blind draws until one matches; returns the puzzle and the number of draws"""
+    for draws in range(1, limit + 1):
+        puzzle = generator.generate_puzzle(difficulty)
+        if matches(puzzle, **constraints):
+            return puzzle, draws
+    return None, limit
+
+
+def time_queries(bank: PuzzleBank, count: int):
+    generator = PuzzleGenerator(seed=3)
+    print(f"\nConstrained draws ({count:,} per query)")
+    print(f"{'query':>52} {'bank µs':>8} {'reject µs':>10} {'draws/hit':>10}")
+    for difficulty, constraints in QUERIES:
+        start = time.process_time()
+        for _ in range(count):
+            bank.sample(difficulty, **constraints)
+        bank_us = (time.process_time() - start) / count * 1e6
+
+        rejection_count = max(count // 20, 200)
+        total_draws = 0
+        start = time.process_time()
+        for _ in range(rejection_count):
+            total_draws += rejection_sample(generator, difficulty, constraints)[1]
+        reject_us = (time.process_time() - start) / rejection_count * 1e6
+        print(f"{describe(difficulty, constraints):>52} {bank_us:>8.2f} {reject_us:>10.1f} "
+              f"{total_draws / rejection_count:>10.1f}")
+
+    start = time.process_time()
+    for _ in range(count):
+        generator.generate_puzzle('Hard')
+    print(f"{'generate_puzzle Hard (unconstrained)':>52} {'':>8} "
+          f"{(time.process_time() - start) / count * 1e6:>10.2f}")
+
+
+def time_focus(bank: PuzzleBank, attempts: int):
+    """A learner who gets most × wrong, served with and without focus"""
+    print(f"\nLearning loop, {attempts:,} attempts, 20 per learner, × mostly answered wrong")
+    print(f"{'focus':>6} {'µs/attempt':>11} {'× share':>8}")
+    for focus in (0.0, 0.3, 0.6):
+        service = LearningService(seed=0, bank=bank if focus else None, focus=focus)
+        rng = random.Random(4)
+        multiplications = served = 0
+        start = time.process_time()
+        for index in range(attempts):
+            learner_id = f"learner-{index // 20}"
+            service.next_puzzle(learner_id, 'Medium')
+            puzzle = service.sessions[learner_id].current_puzzle
+            if puzzle['operation'] == '×':
+                multiplications += 1
+                answer = puzzle['answer'] if rng.random() < 0.2 else 0
+            else:
+                answer = puzzle['answer'] if rng.random() < 0.9 else 0
+            served += 1
+            service.submit_answer(learner_id, answer, 4.0)
+        elapsed = time.process_time() - start
+        print(f"{focus:>6.1f} {elapsed / attempts * 1e6:>11.1f} {multiplications / served * 100:>7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--draws', type=int, default=200_000, help='generate_puzzle draws for the coverage check')
+    parser.add_argument('--samples', type=int, default=100_000, help='timed draws per query')
+    parser.add_argument('--attempts', type=int, default=100_000)
+    args = parser.parse_args()
+
+    start = time.process_time()
+    bank = PuzzleBank(seed=0)
+    print(f"Bank built in {(time.process_time() - start) * 1000:.0f} ms, "
+          f"{sum(len(level) for level in bank.levels.values()):,} puzzles, {bank.nbytes() / 1024:.0f} KiB\n")
+
+    ok = check(bank, args.draws)
+    time_queries(bank, args.samples)
+    time_focus(bank, args.attempts)
+    if not ok:
+        print("\nPUZZLE BANK CHECK FAILED")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Quantile Sketch Accuracy Benchmark
+Rank error of KLLSketch percentiles against exact quantiles, and the memory
+retained, for several k and stream lengths; also for cohort sketches built by
+merging many per-learner sketches
+"""
+import argparse
+import bisect
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from quantile_sketch import KLLSketch
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+# A list slot plus a float object per retained value
+BYTES_PER_VALUE = 8 + 24
+
+
+def response_times(n: int, seed: int = 0) -> list:
+    """Gamma-distributed response times rounded to the timer resolution"""
+    rng = random.Random(seed)
+    return [round(rng.gammavariate(2.0, 3.0), 2) for _ in range(n)]
+
+
+def max_rank_error(sketch: KLLSketch, exact: list) -> float:
+    """Largest |rank(estimate) - q| over QUANTILES, the sketch's error measure"""
+    errors = []
+    for q, estimate in zip(QUANTILES, sketch.quantiles(QUANTILES)):
+        low = bisect.bisect_left(exact, estimate) / len(exact)
+        high = bisect.bisect_right(exact, estimate) / len(exact)
+        errors.append(0.0 if low <= q <= high else min(abs(low - q), abs(high - q)))
+    return max(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--k', type=int, nargs='+', default=[50, 100, 200, 400])
+    parser.add_argument('--learners', type=int, default=1_000, help='per-learner sketches merged into a cohort')
+    args = parser.parse_args()
+
+    print(f"{'values':>10} {'k':>5} {'retained':>9} {'sketch KiB':>11} {'exact KiB':>10} "
+          f"{'max rank err':>13} {'merged err':>11} {'updates/s':>11}")
+    for n in args.sizes:
+        values = response_times(n)
+        exact = sorted(values)
+        for k in args.k:
+            sketch = KLLSketch(k)
+            start = time.perf_counter()
+            for value in values:
+                sketch.update(value)
+            elapsed = time.perf_counter() - start
+
+            learners = [KLLSketch(k) for _ in range(min(args.learners, n))]
+            for i, value in enumerate(values):
+                learners[i % len(learners)].update(value)
+            cohort = KLLSketch.merged(learners, k)
+
+            print(f"{n:>10,} {k:>5} {sketch.retained:>9,} {sketch.retained * BYTES_PER_VALUE / 1024:>11.1f} "
+                  f"{n * BYTES_PER_VALUE / 1024:>10.1f} {max_rank_error(sketch, exact):>13.4f} "
+                  f"{max_rank_error(cohort, exact):>11.4f} {n / elapsed:>11,.0f}")
+
+
+if __name__ == '__main__':
+    main()
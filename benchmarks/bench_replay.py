@@ -0,0 +1,206 @@
+"""
+Replay Benchmark
+Checks that sessions replay exactly from a learner's stream seed and answer
+log (also across a snapshot export/import), that simulation results do not
+depend on how learners are split into chunks and that batches split across
+processes are reproducible; then times puzzle draws from per-learner
+streams against the shared generator
+"""
+import argparse
+import random
+import sys
+import time
+from multiprocessing import Pool
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from adaptive_engine import AdaptiveEngine
+from difficulty_scale import DifficultyScale, default_specs
+from learning_service import LearningService, answers_from_attempts, replay_session
+from puzzle_generator import PuzzleGenerator
+from puzzle_pool import PuzzlePool
+from random_streams import RandomStream
+from rule_engine import RuleSet
+from simulation import run_simulation
+from skill_model import SkillEngine, SkillModel
+
+
+def configurations():
+    """(name, factory) pairs building a fresh (generator, engine) per call"""
+    scale = DifficultyScale(default_specs(100))
+
+    def rules():
+        return PuzzleGenerator(), AdaptiveEngine()
+
+    def scale_rules():
+        return PuzzleGenerator(scale), AdaptiveEngine(rules=RuleSet(scale.rule_config()))
+
+    def skill():
+        generator = PuzzleGenerator()
+        return generator, SkillEngine(SkillModel.for_generator(generator))
+
+    def scale_skill():
+        generator = PuzzleGenerator(scale)
+        return generator, SkillEngine(SkillModel.for_generator(generator))
+
+    return [('rules', rules), ('scale100-rules', scale_rules), ('skill', skill), ('scale100-skill', scale_skill)]
+
+
+def play(service: LearningService, learner_id: str, puzzles: int, rng: random.Random, start: str = None):
+    """Answer puzzles with a mix of right, wrong and skipped answers"""
+    for _ in range(puzzles):
+        service.next_puzzle(learner_id, start)
+        answer = service.sessions[learner_id].current_puzzle['answer']
+        roll = rng.random()
+        if roll < 0.1:
+            answer = None
+        elif roll < 0.35:
+            answer = answer + rng.choice((-1, 1)) if rng.random() < 0.8 else 0
+        service.submit_answer(learner_id, answer, rng.uniform(1.0, 12.0))
+
+
+def fingerprint(session):
+    """Everything a replay must reproduce, without wall-clock timestamps"""
+    attempts = [{key: value for key, value in attempt.items() if key != 'timestamp'}
+                for attempt in session.tracker.attempts]
+    learner = session.learner
+    return (attempts, learner.difficulty_history, learner.current_difficulty, sorted(learner.seen_puzzles),
+            learner.skills, learner.rng.position, session.tracker.get_session_stats())
+
+
+def check_replay(sessions: int, puzzles: int, seed: int) -> bool:
+    ok = True
+    print(f"Replay: {sessions} sessions x {puzzles} puzzles per configuration, root seed {seed}")
+    print(f"{'config':>16} {'replayed':>9} {'snapshot':>9} {'replay/s':>10}")
+    rng = random.Random(seed)
+    for name, factory in configurations():
+        generator, engine = factory()
+        service = LearningService(generator, engine, seed=seed)
+        starts = [rng.choice((None, 'Easy', 'Hard')) for _ in range(sessions)]
+        for index in range(sessions):
+            play(service, f"learner-{index}", puzzles, rng, starts[index])
+
+        replayed = 0
+        elapsed = 0.0
+        for index in range(sessions):
+            learner_id = f"learner-{index}"
+            original = service.sessions[learner_id]
+            answers = answers_from_attempts(original.tracker.attempts)
+            generator, engine = factory()
+            begin = time.process_time()
+            replay = replay_session(learner_id, service.learner_seed(learner_id), answers,
+                                    generator, engine, starts[index])
+            elapsed += time.process_time() - begin
+            replayed += fingerprint(replay) == fingerprint(original)
+
+        # Export half-way, continue in a fresh service, compare with an uninterrupted run
+        restored = 0
+        for index in range(min(sessions, 100)):
+            learner_id = f"snap-{index}"
+            answer_rng = random.Random(index)
+            generator, engine = factory()
+            straight = LearningService(generator, engine, seed=seed)
+            play(straight, learner_id, puzzles, answer_rng)
+            answer_rng = random.Random(index)
+            generator, engine = factory()
+            first = LearningService(generator, engine, seed=seed)
+            play(first, learner_id, puzzles // 2, answer_rng)
+            second = LearningService(generator, engine)
+            second.import_session(first.export_session(learner_id))
+            play(second, learner_id, puzzles - puzzles // 2, answer_rng)
+            restored += fingerprint(second.sessions[learner_id])[:6] == fingerprint(straight.sessions[learner_id])[:6]
+        checked = min(sessions, 100)
+        ok &= replayed == sessions and restored == checked
+        print(f"{name:>16} {replayed:>4}/{sessions:<4} {restored:>4}/{checked:<4} {sessions * puzzles / elapsed:>10,.0f}")
+    return ok
+
+
+def check_chunking(learners: int, seed: int) -> bool:
+    """Simulation totals must not depend on the chunk size"""
+    reports = [run_simulation(learners, puzzles=10, workers=1, chunk_size=size, seed=seed)
+               for size in (1, 7, learners)]
+    for report in reports:
+        report.pop('sessions_per_sec')
+    same = all(report == reports[0] for report in reports)
+    print(f"\nSimulation of {learners} learners with chunk sizes 1, 7 and {learners}: "
+          f"{'identical' if same else 'DIFFERENT'}")
+    return same
+
+
+def _batch_part(task):
+    difficulty, n, seed_sequence = task
+    batch = PuzzleGenerator().generate_batch(difficulty, n, seed=seed_sequence)
+    return batch.num1, batch.num2, batch.op
+
+
+def check_batches(parts: int, n: int, seed: int) -> bool:
+    """Batches split across processes match serial generation from the same spawned seeds"""
+    children = np.random.SeedSequence(seed).spawn(parts)
+    tasks = [('Hard', n, child) for child in children]
+    with Pool(parts) as pool:
+        parallel = pool.map(_batch_part, tasks)
+    serial = [_batch_part(task) for task in tasks]
+    same = all(all(np.array_equal(a, b) for a, b in zip(p, s)) for p, s in zip(parallel, serial))
+    distinct = len({p[0].tobytes() for p in parallel}) == parts
+    correlation = max(abs(np.corrcoef(parallel[i][0], parallel[i + 1][0])[0, 1]) for i in range(parts - 1))
+    print(f"Batch of {parts} x {n:,} split across processes: {'reproducible' if same else 'NOT REPRODUCIBLE'}, "
+          f"parts {'distinct' if distinct else 'REPEATED'}, max |corr| between parts {correlation:.4f}")
+    return same and distinct
+
+
+def time_draws(count: int):
+    generator = PuzzleGenerator(seed=0)
+    streams = [RandomStream(seed) for seed in range(1000)]
+
+    def shared():
+        for _ in range(count):
+            generator.generate_puzzle('Hard')
+
+    def per_learner():
+        for index in range(count):
+            generator.generate_puzzle('Hard', streams[index % 1000])
+
+    print(f"\nPuzzle draws ({count:,}, Hard)")
+    print(f"{'stream':>24} {'µs/puzzle':>10} {'state bytes':>12}")
+    for name, run, size in (('generator random.Random', shared, sys.getsizeof(generator.rng)),
+                            ('per-learner RandomStream', per_learner, sys.getsizeof(streams[0]))):
+        start = time.process_time()
+        run()
+        print(f"{name:>24} {(time.process_time() - start) / count * 1e6:>10.2f} {size:>12,}")
+
+    rng = random.Random(0)
+    learners = count // 20
+    print(f"\nService loop ({count:,} attempts, 20 per learner)")
+    print(f"{'puzzles from':>24} {'µs/attempt':>10}")
+    for name, pool in (('learner streams', None), ('shared pool', PuzzlePool(PuzzleGenerator(), background=False))):
+        service = LearningService(PuzzleGenerator(), AdaptiveEngine(), pool=pool, seed=0)
+        start = time.process_time()
+        for index in range(count):
+            learner_id = f"learner-{index % learners}"
+            puzzle = service.next_puzzle(learner_id)
+            service.submit_answer(learner_id, None if rng.random() < 0.3 else 1, 5.0)
+        print(f"{name:>24} {(time.process_time() - start) / count * 1e6:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sessions', type=int, default=500)
+    parser.add_argument('--puzzles', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--draws', type=int, default=200_000)
+    args = parser.parse_args()
+
+    ok = check_replay(args.sessions, args.puzzles, args.seed)
+    ok &= check_chunking(2000, args.seed)
+    ok &= check_batches(4, 100_000, args.seed)
+    time_draws(args.draws)
+    if not ok:
+        print("\nREPRODUCIBILITY CHECK FAILED")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
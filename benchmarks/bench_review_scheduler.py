@@ -0,0 +1,203 @@
+"""
+Review Scheduler Benchmark
+Checks the scheduler against a brute-force model of every pending review,
+then fills it with 100k learners × 100 pending reviews and measures
+scheduling, taking and recording operations per second, memory, and the
+cost of pulling every due review through the timing wheel against
+scanning all learners
+"""
+import argparse
+import random
+import resource
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from puzzle_generator import PuzzleGenerator, puzzle_key
+from review_scheduler import DEFAULT_INTERVALS, ReviewScheduler
+
+START = 1_800_000_000.0
+
+
+def puzzle_pool(count: int, seed: int = 0):
+    generator = PuzzleGenerator(seed=seed)
+    difficulties = list(PuzzleGenerator.DIFFICULTY_CONFIG)
+    return [generator.generate_puzzle(difficulties[index % len(difficulties)]) for index in range(count)]
+
+
+def check(operations: int, learners: int) -> bool:
+    """Random schedule / take / record / pull operations against a brute-force model"""
+    rng = random.Random(1)
+    pool = puzzle_pool(500)
+    # A small wheel, so the month-long intervals go through its overflow heap
+    scheduler = ReviewScheduler(resolution=60.0, slots=64)
+    model = {}  # learner -> list of (due, box, key)
+    now = START
+    ok = True
+    for _ in range(operations):
+        learner_id = f"learner-{rng.randrange(learners)}"
+        choice = rng.random()
+        if choice < 0.4:
+            puzzle = rng.choice(pool)
+            box = rng.randrange(len(DEFAULT_INTERVALS))
+            scheduler.schedule(learner_id, puzzle, box, now)
+            model.setdefault(learner_id, []).append((int(now + DEFAULT_INTERVALS[box]), box, puzzle_key(puzzle)))
+        elif choice < 0.7:
+            reviews = model.get(learner_id, [])
+            due = [review for review in reviews if review[0] <= now]
+            puzzle = scheduler.take_due(learner_id, now)
+            if not due:
+                ok &= puzzle is None
+                continue
+            if puzzle is None:
+                ok = False
+                continue
+            # Reviews due at the same second may come in either order
+            earliest = (min(due)[0], puzzle['review'], puzzle_key(puzzle))
+            ok &= earliest in due
+            ok &= puzzle['answer'] == next(item for item in pool if puzzle_key(item) == earliest[2])['answer']
+            if earliest in reviews:
+                reviews.remove(earliest)
+            # Answer the review: correct moves it up a box, wrong back to the first
+            is_correct = rng.random() < 0.7
+            scheduler.record(learner_id, puzzle, is_correct, now)
+            box = earliest[1] + 1 if is_correct else 0
+            if box < len(DEFAULT_INTERVALS):
+                reviews.append((int(now + DEFAULT_INTERVALS[box]), box, earliest[2]))
+        elif choice < 0.9:
+            pulled = sorted((learner, puzzle['review'], puzzle_key(puzzle)) for learner, puzzle in scheduler.pull_due(now))
+            expected = []
+            for learner, reviews in model.items():
+                expected.extend((learner, box, key) for due, box, key in reviews if due <= now)
+                reviews[:] = [review for review in reviews if review[0] > now]
+            ok &= pulled == sorted(expected)
+        else:
+            now += rng.choice((1, 30, 600, 7200, 86400))
+    pending = sum(len(reviews) for reviews in model.values())
+    ok &= len(scheduler) == pending
+    print(f"{operations:,} random operations over {learners} learners, {(now - START) / 86400:.0f} days: "
+          f"{'match' if ok else 'MISMATCH'}, {pending} reviews pending")
+    return ok
+
+
+def check_log() -> bool:
+    """A scheduler rebuilt from attempt-log records equals the one that served them"""
+    rng = random.Random(2)
+    pool = puzzle_pool(200)
+    live, rebuilt = ReviewScheduler(), ReviewScheduler()
+    records = []
+    now = time.mktime(time.strptime('2026-03-02 09:00:00', '%Y-%m-%d %H:%M:%S'))
+    for _ in range(20_000):
+        learner_id = f"learner-{rng.randrange(50)}"
+        puzzle = live.take_due(learner_id, now) or rng.choice(pool)
+        is_correct = rng.random() < 0.6
+        live.record(learner_id, puzzle, is_correct, now)
+        record = {'kind': 'attempt', 'learner_id': learner_id,
+                  'timestamp': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now)),
+                  'puzzle': puzzle['question'], 'is_correct': is_correct, 'difficulty': puzzle['difficulty'],
+                  'operation': puzzle['operation']}
+        if 'review' in puzzle:
+            record['review'] = puzzle['review']
+        records.append(record)
+        now += rng.choice((1, 5, 20, 300))
+    rebuilt.observe_log(records)
+    ok = {learner: sorted(heap) for learner, heap in live.heaps.items()} == \
+        {learner: sorted(heap) for learner, heap in rebuilt.heaps.items()}
+    print(f"Rebuilt from {len(records):,} log records: {'match' if ok else 'MISMATCH'}, {len(live):,} pending")
+    return ok
+
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(learners: int, per_learner: int, pulls: int):
+    pool = puzzle_pool(4096)
+    rng = random.Random(3)
+    scheduler = ReviewScheduler()
+    learner_ids = [f"learner-{index}" for index in range(learners)]
+    total = learners * per_learner
+    print(f"\n{learners:,} learners × {per_learner} pending reviews")
+    print(f"{'operation':>36} {'count':>11} {'seconds':>8} {'ops/s':>11}")
+
+    # Misses spread over the last month land in every box, due from now to three weeks out
+    boxes = [rng.randrange(len(DEFAULT_INTERVALS)) for _ in range(4096)]
+    offsets = [rng.uniform(-30 * 86400, 0) for _ in range(4096)]
+    rss_before = rss_mb()
+    start = time.process_time()
+    for index in range(total):
+        scheduler.schedule(learner_ids[index % learners], pool[index & 4095], boxes[index * 7 & 4095],
+                           START + offsets[index * 13 & 4095])
+    elapsed = time.process_time() - start
+    print(f"{'schedule':>36} {total:>11,} {elapsed:>8.2f} {total / elapsed:>11,.0f}")
+    print(f"{'':>36} {len(scheduler):,} pending, +{rss_mb() - rss_before:,.0f} MB RSS, "
+          f"{(rss_mb() - rss_before) * 2**20 / total:.0f} bytes per review")
+
+    # Learners answering: take their earliest due review and record the answer
+    count = min(total // 10, 1_000_000)
+    now = START
+    taken = 0
+    start = time.process_time()
+    for index in range(count):
+        learner_id = learner_ids[index * 7919 % learners]
+        puzzle = scheduler.take_due(learner_id, now)
+        if puzzle is not None:
+            taken += 1
+            scheduler.record(learner_id, puzzle, index % 3 != 0, now)
+    elapsed = time.process_time() - start
+    print(f"{'take_due + record':>36} {count:>11,} {elapsed:>8.2f} {count / elapsed:>11,.0f}"
+          f"  ({taken:,} reviews were due)")
+
+    start = time.process_time()
+    for index in range(count):
+        scheduler.has_due(learner_ids[index * 7919 % learners], now)
+    elapsed = time.process_time() - start
+    print(f"{'has_due':>36} {count:>11,} {elapsed:>8.2f} {count / elapsed:>11,.0f}")
+
+    # The backlog due before the scheduler started serving, drained in one pull
+    start = time.process_time()
+    backlog = len(scheduler.pull_due(now))
+    elapsed = time.process_time() - start
+    print(f"{'pull_due (initial backlog)':>36} {backlog:>11,} {elapsed:>8.2f} {backlog / elapsed:>11,.0f}")
+
+    # Without the index a pull has to look at every learner's earliest review
+    # on top of the same per-review work
+    start = time.process_time()
+    for _ in range(pulls):
+        due = [learner_id for learner_id, heap in scheduler.heaps.items() if heap[0] >> 64 <= now]
+    scan = (time.process_time() - start) / pulls
+
+    print(f"\nPulling every due review, {len(scheduler):,} pending; scanning all learners takes {scan * 1e3:.1f} ms")
+    print(f"{'every':>10} {'due/pull':>9} {'wheel µs':>9} {'µs/review':>10} {'scan µs ≥':>10}")
+    for step, label in ((1, '1 s'), (10, '10 s'), (60, '1 min'), (600, '10 min')):
+        pulled = wheel_time = 0.0
+        for _ in range(pulls):
+            now += step
+            start = time.process_time()
+            pulled += len(scheduler.pull_due(now))
+            wheel_time += time.process_time() - start
+        per_review = wheel_time / pulled * 1e6 if pulled else 0.0
+        print(f"{label:>10} {pulled / pulls:>9,.0f} {wheel_time / pulls * 1e6:>9,.0f} {per_review:>10.2f} "
+              f"{(wheel_time / pulls + scan) * 1e6:>10,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--learners', type=int, default=100_000)
+    parser.add_argument('--per-learner', type=int, default=100)
+    parser.add_argument('--operations', type=int, default=200_000, help='operations of the brute-force check')
+    parser.add_argument('--pulls', type=int, default=30, help='timed pulls per interval')
+    args = parser.parse_args()
+
+    ok = check(args.operations, 40)
+    ok &= check_log()
+    measure(args.learners, args.per_learner, args.pulls)
+    if not ok:
+        print("\nREVIEW SCHEDULER CHECK FAILED")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
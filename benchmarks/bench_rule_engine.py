@@ -0,0 +1,80 @@
+"""
+Rule Engine Benchmark
+Decisions/sec of compiled rule tables vs. walking the rules in order, for
+rule sets of 1 and 50 rules
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from adaptive_engine import AdaptiveEngine
+from rule_engine import DEFAULT_LEVELS, RuleSet
+from tracker import RecentWindow
+
+
+def random_rules(count: int, window_size: int, rng: random.Random) -> dict:
+    """A rule configuration of count narrow rules, so the walk visits many of them"""
+    rules = []
+    for index in range(count):
+        low = round(rng.uniform(1.0, 14.0), 1)
+        when = {
+            'levels': rng.sample(DEFAULT_LEVELS, rng.randint(1, 2)),
+            'min_avg_time': low,
+            'max_avg_time': round(low + rng.uniform(0.2, 1.0), 1),
+            'min_correct': rng.randint(0, window_size)
+        }
+        if rng.random() < 0.3:
+            when['min_trend_accuracy'] = round(rng.uniform(0.3, 0.9), 2)
+        rules.append({'name': f'rule_{index}', 'when': when, 'step': rng.choice([-1, 1])})
+    return {'name': f'{count}_rules', 'window_size': window_size, 'rules': rules}
+
+
+def decisions_per_sec(decide, inputs) -> float:
+    start = time.perf_counter()
+    for args in inputs:
+        decide(*args)
+    return len(inputs) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', type=int, default=200_000, help='decisions per run')
+    parser.add_argument('--window', type=int, default=5)
+    parser.add_argument('--rules', type=int, nargs='+', default=[1, 50])
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    inputs = []
+    for _ in range(args.n):
+        total = rng.randint(2, args.window)
+        inputs.append((rng.randrange(len(DEFAULT_LEVELS)), rng.randint(0, total), total,
+                       rng.uniform(0.5, 15.0), rng.random()))
+
+    windows = []
+    for _ in range(1000):
+        window = RecentWindow(args.window)
+        for _ in range(args.window):
+            window.push(rng.random() < 0.6, round(rng.uniform(0.5, 15.0), 2))
+        windows.append((window, rng.choice(DEFAULT_LEVELS)))
+    window_inputs = [windows[i % len(windows)] for i in range(args.n)]
+
+    print(f"{'rules':>6} {'compile ms':>11} {'table cells':>12} {'walk':>14} {'table':>14} {'engine':>14}")
+    for count in args.rules:
+        config = random_rules(count, args.window, rng)
+        start = time.perf_counter()
+        rules = RuleSet(config)
+        compile_ms = (time.perf_counter() - start) * 1000
+        engine = AdaptiveEngine(rules=rules)
+        walk = decisions_per_sec(rules.evaluate_rules, inputs)
+        table = decisions_per_sec(rules.decide, inputs)
+        full = decisions_per_sec(engine.evaluate, window_inputs)
+        print(f"{count:>6} {compile_ms:>11.1f} {len(rules._table):>12,} {walk:>12,.0f}/s "
+              f"{table:>12,.0f}/s {full:>12,.0f}/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Session Memory Load Test
+Compares RSS per session with per-session object graphs vs. shared
+generator/engine instances plus a LearnerState record
+"""
+import argparse
+import random
+import resource
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from adaptive_engine import AdaptiveEngine
+from learner_state import LearnerState
+from puzzle_generator import PuzzleGenerator
+from tracker import PerformanceTracker
+
+
+def rss_bytes() -> int:
+    """Current resident set size, falling back to the peak where /proc is unavailable"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_per_session(sessions: int, puzzles: int, rng: random.Random) -> list:
+    """Every session owns its generator, tracker and engine, as the UI used to"""
+    states = []
+    for _ in range(sessions):
+        tracker = PerformanceTracker()
+        tracker.start_session()
+        states.append({'generator': PuzzleGenerator(), 'tracker': tracker, 'engine': AdaptiveEngine()})
+    for _ in range(puzzles):
+        for state in states:
+            puzzle = state['generator'].generate_puzzle(state['engine'].current_difficulty)
+            is_correct = rng.random() < 0.7
+            state['tracker'].log_attempt(puzzle, 0, is_correct, rng.uniform(2, 12))
+            state['engine'].adapt_difficulty(state['tracker'].get_window(3), puzzle['difficulty'])
+    return states
+
+
+def run_shared(sessions: int, puzzles: int, rng: random.Random) -> list:
+    """Sessions hold a tracker and a LearnerState; generator and engine are shared"""
+    generator = PuzzleGenerator()
+    engine = AdaptiveEngine()
+    states = []
+    for _ in range(sessions):
+        tracker = PerformanceTracker(window_sizes=())
+        tracker.start_session()
+        states.append({'tracker': tracker, 'learner': LearnerState(window_size=engine.window_size)})
+    for _ in range(puzzles):
+        for state in states:
+            learner = state['learner']
+            puzzle = generator.generate_puzzle(learner.current_difficulty)
+            is_correct = rng.random() < 0.7
+            time_spent = round(rng.uniform(2, 12), 2)
+            state['tracker'].log_attempt(puzzle, 0, is_correct, time_spent)
+            learner.record(is_correct, time_spent)
+            engine.adapt_learner(learner)
+    return states
+
+
+def measure(mode: str, sessions: int, puzzles: int):
+    rng = random.Random(0)
+    baseline = rss_bytes()
+    run = run_per_session if mode == 'per-session' else run_shared
+    states = run(sessions, puzzles, rng)
+    used = rss_bytes() - baseline
+    print(f"{mode:<12} {sessions:>7,} sessions {used / 2**20:>9.2f} MiB {used / len(states):>10,.0f} bytes/session")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sessions', type=int, default=1000)
+    parser.add_argument('--puzzles', type=int, default=10, help='answered puzzles per session')
+    parser.add_argument('--mode', choices=['per-session', 'shared'])
+    args = parser.parse_args()
+
+    if args.mode:
+        measure(args.mode, args.sessions, args.puzzles)
+        return
+
+    # Run each mode in a fresh interpreter so RSS readings do not interfere
+    for mode in ('per-session', 'shared'):
+        subprocess.run([sys.executable, __file__, '--mode', mode,
+                        '--sessions', str(args.sessions), '--puzzles', str(args.puzzles)], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Session Store Load Test
+Checks that sessions spilled to disk and restored (also by a new store on
+the same directory) carry on exactly like sessions kept in memory, then
+runs 50,000 learners through LearningService with and without a memory
+budget and reports RSS, throughput, resident/spilled counts and restore
+latency
+"""
+import argparse
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from learning_service import LearnerSession, LearningService
+from session_store import SessionStore
+
+ATTEMPT_FIELDS = ('puzzle', 'correct_answer', 'user_answer', 'is_correct', 'time_spent', 'difficulty', 'operation')
+
+
+def rss_bytes() -> int:
+    """Current resident set size, falling back to the peak where /proc is unavailable"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def answer(service: LearningService, learner_id: str, rng: random.Random):
+    """Serve a puzzle and answer it right, wrong or not at all"""
+    service.next_puzzle(learner_id)
+    correct = service.sessions[learner_id].current_puzzle['answer']
+    roll = rng.random()
+    service.submit_answer(learner_id, None if roll < 0.05 else correct if roll < 0.75 else correct + 1,
+                          round(rng.uniform(2, 14), 2))
+
+
+def fingerprint(session: LearnerSession) -> tuple:
+    learner, tracker = session.learner, session.tracker
+    return (learner.current_difficulty, learner.attempt_count, learner.correct_count,
+            len(learner.window), learner.window.accuracy, learner.window.avg_time,
+            repr(learner.difficulty_history), sorted(learner.seen_puzzles), learner.rng.position,
+            [tuple(attempt[field] for field in ATTEMPT_FIELDS) for attempt in tracker.attempts],
+            tracker.get_session_stats()['accuracy'], session.current_puzzle)
+
+
+def check(learners: int, rounds: int, directory: str) -> bool:
+    """Same traffic against a dict and a store that has to spill most sessions"""
+    plain = LearningService(seed=7)
+    store = SessionStore(directory, max_bytes=learners * 8 * 1024 // 10, ttl=3600)
+    spilling = LearningService(seed=7, store=store)
+    rng_plain, rng_store = random.Random(1), random.Random(1)
+    order = random.Random(2)
+    for _ in range(rounds * learners):
+        learner_id = f"learner-{order.randrange(learners)}"
+        answer(plain, learner_id, rng_plain)
+        answer(spilling, learner_id, rng_store)
+    # Leave a puzzle on screen for half of them
+    for index in range(0, learners, 2):
+        plain.next_puzzle(f"learner-{index}")
+        spilling.next_puzzle(f"learner-{index}")
+
+    # Remember every attempt timer (looking sessions up restores and spills them
+    # again under the budget), then everybody goes idle and is spilled
+    timers = {learner_id: spilling.sessions[learner_id].tracker.current_attempt_start
+              for learner_id in (f"learner-{index}" for index in range(learners))}
+    store.evict_idle(time.time() + store.ttl + 1)
+    spilled_all = len(store.resident) == 0 and len(store.spilled) == learners
+
+    # A new store on the same directory, as after a restart
+    restarted = LearningService(seed=7, store=SessionStore(directory, max_bytes=store.max_bytes, ttl=3600))
+    same = timers_kept = 0
+    for index in range(learners):
+        learner_id = f"learner-{index}"
+        session = restarted.sessions[learner_id]
+        timers_kept += session.tracker.current_attempt_start == timers[learner_id]
+        same += fingerprint(session) == fingerprint(plain.sessions[learner_id])
+    # ... and play on identically
+    for _ in range(learners):
+        learner_id = f"learner-{order.randrange(learners)}"
+        answer(plain, learner_id, rng_plain)
+        answer(restarted, learner_id, rng_store)
+    same_after = sum(fingerprint(restarted.sessions[f"learner-{index}"]) ==
+                     fingerprint(plain.sessions[f"learner-{index}"]) for index in range(learners))
+    stats = restarted.store_stats()
+    print(f"{learners:,} learners, {rounds * learners:,} answers, budget for ~10% of them: "
+          f"{store.spills:,} spills, {store.restores:,} restores")
+    print(f"  all spilled when idle: {spilled_all}; after a restart {same:,}/{learners:,} sessions identical, "
+          f"{timers_kept:,}/{learners:,} attempt timers kept; "
+          f"{same_after:,}/{learners:,} identical after playing on ({stats['restores']:,} restores)")
+    return spilled_all and same == learners and timers_kept == learners and same_after == learners
+
+
+def load(mode: str, learners: int, attempts: int, concurrent: int, budget_mb: float, directory: str):
+    """One school day: learners come and go, a fifth come back later"""
+    rng = random.Random(3)
+    baseline = rss_bytes()
+    store = SessionStore(directory, max_bytes=int(budget_mb * 2**20), ttl=3600) if mode == 'store' else None
+    service = LearningService(seed=1, store=store)
+    # (learner, answers left) for the sessions in progress
+    active = [[f"learner-{index}", attempts] for index in range(concurrent)]
+    returning = []
+    started, answered, peak = concurrent, 0, 0
+    start = time.process_time()
+    while active:
+        slot = rng.randrange(len(active))
+        learner_id = active[slot][0]
+        answer(service, learner_id, rng)
+        answered += 1
+        active[slot][1] -= 1
+        if active[slot][1] == 0:
+            if started < learners:
+                if rng.random() < 0.2:
+                    returning.append(learner_id)
+                # Returning learners come back once many others have started
+                if returning and rng.random() < 0.25 and started > learners // 2:
+                    active[slot] = [returning.pop(rng.randrange(len(returning))), attempts]
+                else:
+                    active[slot] = [f"learner-{started}", attempts]
+                    started += 1
+            else:
+                active[slot] = active[-1]
+                active.pop()
+        if answered % 50_000 == 0:
+            peak = max(peak, rss_bytes() - baseline)
+    elapsed = time.process_time() - start
+    peak = max(peak, rss_bytes() - baseline)
+    stats = service.store_stats()
+    restore = (f"{stats['restore_ms_p50']:.2f} / {stats['restore_ms_p99']:.2f}"
+               if stats.get('restore_ms_p50') is not None else '-')
+    disk = sum(entry.stat().st_size for entry in os.scandir(directory)) if store else 0
+    print(f"{mode:>6} {len(service.sessions):>9,} {stats['resident']:>9,} {stats['spilled']:>8,} "
+          f"{peak / 2**20:>9,.0f} {answered / elapsed:>10,.0f} {stats.get('spills', 0):>8,} "
+          f"{stats.get('restores', 0):>9,} {restore:>15} {disk / 2**20:>8,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--learners', type=int, default=50_000)
+    parser.add_argument('--attempts', type=int, default=20, help='answers per visit')
+    parser.add_argument('--concurrent', type=int, default=2_000, help='sessions in progress at once')
+    parser.add_argument('--budget-mb', type=float, default=64.0)
+    parser.add_argument('--mode', choices=['dict', 'store'])
+    parser.add_argument('--directory')
+    args = parser.parse_args()
+
+    if args.mode:
+        load(args.mode, args.learners, args.attempts, args.concurrent, args.budget_mb, args.directory)
+        return
+
+    root = tempfile.mkdtemp()
+    try:
+        ok = check(2_000, 10, os.path.join(root, 'check'))
+        print(f"\n{args.learners:,} learners, {args.attempts} answers per visit, {args.concurrent:,} at once, "
+              f"store budget {args.budget_mb:.0f} MB")
+        print(f"{'mode':>6} {'sessions':>9} {'resident':>9} {'spilled':>8} {'RSS MB':>9} {'answers/s':>10} "
+              f"{'spills':>8} {'restores':>9} {'restore ms p50/p99':>15} {'disk MB':>8}")
+        # Each mode in a fresh interpreter so RSS readings do not interfere
+        for mode in ('dict', 'store'):
+            subprocess.run([sys.executable, __file__, '--mode', mode, '--learners', str(args.learners),
+                            '--attempts', str(args.attempts), '--concurrent', str(args.concurrent),
+                            '--budget-mb', str(args.budget_mb), '--directory', os.path.join(root, mode)],
+                           check=True)
+    finally:
+        shutil.rmtree(root)
+    if not ok:
+        print("\nSESSION STORE CHECK FAILED")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""
+Sharding Benchmark
+Measures how evenly the consistent hash ring spreads learners and how many
+change workers when one is added or removed, against hashing modulo N;
+checks that sessions keep their state when the router moves them between
+live workers; then drives a plain API server and the shard router with
+1, 2 and 4 workers from several load processes and reports requests/sec
+and latency
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / 'src'
+sys.path.insert(0, str(SRC))
+
+from bench_api_load import request, run_load, wait_for_port
+from shard_router import HashRing, ShardRouter, ring_hash, start_workers
+
+
+def ring_balance(keys: int, vnodes: int):
+    learner_ids = [f"learner-{index}" for index in range(keys)]
+    print(f"{keys:,} learners, {vnodes} points per worker")
+    print(f"{'workers':>7} {'max/mean':>9} {'min/mean':>9} {'moved on add':>13} {'ideal':>7} {'modulo':>7} "
+          f"{'moved on remove':>16}")
+    for workers in range(1, 9):
+        ring = HashRing([f"shard-{index}" for index in range(workers)], vnodes)
+        owners = [ring.node_for(learner_id) for learner_id in learner_ids]
+        loads = [owners.count(node) for node in ring.nodes]
+        mean = keys / workers
+        grown = ring.copy()
+        grown.add(f"shard-{workers}")
+        added = sum(owner != grown.node_for(learner_id) for owner, learner_id in zip(owners, learner_ids))
+        modulo = sum(ring_hash(learner_id) % workers != ring_hash(learner_id) % (workers + 1)
+                     for learner_id in learner_ids)
+        shrunk = ring.copy()
+        shrunk.remove(ring.nodes[0])
+        removed = (sum(owner != shrunk.node_for(learner_id) for owner, learner_id in zip(owners, learner_ids))
+                   if len(shrunk) else keys)
+        print(f"{workers:>7} {max(loads) / mean:>9.2f} {min(loads) / mean:>9.2f} {added / keys:>13.1%} "
+              f"{1 / (workers + 1):>7.1%} {modulo / keys:>7.1%} {removed / keys:>16.1%}")
+
+
+async def session_states(host: str, port: int, learner_ids: list) -> dict:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        return {learner_id: await request(reader, writer, 'GET', f"/session_stats?learner_id={learner_id}")
+                for learner_id in learner_ids}
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def migrate(socket_dir: str, learners: int, answers: int) -> bool:
+    """Sessions moved by add_worker / remove_worker carry on where they left off"""
+    processes = start_workers(3, socket_dir, ['--seed', '5'])
+    try:
+        paths = {name: path for name, (path, _) in processes.items()}
+        router = ShardRouter({name: paths[name] for name in ('shard-0', 'shard-1')})
+        server = await asyncio.start_server(router.handle_connection, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        learner_ids = [f"learner-{index}" for index in range(learners)]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        for round_ in range(answers):
+            for learner_id in learner_ids:
+                await request(reader, writer, 'POST', '/next_puzzle', {'learner_id': learner_id})
+                await request(reader, writer, 'POST', '/submit_answer',
+                              {'learner_id': learner_id, 'answer': (round_ * 7) % 20})
+        # Leave a puzzle on screen for everybody, to be shown again after the moves
+        shown = {learner_id: await request(reader, writer, 'POST', '/next_puzzle', {'learner_id': learner_id})
+                 for learner_id in learner_ids}
+        before = await session_states('127.0.0.1', port, learner_ids)
+
+        ok = True
+        grown = HashRing(['shard-0', 'shard-1', 'shard-2'])
+        expected = sum(router.ring.node_for(learner_id) != grown.node_for(learner_id) for learner_id in learner_ids)
+        start = time.perf_counter()
+        added = await router.add_worker('shard-2', paths['shard-2'])
+        add_seconds = time.perf_counter() - start
+        ok &= added == expected and await session_states('127.0.0.1', port, learner_ids) == before
+        shrunk = HashRing(['shard-1', 'shard-2'])
+        expected_removed = sum(grown.node_for(learner_id) == 'shard-0' for learner_id in learner_ids)
+        start = time.perf_counter()
+        removed = await router.remove_worker('shard-0')
+        remove_seconds = time.perf_counter() - start
+        ok &= removed == expected_removed and await session_states('127.0.0.1', port, learner_ids) == before
+        ok &= all(router.ring.node_for(learner_id) == shrunk.node_for(learner_id) for learner_id in learner_ids)
+
+        same_puzzle = 0
+        for learner_id, puzzle in shown.items():
+            same_puzzle += await request(reader, writer, 'POST', '/next_puzzle', {'learner_id': learner_id}) == puzzle
+        ok &= same_puzzle == learners
+        counts = await request(reader, writer, 'GET', '/store_stats')
+        ok &= counts['resident'] == learners and 'shard-0' not in counts['workers']
+        writer.close()
+        await writer.wait_closed()
+        # Let the router see the client go before the loop shuts down
+        await asyncio.sleep(0.1)
+        server.close()
+        print(f"\n{learners} learners × {answers} answers on 2 workers, then a third added and the first removed")
+        print(f"  add:    {added} sessions moved ({expected} change owner) in {add_seconds * 1000:.0f} ms")
+        print(f"  remove: {removed} sessions moved ({expected_removed} on the removed worker) "
+              f"in {remove_seconds * 1000:.0f} ms")
+        print(f"  session stats unchanged after both moves, {same_puzzle}/{learners} puzzles on screen kept, "
+              f"sessions per worker "
+              f"{ {name: entry['resident'] for name, entry in counts['workers'].items()} }: "
+              f"{'match' if ok else 'MISMATCH'}")
+        return ok
+    finally:
+        for _, process in processes.values():
+            process.terminate()
+            process.wait()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def load(host: str, port: int, learners: int, duration: float, offset: int):
+    """One load process; prints its latencies as JSON"""
+    latencies = asyncio.run(run_load(host, port, learners, duration, first=offset))
+    print(json.dumps(latencies))
+
+
+def drive(host: str, port: int, learners: int, duration: float, processes: int) -> list:
+    per_process = learners // processes
+    children = [subprocess.Popen([sys.executable, __file__, '--mode', 'load', '--port', str(port),
+                                  '--learners', str(per_process), '--duration', str(duration),
+                                  '--offset', str(index * per_process)], stdout=subprocess.PIPE)
+                for index in range(processes)]
+    latencies = []
+    for child in children:
+        output, _ = child.communicate()
+        latencies.extend(json.loads(output))
+    return latencies
+
+
+def throughput(learners: int, duration: float, processes: int, worker_counts: list):
+    print(f"\n{learners} learners over {processes} load processes, {duration:.0f} s per run, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'server':>22} {'requests':>10} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    setups = [('api_server', ['api_server.py', '--workers', '1'])]
+    setups += [(f"shard_router {count} worker{'s' if count > 1 else ''}",
+                ['shard_router.py', '--workers', str(count)]) for count in worker_counts]
+    for label, command in setups:
+        port = free_port()
+        server = subprocess.Popen([sys.executable, str(SRC / command[0]), '--port', str(port), *command[1:]])
+        try:
+            wait_for_port('127.0.0.1', port, timeout=30)
+            latencies = drive('127.0.0.1', port, learners, duration, processes)
+        finally:
+            server.terminate()
+            server.wait()
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000
+        print(f"{label:>22} {len(latencies):>10,} {len(latencies) / duration:>10,.0f} {p50:>8.2f} {p99:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--keys', type=int, default=100_000, help='learners placed on the ring')
+    parser.add_argument('--vnodes', type=int, default=160)
+    parser.add_argument('--learners', type=int, default=200, help='concurrent learners of the load runs')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per load run')
+    parser.add_argument('--processes', type=int, default=4, help='load generator processes')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--mode', choices=['load'])
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--offset', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.mode:
+        load('127.0.0.1', args.port, args.learners, args.duration, args.offset)
+        return
+
+    ring_balance(args.keys, args.vnodes)
+    socket_dir = tempfile.mkdtemp()
+    try:
+        ok = asyncio.run(migrate(socket_dir, 300, 12))
+    finally:
+        shutil.rmtree(socket_dir)
+    throughput(args.learners, args.duration, args.processes, args.workers)
+    if not ok:
+        print("\nSHARDING CHECK FAILED")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Skill Model Benchmark
+Online update throughput, how closely rule- and skill-based adaptation track a
+target success rate for simulated learners, and batch refit time and
+parameter recovery over millions of attempts
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from adaptive_engine import AdaptiveEngine
+from difficulty_scale import DifficultyScale, default_specs
+from learner_state import LearnerState
+from puzzle_generator import PuzzleGenerator
+from rule_engine import RuleSet
+from skill_model import SkillEngine, SkillModel, _sigmoid, fit_rasch, load_attempts
+
+
+def simulate(engine, generator: PuzzleGenerator, truth: SkillModel, learners: int, attempts: int,
+             target: float, seed: int):
+    """
+    Run simulated learners whose true per-operation skills follow the Rasch model
+
+    Returns:
+        Tuple of (mean |true success probability - target|, observed accuracy,
+        attempts per second)
+    """
+    rng = random.Random(seed)
+    start_level = generator.resolve_difficulty('Medium')
+    gaps = []
+    correct = 0
+    elapsed = 0.0
+    for index in range(learners):
+        ability = rng.gauss(0.0, 1.0)
+        skills = {op: ability + rng.gauss(0.0, 1.0) for op in ('+', '-', '×', '÷')}
+        learner = LearnerState(f"learner-{index}", start_level,
+                               window_size=engine.rules_for(f"learner-{index}").window_size)
+        for _ in range(attempts):
+            level = learner.current_difficulty
+            expected = sum(share * _sigmoid(skills[op] - truth.difficulty(level, op))
+                           for op, share in truth.level_operations[level])
+            gaps.append(abs(expected - target))
+            puzzle = generator.generate_puzzle(level)
+            is_correct = rng.random() < _sigmoid(skills[puzzle['operation']]
+                                                 - truth.difficulty(level, puzzle['operation']))
+            correct += is_correct
+            start = time.process_time()
+            engine.record_attempt(learner, puzzle, is_correct, rng.uniform(2.0, 12.0))
+            engine.adapt_learner(learner)
+            elapsed += time.process_time() - start
+    total = learners * attempts
+    return sum(gaps) / len(gaps), correct / total, total / elapsed
+
+
+def synthetic_records(n: int, learners: int, generator: PuzzleGenerator, truth: SkillModel, seed: int):
+    """Attempt records and the true item difficulty of every (level, operation)"""
+    rng = np.random.default_rng(seed)
+    items = list(truth.difficulties)
+    true_b = {item: b + rng.normal(0.0, 0.5) for item, b in truth.difficulties.items()}
+    learner = rng.integers(0, learners, n)
+    item = rng.integers(0, len(items), n)
+    theta = rng.normal(0.0, 1.5, learners)
+    b = np.array([true_b[key] for key in items])
+    correct = rng.random(n) < 1.0 / (1.0 + np.exp(b[item] - theta[learner]))
+    level_key = 'level' if generator.scale is not None else 'difficulty'
+    records = [{'learner_id': f"l{l}", level_key: items[i][0], 'difficulty': items[i][0],
+                'operation': items[i][1], 'is_correct': bool(c)}
+               for l, i, c in zip(learner.tolist(), item.tolist(), correct.tolist())]
+    return records, true_b
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--learners', type=int, default=300)
+    parser.add_argument('--attempts', type=int, default=60, help='attempts per simulated learner')
+    parser.add_argument('--target', type=float, default=0.75)
+    parser.add_argument('--refit', type=int, nargs='+', default=[100_000, 1_000_000, 3_000_000],
+                        help='attempt counts for the batch refit')
+    args = parser.parse_args()
+
+    print(f"Adaptation: {args.learners} learners x {args.attempts} attempts, target success {args.target:.0%}")
+    print(f"{'levels':>7} {'engine':>7} {'mean |p - target|':>18} {'accuracy':>9} {'attempts/s':>12}")
+    for scale in (None, DifficultyScale(default_specs(100))):
+        generator = PuzzleGenerator(scale)
+        truth = SkillModel.for_generator(generator)
+        engines = {
+            'rules': AdaptiveEngine(rules=RuleSet(scale.rule_config()) if scale else None),
+            'skill': SkillEngine(SkillModel.for_generator(generator), target=args.target)
+        }
+        for name, engine in engines.items():
+            generator.rng.seed(0)
+            gap, accuracy, rate = simulate(engine, generator, truth, args.learners, args.attempts,
+                                           args.target, seed=1)
+            print(f"{len(truth.levels):>7} {name:>7} {gap:>18.3f} {accuracy:>9.1%} {rate:>12,.0f}")
+
+    print("\nBatch refit (100-level scale, 30 sweeps)")
+    print(f"{'attempts':>10} {'encode s':>9} {'fit s':>7} {'attempts/s':>12} {'corr(b)':>8} {'mean |err|':>11}")
+    generator = PuzzleGenerator(DifficultyScale(default_specs(100)))
+    for n in args.refit:
+        truth = SkillModel.for_generator(generator)
+        records, true_b = synthetic_records(n, max(n // 100, 10), generator, truth, seed=n)
+        start = time.process_time()
+        persons, items, correct, _, item_keys = load_attempts(records)
+        encode = time.process_time() - start
+        prior = np.array([truth.prior(*key) for key in item_keys])
+        start = time.process_time()
+        _, b = fit_rasch(persons, items, correct, prior=prior)
+        fit = time.process_time() - start
+        expected = np.array([true_b[key] for key in item_keys])
+        error = np.abs((b - b.mean()) - (expected - expected.mean())).mean()
+        print(f"{n:>10,} {encode:>9.2f} {fit:>7.2f} {n / (encode + fit):>12,.0f} "
+              f"{np.corrcoef(b, expected)[0, 1]:>8.4f} {error:>11.3f}")
+        del records
+
+
+if __name__ == '__main__':
+    main()
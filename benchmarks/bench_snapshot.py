@@ -0,0 +1,125 @@
+"""
+Snapshot Benchmark
+Save/restore time and size of a session (tracker plus learner state) as a
+binary snapshot vs. pickle and JSON, at 1k and 1M attempts
+"""
+import argparse
+import json
+import os
+import pickle
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from adaptive_engine import AdaptiveEngine
+from learner_state import LearnerState
+from puzzle_generator import PuzzleGenerator
+from snapshot import SessionSnapshot, dump_session
+from tracker import PerformanceTracker
+
+
+def build_session(attempts: int, seed: int = 0):
+    """A tracker and learner after the given number of simulated attempts"""
+    rng = random.Random(seed)
+    generator = PuzzleGenerator(seed=seed)
+    engine = AdaptiveEngine()
+    tracker = PerformanceTracker(learner_id='learner-1')
+    tracker.start_session()
+    learner = LearnerState('learner-1')
+    for _ in range(attempts):
+        puzzle = generator.generate_puzzle(learner.current_difficulty)
+        is_correct = rng.random() < 0.65
+        tracker.log_attempt(puzzle, puzzle['answer'] if is_correct else puzzle['answer'] + 1, is_correct,
+                            rng.uniform(1.0, 15.0))
+        engine.record_attempt(learner, puzzle, is_correct, tracker.attempts[-1]['time_spent'])
+        engine.adapt_learner(learner)
+    return tracker, learner
+
+
+def json_dump(tracker: PerformanceTracker, learner: LearnerState) -> bytes:
+    return json.dumps({'learner_id': tracker.learner_id, 'attempts': tracker.attempts,
+                       'current_difficulty': learner.current_difficulty,
+                       'difficulty_history': learner.difficulty_history}).encode('utf-8')
+
+
+def json_load(data: bytes):
+    """Parse and rebuild a usable tracker; JSON holds no aggregates, so they are replayed"""
+    state = json.loads(data)
+    tracker = PerformanceTracker(learner_id=state['learner_id'])
+    tracker.attempts = state['attempts']
+    learner = LearnerState(state['learner_id'], state['current_difficulty'])
+    learner.difficulty_history = state['difficulty_history']
+    return tracker, learner
+
+
+def snapshot_load(data: bytes):
+    snapshot = SessionSnapshot(data)
+    return snapshot.restore_tracker(), snapshot.restore_learner()
+
+
+def snapshot_load_columnar(data: bytes):
+    snapshot = SessionSnapshot(data)
+    return snapshot.restore_tracker(columnar=True), snapshot.restore_learner()
+
+
+def best_time(function, repeats: int) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.process_time()
+        function()
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--attempts', type=int, nargs='+', default=[1_000, 1_000_000])
+    args = parser.parse_args()
+
+    try:
+        import zstandard  # noqa: F401
+        compressed = True
+    except ImportError:
+        compressed = False
+        print("zstandard not installed; skipping the compressed snapshot\n")
+
+    print(f"{'attempts':>10} {'format':>12} {'size':>12} {'bytes/att':>10} {'save ms':>10} {'load ms':>10}")
+    for count in args.attempts:
+        tracker, learner = build_session(count)
+        repeats = 5 if count <= 10_000 else 1
+        formats = {
+            'pickle': (lambda: pickle.dumps((tracker, learner), protocol=pickle.HIGHEST_PROTOCOL), pickle.loads),
+            'json': (lambda: json_dump(tracker, learner), json_load),
+            'snapshot': (lambda: dump_session(tracker, learner), snapshot_load)
+        }
+        if compressed:
+            formats['snapshot+zstd'] = (lambda: dump_session(tracker, learner, compress=True), snapshot_load)
+        # Same bytes, restored into an array-backed ColumnarPerformanceTracker
+        formats['->columnar'] = (formats['snapshot'][0], snapshot_load_columnar)
+        for name, (save, load) in formats.items():
+            data = save()
+            save_time = best_time(save, repeats)
+            load_time = best_time(lambda: load(data), repeats)
+            print(f"{count:>10,} {name:>12} {len(data):>12,} {len(data) / count:>10.1f} "
+                  f"{save_time * 1000:>10.1f} {load_time * 1000:>10.1f}")
+
+        # Zero-copy: map the file and aggregate a column without building any attempt dict
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'session.snap')
+            with open(path, 'wb') as f:
+                f.write(dump_session(tracker, learner))
+
+            def open_and_scan():
+                snapshot = SessionSnapshot.open(path)
+                return snapshot.column('is_correct').mean(), snapshot.column('time_spent').mean() / 100
+
+            scan_time = best_time(open_and_scan, repeats)
+            print(f"{count:>10,} {'mmap+scan':>12} {'':>12} {'':>10} {'':>10} {scan_time * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Summary Render Benchmark
+Times the data work behind summary_screen per rerun at 10, 1,000 and 100,000
+attempts: the old full rebuild vs. the version-keyed cache, both on an
+unchanged tracker and right after a new attempt
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from puzzle_generator import PuzzleGenerator
+from summary_cache import SummaryCache, difficulty_chart, operation_chart
+from tracker import PerformanceTracker
+
+PAGE_SIZE = 50
+
+try:
+    import plotly.express  # noqa: F401
+    HAVE_PLOTLY = True
+except ImportError:
+    HAVE_PLOTLY = False
+
+
+def build_tracker(n: int, seed: int = 0) -> PerformanceTracker:
+    """Tracker holding n logged attempts"""
+    rng = random.Random(seed)
+    generator = PuzzleGenerator()
+    tracker = PerformanceTracker(window_sizes=())
+    tracker.start_session()
+    for puzzle in generator.generate_batch('Hard', n, seed=seed):
+        is_correct = rng.random() < 0.7
+        tracker.log_attempt(puzzle, puzzle['answer'] if is_correct else 0, is_correct, rng.uniform(2, 12))
+    return tracker
+
+
+def render_rebuild(tracker: PerformanceTracker):
+    """What summary_screen did before: figures and a table of every attempt, each rerun"""
+    if HAVE_PLOTLY:
+        difficulty_chart(tracker)
+        operation_chart(tracker)
+    pd.DataFrame([{
+        'Question': a['puzzle'],
+        'Your Answer': a['user_answer'],
+        'Correct Answer': a['correct_answer'],
+        'Result': '✅' if a['is_correct'] else '❌',
+        'Time (s)': a['time_spent'],
+        'Difficulty': a['difficulty']
+    } for a in tracker.attempts])
+
+
+def render_cached(cache: SummaryCache):
+    """What summary_screen does now: cached figures and one page of the table"""
+    if HAVE_PLOTLY:
+        cache.get('difficulty_chart', lambda: difficulty_chart(cache.tracker))
+        cache.get('operation_chart', lambda: operation_chart(cache.tracker))
+    table = cache.attempt_table()
+    cache.get('attempt_page_1', lambda: table.page(0, PAGE_SIZE))
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if not HAVE_PLOTLY:
+        print("plotly not installed: timing the attempt table only")
+    print(f"{'attempts':>9} {'rebuild ms':>11} {'cached ms':>10} {'+1 attempt ms':>14}")
+    generator = PuzzleGenerator()
+    for n in args.sizes:
+        tracker = build_tracker(n)
+        cache = SummaryCache(tracker)
+        render_cached(cache)
+
+        rebuild = best_of(lambda: render_rebuild(tracker), args.repeat)
+        cached = best_of(lambda: render_cached(cache), args.repeat)
+
+        def after_new_attempt():
+            puzzle = generator.generate_puzzle('Hard')
+            tracker.log_attempt(puzzle, puzzle['answer'], True, 5.0)
+            render_cached(cache)
+
+        incremental = best_of(after_new_attempt, args.repeat)
+        print(f"{n:>9,} {rebuild:>11.2f} {cached:>10.3f} {incremental:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""
+What-If Benchmark
+Writes a synthetic attempt log from interleaved sessions adapted by the
+default rules, checks that replaying it under those rules reproduces every
+logged level and session, then measures replay throughput against the
+number of configurations, one pass per configuration, worker count and log
+size (with the peak memory of each worker)
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from adaptive_engine import AdaptiveEngine
+from puzzle_generator import PuzzleGenerator
+from rule_engine import default_config
+from simulation import SyntheticLearner
+from tracker import RecentWindow
+from what_if import run_what_if
+
+SEGMENT_BYTES = 64 * 1024 * 1024
+SESSION_GAP = 1800
+
+
+def write_log(directory: str, attempts: int, concurrent: int = 5_000, seed: int = 0) -> int:
+    """
+    Write attempts from interleaved sessions in AttemptLog's segment format
+
+    Sessions run side by side, one answer per session and round; a finished
+    session is replaced by a new learner or, once more than the session gap
+    has passed, by a returning one.
+
+    Returns:
+        Number of sessions written
+    """
+    rng = random.Random(seed)
+    generator = PuzzleGenerator(seed=seed)
+    engine = AdaptiveEngine()
+    clock = datetime(2026, 1, 5, 8, 0, 0)
+    returning = deque()
+    learners = 0
+
+    def new_session():
+        nonlocal learners
+        if returning and returning[0][0] < clock - timedelta(seconds=SESSION_GAP) and rng.random() < 0.5:
+            learner_id = returning.popleft()[1]
+        else:
+            learner_id = f"learner-{learners}"
+            learners += 1
+        return [learner_id, SyntheticLearner.random(rng), RecentWindow(3), 'Medium', rng.randint(5, 40), 0]
+
+    active = [new_session() for _ in range(concurrent)]
+    sessions = 0
+    segment, written, size = 1, 0, 0
+    out = open(os.path.join(directory, f"segment-{segment:08d}.ndjson"), 'wb')
+    while written < attempts:
+        timestamp = clock.strftime('%Y-%m-%d %H:%M:%S')
+        lines = []
+        for slot, session in enumerate(active):
+            learner_id, learner, window, difficulty, length, index = session
+            sessions += index == 0
+            puzzle = generator.generate_puzzle(difficulty)
+            is_correct, time_spent = learner.answer(puzzle, index)
+            time_spent = round(time_spent, 2)
+            lines.append(json.dumps({
+                'kind': 'attempt', 'learner_id': learner_id, 'timestamp': timestamp,
+                'puzzle': puzzle['question'], 'correct_answer': puzzle['answer'],
+                'user_answer': puzzle['answer'] if is_correct else 0, 'is_correct': is_correct,
+                'time_spent': time_spent, 'difficulty': difficulty, 'operation': puzzle['operation']
+            }, ensure_ascii=False) + '\n')
+            window.push(is_correct, time_spent)
+            session[3] = engine.evaluate(window, difficulty)[0]
+            session[5] = index + 1
+            if index + 1 == length:
+                returning.append((clock, learner_id))
+                active[slot] = new_session()
+            written += 1
+            if written == attempts:
+                break
+        payload = ''.join(lines).encode('utf-8')
+        out.write(payload)
+        size += len(payload)
+        if size >= SEGMENT_BYTES:
+            out.close()
+            segment, size = segment + 1, 0
+            out = open(os.path.join(directory, f"segment-{segment:08d}.ndjson"), 'wb')
+        clock += timedelta(seconds=6)
+    out.close()
+    return sessions
+
+
+def configurations():
+    """Default rules first, then variants"""
+    variants = [default_config()]
+    for name, params in (('strict-promote', (3, 3, 1, 8.0)), ('fast-only', (3, 2, 1, 5.0)),
+                         ('window-5', (5, 4, 2, 8.0)), ('lenient-demote', (3, 2, 0, 8.0)),
+                         ('window-4', (4, 3, 1, 10.0)), ('slow-ok', (3, 2, 1, 15.0)),
+                         ('window-6', (6, 4, 2, 8.0))):
+        config = default_config(*params)
+        config['name'] = name
+        variants.append(config)
+    return variants
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--attempts', type=int, nargs='+', default=[1_000_000, 4_000_000],
+                        help='log sizes; the first is used for the throughput runs')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--concurrent', type=int, default=5_000, help='sessions in progress at once')
+    args = parser.parse_args()
+    configs = configurations()
+
+    with tempfile.TemporaryDirectory() as root:
+        logs = {}
+        for attempts in args.attempts:
+            directory = os.path.join(root, str(attempts))
+            os.mkdir(directory)
+            start = time.perf_counter()
+            sessions = write_log(directory, attempts, args.concurrent)
+            size = sum(path.stat().st_size for path in Path(directory).iterdir())
+            logs[attempts] = directory, sessions
+            print(f"Wrote {attempts:,} attempts in {sessions:,} sessions ({size / 2**20:,.0f} MB) "
+                  f"in {time.perf_counter() - start:.1f} s")
+
+        # The rules that wrote the log must reproduce it exactly
+        first = args.attempts[0]
+        directory, expected = logs[first]
+        result = run_what_if(directory, configs[:1], workers=2)
+        baseline = result['configs'][0]
+        ok = baseline['matched_logged_level'] == 100.0 and baseline['sessions'] == expected
+        print(f"\nDefault rules replayed: {baseline['matched_logged_level']}% of levels match the log, "
+              f"{baseline['sessions']:,} of {expected:,} sessions recovered")
+
+        print(f"\nThroughput on {first:,} attempts, 1 worker (os.cpu_count() = {os.cpu_count()})")
+        print(f"{'configs':>8} {'seconds':>8} {'attempts/s':>11} {'decisions/s':>12}")
+        for count in (1, 4, len(configs)):
+            result = run_what_if(directory, configs[:count], workers=1)
+            print(f"{count:>8} {result['seconds']:>8.2f} {result['attempts_per_sec']:>11,} "
+                  f"{result['decisions_per_sec']:>12,}")
+        separate = sum(run_what_if(directory, [config], workers=1)['seconds'] for config in configs[:4])
+        print(f"{'4 passes':>8} {separate:>8.2f} {first * 4 / separate:>11,.0f} {first * 4 / separate:>12,.0f}"
+              f"  (one pass per configuration)")
+
+        print(f"\nWorkers, {len(configs)} configs on {first:,} attempts")
+        print(f"{'workers':>8} {'seconds':>8} {'attempts/s':>11}")
+        for workers in args.workers:
+            result = run_what_if(directory, configs, workers=workers)
+            print(f"{workers:>8} {result['seconds']:>8.2f} {result['attempts_per_sec']:>11,}")
+
+        print(f"\nMemory, {len(configs)} configs, 1 worker")
+        print(f"{'attempts':>11} {'seconds':>8} {'open sessions':>14} {'peak RSS MB':>12}")
+        for attempts, (directory, _) in logs.items():
+            # A fresh process per size, so the RSS high-water mark isn't inherited
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                result = pool.submit(run_what_if, directory, configs, 1).result()
+            print(f"{attempts:>11,} {result['seconds']:>8.2f} {result['peak_sessions']:>14,} "
+                  f"{result['peak_rss_mb']:>12}")
+
+        print()
+        for report in result['configs']:
+            print(f"{report['config']:>16}: switches/session {report['switches_per_session']:.2f}, "
+                  f"final-level accuracy {report['final_level_accuracy']}%, time share {report['time_share']}")
+
+    if not ok:
+        print("\nREPLAY CHECK FAILED")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
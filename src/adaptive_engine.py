@@ -2,77 +2,193 @@
 Adaptive Engine Module
 Determines difficulty adjustments based on user performance
 """
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple, Union
+
+from instrumentation import metrics
+from rule_engine import DEFAULT_LEVELS, RuleRegistry, RuleSet, default_rules
+from tracker import RecentWindow
+
+RecentPerformance = Union[List[Dict], RecentWindow]
 
 class AdaptiveEngine:
     """
     Rule-based adaptive engine that adjusts difficulty based on performance
     
-    Adaptation Rules:
+    Adaptation Rules (default thresholds):
     - If user answers 2+ of last 3 correctly AND average time < 8s → Increase difficulty
     - If user answers 1 or fewer of last 3 correctly → Decrease difficulty
     - Otherwise maintain current difficulty
+    
+    The rules can instead be given declaratively as a RuleSet, or as a
+    RuleRegistry serving a variant per learner (see rule_engine).
     """
     
-    DIFFICULTY_LEVELS = ['Easy', 'Medium', 'Hard']
+    DIFFICULTY_LEVELS = DEFAULT_LEVELS
     
-    def __init__(self):
-        """Initialize the adaptive engine"""
+    def __init__(self, window_size: int = 3, promote_correct: int = 2,
+                 demote_correct: int = 1, time_threshold: float = 8.0,
+                 rules: RuleSet = None, registry: RuleRegistry = None):
+        """
+        Initialize the adaptive engine
+        
+        Args:
+            window_size: Number of recent attempts the rules look at
+            promote_correct: Minimum correct answers in the window to increase difficulty
+            demote_correct: Maximum correct answers in the window to decrease difficulty
+            time_threshold: Average seconds per answer must stay below this to increase
+            rules: Compiled rules replacing the threshold arguments
+            registry: Rule variants chosen per learner by adapt_learner
+        """
+        self.promote_correct = promote_correct
+        self.demote_correct = demote_correct
+        self.time_threshold = time_threshold
+        self.rules = rules or default_rules(window_size, promote_correct, demote_correct, time_threshold)
+        self.registry = registry
         self.current_difficulty = 'Medium'
         self.difficulty_history = []
     
-    def adapt_difficulty(self, recent_attempts: List[Dict], current_difficulty: str) -> str:
+    @property
+    def window_size(self) -> int:
+        return self.rules.window_size
+    
+    def set_rules(self, rules: RuleSet):
+        """Swap in new rules; evaluations already running finish on the old ones"""
+        self.rules = rules
+    
+    def rules_for(self, learner_id: str) -> RuleSet:
+        """Rules serving a learner: their registry variant, or the engine's own rules"""
+        return self.registry.rules_for(learner_id) if self.registry is not None else self.rules
+    
+    @staticmethod
+    def _summarize(recent_attempts: RecentPerformance) -> Tuple[int, int, float]:
+        """Return correct count, attempt count and average time of recent attempts"""
+        if isinstance(recent_attempts, RecentWindow):
+            return recent_attempts.correct_count, recent_attempts.count, recent_attempts.avg_time
+        if not recent_attempts:
+            return 0, 0, 0.0
+        correct_count = sum(1 for attempt in recent_attempts if attempt['is_correct'])
+        avg_time = sum(attempt['time_spent'] for attempt in recent_attempts) / len(recent_attempts)
+        return correct_count, len(recent_attempts), avg_time
+    
+    def evaluate(self, recent_attempts: RecentPerformance, current_difficulty: str,
+                 trend_window: RecentWindow = None, rules: RuleSet = None) -> Tuple[str, Optional[Dict]]:
         """
-        Determine the next difficulty level based on recent performance
+        Decide the next difficulty level without changing any engine state
+        
+        Because it only reads its arguments, a single engine can evaluate
+        decisions for many learners concurrently.
         
         Args:
-            recent_attempts: List of recent attempt dictionaries
+            recent_attempts: List of recent attempt dictionaries, or a RecentWindow
+                from PerformanceTracker.get_window for constant-time evaluation
             current_difficulty: Current difficulty level
+            trend_window: Optional longer window; when given, difficulty is only
+                increased if its accuracy also reaches promote_correct/window_size
+            rules: Rules to apply instead of the engine's own
             
         Returns:
-            Recommended difficulty level
+            Tuple of (recommended difficulty, adaptation event or None if unchanged)
         """
-        # Need at least 2 attempts to make adaptation decisions
-        if len(recent_attempts) < 2:
-            return current_difficulty
+        if rules is None:
+            rules = self.rules
+        correct_count, total_attempts, avg_time = self._summarize(recent_attempts)
         
-        # Analyze recent performance
-        correct_count = sum(1 for attempt in recent_attempts if attempt['is_correct'])
-        avg_time = sum(attempt['time_spent'] for attempt in recent_attempts) / len(recent_attempts)
+        current_index = rules.level_index.get(current_difficulty)
+        if current_index is None:
+            raise ValueError(f"unknown difficulty {current_difficulty!r}")
         
-        # Get current difficulty index
-        current_index = self.DIFFICULTY_LEVELS.index(current_difficulty)
+        trend_accuracy = None
+        if trend_window is not None and trend_window.count:
+            trend_accuracy = trend_window.correct_count / trend_window.count
         
-        # Adaptation logic
-        if correct_count >= 2 and avg_time < 8.0 and current_index < len(self.DIFFICULTY_LEVELS) - 1:
-            # User is doing well - increase difficulty
-            new_difficulty = self.DIFFICULTY_LEVELS[current_index + 1]
-            reason = f"Great work! Moving to {new_difficulty} (accuracy: {correct_count}/{len(recent_attempts)})"
-            
-        elif correct_count <= 1 and current_index > 0:
-            # User is struggling - decrease difficulty
-            new_difficulty = self.DIFFICULTY_LEVELS[current_index - 1]
-            reason = f"Let's try {new_difficulty} level (accuracy: {correct_count}/{len(recent_attempts)})"
-            
-        else:
+        decision = rules.decide(current_index, correct_count, total_attempts, avg_time, trend_accuracy)
+        if decision is None:
             # Maintain current difficulty
-            new_difficulty = current_difficulty
-            reason = f"Staying at {current_difficulty} level"
+            return current_difficulty, None
+        
+        new_index, rule, reason = decision
+        new_difficulty = rules.levels[new_index]
+        if reason is None:
+            reason = rule.reason.format(**{'from': current_difficulty, 'to': new_difficulty,
+                                           'correct': correct_count, 'total': total_attempts,
+                                           'avg_time': avg_time})
+        return new_difficulty, {
+            'from': current_difficulty,
+            'to': new_difficulty,
+            'reason': reason,
+            'correct_count': correct_count,
+            'total_attempts': total_attempts,
+            'avg_time': round(avg_time, 2),
+            'rule': rule.name,
+            'rules': rules.name
+        }
+    
+    @metrics.timed('engine_adapt_seconds', 'AdaptiveEngine adaptation wall time')
+    def adapt_difficulty(self, recent_attempts: RecentPerformance, current_difficulty: str,
+                         trend_window: RecentWindow = None) -> str:
+        """
+        Determine the next difficulty level based on recent performance
+        
+        Args:
+            recent_attempts: List of recent attempt dictionaries, or a RecentWindow
+                from PerformanceTracker.get_window for constant-time evaluation
+            current_difficulty: Current difficulty level
+            trend_window: Optional longer window; when given, difficulty is only
+                increased if its accuracy also reaches promote_correct/window_size
+            
+        Returns:
+            Recommended difficulty level
+        """
+        new_difficulty, event = self.evaluate(recent_attempts, current_difficulty, trend_window)
         
         # Log difficulty change
-        if new_difficulty != current_difficulty:
-            self.difficulty_history.append({
-                'from': current_difficulty,
-                'to': new_difficulty,
-                'reason': reason,
-                'correct_count': correct_count,
-                'total_attempts': len(recent_attempts),
-                'avg_time': round(avg_time, 2)
-            })
+        if event is not None:
+            self.difficulty_history.append(event)
+            metrics.inc('engine_difficulty_changes_total', help='Difficulty changes made by the engine')
         
         self.current_difficulty = new_difficulty
         return new_difficulty
     
+    def record_attempt(self, learner, puzzle: Dict, is_correct: bool, time_spent: float):
+        """
+        Record an answered puzzle on the learner before adapt_learner is called
+        
+        The rules only need the learner's recent window; engines modelling
+        the answered puzzle itself (see skill_model) extend this.
+        
+        Args:
+            learner: LearnerState to update
+            puzzle: The answered puzzle
+            is_correct: Whether the answer was correct
+            time_spent: Seconds spent on the puzzle
+        """
+        learner.record(is_correct, time_spent)
+    
+    @metrics.timed('engine_adapt_seconds', 'AdaptiveEngine adaptation wall time')
+    def adapt_learner(self, learner, trend_window: RecentWindow = None) -> str:
+        """
+        Adapt a learner's difficulty, keeping all state on the learner record
+        
+        Args:
+            learner: LearnerState whose window, current_difficulty and
+                difficulty_history are read and updated; with a registry, its
+                learner_id picks the rule variant
+            trend_window: Optional longer window, see adapt_difficulty
+            
+        Returns:
+            Recommended difficulty level
+        """
+        rules = self.rules_for(learner.learner_id)
+        if learner.window.size != rules.window_size:
+            # The learner's variant was swapped for one with another window size
+            learner.window = learner.window.resized(rules.window_size)
+        new_difficulty, event = self.evaluate(learner.window, learner.current_difficulty, trend_window, rules)
+        if event is not None:
+            learner.difficulty_history.append(event)
+            metrics.inc('engine_difficulty_changes_total', help='Difficulty changes made by the engine')
+        learner.current_difficulty = new_difficulty
+        return new_difficulty
+    
     def get_adaptation_summary(self) -> List[Dict]:
         """
         Get history of difficulty adaptations
@@ -82,31 +198,24 @@ class AdaptiveEngine:
         """
         return self.difficulty_history
     
-    def get_recommendation_explanation(self, recent_attempts: List[Dict]) -> str:
+    def get_recommendation_explanation(self, recent_attempts: RecentPerformance) -> str:
         """
         Get a detailed explanation of the adaptation decision
         
         Args:
-            recent_attempts: List of recent attempts
+            recent_attempts: List of recent attempts or a RecentWindow
             
         Returns:
             String explanation of the recommendation
         """
-        if len(recent_attempts) < 2:
-            return "Building your performance profile... Keep going!"
+        correct_count, total_attempts, avg_time = self._summarize(recent_attempts)
         
-        correct_count = sum(1 for attempt in recent_attempts if attempt['is_correct'])
-        avg_time = sum(attempt['time_spent'] for attempt in recent_attempts) / len(recent_attempts)
+        if total_attempts < self.rules.min_attempts:
+            return self.rules.warmup_explanation
         
         explanation = f"Recent Performance Analysis:\n"
-        explanation += f"✓ Correct: {correct_count}/{len(recent_attempts)}\n"
+        explanation += f"✓ Correct: {correct_count}/{total_attempts}\n"
         explanation += f"⏱ Average Time: {avg_time:.1f}s\n\n"
-        
-        if correct_count >= 2 and avg_time < 8.0:
-            explanation += "🎯 You're doing excellent! Ready for a challenge."
-        elif correct_count <= 1:
-            explanation += "💪 Let's work on building confidence at an easier level."
-        else:
-            explanation += "✨ You're at the perfect difficulty level. Keep it up!"
+        explanation += self.rules.explain(correct_count, total_attempts, avg_time)
         
         return explanation
\ No newline at end of file
@@ -0,0 +1,363 @@
+"""
+API Server Module
+Headless HTTP/JSON API for the adaptive loop, built on asyncio
+"""
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import signal
+import socket
+from typing import Dict, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from adaptive_engine import AdaptiveEngine
+from instrumentation import metrics
+from learning_service import LearnerNotFound, LearningService
+from puzzle_bank import PuzzleBank
+from puzzle_generator import PuzzleGenerator
+from review_scheduler import ReviewScheduler
+from rule_engine import RuleRegistry, RuleSet
+from session_store import SessionStore
+
+logger = logging.getLogger(__name__)
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+           431: 'Request Header Fields Too Large', 500: 'Internal Server Error', 502: 'Bad Gateway'}
+
+MAX_BODY_BYTES = 64 * 1024
+# Session hand-over carries whole snapshots
+ADMIN_MAX_BODY_BYTES = 64 * 2**20
+
+
+class HTTPError(Exception):
+    """Error answered with the given HTTP status"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class APIServer:
+    """
+    Minimal HTTP/1.1 server exposing LearningService as JSON endpoints
+
+    Endpoints:
+    - POST /next_puzzle      {"learner_id": ..., "difficulty": optional}
+    - POST /submit_answer    {"learner_id": ..., "answer": int or null}
+    - GET  /session_stats?learner_id=...
+    - GET  /store_stats
+
+    With admin enabled, as for shard workers behind shard_router, sessions
+    can also be handed over between servers:
+    - GET  /sessions
+    - POST /release_session  {"learner_id": ...}, exports and drops the session
+    - POST /import_session   {"snapshot": base64, "current_puzzle": ..., "reviews": [...]}
+
+    Connections are kept alive, so a client can drive a whole session over
+    one connection.
+    """
+
+    def __init__(self, service: LearningService = None, admin: bool = False):
+        self.service = service or LearningService()
+        self.admin = admin
+
+    def dispatch(self, method: str, target: str, body: bytes) -> Dict:
+        """
+        Route a request to the service
+
+        Args:
+            method: HTTP method
+            target: Request target including the query string
+            body: Raw request body
+
+        Returns:
+            JSON-serializable response payload
+        """
+        url = urlsplit(target)
+        if url.path == '/session_stats':
+            if method != 'GET':
+                raise HTTPError(405, "use GET")
+            learner_id = parse_qs(url.query).get('learner_id', [None])[0]
+            if not learner_id:
+                raise HTTPError(400, "learner_id is required")
+            return self.service.session_stats(learner_id)
+        if url.path == '/store_stats':
+            if method != 'GET':
+                raise HTTPError(405, "use GET")
+            return self.service.store_stats()
+        if self.admin and url.path in ('/sessions', '/release_session', '/import_session'):
+            return self.dispatch_admin(method, url.path, body)
+
+        if url.path not in ('/next_puzzle', '/submit_answer'):
+            raise HTTPError(404, f"unknown endpoint {url.path}")
+        if method != 'POST':
+            raise HTTPError(405, "use POST")
+        payload = parse_body(body)
+        learner_id = payload.get('learner_id')
+        if not learner_id:
+            raise HTTPError(400, "learner_id is required")
+
+        if url.path == '/next_puzzle':
+            return self.service.next_puzzle(learner_id, payload.get('difficulty'))
+        answer = payload.get('answer')
+        # bool is an int subclass, but true is not an answer of 1
+        if answer is not None and (not isinstance(answer, int) or isinstance(answer, bool)):
+            raise HTTPError(400, "answer must be an integer or null")
+        return self.service.submit_answer(learner_id, answer)
+
+    def dispatch_admin(self, method: str, path: str, body: bytes) -> Dict:
+        """Route a session hand-over request"""
+        if path == '/sessions':
+            if method != 'GET':
+                raise HTTPError(405, "use GET")
+            return {'learner_ids': list(self.service.sessions)}
+        if method != 'POST':
+            raise HTTPError(405, "use POST")
+        payload = parse_body(body)
+        if path == '/release_session':
+            learner_id = payload.get('learner_id')
+            if not learner_id:
+                raise HTTPError(400, "learner_id is required")
+            released = self.service.release_session(learner_id)
+            # The snapshot leaves out the puzzle on screen and the reviews, so they travel alongside
+            return {'learner_id': learner_id, 'snapshot': base64.b64encode(released['snapshot']).decode('ascii'),
+                    'current_puzzle': released['current_puzzle'], 'reviews': released['reviews']}
+        if not payload.get('snapshot'):
+            raise HTTPError(400, "snapshot is required")
+        learner_id = self.service.import_session(base64.b64decode(payload['snapshot']),
+                                                 payload.get('current_puzzle'), payload.get('reviews'))
+        return {'learner_id': learner_id}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one connection until the client closes it"""
+        try:
+            while True:
+                try:
+                    request = await read_request(reader, ADMIN_MAX_BODY_BYTES if self.admin else MAX_BODY_BYTES)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HTTPError as exc:
+                    await reject(writer, exc)
+                    break
+                method, target, headers, body = request
+                try:
+                    status, payload = 200, self.dispatch(method, target, body)
+                except HTTPError as exc:
+                    status, payload = exc.status, {'error': str(exc)}
+                except LearnerNotFound as exc:
+                    status, payload = 404, {'error': f"no session for learner {exc.args[0]!r}"}
+                except ValueError as exc:
+                    status, payload = 400, {'error': str(exc)}
+                except Exception:
+                    # Answer instead of dropping the connection, and keep serving it
+                    logger.exception("%s %s failed", method, target)
+                    status, payload = 500, {'error': "internal server error"}
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8000, sock: socket.socket = None, path: str = None):
+        """Run the server until cancelled, on a Unix socket if path is given"""
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, path)
+        elif sock is not None:
+            server = await asyncio.start_server(self.handle_connection, sock=sock)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def parse_body(body: bytes) -> Dict:
+    """
+    Decode a JSON request body, which must be an object
+
+    Args:
+        body: Raw request body; empty counts as {}
+
+    Returns:
+        The decoded object
+    """
+    try:
+        payload = json.loads(body or b'{}')
+    except (json.JSONDecodeError, UnicodeDecodeError) as exc:
+        raise HTTPError(400, f"invalid JSON: {exc}")
+    if not isinstance(payload, dict):
+        raise HTTPError(400, "request body must be a JSON object")
+    return payload
+
+
+async def read_request(reader: asyncio.StreamReader,
+                       max_body: int = MAX_BODY_BYTES) -> Tuple[str, str, Dict[str, str], bytes]:
+    """
+    Read one HTTP/1.1 request
+
+    A request that cannot be framed raises HTTPError: 431 for a head longer
+    than the reader's limit, 400 for a malformed request line or
+    Content-Length and 413 for a body over max_body. The connection cannot
+    be read any further after one, see reject.
+
+    Args:
+        reader: Connection to read from
+        max_body: Largest accepted body in bytes
+
+    Returns:
+        Tuple of (method, target, lower-cased headers, body); at EOF
+        readuntil raises asyncio.IncompleteReadError
+    """
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.LimitOverrunError:
+        raise HTTPError(431, "request head too long")
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, _ = lines[0].split(' ', 2)
+    except ValueError:
+        raise HTTPError(400, "malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HTTPError(400, "invalid Content-Length")
+    if length > max_body:
+        raise HTTPError(413, f"request body over {max_body} bytes")
+    body = await reader.readexactly(length) if length else b''
+    return method, target, headers, body
+
+
+async def reject(writer: asyncio.StreamWriter, error: HTTPError):
+    """Answer a request read_request could not frame; the caller then closes the connection"""
+    writer.write(encode_response(error.status, {'error': str(error)}, keep_alive=False))
+    await writer.drain()
+
+
+def encode_response(status: int, payload: Dict, keep_alive: bool = True) -> bytes:
+    """Serialize a JSON response with HTTP/1.1 framing"""
+    body = json.dumps(payload).encode('utf-8')
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode('latin-1') + body
+
+
+def bind_socket(host: str, port: int, reuse_port: bool) -> socket.socket:
+    """Create a listening socket, optionally shared between processes"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.setblocking(False)
+    return sock
+
+
+def run_worker(host: str, port: int, reuse_port: bool, rules: str = None, levels: int = None,
+               engine: str = 'rules', difficulties: str = None, seed: int = None, focus: float = 0.0,
+               reviews: float = 0.0, spill_dir: str = None, max_resident_mb: float = 256.0,
+               idle_ttl: float = 1800.0, worker: int = 0, unix_socket: str = None):
+    """Run one server process on its own event loop, on a Unix socket with admin endpoints if given"""
+    sock = bind_socket(host, port, reuse_port) if unix_socket is None else None
+    if unix_socket is None:
+        # Each worker serves its own registry; shard workers behind the router have no metrics port
+        metrics.start_server(offset=worker)
+    scale = None
+    if levels:
+        from difficulty_scale import DifficultyScale, default_specs
+        scale = DifficultyScale(default_specs(levels))
+    generator = PuzzleGenerator(scale)
+    if engine == 'skill':
+        from skill_model import SkillEngine, SkillModel
+        adaptive_engine = SkillEngine(SkillModel.for_generator(generator, difficulties))
+    else:
+        adaptive_engine = AdaptiveEngine(rules=RuleSet(scale.rule_config()) if scale else None,
+                                         registry=RuleRegistry.from_file(rules) if rules else None)
+    # Sessions live in the worker that created them, so each worker spills to its own directory
+    name = os.path.basename(unix_socket) if unix_socket else f"worker-{worker}"
+    store = SessionStore(os.path.join(spill_dir, name), int(max_resident_mb * 2**20),
+                         idle_ttl) if spill_dir else None
+    service = LearningService(generator, adaptive_engine, seed=seed, bank=PuzzleBank() if focus else None,
+                              focus=focus, reviews=ReviewScheduler() if reviews else None, review_share=reviews,
+                              store=store)
+    try:
+        asyncio.run(APIServer(service, admin=unix_socket is not None).serve(sock=sock, path=unix_socket))
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes sharing the port via SO_REUSEPORT; sessions live in '
+                             'the worker that created them, so keep one connection per learner')
+    parser.add_argument('--rules', help='JSON/YAML rule file, re-read when it changes')
+    parser.add_argument('--levels', type=int, help='use a fine-grained difficulty scale with this many levels')
+    parser.add_argument('--engine', choices=('rules', 'skill'), default='rules',
+                        help='adapt with the rules or with per-operation skill estimates')
+    parser.add_argument('--difficulties', help='calibrated puzzle difficulties for --engine skill')
+    parser.add_argument('--seed', type=int,
+                        help='root seed; every session can then be replayed from it and the attempt log')
+    parser.add_argument('--focus', type=float, default=0.0,
+                        help="share of puzzles targeting the learner's weakest operation")
+    parser.add_argument('--reviews', type=float, default=0.0,
+                        help='chance of re-serving a missed puzzle once it is due for review')
+    parser.add_argument('--spill-dir', help='spill idle sessions to this directory instead of keeping them all in memory')
+    parser.add_argument('--max-resident-mb', type=float, default=256.0,
+                        help='estimated memory budget of resident sessions per worker, with --spill-dir')
+    parser.add_argument('--idle-ttl', type=float, default=1800.0,
+                        help='seconds of inactivity before a session is spilled, with --spill-dir')
+    parser.add_argument('--unix-socket', help='serve on this Unix socket instead, as a shard_router worker')
+    args = parser.parse_args()
+    options = {'rules': args.rules, 'levels': args.levels, 'engine': args.engine,
+               'difficulties': args.difficulties, 'seed': args.seed, 'focus': args.focus,
+               'reviews': args.reviews, 'spill_dir': args.spill_dir, 'max_resident_mb': args.max_resident_mb,
+               'idle_ttl': args.idle_ttl}
+
+    if args.unix_socket:
+        run_worker(args.host, args.port, reuse_port=False, unix_socket=args.unix_socket, **options)
+        return
+    if args.workers == 1:
+        run_worker(args.host, args.port, reuse_port=False, **options)
+        return
+
+    children = []
+    for worker in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            run_worker(args.host, args.port, reuse_port=True, worker=worker, **options)
+            os._exit(0)
+        children.append(pid)
+
+    def stop_workers(signum, frame):
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop_workers)
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
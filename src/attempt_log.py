@@ -0,0 +1,369 @@
+"""
+Attempt Log Module
+Durable, append-only storage for attempt records
+"""
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Union
+
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+# Records are written by json.dumps with its default separators
+_LEARNER_FIELD = b'"learner_id": "'
+
+_STOP = object()
+
+
+class AttemptLog:
+    """
+    Append-only log of NDJSON segments written by a background thread
+
+    append() only enqueues the record, so the request path never waits on
+    disk. The writer thread drains whatever has queued up into one write
+    (group commit) and syncs according to the fsync policy:
+
+    - 'always': fsync after every group commit
+    - 'interval': fsync at most once every fsync_interval seconds, and
+      fsync_interval seconds after the last write if no other one follows
+    - 'never': leave flushing to the operating system
+
+    On startup a torn trailing line left by a crash is truncated and any
+    interrupted compaction is finished.
+    """
+
+    SEGMENT_PATTERN = 'segment-*.ndjson'
+
+    def __init__(self, directory: str, fsync: str = 'interval', fsync_interval: float = 1.0,
+                 segment_bytes: int = 64 * 1024 * 1024, max_batch: int = 1024):
+        """
+        Open (or create) a log directory and start the writer thread
+
+        Args:
+            directory: Directory holding the segment files
+            fsync: One of FSYNC_POLICIES
+            fsync_interval: Seconds between fsyncs for the 'interval' policy
+            segment_bytes: Size after which the active segment is sealed
+            max_batch: Maximum number of records per group commit
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.segment_bytes = segment_bytes
+        self.max_batch = max_batch
+
+        self._queue: queue.Queue = queue.Queue()
+        self._error: Exception = None
+        self._last_sync = time.monotonic()
+        self._unsynced = False
+        self._recover()
+
+        segments = self.segments()
+        self._segment_number = self._number(segments[-1]) if segments else 1
+        self._file = open(self._segment_path(self._segment_number), 'ab')
+        self._writer = threading.Thread(target=self._run, name='attempt-log-writer', daemon=True)
+        self._writer.start()
+
+    def _segment_path(self, number: int) -> Path:
+        return self.directory / f"segment-{number:08d}.ndjson"
+
+    @staticmethod
+    def _number(path: Path) -> int:
+        return int(path.stem.split('-')[1])
+
+    def segments(self) -> List[Path]:
+        """Return the segment files in write order"""
+        return log_segments(self.directory)
+
+    def _recover(self):
+        """Finish interrupted compactions and drop a torn trailing record"""
+        for path in self.directory.glob('*.tmp'):
+            path.unlink()
+
+        for path in self.segments():
+            header = self._read_header(path)
+            if header is not None:
+                for number in range(header['first'], self._number(path)):
+                    self._segment_path(number).unlink(missing_ok=True)
+
+        segments = self.segments()
+        if not segments:
+            return
+        last = segments[-1]
+        with open(last, 'rb+') as f:
+            data = f.read()
+            end = data.rfind(b'\n') + 1
+            if end != len(data):
+                f.truncate(end)
+                f.flush()
+                os.fsync(f.fileno())
+
+    @staticmethod
+    def _read_header(path: Path) -> Dict:
+        """Return the compaction header of a segment, if it has one"""
+        with open(path, 'rb') as f:
+            line = f.readline()
+        if not line.endswith(b'\n'):
+            return None
+        record = json.loads(line)
+        return record.get('_compacted') if isinstance(record, dict) else None
+
+    def append(self, record: Dict):
+        """
+        Queue a record for writing without blocking on disk
+
+        Args:
+            record: JSON-serializable dictionary
+        """
+        if self._error is not None:
+            raise RuntimeError("attempt log writer failed") from self._error
+        self._queue.put(record)
+
+    def flush(self):
+        """Block until every queued record has been written"""
+        self._queue.join()
+        if self._error is not None:
+            raise RuntimeError("attempt log writer failed") from self._error
+
+    def close(self):
+        """Write remaining records, sync and stop the writer thread"""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        if not self._file.closed:
+            self._file.flush()
+            if self.fsync != 'never':
+                os.fsync(self._file.fileno())
+            self._file.close()
+
+    def __enter__(self) -> 'AttemptLog':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _run(self):
+        """Writer loop: gather a batch, write it in one call, then sync"""
+        while True:
+            try:
+                # An idle log must not hold its last writes unsynced until the next append
+                batch = [self._queue.get(timeout=self.fsync_interval if self._unsynced else None)]
+            except queue.Empty:
+                try:
+                    self._sync()
+                except Exception as exc:
+                    self._error = exc
+                    self._unsynced = False
+                continue
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = any(record is _STOP for record in batch)
+            records = [record for record in batch if record is not _STOP]
+            try:
+                if records and self._error is None:
+                    self._write(records)
+            except Exception as exc:  # surfaced to callers on their next append/flush
+                self._error = exc
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, records: List[Dict]):
+        payload = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+        self._file.write(payload.encode('utf-8'))
+        self._file.flush()
+
+        if self.fsync == 'always' or (self.fsync == 'interval'
+                                      and time.monotonic() - self._last_sync >= self.fsync_interval):
+            self._sync()
+        else:
+            self._unsynced = self.fsync == 'interval'
+
+        if self._file.tell() >= self.segment_bytes:
+            self._rotate()
+
+    def _sync(self):
+        """fsync the active segment"""
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+        self._unsynced = False
+
+    def _rotate(self):
+        """Seal the active segment and start a new one"""
+        if self.fsync != 'never':
+            self._sync()
+        self._file.close()
+        self._segment_number += 1
+        self._file = open(self._segment_path(self._segment_number), 'ab')
+
+    def replay(self, learner_id: str = None) -> Iterator[Dict]:
+        """
+        Yield stored records in write order
+
+        Only records already written are visible; call flush() first to
+        include everything appended so far.
+
+        Args:
+            learner_id: Only yield records for this learner if given
+
+        Returns:
+            Iterator over record dictionaries
+        """
+        for record in LogReader(self.segments()):
+            if learner_id is None or record.get('learner_id') == learner_id:
+                yield record
+
+    def attempts_for(self, learner_id: str) -> List[Dict]:
+        """
+        Load a learner's attempts in the PerformanceTracker dict format
+
+        Args:
+            learner_id: Learner whose attempts to load
+
+        Returns:
+            List of attempt dictionaries, oldest first
+        """
+        attempts = []
+        for record in self.replay(learner_id):
+            if record.get('kind', 'attempt') == 'attempt':
+                attempt = dict(record)
+                attempt.pop('kind', None)
+                attempt.pop('learner_id', None)
+                attempts.append(attempt)
+        return attempts
+
+    def compact(self, keep=None) -> int:
+        """
+        Merge all sealed segments into a single segment
+
+        The merged segment is written to a temporary file, synced and renamed
+        over the newest sealed segment; its header lets recovery finish the
+        job if the process dies before the older segments are removed.
+
+        Args:
+            keep: Optional predicate; records for which it returns False are dropped
+
+        Returns:
+            Number of segments merged
+        """
+        sealed = [path for path in self.segments() if self._number(path) < self._segment_number]
+        if len(sealed) < 2 and keep is None:
+            return 0
+        if not sealed:
+            return 0
+
+        first, last = self._number(sealed[0]), self._number(sealed[-1])
+        header = self._read_header(sealed[0])
+        if header is not None:
+            first = header['first']
+        tmp_path = self.directory / f"segment-{last:08d}.ndjson.tmp"
+        with open(tmp_path, 'wb') as out:
+            header = {'_compacted': {'first': first, 'last': last}}
+            out.write((json.dumps(header) + '\n').encode('utf-8'))
+            for path in sealed:
+                with open(path, 'rb') as f:
+                    for line in f:
+                        record = json.loads(line)
+                        if '_compacted' in record or (keep is not None and not keep(record)):
+                            continue
+                        out.write(line)
+            out.flush()
+            os.fsync(out.fileno())
+
+        os.replace(tmp_path, self._segment_path(last))
+        self._sync_directory()
+        for path in sealed[:-1]:
+            path.unlink()
+        return len(sealed)
+
+    def _sync_directory(self):
+        """Make renames in the log directory durable where the OS supports it"""
+        if hasattr(os, 'O_DIRECTORY'):
+            fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+
+def log_segments(directory: str) -> List[Path]:
+    """Segment files of a log directory in write order"""
+    return sorted(Path(directory).glob(AttemptLog.SEGMENT_PATTERN), key=lambda path: int(path.stem.split('-')[1]))
+
+
+class LogReader:
+    """
+    Read-only iterator over the records of a log directory or some of its segments
+
+    Nothing is opened for writing and no recovery runs, so it is safe to
+    read the log of a live server: a record still being written ends its
+    segment early instead of being read half-way. Compaction headers are
+    skipped.
+
+    With partitions > 1, learners are hashed into that many partitions and
+    the records of other partitions are skipped on their raw bytes before
+    any JSON is decoded, so each of N workers reading the whole log only
+    parses its own 1/N of it.
+
+    offset is the byte offset just past the last complete record read in
+    the current segment, so a reader can resume a segment where it stopped.
+    """
+
+    def __init__(self, source: Union[str, Path, Iterable[Path]], kind: str = None, partition: int = 0,
+                 partitions: int = 1, start: int = 0):
+        """
+        Initialize the reader
+
+        Args:
+            source: Log directory, or segment files in write order
+            kind: Only yield records of this kind, e.g. 'attempt'; records without one are attempts
+            partition: Learner partition to yield
+            partitions: Number of partitions learners are hashed into
+            start: Byte offset to start reading the first segment at
+        """
+        self.paths = log_segments(source) if isinstance(source, (str, os.PathLike)) else list(source)
+        self.kind = kind
+        self.partition = partition
+        self.partitions = partitions
+        self.start = start
+        self.offset = start
+
+    def __iter__(self) -> Iterator[Dict]:
+        kind, partition, partitions = self.kind, self.partition, self.partitions
+        key_start = len(_LEARNER_FIELD)
+        # Skips json.loads' encoding detection and trailing whitespace check on every line
+        decode = json.JSONDecoder().raw_decode
+        start = self.start
+        for path in self.paths:
+            self.offset = start
+            with open(path, 'rb') as f:
+                f.seek(start)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # record still being written
+                    self.offset += len(line)
+                    if partitions > 1:
+                        # An escaped quote cuts the key short, but the same learner
+                        # always encodes to the same bytes, so it still maps to one partition
+                        found = line.find(_LEARNER_FIELD)
+                        key = line[found + key_start:line.find(b'"', found + key_start)] if found >= 0 else b''
+                        if zlib.crc32(key) % partitions != partition:
+                            continue
+                    record = decode(line.decode('utf-8'))[0]
+                    if '_compacted' in record or (kind is not None and record.get('kind', 'attempt') != kind):
+                        continue
+                    yield record
+            start = 0
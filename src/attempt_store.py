@@ -0,0 +1,360 @@
+"""
+Attempt Store Module
+Columnar, array-backed storage for puzzle attempts
+"""
+import math
+import time
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+
+from instrumentation import metrics
+from puzzle_generator import PuzzleGenerator
+from tracker import PerformanceTracker
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Codes of attempts without a scale level or outside a review
+NO_LEVEL = -1
+NO_REVIEW = -1
+
+
+def _nearest_rank(ordered: np.ndarray, q: float) -> float:
+    """Exact q-quantile of sorted values, the ceil(q * n)-th smallest"""
+    return float(ordered[max(math.ceil(q * len(ordered)), 1) - 1])
+
+
+class AttemptStore:
+    """
+    Stores attempts as typed NumPy columns instead of per-attempt dicts
+
+    Difficulty, level and operation labels are interned into small integer
+    codes, timestamps are kept as epoch seconds and question strings are
+    rebuilt from the operands on demand.
+    """
+
+    COLUMNS = {
+        'timestamp': np.float64,
+        'time_spent': np.float64,
+        'is_correct': np.bool_,
+        'difficulty': np.int8,
+        'operation': np.int8,
+        'num1': np.int32,
+        'num2': np.int32,
+        'correct_answer': np.int64,
+        'user_answer': np.int64,
+        'level': np.int16,
+        'review': np.int8
+    }
+    # Columns extend() fills in when they are not given
+    DEFAULTS = {'level': NO_LEVEL, 'review': NO_REVIEW}
+
+    def __init__(self, capacity: int = 1024):
+        """
+        Initialize an empty store
+
+        Args:
+            capacity: Initial number of rows to allocate
+        """
+        self.size = 0
+        self._columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in self.COLUMNS.items()}
+        self.difficulty_labels: List[str] = []
+        self.operation_labels: List[str] = []
+        self.level_labels: List[str] = []
+        self._difficulty_codes: Dict[str, int] = {}
+        self._operation_codes: Dict[str, int] = {}
+        self._level_codes: Dict[str, int] = {}
+        for difficulty in PuzzleGenerator.DIFFICULTY_CONFIG:
+            self.difficulty_code(difficulty)
+        for operation in PuzzleGenerator.OPERATIONS:
+            self.operation_code(operation)
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def capacity(self) -> int:
+        return len(self._columns['timestamp'])
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the filled part of all columns"""
+        return sum(column.itemsize * self.size for column in self._columns.values())
+
+    def difficulty_code(self, difficulty: str) -> int:
+        """Return the integer code for a difficulty label, interning it if new"""
+        code = self._difficulty_codes.get(difficulty)
+        if code is None:
+            code = self._difficulty_codes[difficulty] = len(self.difficulty_labels)
+            self.difficulty_labels.append(difficulty)
+        return code
+
+    def operation_code(self, operation: str) -> int:
+        """Return the integer code for an operation symbol, interning it if new"""
+        code = self._operation_codes.get(operation)
+        if code is None:
+            code = self._operation_codes[operation] = len(self.operation_labels)
+            self.operation_labels.append(operation)
+        return code
+
+    def level_code(self, level: str) -> int:
+        """Return the integer code for a scale level name, interning it if new; NO_LEVEL for None"""
+        if level is None:
+            return NO_LEVEL
+        code = self._level_codes.get(level)
+        if code is None:
+            code = self._level_codes[level] = len(self.level_labels)
+            self.level_labels.append(level)
+        return code
+
+    def _reserve(self, extra: int):
+        """Grow every column so that extra more rows fit"""
+        needed = self.size + extra
+        if needed <= self.capacity:
+            return
+        new_capacity = max(needed, self.capacity * 2)
+        for name, column in self._columns.items():
+            grown = np.empty(new_capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self._columns[name] = grown
+
+    def append(self, puzzle: Dict, user_answer: int, is_correct: bool,
+               time_spent: float, timestamp: float = None):
+        """
+        Append a single attempt
+
+        Args:
+            puzzle: The puzzle dictionary
+            user_answer: User's submitted answer
+            is_correct: Whether the answer was correct
+            time_spent: Seconds spent on the puzzle (already rounded)
+            timestamp: Epoch seconds of the attempt, defaults to now
+        """
+        self._reserve(1)
+        row = self.size
+        columns = self._columns
+        num1, num2 = puzzle['numbers']
+        columns['timestamp'][row] = time.time() if timestamp is None else timestamp
+        columns['time_spent'][row] = time_spent
+        columns['is_correct'][row] = is_correct
+        columns['difficulty'][row] = self.difficulty_code(puzzle['difficulty'])
+        columns['operation'][row] = self.operation_code(puzzle['operation'])
+        columns['num1'][row] = num1
+        columns['num2'][row] = num2
+        columns['correct_answer'][row] = puzzle['answer']
+        columns['user_answer'][row] = user_answer
+        columns['level'][row] = self.level_code(puzzle.get('level'))
+        columns['review'][row] = puzzle.get('review', NO_REVIEW)
+        self.size += 1
+
+    def append_record(self, attempt: Dict):
+        """
+        Append an attempt given in the PerformanceTracker dict format
+
+        Args:
+            attempt: Attempt dictionary as produced by PerformanceTracker.log_attempt
+        """
+        num1, _, num2 = attempt['puzzle'].split(' ')
+        puzzle = {
+            'answer': attempt['correct_answer'],
+            'difficulty': attempt['difficulty'],
+            'operation': attempt['operation'],
+            'numbers': [int(num1), int(num2)]
+        }
+        for key in ('level', 'review'):
+            if key in attempt:
+                puzzle[key] = attempt[key]
+        timestamp = datetime.strptime(attempt['timestamp'], TIMESTAMP_FORMAT).timestamp()
+        self.append(puzzle, attempt['user_answer'], attempt['is_correct'],
+                    attempt['time_spent'], timestamp)
+
+    def extend(self, **columns: np.ndarray):
+        """
+        Append many rows at once from already-encoded column arrays
+
+        Args:
+            columns: One array per name in COLUMNS, all of the same length;
+                level and review may be left out for attempts without them
+        """
+        lengths = {len(values) for values in columns.values()}
+        if not set(self.COLUMNS) - set(self.DEFAULTS) <= set(columns) <= set(self.COLUMNS) or len(lengths) != 1:
+            raise ValueError("extend() needs equally sized arrays for every column")
+        count = lengths.pop()
+        self._reserve(count)
+        for name in self.COLUMNS:
+            self._columns[name][self.size:self.size + count] = columns.get(name, self.DEFAULTS.get(name))
+        self.size += count
+
+    def column(self, name: str) -> np.ndarray:
+        """Return a read-only view of the filled part of a column"""
+        view = self._columns[name][:self.size]
+        view.flags.writeable = False
+        return view
+
+    def row(self, index: int) -> Dict:
+        """
+        Materialize a single attempt in the PerformanceTracker dict format
+
+        Args:
+            index: Row index, negative values count from the end
+
+        Returns:
+            Attempt dictionary
+        """
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("attempt index out of range")
+        columns = self._columns
+        operation = self.operation_labels[columns['operation'][index]]
+        attempt = {
+            'timestamp': datetime.fromtimestamp(columns['timestamp'][index]).strftime(TIMESTAMP_FORMAT),
+            'puzzle': f"{columns['num1'][index]} {operation} {columns['num2'][index]}",
+            'correct_answer': int(columns['correct_answer'][index]),
+            'user_answer': int(columns['user_answer'][index]),
+            'is_correct': bool(columns['is_correct'][index]),
+            'time_spent': float(columns['time_spent'][index]),
+            'difficulty': self.difficulty_labels[columns['difficulty'][index]],
+            'operation': operation
+        }
+        if columns['level'][index] != NO_LEVEL:
+            attempt['level'] = self.level_labels[columns['level'][index]]
+        if columns['review'][index] != NO_REVIEW:
+            attempt['review'] = int(columns['review'][index])
+        return attempt
+
+    def _labels_in_first_seen_order(self, codes: np.ndarray) -> np.ndarray:
+        """Return the distinct codes ordered by first appearance"""
+        unique, first_index = np.unique(codes, return_index=True)
+        return unique[np.argsort(first_index)]
+
+    def session_stats(self) -> Dict:
+        """Vectorized equivalent of PerformanceTracker.get_session_stats"""
+        if self.size == 0:
+            return {
+                'total_attempts': 0,
+                'correct_count': 0,
+                'accuracy': 0.0,
+                'average_time': 0.0,
+                'total_time': 0.0
+            }
+
+        times = self.column('time_spent')
+        correct_count = int(np.count_nonzero(self.column('is_correct')))
+        total_time = float(times.sum())
+        ordered = np.sort(times)
+
+        return {
+            'total_attempts': self.size,
+            'correct_count': correct_count,
+            'incorrect_count': self.size - correct_count,
+            'accuracy': round((correct_count / self.size) * 100, 1),
+            'average_time': round(total_time / self.size, 2),
+            'total_time': round(total_time, 2),
+            'fastest_time': float(ordered[0]),
+            'slowest_time': float(ordered[-1]),
+            'median_time': _nearest_rank(ordered, 0.5),
+            'p90_time': _nearest_rank(ordered, 0.9)
+        }
+
+    def difficulty_distribution(self) -> Dict[str, int]:
+        """Vectorized equivalent of PerformanceTracker.get_difficulty_distribution"""
+        codes = self.column('difficulty')
+        counts = np.bincount(codes, minlength=len(self.difficulty_labels))
+        return {
+            self.difficulty_labels[code]: int(counts[code])
+            for code in self._labels_in_first_seen_order(codes)
+        }
+
+    def operation_performance(self) -> Dict[str, Dict]:
+        """
+        Vectorized equivalent of PerformanceTracker.get_operation_performance
+
+        The per-operation 'times' entry is a NumPy array rather than a list.
+        """
+        codes = self.column('operation')
+        correct = self.column('is_correct')
+        times = self.column('time_spent')
+        minlength = len(self.operation_labels)
+        totals = np.bincount(codes, minlength=minlength)
+        corrects = np.bincount(codes, weights=correct, minlength=minlength)
+        time_sums = np.bincount(codes, weights=times, minlength=minlength)
+
+        operation_stats = {}
+        for code in self._labels_in_first_seen_order(codes):
+            total = int(totals[code])
+            operation_times = times[codes == code]
+            operation_stats[self.operation_labels[code]] = {
+                'total': total,
+                'correct': int(corrects[code]),
+                'times': operation_times,
+                'accuracy': round(float(corrects[code] / total) * 100, 1),
+                'avg_time': round(float(time_sums[code] / total), 2),
+                'median_time': _nearest_rank(np.sort(operation_times), 0.5)
+            }
+        return operation_stats
+
+
+class AttemptView(Sequence):
+    """Read-only sequence of attempt dicts backed by an AttemptStore"""
+
+    def __init__(self, store: AttemptStore):
+        self.store = store
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.store.row(i) for i in range(*index.indices(len(self.store)))]
+        return self.store.row(index)
+
+
+class ColumnarPerformanceTracker(PerformanceTracker):
+    """
+    PerformanceTracker variant that keeps attempts in an AttemptStore
+
+    The attempts attribute is exposed as a dict-producing view, so callers
+    written against PerformanceTracker keep working unchanged.
+    """
+
+    # Per-operation times are selected from the store instead
+    keep_operation_times = False
+
+    @property
+    def attempts(self) -> AttemptView:
+        return AttemptView(self.store)
+
+    @attempts.setter
+    def attempts(self, attempts: List[Dict]):
+        self.store = AttemptStore()
+        for attempt in attempts:
+            self.store.append_record(attempt)
+        self._rebuild_aggregates(attempts)
+
+    def _times_for_operation(self, operation: str) -> np.ndarray:
+        codes = self.store.column('operation')
+        return self.store.column('time_spent')[codes == self.store.operation_code(operation)]
+
+    @metrics.timed('tracker_log_attempt_seconds', 'PerformanceTracker.log_attempt wall time')
+    def log_attempt(self, puzzle: Dict, user_answer: int, is_correct: bool, time_spent: float = None):
+        """
+        Log a puzzle attempt with performance metrics
+
+        Args:
+            puzzle: The puzzle dictionary
+            user_answer: User's submitted answer
+            is_correct: Whether the answer was correct
+            time_spent: Seconds spent, measured from the attempt start if omitted
+        """
+        now = time.time()
+        if time_spent is None:
+            time_spent = now - self.current_attempt_start
+        time_spent = round(time_spent, 2)
+        self.store.append(puzzle, user_answer, is_correct, time_spent, now)
+        if self.sink is not None:
+            self._persist(self.store.row(-1))
+        self._update_aggregates(time_spent, is_correct, puzzle['difficulty'], puzzle['operation'])
+        self.start_attempt()  # Start timing next attempt
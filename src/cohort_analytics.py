@@ -0,0 +1,496 @@
+"""
+Cohort Analytics Module
+Class- and school-wide aggregates over the attempt log, computed in streaming chunks
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from attempt_log import LogReader, log_segments
+from puzzle_generator import PuzzleGenerator
+
+DIFFICULTIES = list(PuzzleGenerator.DIFFICULTY_CONFIG)
+_DIFFICULTY_CODES = {difficulty: code for code, difficulty in enumerate(DIFFICULTIES)}
+
+# Response times are histogrammed in 0.1 s bins; the last bin collects everything from 60 s up
+TIME_BIN_WIDTH = 0.1
+TIME_BINS = 601
+
+CACHE_FORMAT = 3
+
+
+class CohortAggregates:
+    """
+    Mergeable aggregates over a contiguous run of attempt records
+
+    Per (cohort, operation): attempt count, correct count, time sum and a
+    response-time histogram. Per cohort: a difficulty transition matrix
+    between consecutive attempts of the same learner. Per (cohort, day):
+    count, correct count and time sum for trend lines. The first and last
+    difficulty of every learner are kept so runs can be merged in log order
+    without losing the transitions that cross their boundary.
+
+    Review attempts replay an earlier puzzle at its own difficulty, so they
+    are left out of the transitions and only counted per (cohort, difficulty).
+
+    Logged adaptation records are counted per (cohort, from, to) level name,
+    and the band of every scale level seen on an attempt is kept, so the
+    engine's actual decisions can be reported in bands.
+    """
+
+    def __init__(self):
+        self.attempts = 0
+        self.operations: Dict[Tuple[str, str], np.ndarray] = {}
+        self.time_histograms: Dict[Tuple[str, str], np.ndarray] = {}
+        self.transitions: Dict[str, np.ndarray] = {}
+        self.review_difficulties: Dict[str, np.ndarray] = {}
+        self.daily: Dict[Tuple[str, str], np.ndarray] = {}
+        self.first_difficulty: Dict[str, Tuple[str, int]] = {}
+        self.last_difficulty: Dict[str, int] = {}
+        self.adaptations: Dict[Tuple[str, str, str], int] = {}
+        self.level_bands: Dict[str, int] = {}
+
+    def _transition_matrix(self, cohort: str) -> np.ndarray:
+        matrix = self.transitions.get(cohort)
+        if matrix is None:
+            matrix = self.transitions[cohort] = np.zeros((len(DIFFICULTIES), len(DIFFICULTIES)), dtype=np.int64)
+        return matrix
+
+    def add_adaptation(self, cohort: str, record: Dict):
+        """
+        Count a logged adaptation record
+
+        Args:
+            cohort: Cohort of the adapted learner
+            record: Adaptation record with from and to level names
+        """
+        key = (cohort, record['from'], record['to'])
+        self.adaptations[key] = self.adaptations.get(key, 0) + 1
+
+    def band_code(self, level: str) -> Optional[int]:
+        """Difficulty code of a level or scale level name, None if no attempt at it was seen"""
+        code = _DIFFICULTY_CODES.get(level)
+        return self.level_bands.get(level) if code is None else code
+
+    def fold(self, frame: pd.DataFrame):
+        """
+        Fold a chunk of attempts into the aggregates
+
+        Args:
+            frame: Chunk in log order with columns learner, cohort, operation,
+                difficulty (code), correct, time, day and review
+        """
+        if frame.empty:
+            return
+        self.attempts += len(frame)
+
+        sums = frame.groupby(['cohort', 'operation'], sort=False).agg(
+            count=('correct', 'size'), correct=('correct', 'sum'), time=('time', 'sum'))
+        for key, row in zip(sums.index, sums.to_numpy(dtype=np.float64)):
+            self.operations[key] = self.operations.get(key, 0) + row
+
+        group_codes, group_keys = pd.factorize(pd.MultiIndex.from_frame(frame[['cohort', 'operation']]))
+        bins = np.minimum((frame['time'].to_numpy() / TIME_BIN_WIDTH).astype(np.int64), TIME_BINS - 1)
+        histograms = np.bincount(group_codes * TIME_BINS + bins,
+                                 minlength=len(group_keys) * TIME_BINS).reshape(len(group_keys), TIME_BINS)
+        for key, histogram in zip(group_keys, histograms):
+            self.time_histograms[key] = self.time_histograms.get(key, 0) + histogram
+
+        daily = frame.groupby(['cohort', 'day'], sort=False).agg(
+            count=('correct', 'size'), correct=('correct', 'sum'), time=('time', 'sum'))
+        for key, row in zip(daily.index, daily.to_numpy(dtype=np.float64)):
+            self.daily[key] = self.daily.get(key, 0) + row
+
+        review = frame['review'].to_numpy()
+        if review.any():
+            cohort_codes, cohorts = pd.factorize(frame['cohort'][review])
+            counts = np.bincount(cohort_codes * len(DIFFICULTIES) + frame['difficulty'].to_numpy()[review],
+                                 minlength=len(cohorts) * len(DIFFICULTIES)).reshape(len(cohorts), len(DIFFICULTIES))
+            for cohort, row in zip(cohorts, counts):
+                self.review_difficulties[cohort] = self.review_difficulties.get(cohort, 0) + row
+            frame = frame[~review]
+            if frame.empty:
+                return
+
+        # Transitions between consecutive attempts of a learner; a learner's
+        # first attempt in the chunk continues from the previous chunk, if any
+        difficulty = frame['difficulty'].to_numpy()
+        previous = frame.groupby('learner', sort=False, dropna=False)['difficulty'].shift(1).to_numpy(dtype=np.float64, copy=True)
+        learners = frame['learner'].to_numpy()
+        cohort_labels = frame['cohort'].to_numpy()
+        for row in np.flatnonzero(np.isnan(previous)).tolist():
+            learner = learners[row]
+            if learner in self.last_difficulty:
+                previous[row] = self.last_difficulty[learner]
+            elif learner not in self.first_difficulty:
+                self.first_difficulty[learner] = (cohort_labels[row], int(difficulty[row]))
+        has_previous = ~np.isnan(previous)
+        cohort_codes, cohorts = pd.factorize(frame['cohort'])
+        counts = np.bincount(
+            (cohort_codes[has_previous] * len(DIFFICULTIES) + previous[has_previous].astype(np.int64))
+            * len(DIFFICULTIES) + difficulty[has_previous],
+            minlength=len(cohorts) * len(DIFFICULTIES) ** 2
+        ).reshape(len(cohorts), len(DIFFICULTIES), len(DIFFICULTIES))
+        for cohort, matrix in zip(cohorts, counts):
+            self._transition_matrix(cohort)[:] += matrix
+
+        last = frame.groupby('learner', sort=False, dropna=False)['difficulty'].last()
+        self.last_difficulty.update(zip(last.index, last.to_numpy().tolist()))
+
+    def merge(self, other: 'CohortAggregates'):
+        """
+        Fold in the aggregates of the run that directly follows this one
+
+        Args:
+            other: Aggregates of the next run of the log
+        """
+        self.attempts += other.attempts
+        for target, source in ((self.operations, other.operations),
+                               (self.time_histograms, other.time_histograms),
+                               (self.review_difficulties, other.review_difficulties),
+                               (self.daily, other.daily)):
+            for key, value in source.items():
+                target[key] = target.get(key, 0) + value
+        for cohort, matrix in other.transitions.items():
+            self._transition_matrix(cohort)[:] += matrix
+        for key, count in other.adaptations.items():
+            self.adaptations[key] = self.adaptations.get(key, 0) + count
+        self.level_bands.update(other.level_bands)
+        for learner, (cohort, difficulty) in other.first_difficulty.items():
+            if learner in self.last_difficulty:
+                self._transition_matrix(cohort)[self.last_difficulty[learner], difficulty] += 1
+            elif learner not in self.first_difficulty:
+                self.first_difficulty[learner] = (cohort, difficulty)
+        self.last_difficulty.update(other.last_difficulty)
+
+
+def read_partition(path: str, start: int = 0, cohorts: Dict[str, str] = None,
+                   default_cohort: str = 'unassigned', chunk_size: int = 100_000) -> Tuple[CohortAggregates, int]:
+    """
+    Aggregate the attempt and adaptation records of one log segment from a
+    byte offset in constant-size chunks
+
+    Args:
+        path: Segment file
+        start: Byte offset to resume from
+        cohorts: Mapping from learner ID to cohort name
+        default_cohort: Cohort for learners missing from the mapping
+        chunk_size: Attempts folded per chunk
+
+    Returns:
+        Tuple of (aggregates, offset just past the last complete record)
+    """
+    cohorts = cohorts or {}
+    aggregates = CohortAggregates()
+    columns = {name: [] for name in ('learner', 'cohort', 'operation', 'difficulty', 'correct', 'time', 'day',
+                                     'review')}
+
+    def flush():
+        frame = pd.DataFrame({
+            'learner': columns['learner'],
+            'cohort': columns['cohort'],
+            'operation': columns['operation'],
+            'difficulty': np.asarray(columns['difficulty'], dtype=np.int64),
+            'correct': np.asarray(columns['correct'], dtype=bool),
+            'time': np.asarray(columns['time'], dtype=np.float64),
+            'day': columns['day'],
+            'review': np.asarray(columns['review'], dtype=bool)
+        })
+        aggregates.fold(frame)
+        for values in columns.values():
+            values.clear()
+
+    reader = LogReader([path], start=start)
+    for record in reader:
+        kind = record.get('kind', 'attempt')
+        learner = record.get('learner_id')
+        if kind == 'adaptation':
+            aggregates.add_adaptation(cohorts.get(learner, default_cohort), record)
+            continue
+        if kind != 'attempt':
+            continue
+        difficulty = _DIFFICULTY_CODES[record['difficulty']]
+        if 'level' in record:
+            aggregates.level_bands[record['level']] = difficulty
+        columns['learner'].append(learner)
+        columns['cohort'].append(cohorts.get(learner, default_cohort))
+        columns['operation'].append(record['operation'])
+        columns['difficulty'].append(difficulty)
+        columns['correct'].append(record['is_correct'])
+        columns['time'].append(record['time_spent'])
+        columns['day'].append(record['timestamp'][:10])
+        columns['review'].append('review' in record)
+        if len(columns['learner']) >= chunk_size:
+            flush()
+    flush()
+    return aggregates, reader.offset
+
+
+def _read_partition_task(args) -> Tuple[CohortAggregates, int]:
+    return read_partition(*args)
+
+
+def _percentile(histogram: np.ndarray, q: float) -> float:
+    """Approximate percentile (bin midpoint) from a response-time histogram"""
+    cumulative = np.cumsum(histogram)
+    index = int(np.searchsorted(cumulative, q / 100 * cumulative[-1]))
+    return round(min(index + 0.5, TIME_BINS - 1) * TIME_BIN_WIDTH, 2)
+
+
+class CohortAnalytics:
+    """
+    Class- and school-wide views over an AttemptLog directory
+
+    refresh() folds only what was appended since the last call, reading each
+    segment from where it left off; sealed segments are aggregated in
+    parallel. The materialized aggregates can be cached on disk so a new
+    process resumes instead of rescanning the whole log. A compaction
+    rewrites segments and triggers a full recomputation.
+    """
+
+    def __init__(self, directory: str, cohorts: Dict[str, str] = None, default_cohort: str = 'unassigned',
+                 cache_path: str = None, workers: int = None, chunk_size: int = 100_000):
+        """
+        Initialize the analytics view
+
+        Args:
+            directory: AttemptLog directory
+            cohorts: Mapping from learner ID to cohort (class or school) name
+            default_cohort: Cohort for learners missing from the mapping
+            cache_path: File to persist the materialized aggregates in
+            workers: Processes used to aggregate segments, os.cpu_count() if omitted
+            chunk_size: Attempts held in memory per chunk and worker
+        """
+        self.directory = Path(directory)
+        self.cohorts = cohorts or {}
+        self.default_cohort = default_cohort
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._cohorts_key = hashlib.sha1(
+            json.dumps([default_cohort, sorted(self.cohorts.items())]).encode('utf-8')).hexdigest()
+        self._reset()
+        self._load_cache()
+
+    def _reset(self):
+        self.aggregates = CohortAggregates()
+        # segment name -> (inode, bytes already folded)
+        self.offsets: Dict[str, Tuple[int, int]] = {}
+
+    def _load_cache(self):
+        if self.cache_path is None or not self.cache_path.exists():
+            return
+        with open(self.cache_path, 'rb') as f:
+            cached = pickle.load(f)
+        if cached.get('format') == CACHE_FORMAT and cached.get('cohorts') == self._cohorts_key:
+            self.aggregates = cached['aggregates']
+            self.offsets = cached['offsets']
+
+    def _save_cache(self):
+        if self.cache_path is None:
+            return
+        tmp = self.cache_path.with_suffix(self.cache_path.suffix + '.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump({'format': CACHE_FORMAT, 'cohorts': self._cohorts_key,
+                         'aggregates': self.aggregates, 'offsets': self.offsets}, f)
+        os.replace(tmp, self.cache_path)
+
+    def refresh(self) -> int:
+        """
+        Fold attempts appended since the last refresh into the aggregates
+
+        Returns:
+            Number of attempts added
+        """
+        segments = log_segments(self.directory)
+        stats = {path.name: os.stat(path) for path in segments}
+        for name, (inode, offset) in self.offsets.items():
+            stat = stats.get(name)
+            if stat is None or stat.st_ino != inode or stat.st_size < offset:
+                self._reset()
+                break
+
+        tasks = []
+        for path in segments:
+            stat = stats[path.name]
+            _, offset = self.offsets.get(path.name, (stat.st_ino, 0))
+            if stat.st_size > offset:
+                tasks.append((str(path), offset, self.cohorts, self.default_cohort, self.chunk_size))
+        if not tasks:
+            return 0
+
+        if self.workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks))) as pool:
+                results = list(pool.map(_read_partition_task, tasks))
+        else:
+            results = [_read_partition_task(task) for task in tasks]
+
+        added = 0
+        for (path, *_), (partial, end) in zip(tasks, results):
+            self.aggregates.merge(partial)
+            added += partial.attempts
+            self.offsets[Path(path).name] = (stats[Path(path).name].st_ino, end)
+        self._save_cache()
+        return added
+
+    def _select(self, table: Dict, cohort: Optional[str]) -> Dict:
+        """Entries of a (cohort, key) table, summed over cohorts if cohort is None"""
+        selected = {}
+        for (entry_cohort, key), value in table.items():
+            if cohort is None or entry_cohort == cohort:
+                selected[key] = selected.get(key, 0) + value
+        return selected
+
+    def cohort_names(self) -> List[str]:
+        """Cohorts with at least one attempt"""
+        return sorted({cohort for cohort, _ in self.aggregates.operations})
+
+    def operation_performance(self, cohort: str = None, percentiles=(50, 90, 99)) -> pd.DataFrame:
+        """
+        Per-operation accuracy and response-time percentiles
+
+        Args:
+            cohort: Cohort to report, all learners if omitted
+            percentiles: Response-time percentiles to include
+
+        Returns:
+            DataFrame indexed by operation
+        """
+        sums = self._select(self.aggregates.operations, cohort)
+        histograms = self._select(self.aggregates.time_histograms, cohort)
+        rows = []
+        for operation in PuzzleGenerator.OPERATIONS:
+            if operation not in sums:
+                continue
+            count, correct, time_sum = sums[operation]
+            row = {'operation': operation, 'attempts': int(count),
+                   'accuracy': round(correct / count * 100, 1), 'avg_time': round(time_sum / count, 2)}
+            for q in percentiles:
+                row[f'p{q}_time'] = _percentile(histograms[operation], q)
+            rows.append(row)
+        return pd.DataFrame(rows).set_index('operation') if rows else pd.DataFrame()
+
+    def _attempt_counts(self, cohort: Optional[str]) -> np.ndarray:
+        """Non-review attempts per difficulty, the transition matrices' column sums plus each learner's first attempt"""
+        counts = np.zeros(len(DIFFICULTIES), dtype=np.int64)
+        for entry_cohort, matrix in self.aggregates.transitions.items():
+            if cohort is None or entry_cohort == cohort:
+                counts += matrix.sum(axis=0)
+        for entry_cohort, difficulty in self.aggregates.first_difficulty.values():
+            if cohort is None or entry_cohort == cohort:
+                counts[difficulty] += 1
+        return counts
+
+    def difficulty_distribution(self, cohort: str = None) -> Dict[str, int]:
+        """
+        Attempts per difficulty level, review attempts included
+
+        Args:
+            cohort: Cohort to report, all learners if omitted
+
+        Returns:
+            Dictionary mapping difficulty levels to attempt counts
+        """
+        counts = self._attempt_counts(cohort)
+        for entry_cohort, reviews in self.aggregates.review_difficulties.items():
+            if cohort is None or entry_cohort == cohort:
+                counts += reviews
+        return {difficulty: int(count) for difficulty, count in zip(DIFFICULTIES, counts) if count}
+
+    def difficulty_transitions(self, cohort: str = None, normalize: bool = False) -> pd.DataFrame:
+        """
+        Difficulty transition matrix over the answers of a learner
+
+        Each non-review answer counts once, from the difficulty it was given
+        at to the difficulty the learner continued with. When the log holds
+        adaptation records, the off-diagonal cells are the engine's logged
+        changes and the diagonal the remaining answers; a move between scale
+        levels of the same band counts on the diagonal. Logs written before
+        adaptations were recorded fall back to comparing consecutive
+        attempts, which also counts a new game started at another difficulty.
+
+        Args:
+            cohort: Cohort to report, all learners if omitted
+            normalize: Return row-normalized transition probabilities
+
+        Returns:
+            DataFrame with the from-difficulty as index and to-difficulty as columns
+        """
+        matrix = np.zeros((len(DIFFICULTIES), len(DIFFICULTIES)), dtype=np.int64)
+        if self.aggregates.adaptations:
+            for (entry_cohort, source, target), count in self.aggregates.adaptations.items():
+                source, target = self.aggregates.band_code(source), self.aggregates.band_code(target)
+                if (cohort is None or entry_cohort == cohort) and source is not None and target is not None:
+                    matrix[source, target] += count
+            stays = self._attempt_counts(cohort) - matrix.sum(axis=1)
+            matrix[np.diag_indices_from(matrix)] += np.maximum(stays, 0)
+        else:
+            for entry_cohort, counts in self.aggregates.transitions.items():
+                if cohort is None or entry_cohort == cohort:
+                    matrix += counts
+        frame = pd.DataFrame(matrix, index=pd.Index(DIFFICULTIES, name='from'),
+                             columns=pd.Index(DIFFICULTIES, name='to'))
+        if normalize:
+            frame = frame.div(frame.sum(axis=1).replace(0, 1), axis=0).round(3)
+        return frame
+
+    def daily_trend(self, cohort: str = None) -> pd.DataFrame:
+        """
+        Attempts, accuracy and average time per day
+
+        Args:
+            cohort: Cohort to report, all learners if omitted
+
+        Returns:
+            DataFrame indexed by day in ascending order
+        """
+        sums = self._select(self.aggregates.daily, cohort)
+        if not sums:
+            return pd.DataFrame()
+        days = sorted(sums)
+        values = np.array([sums[day] for day in days])
+        return pd.DataFrame({
+            'attempts': values[:, 0].astype(np.int64),
+            'accuracy': np.round(values[:, 1] / values[:, 0] * 100, 1),
+            'avg_time': np.round(values[:, 2] / values[:, 0], 2)
+        }, index=pd.Index(days, name='day'))
+
+
+def load_cohorts(path: str) -> Dict[str, str]:
+    """Read a learner_id,cohort CSV file"""
+    with open(path, newline='', encoding='utf-8') as f:
+        return {row['learner_id']: row['cohort'] for row in csv.DictReader(f)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('directory', help='attempt log directory')
+    parser.add_argument('--cohorts', help='CSV file with learner_id,cohort columns')
+    parser.add_argument('--cohort', help='report a single cohort')
+    parser.add_argument('--cache', help='file to keep materialized aggregates in')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    analytics = CohortAnalytics(args.directory, cohorts=load_cohorts(args.cohorts) if args.cohorts else None,
+                                cache_path=args.cache, workers=args.workers)
+    added = analytics.refresh()
+    print(f"{analytics.aggregates.attempts:,} attempts ({added:,} new), cohorts: {', '.join(analytics.cohort_names())}")
+    print("\nPerformance by operation")
+    print(analytics.operation_performance(args.cohort).to_string())
+    print("\nDifficulty transitions")
+    print(analytics.difficulty_transitions(args.cohort, normalize=True).to_string())
+    print("\nDaily trend")
+    print(analytics.daily_trend(args.cohort).tail(14).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+"""
+Difficulty Scale Module
+Fine-grained difficulty levels with precomputed alias-method sampling tables
+"""
+import random
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from puzzle_generator import PuzzleGenerator
+
+# Op codes index PuzzleGenerator.OPERATIONS, so batches from either source share them
+OPERATIONS = PuzzleGenerator.OPERATIONS
+
+
+class AliasTable:
+    """
+    Walker's alias method over a fixed discrete distribution
+
+    Built once in O(n) (Vose's variant); every draw is one uniform index and
+    one biased coin, whatever the number of outcomes.
+    """
+
+    __slots__ = ('prob', 'alias', '_prob_array', '_alias_array')
+
+    def __init__(self, weights: List[float]):
+        """
+        Build the table
+
+        Args:
+            weights: Non-negative weight per outcome, not all zero
+        """
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("alias table needs at least one positive weight")
+        scaled = [w * n / total for w in weights]
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Leftovers are 1 up to rounding
+        self.prob = prob
+        self.alias = alias
+        self._prob_array = np.array(prob)
+        self._alias_array = np.array(alias)
+
+    def __len__(self) -> int:
+        return len(self.prob)
+
+    def sample(self, rng=random) -> int:
+        """Draw one outcome index"""
+        i = int(rng.random() * len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+    def sample_many(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        """Draw n outcome indices at once"""
+        i = rng.integers(0, len(self.prob), size=n)
+        keep = rng.random(n) < self._prob_array[i]
+        return np.where(keep, i, self._alias_array[i])
+
+
+class LevelSpec:
+    """Generation parameters of one difficulty level"""
+
+    __slots__ = ('name', 'band', 'add_max', 'factor_max', 'weights', 'regroup')
+
+    def __init__(self, name: str, add_max: int, factor_max: int, weights: Dict[str, float], regroup: float):
+        """
+        Initialize the level
+
+        Args:
+            name: Level name, e.g. 'L37'
+            add_max: Largest operand for + and -
+            factor_max: Largest factor for × and of divisor and quotient for ÷
+            weights: Relative weight of each operation symbol
+            regroup: Share of + and - puzzles that need a carry or borrow
+        """
+        self.name = name
+        self.add_max = add_max
+        self.factor_max = factor_max
+        self.weights = weights
+        self.regroup = regroup
+        if weights.get('÷', 0) > 0:
+            self.band = 'Hard'
+        elif weights.get('×', 0) > 0:
+            self.band = 'Medium'
+        else:
+            self.band = 'Easy'
+
+    def description(self) -> str:
+        ops = [op for op in OPERATIONS if self.weights.get(op, 0) > 0]
+        factors = f", factors up to {self.factor_max}" if len(ops) > 2 else ''
+        return (f"Numbers 1-{self.add_max}{factors}, {', '.join(ops)}, "
+                f"{round(self.regroup * 100)}% carrying/borrowing")
+
+
+def _ramp(t: float, start: float, end: float) -> float:
+    """0 before start, 1 after end, linear in between"""
+    return min(max((t - start) / (end - start), 0.0), 1.0)
+
+
+def default_specs(levels: int = 100, max_operand: int = 100, max_factor: int = 20) -> List[LevelSpec]:
+    """
+    Evenly graded levels from single-digit addition to all four operations
+
+    Operand ranges grow linearly, multiplication is phased in over the
+    second quarter and division over the third, and the share of
+    carry/borrow puzzles rises from 10% to 80%.
+
+    Args:
+        levels: Number of levels
+        max_operand: Largest + and - operand at the top level
+        max_factor: Largest × and ÷ factor at the top level
+
+    Returns:
+        Level specs, easiest first
+    """
+    specs = []
+    for index in range(levels):
+        t = index / (levels - 1) if levels > 1 else 1.0
+        weights = {'+': 1.0, '-': 0.5 + 0.5 * _ramp(t, 0.0, 0.2),
+                   '×': _ramp(t, 0.25, 0.5), '÷': _ramp(t, 0.55, 0.8)}
+        specs.append(LevelSpec(f"L{index + 1}", round(10 + (max_operand - 10) * t),
+                               round(5 + (max_factor - 5) * t), weights, 0.1 + 0.7 * t))
+    return specs
+
+
+class DifficultyScale:
+    """
+    Many-level difficulty scale with O(1) puzzle sampling per level
+
+    For every level an alias table over (operation, needs carry/borrow)
+    categories is built once. + and - operand pairs are enumerated once per
+    operand range and split by whether they need a carry/borrow, so a
+    category is sampled uniformly by a single index. × and ÷ draw factors
+    directly. Generation therefore costs the same at level 1 and level 500.
+    """
+
+    # Sampling categories: (operation code, needs carry/borrow)
+    CATEGORIES = ((0, False), (0, True), (1, False), (1, True), (2, False), (3, False))
+
+    def __init__(self, specs: List[LevelSpec] = None):
+        """
+        Precompute the sampling tables
+
+        Args:
+            specs: Level specs easiest first, default_specs() if omitted
+        """
+        self.specs = specs or default_specs()
+        self.level_index: Dict[str, int] = {spec.name: i for i, spec in enumerate(self.specs)}
+        if len(self.level_index) != len(self.specs):
+            raise ValueError("level names must be distinct")
+
+        self._pairs: Dict[int, Dict[int, Tuple[np.ndarray, ...]]] = {}
+        self._tables: List[AliasTable] = []
+        for spec in self.specs:
+            pairs = self._pairs_for(spec.add_max)
+            weights = []
+            for op, regroup in self.CATEGORIES:
+                weight = spec.weights.get(OPERATIONS[op], 0.0)
+                if op < 2:
+                    share = spec.regroup if regroup else 1.0 - spec.regroup
+                    weight *= share if len(pairs[op][regroup][0]) else 0.0
+                weights.append(weight)
+            self._tables.append(AliasTable(weights))
+
+    def _pairs_for(self, add_max: int) -> Dict[int, Tuple[Tuple[np.ndarray, np.ndarray], ...]]:
+        """Operand pairs for + and - over 1..add_max, split by carry/borrow"""
+        pairs = self._pairs.get(add_max)
+        if pairs is None:
+            values = np.arange(1, add_max + 1, dtype=np.int64)
+            num1, num2 = (a.ravel() for a in np.meshgrid(values, values, indexing='ij'))
+            carry = num1 % 10 + num2 % 10 >= 10
+            ordered = num1 >= num2
+            borrow = num1 % 10 < num2 % 10
+            pairs = self._pairs[add_max] = {
+                0: ((num1[~carry], num2[~carry]), (num1[carry], num2[carry])),
+                1: ((num1[ordered & ~borrow], num2[ordered & ~borrow]),
+                    (num1[ordered & borrow], num2[ordered & borrow]))
+            }
+        return pairs
+
+    def __len__(self) -> int:
+        return len(self.specs)
+
+    def names(self) -> List[str]:
+        """Level names, easiest first"""
+        return [spec.name for spec in self.specs]
+
+    def spec(self, level: str) -> LevelSpec:
+        return self.specs[self.level_index[level]]
+
+    def level_for(self, band: str) -> str:
+        """
+        First level of a coarse difficulty band
+
+        Args:
+            band: 'Easy', 'Medium' or 'Hard', or already a level name
+
+        Returns:
+            Level name
+        """
+        if band in self.level_index:
+            return band
+        for spec in self.specs:
+            if spec.band == band:
+                return spec.name
+        raise ValueError(f"unknown difficulty {band!r}")
+
+    def generate(self, level: str, rng=random) -> Dict:
+        """
+        Generate one puzzle at a level
+
+        Args:
+            level: Level name
+            rng: Random stream with a random() method
+
+        Returns:
+            Puzzle dictionary in the PuzzleGenerator format; difficulty is the
+            level's band and level the level name
+        """
+        index = self.level_index[level]
+        spec = self.specs[index]
+        op, regroup = self.CATEGORIES[self._tables[index].sample(rng)]
+        if op < 2:
+            num1s, num2s = self._pairs[spec.add_max][op][regroup]
+            i = int(rng.random() * len(num1s))
+            num1, num2 = int(num1s[i]), int(num2s[i])
+            answer = num1 + num2 if op == 0 else num1 - num2
+        else:
+            num1 = int(rng.random() * spec.factor_max) + 1
+            num2 = int(rng.random() * spec.factor_max) + 1
+            answer = num1 * num2 if op == 2 else num1
+            if op == 3:
+                num1 *= num2
+        operation = OPERATIONS[op]
+        return {
+            'question': f"{num1} {operation} {num2}",
+            'answer': answer,
+            'difficulty': spec.band,
+            'level': level,
+            'operation': operation,
+            'numbers': [num1, num2]
+        }
+
+    def sample_batch(self, level: str, n: int, rng: np.random.Generator) -> Tuple[np.ndarray, ...]:
+        """
+        Generate n puzzles at a level as columns
+
+        Args:
+            level: Level name
+            n: Number of puzzles
+            rng: NumPy random generator
+
+        Returns:
+            Tuple of (num1, num2, op, answer) arrays
+        """
+        index = self.level_index[level]
+        spec = self.specs[index]
+        categories = self._tables[index].sample_many(rng, n)
+        num1 = np.empty(n, dtype=np.int64)
+        num2 = np.empty(n, dtype=np.int64)
+        op = np.empty(n, dtype=np.int8)
+        for category, (code, regroup) in enumerate(self.CATEGORIES):
+            rows = np.flatnonzero(categories == category)
+            if not len(rows):
+                continue
+            op[rows] = code
+            if code < 2:
+                num1s, num2s = self._pairs[spec.add_max][code][regroup]
+                picks = rng.integers(0, len(num1s), size=len(rows))
+                num1[rows], num2[rows] = num1s[picks], num2s[picks]
+            else:
+                num1[rows] = rng.integers(1, spec.factor_max + 1, size=len(rows))
+                num2[rows] = rng.integers(1, spec.factor_max + 1, size=len(rows))
+        answer = np.select([op == 0, op == 1, op == 2], [num1 + num2, num1 - num2, num1 * num2], default=num1)
+        num1 = np.where(op == 3, num1 * num2, num1)
+        return num1, num2, op, answer
+
+    def rule_config(self, window_size: int = 3, time_threshold: float = 8.0,
+                    leap: int = 3, drop: int = 3) -> Dict:
+        """
+        Adaptation rules stepping through the scale by variable amounts
+
+        A full window answered correctly in under half the time threshold
+        moves up by leap levels and an all-wrong window down by drop levels;
+        otherwise the usual rules move one level at a time.
+
+        Args:
+            window_size: Number of recent attempts the rules look at
+            time_threshold: Average seconds per answer must stay below this to increase
+            leap: Levels gained by a perfect, fast window
+            drop: Levels lost by a window without a correct answer
+
+        Returns:
+            Rule configuration for rule_engine.RuleSet
+        """
+        promote = max(window_size - 1, 1)
+        return {
+            'name': f'scale_{len(self)}',
+            'levels': self.names(),
+            'window_size': window_size,
+            'min_attempts': 2,
+            'rules': [
+                {'name': 'leap', 'when': {'min_correct': window_size, 'max_avg_time': time_threshold / 2},
+                 'step': leap, 'reason': "Excellent! Jumping to {to} (accuracy: {correct}/{total})",
+                 'explanation': "🚀 You're flying through these! Skipping ahead."},
+                {'name': 'promote', 'when': {'min_correct': promote, 'max_avg_time': time_threshold,
+                                             'min_trend_accuracy': promote / window_size},
+                 'step': 1, 'reason': "Great work! Moving to {to} (accuracy: {correct}/{total})",
+                 'explanation': "🎯 You're doing excellent! Ready for a challenge."},
+                {'name': 'drop', 'when': {'max_correct': 0}, 'step': -drop,
+                 'reason': "Let's try {to} (accuracy: {correct}/{total})",
+                 'explanation': "💪 Let's work on building confidence at an easier level."},
+                {'name': 'demote', 'when': {'max_correct': window_size - promote}, 'step': -1,
+                 'reason': "Let's try {to} (accuracy: {correct}/{total})",
+                 'explanation': "💪 Let's work on building confidence at an easier level."}
+            ],
+            'explanation': "✨ You're at the perfect difficulty level. Keep it up!",
+            'warmup_explanation': "Building your performance profile... Keep going!"
+        }
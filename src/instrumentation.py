@@ -0,0 +1,296 @@
+"""
+Instrumentation Module
+Opt-in timers, counters and profiling for the interaction hot path
+"""
+import bisect
+import functools
+import os
+import threading
+import time
+from typing import Callable, Dict, Tuple
+
+# Set to a file path to export metrics there, or to a port number to serve
+# them over HTTP once an entry point calls metrics.start_server(); metrics
+# are disabled (and cost nothing) when unset.
+METRICS_ENV = 'MATH_ADVENTURES_METRICS'
+
+# Latency buckets in seconds, 1µs to 10s; the hot-path calls live at the low end
+DEFAULT_BUCKETS = (
+    1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+    1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+class Histogram:
+    """Cumulative latency histogram in the Prometheus model"""
+
+    __slots__ = ('name', 'help', 'buckets', 'counts', 'count', 'sum', '_lock')
+
+    def __init__(self, name: str, help: str = '', buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """Record one observation"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def render(self) -> str:
+        """Prometheus text exposition of the histogram"""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound:g}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum:.9f}")
+        lines.append(f"{self.name}_count {self.count}")
+        return '\n'.join(lines)
+
+
+class Counter:
+    """Monotonic counter in the Prometheus model"""
+
+    __slots__ = ('name', 'help', 'value', '_lock')
+
+    def __init__(self, name: str, help: str = ''):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+    def render(self) -> str:
+        return f"# HELP {self.name} {self.help}\n# TYPE {self.name} counter\n{self.name} {self.value}"
+
+
+class _NullTimer:
+    """Context manager returned by timer() when metrics are disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Timer:
+    """Context manager observing the wall time of its block"""
+
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """
+    Registry of histograms and counters
+
+    When disabled, timed() returns the function unchanged and timer()/inc()
+    do nothing, so instrumented code runs at full speed.
+    """
+
+    def __init__(self, enabled: bool = False, path: str = None, port: int = None,
+                 export_interval: float = 5.0):
+        """
+        Initialize the registry
+
+        Args:
+            enabled: Whether to record anything
+            path: File that export() writes the Prometheus text to
+            port: Port to serve the Prometheus text on (/metrics)
+            export_interval: Minimum seconds between two file exports
+        """
+        self.enabled = enabled
+        self.path = path
+        self.port = port
+        self.export_interval = export_interval
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+        self._last_export = 0.0
+        self._server = None
+
+    @classmethod
+    def from_env(cls) -> 'Metrics':
+        """Build the registry from the METRICS_ENV environment variable"""
+        target = os.environ.get(METRICS_ENV)
+        if not target:
+            return cls()
+        if target.isdigit():
+            return cls(enabled=True, port=int(target))
+        return cls(enabled=True, path=target)
+
+    def histogram(self, name: str, help: str = '') -> Histogram:
+        """Get or create a histogram"""
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(name, help)
+            return histogram
+
+    def counter(self, name: str, help: str = '') -> Counter:
+        """Get or create a counter"""
+        with self._lock:
+            counter = self.counters.get(name)
+            if counter is None:
+                counter = self.counters[name] = Counter(name, help)
+            return counter
+
+    def timed(self, name: str, help: str = '') -> Callable:
+        """
+        Decorator recording a function's wall time in a histogram
+
+        Args:
+            name: Histogram name, e.g. 'tracker_log_attempt_seconds'
+            help: Histogram description
+
+        Returns:
+            Decorator; the identity when metrics are disabled
+        """
+        if not self.enabled:
+            return lambda func: func
+
+        histogram = self.histogram(name, help)
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def timer(self, name: str, help: str = ''):
+        """Context manager recording the wall time of a block"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self.histogram(name, help))
+
+    def inc(self, name: str, amount: int = 1, help: str = ''):
+        """Increment a counter"""
+        if self.enabled:
+            self.counter(name, help).inc(amount)
+
+    def render(self) -> str:
+        """Prometheus text exposition of every metric"""
+        with self._lock:
+            metrics = [*self.histograms.values(), *self.counters.values()]
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+    def export(self, force: bool = False):
+        """
+        Write the metrics to the export file, at most once per export_interval
+
+        Args:
+            force: Write even if the last export is recent
+        """
+        if not self.enabled or self.path is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_export < self.export_interval:
+            return
+        self._last_export = now
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp, self.path)
+
+    def start_server(self, offset: int = 0):
+        """
+        Serve the metrics on the configured port, if any
+
+        Called by the entry points rather than at import, so importing an
+        instrumented module never binds a port. Later calls do nothing.
+
+        Args:
+            offset: Added to the port, so several worker processes can each serve their own
+        """
+        if self.enabled and self.port is not None and self._server is None:
+            self.serve(self.port + offset)
+
+    def serve(self, port: int, host: str = '127.0.0.1'):
+        """Serve the metrics at http://host:port/metrics from a daemon thread"""
+        # http.server pulls in email, ssl and socket; only metrics servers pay for it
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+
+
+class SessionProfiler:
+    """
+    Accumulates a cProfile profile over the reruns of one session
+
+    Each call to run() profiles one rerun; the cumulative stats are written
+    to path afterwards so they can be inspected with pstats or snakeviz.
+    """
+
+    def __init__(self, path: str):
+        import cProfile
+
+        self.path = path
+        self.profile = cProfile.Profile()
+        self.reruns = 0
+
+    def run(self, func: Callable, *args, **kwargs):
+        """Call func under the profiler and dump the accumulated stats"""
+        try:
+            self.profile.enable()
+        except ValueError:
+            # Another session's rerun holds the interpreter's profiler
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.profile.disable()
+            self.reruns += 1
+            self.profile.dump_stats(self.path)
+
+
+metrics = Metrics.from_env()
@@ -0,0 +1,74 @@
+"""
+Learner State Module
+Compact per-learner record used with shared generator and engine instances
+"""
+from typing import Dict, List, Set
+
+from random_streams import RandomStream
+from tracker import RecentWindow
+
+
+class LearnerState:
+    """
+    Per-learner adaptation state
+
+    PuzzleGenerator and AdaptiveEngine hold no per-learner data when used
+    through generate_puzzle(difficulty) and adapt_learner(), so one instance
+    of each can serve every learner in the process. Everything that differs
+    between learners lives in this slotted record instead, including the
+    learner's own random stream, so a session is reproducible from its seed
+    and answers.
+    """
+
+    __slots__ = ('learner_id', 'current_difficulty', 'attempt_count', 'correct_count',
+                 'window', 'difficulty_history', 'seen_puzzles', 'skills', 'rng')
+
+    def __init__(self, learner_id: str = None, current_difficulty: str = 'Medium', window_size: int = 3,
+                 seed: int = None):
+        """
+        Initialize the learner state
+
+        Args:
+            learner_id: Identifier of the learner
+            current_difficulty: Starting difficulty level
+            window_size: Number of recent attempts kept for adaptation
+            seed: Seed of the learner's puzzle stream, a fresh one if omitted
+        """
+        self.learner_id = learner_id
+        self.current_difficulty = current_difficulty
+        self.attempt_count = 0
+        self.correct_count = 0
+        self.window = RecentWindow(window_size)
+        self.difficulty_history: List[Dict] = []
+        self.seen_puzzles: Set[int] = set()
+        # Per-operation [skill, attempts], only filled in by skill_model.SkillEngine
+        self.skills: Dict[str, List[float]] = {}
+        self.rng = RandomStream(seed)
+
+    def record(self, is_correct: bool, time_spent: float):
+        """
+        Count an answered puzzle and add it to the recent window
+
+        Args:
+            is_correct: Whether the answer was correct
+            time_spent: Seconds spent on the puzzle
+        """
+        self.attempt_count += 1
+        if is_correct:
+            self.correct_count += 1
+        self.window.push(is_correct, time_spent)
+
+    def reset(self, current_difficulty: str):
+        """
+        Start over at the given difficulty, as when a new game begins
+
+        Args:
+            current_difficulty: Starting difficulty level
+        """
+        self.current_difficulty = current_difficulty
+        self.attempt_count = 0
+        self.correct_count = 0
+        self.window.clear()
+        self.difficulty_history = []
+        self.seen_puzzles = set()
+        self.skills = {}
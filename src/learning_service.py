@@ -0,0 +1,366 @@
+"""
+Learning Service Module
+Transport-independent adaptive learning loop for headless servers
+"""
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from adaptive_engine import AdaptiveEngine
+from learner_state import LearnerState
+from puzzle_bank import PuzzleBank, weakest_operation
+from puzzle_generator import PuzzleGenerator
+from puzzle_pool import PuzzlePool
+from random_streams import derive_seed
+from review_scheduler import ReviewScheduler
+from tracker import PerformanceTracker
+
+if TYPE_CHECKING:
+    from session_store import SessionStore
+
+
+class LearnerSession:
+    """Everything the service keeps for one learner"""
+
+    __slots__ = ('learner', 'tracker', 'current_puzzle', 'last_active')
+
+    def __init__(self, learner: LearnerState, tracker: PerformanceTracker):
+        self.learner = learner
+        self.tracker = tracker
+        self.current_puzzle = None
+        self.last_active = time.time()
+
+
+class LearnerNotFound(KeyError):
+    """Raised when a request refers to a learner without a session"""
+
+
+class LearningService:
+    """
+    Runs the puzzle → answer → adapt loop for many learners
+
+    Generator and engine are shared; each learner only owns a LearnerSession,
+    including the random stream its puzzles are drawn from. Sessions are
+    kept in memory keyed by learner ID, or in a SessionStore that spills
+    idle ones to disk.
+    """
+
+    def __init__(self, generator: PuzzleGenerator = None, engine: AdaptiveEngine = None,
+                 pool: PuzzlePool = None, sink=None, seed: int = None, bank: PuzzleBank = None,
+                 focus: float = 0.0, reviews: ReviewScheduler = None, review_share: float = 0.5,
+                 store: 'SessionStore' = None):
+        """
+        Initialize the service
+
+        Args:
+            generator: Shared puzzle generator
+            engine: Shared adaptive engine
+            pool: Shared pre-generated puzzle pool to serve from instead of the
+                learners' own streams; sessions served from a pool cannot be replayed
+            sink: Optional durable attempt log handed to every tracker
+            seed: Root seed; each learner's stream seed is derived from it and the
+                learner ID, so a session can be replayed from the root seed and
+                its attempt log. Learners get fresh seeds if omitted.
+            bank: Indexed puzzle bank serving targeted practice
+            focus: Share of puzzles drawn from the bank in the operation the
+                learner is weakest at on the current level, once one falls
+                behind (see puzzle_bank.weakest_operation)
+            reviews: Review scheduler re-serving missed puzzles; due times
+                follow the wall clock, so sessions with reviews only replay
+                exactly when no review fell due
+            review_share: Chance of serving a due review instead of a fresh puzzle
+            store: Bounded session store; sessions are kept in a dict without limit if omitted
+        """
+        self.generator = generator or PuzzleGenerator()
+        self.engine = engine or AdaptiveEngine()
+        self.pool = pool
+        self.sink = sink
+        self.seed = seed
+        self.bank = bank
+        self.focus = focus
+        self.reviews = reviews
+        self.review_share = review_share
+        self.store = store
+        self.sessions: Dict[str, LearnerSession] = {} if store is None else store
+
+    def learner_seed(self, learner_id: str) -> Optional[int]:
+        """Stream seed a new session of the learner gets, None for a fresh one"""
+        return derive_seed(self.seed, learner_id) if self.seed is not None else None
+
+    def get_session(self, learner_id: str, create: bool = False, seed: int = None) -> LearnerSession:
+        """
+        Look up a learner's session
+
+        Args:
+            learner_id: Learner identifier
+            create: Start a new session if the learner has none
+            seed: Stream seed for a new session, learner_seed() if omitted
+
+        Returns:
+            The learner's session
+        """
+        session = self.sessions.get(learner_id)
+        if session is None:
+            if not create:
+                raise LearnerNotFound(learner_id)
+            tracker = PerformanceTracker(window_sizes=(), learner_id=learner_id, sink=self.sink)
+            tracker.start_session()
+            learner = LearnerState(learner_id, self.generator.resolve_difficulty('Medium'),
+                                   window_size=self.engine.rules_for(learner_id).window_size,
+                                   seed=self.learner_seed(learner_id) if seed is None else seed)
+            session = self.sessions[learner_id] = LearnerSession(learner, tracker)
+        session.last_active = time.time()
+        return session
+
+    def next_puzzle(self, learner_id: str, difficulty: str = None) -> Dict:
+        """
+        Serve the learner's current puzzle, drawing a new one if needed
+
+        Args:
+            learner_id: Learner identifier; a session is created on first use
+            difficulty: Starting difficulty for a new session
+
+        Returns:
+            Puzzle question, difficulty and operation (without the answer)
+        """
+        session = self.get_session(learner_id, create=True)
+        if difficulty is not None and session.learner.attempt_count == 0:
+            if not self.generator.has_difficulty(difficulty):
+                raise ValueError(f"unknown difficulty {difficulty!r}")
+            difficulty = self.generator.resolve_difficulty(difficulty)
+            if difficulty != session.learner.current_difficulty:
+                session.learner.current_difficulty = difficulty
+                session.current_puzzle = None
+
+        if session.current_puzzle is None:
+            learner = session.learner
+            if self.pool is not None:
+                session.current_puzzle = self.pool.next_puzzle(learner.current_difficulty, learner.seen_puzzles)
+            else:
+                puzzle = self._focus_puzzle(session) if self.bank is not None and self.focus else None
+                session.current_puzzle = puzzle or self.generator.next_puzzle(
+                    learner.current_difficulty, learner.seen_puzzles, learner.rng,
+                    self.reviews, learner_id, self.review_share
+                )
+            session.tracker.start_attempt()
+
+        puzzle = session.current_puzzle
+        return {
+            'question': puzzle['question'],
+            'difficulty': puzzle.get('level', puzzle['difficulty']),
+            'operation': puzzle['operation'],
+            'puzzle_number': session.learner.attempt_count + 1
+        }
+
+    def _focus_puzzle(self, session: LearnerSession) -> Optional[Dict]:
+        """A bank puzzle in the learner's weakest operation, or None for a regular draw"""
+        learner = session.learner
+        level = learner.current_difficulty
+        # Drawn from the learner's stream, so focused sessions replay exactly too
+        if not self.bank.has_difficulty(level) or learner.rng.random() >= self.focus:
+            return None
+        operation = weakest_operation(session.tracker.get_operation_counts(), self.bank.operations(level))
+        if operation is None:
+            return None
+        return self.bank.sample_unseen(level, learner.seen_puzzles, learner.rng, operation=operation)
+
+    def submit_answer(self, learner_id: str, answer: int, time_spent: float = None) -> Dict:
+        """
+        Check an answer, log it and adapt the difficulty
+
+        Args:
+            learner_id: Learner identifier
+            answer: Submitted answer, None to skip the puzzle
+            time_spent: Seconds spent, measured since the puzzle was served if omitted
+
+        Returns:
+            Correctness, the correct answer and the next difficulty
+        """
+        session = self.get_session(learner_id)
+        puzzle = session.current_puzzle
+        if puzzle is None:
+            raise ValueError("no puzzle has been served to this learner")
+
+        user_answer = 0 if answer is None else answer
+        is_correct = answer is not None and answer == puzzle['answer']
+        session.tracker.log_attempt(puzzle, user_answer, is_correct, time_spent)
+        if self.reviews is not None:
+            self.reviews.record(learner_id, puzzle, is_correct)
+        self.engine.record_attempt(session.learner, puzzle, is_correct, session.tracker.attempts[-1]['time_spent'])
+        changes = len(session.learner.difficulty_history)
+        new_difficulty = self.engine.adapt_learner(session.learner)
+        if len(session.learner.difficulty_history) > changes:
+            session.tracker.log_adaptation(session.learner.difficulty_history[-1])
+        session.current_puzzle = None
+
+        return {
+            'is_correct': is_correct,
+            'correct_answer': puzzle['answer'],
+            'difficulty': new_difficulty,
+            'difficulty_changed': new_difficulty != puzzle.get('level', puzzle['difficulty'])
+        }
+
+    def export_session(self, learner_id: str, compress: bool = False) -> bytes:
+        """
+        Snapshot a learner's session, e.g. to move it to another worker
+
+        The puzzle currently shown is not included; the learner gets a new
+        one after import.
+
+        Args:
+            learner_id: Learner identifier
+            compress: Compress the snapshot with zstd
+
+        Returns:
+            Snapshot bytes for import_session
+        """
+        from snapshot import dump_session
+
+        session = self.get_session(learner_id)
+        return dump_session(session.tracker, session.learner, compress=compress)
+
+    def release_session(self, learner_id: str) -> Dict:
+        """
+        Remove a learner's session to hand it over to another worker
+
+        Args:
+            learner_id: Learner identifier
+
+        Returns:
+            Dictionary with the export_session snapshot, the puzzle on screen
+            and the pending reviews, the arguments of import_session
+        """
+        snapshot = self.export_session(learner_id)
+        session = self.get_session(learner_id)
+        released = {
+            'snapshot': snapshot,
+            'current_puzzle': session.current_puzzle,
+            'reviews': self.reviews.release(learner_id) if self.reviews is not None else []
+        }
+        del self.sessions[learner_id]
+        return released
+
+    def import_session(self, data, current_puzzle: Dict = None, reviews: List = None) -> str:
+        """
+        Restore a session exported by export_session, replacing any existing one
+
+        Args:
+            data: Snapshot bytes or buffer
+            current_puzzle: Puzzle on screen, served again by next_puzzle
+            reviews: Pending reviews from ReviewScheduler.release
+
+        Returns:
+            The learner's ID
+        """
+        from snapshot import SessionSnapshot
+
+        snapshot = SessionSnapshot(data)
+        learner = snapshot.restore_learner()
+        tracker = snapshot.restore_tracker(sink=self.sink)
+        tracker.start_attempt()
+        session = self.sessions[learner.learner_id] = LearnerSession(learner, tracker)
+        session.current_puzzle = current_puzzle
+        if reviews and self.reviews is not None:
+            self.reviews.restore(learner.learner_id, reviews)
+        return learner.learner_id
+
+    def store_stats(self) -> Dict:
+        """Resident and spilled session counts, see SessionStore.stats"""
+        if self.store is None:
+            return {'resident': len(self.sessions), 'spilled': 0}
+        return self.store.stats()
+
+    def session_stats(self, learner_id: str) -> Dict:
+        """
+        Get the learner's session statistics
+
+        Args:
+            learner_id: Learner identifier
+
+        Returns:
+            PerformanceTracker.get_session_stats plus the current difficulty
+        """
+        session = self.get_session(learner_id)
+        stats = session.tracker.get_session_stats()
+        stats['current_difficulty'] = session.learner.current_difficulty
+        stats['adaptations'] = len(session.learner.difficulty_history)
+        return stats
+
+
+def answers_from_attempts(attempts: Iterable[Dict]) -> List[Tuple[Optional[int], float]]:
+    """
+    Answer log of a session from its tracker or attempt-log records
+
+    Args:
+        attempts: Attempt dictionaries in the PerformanceTracker format, in order
+
+    Returns:
+        (answer, time_spent) pairs for replay_session; None marks a skipped puzzle
+    """
+    answers = []
+    for attempt in attempts:
+        # A skip is logged as a wrong 0; a wrong 0 replays the same way, except
+        # when 0 is the correct answer
+        skipped = not attempt['is_correct'] and attempt['user_answer'] == 0
+        answers.append((None if skipped else attempt['user_answer'], attempt['time_spent']))
+    return answers
+
+
+def logged_session(records: Iterable[Dict], learner_id: str) -> Tuple[Optional[int], Optional[str], List]:
+    """
+    Seed, starting difficulty and answers of a learner's last logged game
+
+    Games are logged with their seed by PerformanceTracker.log_session, as
+    the Streamlit UI does when a game starts.
+
+    Args:
+        records: Attempt-log records in write order, e.g. AttemptLog.replay(learner_id)
+        learner_id: Learner identifier
+
+    Returns:
+        (seed, difficulty, answers) for replay_session; seed and difficulty
+        are None if the learner's game start was not logged
+    """
+    seed = difficulty = None
+    attempts = []
+    for record in records:
+        if record.get('learner_id') != learner_id:
+            continue
+        kind = record.get('kind', 'attempt')
+        if kind == 'session':
+            seed, difficulty, attempts = record['seed'], record['difficulty'], []
+        elif kind == 'attempt':
+            attempts.append(record)
+    return seed, difficulty, answers_from_attempts(attempts)
+
+
+def replay_session(learner_id: str, seed: int, answers: Iterable[Tuple[Optional[int], float]],
+                   generator: PuzzleGenerator = None, engine: AdaptiveEngine = None,
+                   difficulty: str = None, bank: PuzzleBank = None, focus: float = 0.0) -> LearnerSession:
+    """
+    Re-run a session from its stream seed and answers
+
+    Puzzles are drawn from the same stream, so with the same generator and
+    engine configuration the replay shows the same puzzles, logs the same
+    attempts and makes the same adaptation decisions as the original.
+    Engines that learn across learners (e.g. a skill model with item_k > 0)
+    only replay exactly from the same model state.
+
+    Args:
+        learner_id: Learner identifier, which also selects A/B rule variants
+        seed: The learner's stream seed, e.g. LearningService.learner_seed(learner_id)
+        answers: (answer, time_spent) pairs, e.g. from answers_from_attempts
+        generator: Puzzle generator configured like the original's
+        engine: Fresh engine configured like the original's
+        difficulty: Starting difficulty of the original session
+        bank: Puzzle bank of the original service, if it had one
+        focus: The original service's focus share
+
+    Returns:
+        The replayed session
+    """
+    service = LearningService(generator, engine, bank=bank, focus=focus)
+    service.get_session(learner_id, create=True, seed=seed)
+    for answer, time_spent in answers:
+        service.next_puzzle(learner_id, difficulty)
+        service.submit_answer(learner_id, answer, time_spent)
+    return service.sessions[learner_id]
@@ -1,8 +1,40 @@
 """
 Main Entry Point
 Launches the Streamlit application
+
+Run with `streamlit run src/main.py -- --profile` to write a cProfile dump
+per session to profiles/.
 """
-from ui import main
+import os
+import sys
+import uuid
+
+from instrumentation import SessionProfiler, metrics
+
+PROFILE_DIR = 'profiles'
+
+
+def run():
+    """Run one Streamlit rerun, timing it and optionally profiling it"""
+    # Imported here so the entry point itself loads without the UI stack;
+    # later reruns find both in sys.modules
+    import streamlit as st
+
+    from ui import main
+
+    metrics.start_server()
+    try:
+        with metrics.timer('ui_rerun_seconds', 'Streamlit rerun wall time'):
+            if '--profile' in sys.argv[1:]:
+                if 'profiler' not in st.session_state:
+                    os.makedirs(PROFILE_DIR, exist_ok=True)
+                    path = os.path.join(PROFILE_DIR, f"session-{uuid.uuid4().hex[:8]}.prof")
+                    st.session_state.profiler = SessionProfiler(path)
+                st.session_state.profiler.run(main)
+            else:
+                main()
+    finally:
+        metrics.export()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run()
\ No newline at end of file
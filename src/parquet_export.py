@@ -0,0 +1,262 @@
+"""
+Parquet Export Module
+Streams attempts and adaptation events from the attempt log into partitioned Parquet datasets
+"""
+import argparse
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+from urllib.parse import quote
+
+from attempt_log import LogReader
+
+# Column name and type of each table; 'category' columns are dictionary-encoded.
+# date and difficulty are the partition keys and live in the directory names.
+TABLES = {
+    'attempts': (
+        ('learner_id', 'string'), ('timestamp', 'timestamp'), ('puzzle', 'string'),
+        ('correct_answer', 'int64'), ('user_answer', 'int64'), ('is_correct', 'bool'),
+        ('time_spent', 'float64'), ('operation', 'category'), ('level', 'category'), ('review', 'int8')
+    ),
+    'adaptations': (
+        ('learner_id', 'string'), ('timestamp', 'timestamp'), ('attempt', 'int32'),
+        ('from', 'category'), ('to', 'category'), ('rule', 'category'), ('rules', 'category'),
+        ('reason', 'string'), ('correct_count', 'int32'), ('total_attempts', 'int32'),
+        ('avg_time', 'float64'), ('p_success', 'float64'), ('p_next', 'float64')
+    )
+}
+
+# Log record kind of each table, and the field its difficulty partition comes from;
+# an adaptation is filed under the level the learner left
+KINDS = {'attempt': 'attempts', 'adaptation': 'adaptations'}
+DIFFICULTY_FIELDS = {'attempts': 'difficulty', 'adaptations': 'from'}
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def arrow_type(kind: str):
+    """Arrow type of a column kind in TABLES"""
+    import pyarrow as pa
+
+    if kind == 'category':
+        return pa.dictionary(pa.int16(), pa.string())
+    if kind == 'timestamp':
+        return pa.timestamp('s')
+    return pa.type_for_alias(kind)
+
+
+def table_schema(table: str, raw: bool = False):
+    """
+    Arrow schema of a table's files
+
+    Args:
+        table: Name in TABLES
+        raw: Timestamp and category columns as the strings found in log records
+    """
+    import pyarrow as pa
+
+    return pa.schema([(name, pa.string() if raw and kind in ('timestamp', 'category') else arrow_type(kind))
+                      for name, kind in TABLES[table]])
+
+
+class ParquetExporter:
+    """
+    Writes log records into one Hive-partitioned Parquet dataset per table
+
+    Attempts go to <output>/attempts, adaptation events to
+    <output>/adaptations, each as date=YYYY-MM-DD/difficulty=<level>/
+    part-NNNNN.parquet, so a query for a day or a level only opens the
+    files under it. Operation, level and rule columns are
+    dictionary-encoded.
+
+    Records are buffered per partition and converted in one go (Arrow reads
+    the dicts' fields itself) into a record batch, written as one Parquet
+    row group, every batch_rows rows. Memory is
+    bounded by the rows buffered over all partitions (the fullest buffer is
+    written early past 2 × batch_rows) and by the number of open files (the
+    least recently used is closed past max_open_files), not by the size of
+    the log. A partition written to again after its file was closed, or by
+    a later export, gets a new part file; existing files are never
+    rewritten.
+
+    Needs the pyarrow package.
+    """
+
+    def __init__(self, output: str, batch_rows: int = 65_536, compression: str = 'zstd',
+                 max_open_files: int = 32):
+        """
+        Initialize the exporter
+
+        Args:
+            output: Dataset root directory, created if missing
+            batch_rows: Rows per record batch and row group
+            compression: Parquet compression codec, e.g. 'zstd', 'snappy' or 'none'
+            max_open_files: Part files kept open at once
+        """
+        if batch_rows <= 0 or max_open_files <= 0:
+            raise ValueError("batch_rows and max_open_files must be positive")
+        self.output = Path(output)
+        self.batch_rows = batch_rows
+        self.compression = compression
+        self.max_open_files = max_open_files
+        self.schemas = {table: table_schema(table) for table in TABLES}
+        self._raw_schemas = {table: table_schema(table, raw=True) for table in TABLES}
+        # (table, date, difficulty) -> records
+        self._buffers: Dict[Tuple[str, str, str], List[Dict]] = {}
+        self._buffered = 0
+        self._writers: 'OrderedDict[Tuple[str, str, str], object]' = OrderedDict()
+        self.rows = {table: 0 for table in TABLES}
+        self.files = 0
+
+    def add(self, record: Dict):
+        """
+        Buffer one log record, writing its partition's batch once full
+
+        Records of other kinds and compaction headers are ignored.
+
+        Args:
+            record: Attempt or adaptation record as stored in the attempt log
+        """
+        table = KINDS.get(record.get('kind', 'attempt'))
+        if table is None or '_compacted' in record:
+            return
+        key = (table, record['timestamp'][:10], record[DIFFICULTY_FIELDS[table]])
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = []
+        buffer.append(record)
+        self._buffered += 1
+        if len(buffer) >= self.batch_rows:
+            self._flush(key)
+        elif self._buffered > 2 * self.batch_rows:
+            self._flush(max(self._buffers, key=lambda other: len(self._buffers[other])))
+
+    def write(self, records: Iterable[Dict]):
+        """
+        Buffer a stream of log records
+
+        Args:
+            records: Records in any order, e.g. AttemptLog.replay()
+        """
+        add = self.add
+        for record in records:
+            add(record)
+
+    def close(self) -> Dict:
+        """
+        Write every buffered record and close all files
+
+        Returns:
+            Rows per table and number of files written
+        """
+        for key in list(self._buffers):
+            self._flush(key)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+        return {**self.rows, 'files': self.files}
+
+    def __enter__(self) -> 'ParquetExporter':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _batch(self, table: str, records: List[Dict]):
+        """Convert buffered records into a record batch"""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        raw = pa.RecordBatch.from_pylist(records, schema=self._raw_schemas[table])
+        arrays = []
+        for (name, kind), field, array in zip(TABLES[table], self.schemas[table], raw.columns):
+            if kind == 'timestamp':
+                array = pc.strptime(array, format=TIMESTAMP_FORMAT, unit='s')
+            elif kind == 'category':
+                array = array.dictionary_encode().cast(field.type)
+            arrays.append(array)
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schemas[table])
+
+    def _flush(self, key: Tuple[str, str, str]):
+        """Write a partition's buffered rows as one row group"""
+        records = self._buffers.pop(key)
+        self._buffered -= len(records)
+        self.rows[key[0]] += len(records)
+        self._writer(key).write_batch(self._batch(key[0], records), row_group_size=self.batch_rows)
+
+    def _writer(self, key: Tuple[str, str, str]):
+        """Open part file of a partition, starting a new one if needed"""
+        import pyarrow.parquet as pq
+
+        writer = self._writers.get(key)
+        if writer is not None:
+            self._writers.move_to_end(key)
+            return writer
+        while len(self._writers) >= self.max_open_files:
+            _, oldest = self._writers.popitem(last=False)
+            oldest.close()
+        table, day, difficulty = key
+        # Hive partition values are URI-encoded, so levels like 'Level 12' stay one path segment
+        directory = self.output / table / f"date={day}" / f"difficulty={quote(str(difficulty), safe='')}"
+        directory.mkdir(parents=True, exist_ok=True)
+        number = sum(1 for name in os.listdir(directory) if name.startswith('part-'))
+        writer = self._writers[key] = pq.ParquetWriter(directory / f"part-{number:05d}.parquet",
+                                                       self.schemas[table], compression=self.compression)
+        self.files += 1
+        return writer
+
+
+def export_log(directory: str, output: str, **options) -> Dict:
+    """
+    Export an attempt log directory to Parquet
+
+    Args:
+        directory: AttemptLog directory
+        output: Dataset root directory
+        **options: ParquetExporter options
+
+    Returns:
+        Rows per table and number of files written
+    """
+    with ParquetExporter(output, **options) as exporter:
+        exporter.write(LogReader(directory))
+    return {**exporter.rows, 'files': exporter.files}
+
+
+def open_dataset(output: str, table: str = 'attempts'):
+    """
+    Open an exported table for scanning, e.g. with a filter on the partitions
+
+    Args:
+        output: Dataset root directory
+        table: 'attempts' or 'adaptations'
+
+    Returns:
+        pyarrow.dataset.Dataset with date and difficulty as dictionary columns
+    """
+    import pyarrow.dataset as ds
+
+    if table not in TABLES:
+        raise ValueError(f"table must be one of {list(TABLES)}, got {table!r}")
+    return ds.dataset(Path(output) / table, format='parquet',
+                      partitioning=ds.HivePartitioning.discover(infer_dictionary=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('directory', help='attempt log directory')
+    parser.add_argument('output', help='dataset root directory')
+    parser.add_argument('--batch-rows', type=int, default=65_536, help='rows per record batch and row group')
+    parser.add_argument('--compression', default='zstd')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = export_log(args.directory, args.output, batch_rows=args.batch_rows, compression=args.compression)
+    print(f"{counts['attempts']:,} attempts and {counts['adaptations']:,} adaptations in {counts['files']:,} files "
+          f"under {args.output} ({time.perf_counter() - start:.1f} s)")
+
+
+if __name__ == '__main__':
+    main()
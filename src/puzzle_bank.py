@@ -0,0 +1,270 @@
+"""
+Puzzle Bank Module
+Every puzzle of each difficulty level, enumerated once and indexed for constrained sampling
+"""
+import random
+from array import array
+from itertools import product
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+
+from puzzle_generator import PuzzleGenerator, puzzle_key
+
+OPERATIONS = PuzzleGenerator.OPERATIONS
+
+_NO_ROWS = array('H')
+
+
+def needs_regrouping(operation: str, num1: int, num2: int) -> bool:
+    """
+    Whether a written + needs a carry or a written - a borrow, in any column
+
+    Args:
+        operation: Operation symbol; × and ÷ never count as regrouping
+        num1: First operand
+        num2: Second operand
+
+    Returns:
+        True if some column carries or borrows
+    """
+    if operation == '+':
+        carry = 0
+        while num1 or num2:
+            carry = int(num1 % 10 + num2 % 10 + carry >= 10)
+            if carry:
+                return True
+            num1, num2 = num1 // 10, num2 // 10
+    elif operation == '-':
+        while num2:
+            if num1 % 10 < num2 % 10:
+                return True
+            num1, num2 = num1 // 10, num2 // 10
+    return False
+
+
+def question_digits(num1: int, num2: int) -> int:
+    """Digits of the largest number shown in a question"""
+    return len(str(max(num1, num2)))
+
+
+class _LevelBank:
+    """The puzzles of one difficulty level as columns plus their indexes"""
+
+    __slots__ = ('difficulty', 'operations', 'num1', 'num2', 'op', 'answer', 'max_answer', 'index')
+
+    def __init__(self, difficulty: str, config: Dict):
+        self.difficulty = difficulty
+        self.operations = list(config['operations'])
+        min_val, max_val = config['range']
+        values = range(min_val, max_val + 1)
+
+        # The puzzles generate_puzzle can produce: - is shown larger operand
+        # first, and ÷ divides a product by one of its factors
+        rows = []
+        for operation in self.operations:
+            code = OPERATIONS.index(operation)
+            for a, b in product(values, values):
+                if operation == '+':
+                    rows.append((a, b, code, a + b))
+                elif operation == '-':
+                    if a >= b:
+                        rows.append((a, b, code, a - b))
+                elif operation == '×':
+                    rows.append((a, b, code, a * b))
+                else:
+                    rows.append((a * b, b, code, a))
+        # Ordered by answer, so every index below lists rows in answer order too
+        rows.sort(key=lambda row: (row[3], row[2], row[0], row[1]))
+        self.num1 = array('H', (row[0] for row in rows))
+        self.num2 = array('H', (row[1] for row in rows))
+        self.op = array('B', (row[2] for row in rows))
+        self.answer = array('H', (row[3] for row in rows))
+        self.max_answer = self.answer[-1]
+
+        # One bucket per (operation, regrouping, digits) with None for "any",
+        # so a query on any combination of the three is a single lookup
+        buckets: Dict[Tuple, List[int]] = {}
+        for row, (num1, num2, code, _) in enumerate(rows):
+            attributes = (code, needs_regrouping(OPERATIONS[code], num1, num2), question_digits(num1, num2))
+            for mask in product((False, True), repeat=3):
+                key = tuple(value if keep else None for value, keep in zip(attributes, mask))
+                buckets.setdefault(key, []).append(row)
+
+        # starts[v]: how many rows of the bucket have an answer below v, so the
+        # rows with an answer in [low, high] are bucket[starts[low]:starts[high + 1]]
+        self.index: Dict[Tuple, Tuple[array, array]] = {}
+        for key, bucket in buckets.items():
+            starts = array('H', bytes(2 * (self.max_answer + 2)))
+            for row in bucket:
+                starts[self.answer[row] + 1] += 1
+            for value in range(1, len(starts)):
+                starts[value] += starts[value - 1]
+            self.index[key] = (array('H', bucket), starts)
+
+    def __len__(self) -> int:
+        return len(self.answer)
+
+    def select(self, key: Tuple, low: Optional[int], high: Optional[int]) -> Tuple[array, int, int]:
+        """Bucket and the slice of it whose answers lie in [low, high]"""
+        entry = self.index.get(key)
+        if entry is None:
+            return _NO_ROWS, 0, 0
+        rows, starts = entry
+        start = 0 if low is None or low <= 0 else starts[min(low, self.max_answer + 1)]
+        stop = len(rows) if high is None or high >= self.max_answer else (starts[high + 1] if high >= 0 else 0)
+        return rows, start, stop
+
+    def nbytes(self) -> int:
+        columns = sum(column.itemsize * len(column) for column in (self.num1, self.num2, self.op, self.answer))
+        indexes = sum(rows.itemsize * len(rows) + starts.itemsize * len(starts) for rows, starts in self.index.values())
+        return columns + indexes
+
+
+class PuzzleBank:
+    """
+    The complete, finite puzzle space of every difficulty level
+
+    Each level's puzzles are enumerated once into compact arrays (Hard, the
+    largest, has 8,775). Puzzles are grouped by every combination of
+    operation, carry/borrow and number of digits, and within a group by
+    answer, with a running count per answer value; any query on those
+    attributes and an answer range is then a dictionary lookup, two array
+    reads and one random index - constant time and no rejection loop.
+
+    Matching puzzles are drawn uniformly. generate_puzzle instead picks the
+    operation first, so unconstrained draws from the bank favour the
+    operations with more distinct puzzles.
+    """
+
+    def __init__(self, config: Dict[str, Dict] = None, seed: int = None):
+        """
+        Enumerate and index the puzzle space
+
+        Args:
+            config: Difficulty levels in the PuzzleGenerator.DIFFICULTY_CONFIG
+                format, which is the default
+            seed: Seed of the bank's own random stream, used when no
+                per-learner stream is passed in
+        """
+        config = config or PuzzleGenerator.DIFFICULTY_CONFIG
+        self.levels = {difficulty: _LevelBank(difficulty, level) for difficulty, level in config.items()}
+        self.rng = random.Random(seed)
+
+    def has_difficulty(self, difficulty: str) -> bool:
+        return difficulty in self.levels
+
+    def operations(self, difficulty: str) -> List[str]:
+        """Operations available at a difficulty level"""
+        return self._level(difficulty).operations
+
+    def _level(self, difficulty: str) -> _LevelBank:
+        level = self.levels.get(difficulty)
+        if level is None:
+            raise ValueError(f"unknown difficulty {difficulty!r}")
+        return level
+
+    @staticmethod
+    def _key(operation: Optional[str], regroup: Optional[bool], digits: Optional[int]) -> Tuple:
+        if operation is not None and operation not in OPERATIONS:
+            raise ValueError(f"unknown operation {operation!r}")
+        return (None if operation is None else OPERATIONS.index(operation),
+                None if regroup is None else bool(regroup), digits)
+
+    def count(self, difficulty: str, operation: str = None, answer: Tuple[Optional[int], Optional[int]] = None,
+              regroup: bool = None, digits: int = None) -> int:
+        """Number of puzzles matching a query; arguments as for sample"""
+        low, high = answer or (None, None)
+        _, start, stop = self._level(difficulty).select(self._key(operation, regroup, digits), low, high)
+        return max(stop - start, 0)
+
+    def sample(self, difficulty: str, operation: str = None, answer: Tuple[Optional[int], Optional[int]] = None,
+               regroup: bool = None, digits: int = None, rng=None) -> Optional[Dict]:
+        """
+        Draw a puzzle matching every given constraint
+
+        Args:
+            difficulty: Difficulty level ('Easy', 'Medium', 'Hard')
+            operation: Operation symbol
+            answer: Inclusive (low, high) answer range; either end may be None
+            regroup: True for + with carrying / - with borrowing only, False to exclude them
+            digits: Digits of the largest number in the question
+            rng: Random stream with a random() method, e.g. the learner's
+                random_streams.RandomStream; the bank's own if omitted
+
+        Returns:
+            Puzzle dictionary in the PuzzleGenerator format, or None if no
+            puzzle of the level matches
+        """
+        level = self._level(difficulty)
+        low, high = answer or (None, None)
+        rows, start, stop = level.select(self._key(operation, regroup, digits), low, high)
+        if stop <= start:
+            return None
+        if rng is None:
+            rng = self.rng
+        return self._puzzle(level, rows[start + int(rng.random() * (stop - start))])
+
+    def sample_unseen(self, difficulty: str, seen: Set[int] = None, rng=None, attempts: int = 20,
+                      **constraints) -> Optional[Dict]:
+        """
+        Draw a matching puzzle whose puzzle_key is not in a learner's seen-set
+
+        Args:
+            difficulty: Difficulty level
+            seen: Learner's set of puzzle_key values; the new key is added to it
+            rng: Random stream, the bank's own if omitted
+            attempts: Redraws before accepting a repeat
+            constraints: Keyword constraints accepted by sample
+
+        Returns:
+            Puzzle dictionary, or None if no puzzle matches
+        """
+        puzzle = self.sample(difficulty, rng=rng, **constraints)
+        if puzzle is None or seen is None:
+            return puzzle
+        key = puzzle_key(puzzle)
+        for _ in range(attempts):
+            if key not in seen:
+                break
+            puzzle = self.sample(difficulty, rng=rng, **constraints)
+            key = puzzle_key(puzzle)
+        # A small matching set may be exhausted; a repeat then beats no puzzle
+        seen.add(key)
+        return puzzle
+
+    def _puzzle(self, level: _LevelBank, row: int) -> Dict:
+        num1, num2 = level.num1[row], level.num2[row]
+        operation = OPERATIONS[level.op[row]]
+        return {
+            'question': f"{num1} {operation} {num2}",
+            'answer': level.answer[row],
+            'difficulty': level.difficulty,
+            'operation': operation,
+            'numbers': [num1, num2]
+        }
+
+    def nbytes(self) -> int:
+        """Bytes held by the puzzle columns and indexes"""
+        return sum(level.nbytes() for level in self.levels.values())
+
+
+def weakest_operation(counts: Mapping[str, Tuple[int, int]], operations: List[str],
+                      min_attempts: int = 3, max_accuracy: float = 0.8) -> Optional[str]:
+    """
+    The operation a learner most needs practice in
+
+    Args:
+        counts: (correct, total) per operation, e.g. from
+            PerformanceTracker.get_operation_counts
+        operations: Operations to choose from, e.g. PuzzleBank.operations(level)
+        min_attempts: Attempts needed before an operation's accuracy is trusted
+        max_accuracy: Operations at or above this accuracy need no extra practice
+
+    Returns:
+        Operation with the lowest accuracy below max_accuracy, or None
+    """
+    weakest, weakest_accuracy = None, max_accuracy
+    for operation in operations:
+        correct, total = counts.get(operation, (0, 0))
+        if total >= min_attempts and correct / total < weakest_accuracy:
+            weakest, weakest_accuracy = operation, correct / total
+    return weakest
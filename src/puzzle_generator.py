@@ -3,7 +3,34 @@ Puzzle Generator Module
 Generates math puzzles based on difficulty level
 """
 import random
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, Iterator, List, Set
+
+from instrumentation import metrics
+
+if TYPE_CHECKING:
+    # NumPy is only needed for batches and scales; importing the generator stays cheap
+    import numpy as np
+
+    from difficulty_scale import DifficultyScale
+    from review_scheduler import ReviewScheduler
+
+
+def puzzle_key(puzzle: Dict) -> int:
+    """
+    Pack a puzzle's operands and operation into a single int
+
+    Used for compact per-learner seen-sets; two puzzles share a key exactly
+    when they show the same question.
+
+    Args:
+        puzzle: The puzzle dictionary
+
+    Returns:
+        Integer key
+    """
+    num1, num2 = puzzle['numbers']
+    return (num1 << 24) | (num2 << 4) | PuzzleGenerator.OPERATIONS.index(puzzle['operation'])
+
 
 class PuzzleGenerator:
     """Generates math puzzles with varying difficulty levels"""
@@ -26,29 +53,57 @@ class PuzzleGenerator:
         }
     }
     
-    def __init__(self):
-        """Initialize the puzzle generator"""
+    OPERATIONS = ['+', '-', '×', '÷']
+    
+    def __init__(self, scale: 'DifficultyScale' = None, seed: int = None):
+        """
+        Initialize the puzzle generator
+        
+        Args:
+            scale: Optional fine-grained difficulty scale; its level names are
+                accepted wherever a difficulty is
+            seed: Seed of the generator's own random stream, used when no
+                per-learner stream is passed in
+        """
+        self.scale = scale
         self.current_difficulty = 'Medium'
+        # Never the global random module: its state is shared by every thread and caller
+        self.rng = random.Random(seed)
+    
+    def has_difficulty(self, difficulty: str) -> bool:
+        """Whether difficulty is a level name or a fine-grained scale level"""
+        return difficulty in self.DIFFICULTY_CONFIG or (self.scale is not None and difficulty in self.scale.level_index)
     
-    def generate_puzzle(self, difficulty: str = None) -> Dict:
+    def resolve_difficulty(self, difficulty: str) -> str:
+        """Map a level name to the first scale level of that band when a scale is used"""
+        return self.scale.level_for(difficulty) if self.scale is not None else difficulty
+    
+    @metrics.timed('generator_generate_puzzle_seconds', 'PuzzleGenerator.generate_puzzle wall time')
+    def generate_puzzle(self, difficulty: str = None, rng=None) -> Dict:
         """
         Generate a math puzzle based on difficulty level
         
         Args:
             difficulty: Difficulty level ('Easy', 'Medium', 'Hard')
+            rng: Random stream to draw from, e.g. the learner's
+                random_streams.RandomStream; the generator's own if omitted
             
         Returns:
             Dict containing puzzle question, answer, and metadata
         """
         if difficulty is None:
             difficulty = self.current_difficulty
+        if rng is None:
+            rng = self.rng
+        if self.scale is not None and difficulty in self.scale.level_index:
+            return self.scale.generate(difficulty, rng)
             
         config = self.DIFFICULTY_CONFIG.get(difficulty, self.DIFFICULTY_CONFIG['Medium'])
-        operation = random.choice(config['operations'])
+        operation = rng.choice(config['operations'])
         
         min_val, max_val = config['range']
-        num1 = random.randint(min_val, max_val)
-        num2 = random.randint(min_val, max_val)
+        num1 = rng.randint(min_val, max_val)
+        num2 = rng.randint(min_val, max_val)
         
         # Generate puzzle based on operation
         if operation == '+':
@@ -68,7 +123,7 @@ class PuzzleGenerator:
             
         elif operation == '÷':
             # Ensure clean division
-            answer = num2
+            answer = num1
             num1 = num1 * num2
             question = f"{num1} ÷ {num2}"
         
@@ -80,13 +135,177 @@ class PuzzleGenerator:
             'numbers': [num1, num2]
         }
     
+    def generate_unseen(self, difficulty: str, seen: Set[int] = None, rng=None, attempts: int = 1000) -> Dict:
+        """
+        Generate a puzzle whose puzzle_key is not in a learner's seen-set
+
+        Args:
+            difficulty: Difficulty level or scale level name
+            seen: Learner's set of puzzle_key values; the new key is added to it
+            rng: Random stream to draw from, the generator's own if omitted
+            attempts: Redraws before accepting a repeat
+
+        Returns:
+            Puzzle dictionary
+        """
+        puzzle = self.generate_puzzle(difficulty, rng)
+        if seen is None:
+            return puzzle
+        key = puzzle_key(puzzle)
+        for _ in range(attempts):
+            if key not in seen:
+                break
+            puzzle = self.generate_puzzle(difficulty, rng)
+            key = puzzle_key(puzzle)
+        # If the learner has seen (nearly) the whole puzzle space, a repeat is unavoidable
+        seen.add(key)
+        return puzzle
+    
+    def next_puzzle(self, difficulty: str, seen: Set[int] = None, rng=None, reviews: 'ReviewScheduler' = None,
+                    learner_id: str = None, review_share: float = 0.5) -> Dict:
+        """
+        Serve a learner's next puzzle, interleaving due reviews with fresh ones
+
+        Args:
+            difficulty: Difficulty level or scale level name of fresh puzzles
+            seen: Learner's set of puzzle_key values
+            rng: Learner's random stream, the generator's own if omitted
+            reviews: Review scheduler holding the learner's missed puzzles
+            learner_id: Learner identifier in the scheduler
+            review_share: Chance of serving a due review instead of a fresh puzzle
+
+        Returns:
+            Puzzle dictionary; reviews carry their box under 'review'
+        """
+        # Only draw when a review is due, so learners without reviews get the
+        # same stream of puzzles as from generate_unseen
+        if reviews is not None and reviews.has_due(learner_id) and (rng or self.rng).random() < review_share:
+            puzzle = reviews.take_due(learner_id)
+            if puzzle is not None:
+                return puzzle
+        return self.generate_unseen(difficulty, seen, rng)
+    
+    @metrics.timed('generator_generate_batch_seconds', 'PuzzleGenerator.generate_batch wall time')
+    def generate_batch(self, difficulty: str, n: int, seed: int = None) -> 'PuzzleBatch':
+        """
+        Generate n puzzles at once using vectorized NumPy sampling
+        
+        Operands and operations follow the same distribution as
+        generate_puzzle for the given difficulty level.
+        
+        Args:
+            difficulty: Difficulty level ('Easy', 'Medium', 'Hard')
+            n: Number of puzzles to generate
+            seed: Seed or numpy SeedSequence for the batch; drawn from the
+                generator's own stream if omitted. To split a batch across
+                processes without correlation, give each part one of
+                SeedSequence(seed).spawn(parts).
+            
+        Returns:
+            PuzzleBatch holding the puzzles in columnar form
+        """
+        import numpy as np
+
+        if difficulty is None:
+            difficulty = self.current_difficulty
+        if seed is None:
+            seed = self.rng.getrandbits(64)
+        
+        rng = np.random.default_rng(seed)
+        if self.scale is not None and difficulty in self.scale.level_index:
+            num1, num2, op, answer = self.scale.sample_batch(difficulty, n, rng)
+            return PuzzleBatch(self.scale.spec(difficulty).band, num1, num2, op, answer, level=difficulty)
+        
+        config = self.DIFFICULTY_CONFIG.get(difficulty, self.DIFFICULTY_CONFIG['Medium'])
+        
+        op_codes = np.array([self.OPERATIONS.index(op) for op in config['operations']], dtype=np.int8)
+        op = op_codes[rng.integers(0, len(op_codes), size=n)]
+        
+        min_val, max_val = config['range']
+        num1 = rng.integers(min_val, max_val + 1, size=n, dtype=np.int64)
+        num2 = rng.integers(min_val, max_val + 1, size=n, dtype=np.int64)
+        
+        # Ensure positive result for subtraction
+        swap = (op == 1) & (num1 < num2)
+        num1, num2 = np.where(swap, num2, num1), np.where(swap, num1, num2)
+        
+        # Ensure clean division: the quotient is the drawn first operand
+        is_div = op == 3
+        answer = np.select(
+            [op == 0, op == 1, op == 2],
+            [num1 + num2, num1 - num2, num1 * num2],
+            default=num1
+        )
+        num1 = np.where(is_div, num1 * num2, num1)
+        
+        return PuzzleBatch(difficulty, num1, num2, op, answer)
+    
     def set_difficulty(self, difficulty: str):
         """Set the current difficulty level"""
-        if difficulty in self.DIFFICULTY_CONFIG:
+        if self.has_difficulty(difficulty):
             self.current_difficulty = difficulty
     
     def get_difficulty_info(self, difficulty: str = None) -> str:
         """Get description of difficulty level"""
         if difficulty is None:
             difficulty = self.current_difficulty
-        return self.DIFFICULTY_CONFIG.get(difficulty, {}).get('description', '')
\ No newline at end of file
+        if self.scale is not None and difficulty in self.scale.level_index:
+            return self.scale.spec(difficulty).description()
+        return self.DIFFICULTY_CONFIG.get(difficulty, {}).get('description', '')
+
+
+class PuzzleBatch:
+    """Columnar batch of puzzles produced by PuzzleGenerator.generate_batch"""
+    
+    def __init__(self, difficulty: str, num1: 'np.ndarray', num2: 'np.ndarray',
+                 op: 'np.ndarray', answer: 'np.ndarray', level: str = None):
+        """
+        Initialize the batch from operand, operation and answer arrays
+        
+        Args:
+            difficulty: Difficulty level shared by every puzzle in the batch
+            num1: First operands
+            num2: Second operands
+            op: Operation codes indexing PuzzleGenerator.OPERATIONS
+            answer: Correct answers
+            level: Fine-grained scale level the batch was drawn from, if any
+        """
+        self.difficulty = difficulty
+        self.num1 = num1
+        self.num2 = num2
+        self.op = op
+        self.answer = answer
+        self.level = level
+    
+    def __len__(self) -> int:
+        return len(self.answer)
+    
+    def __getitem__(self, index: int) -> Dict:
+        """Return puzzle at index in the same format as generate_puzzle"""
+        num1 = int(self.num1[index])
+        num2 = int(self.num2[index])
+        operation = PuzzleGenerator.OPERATIONS[self.op[index]]
+        puzzle = {
+            'question': f"{num1} {operation} {num2}",
+            'answer': int(self.answer[index]),
+            'difficulty': self.difficulty,
+            'operation': operation,
+            'numbers': [num1, num2]
+        }
+        if self.level is not None:
+            puzzle['level'] = self.level
+        return puzzle
+    
+    def __iter__(self) -> Iterator[Dict]:
+        for index in range(len(self)):
+            yield self[index]
+    
+    def question(self, index: int) -> str:
+        """Format the question string for a single puzzle"""
+        operation = PuzzleGenerator.OPERATIONS[self.op[index]]
+        return f"{self.num1[index]} {operation} {self.num2[index]}"
+    
+    def questions(self) -> Iterator[str]:
+        """Lazily format question strings for the whole batch"""
+        for index in range(len(self)):
+            yield self.question(index)
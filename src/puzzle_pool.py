@@ -0,0 +1,177 @@
+"""
+Puzzle Pool Module
+Pre-generated puzzle queues per difficulty with background refill
+"""
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Set
+
+from instrumentation import metrics
+from puzzle_generator import PuzzleGenerator, puzzle_key
+
+
+class PuzzlePool:
+    """
+    Serves puzzles from per-difficulty queues filled in bulk
+
+    Queues are filled with generate_batch and topped up once they drop below
+    the low-water mark, either by a background thread or, for seeded pools,
+    synchronously so the sequence of puzzles is reproducible. Puzzles drawn
+    on a miss come from the pool's own random stream, seeded alongside the
+    batches. Levels of a fine-grained difficulty scale get smaller queues,
+    created on first use.
+    """
+
+    # Queued puzzles skipped per request before falling back to generate_puzzle
+    MAX_SKIPS = 32
+
+    def __init__(self, generator: PuzzleGenerator = None, capacity: int = 1024,
+                 low_water: int = 256, seed: int = None, background: bool = None,
+                 level_capacity: int = 128):
+        """
+        Initialize and pre-fill the pool
+
+        Args:
+            generator: Generator used for refills, a new one if omitted
+            capacity: Puzzles per difficulty after a refill
+            low_water: Queue length that triggers a refill
+            seed: Seed for a deterministic pool (e.g. exams)
+            background: Refill on a background thread; defaults to True unless seeded
+            level_capacity: Puzzles per fine-grained scale level after a refill
+        """
+        self.generator = generator or PuzzleGenerator()
+        self.capacity = capacity
+        self.low_water = low_water
+        self.level_capacity = level_capacity
+        self.background = seed is None if background is None else background
+        self._seed_sequence = None
+        # Stream of the puzzles generated on a miss, not the shared generator's
+        self.rng = random.Random(seed)
+        if seed is not None:
+            import numpy as np
+            self._seed_sequence = np.random.SeedSequence(seed)
+        self._queues = {difficulty: deque() for difficulty in PuzzleGenerator.DIFFICULTY_CONFIG}
+
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.refill_latencies = deque(maxlen=1000)
+
+        self._refill_lock = threading.Lock()
+        self._refill_needed = threading.Event()
+        self._closed = False
+        for difficulty in self._queues:
+            self._refill(difficulty)
+
+        self._worker = None
+        if self.background:
+            self._worker = threading.Thread(target=self._run, name='puzzle-pool-refill', daemon=True)
+            self._worker.start()
+
+    @metrics.timed('pool_next_puzzle_seconds', 'PuzzlePool.next_puzzle wall time')
+    def next_puzzle(self, difficulty: str, seen: Set[int] = None) -> Dict:
+        """
+        Take the next puzzle for a difficulty level
+
+        Args:
+            difficulty: Difficulty level ('Easy', 'Medium', 'Hard')
+            seen: Learner's set of puzzle_key values; the puzzle returned is
+                not in it and is added to it
+
+        Returns:
+            Puzzle dictionary in the generate_puzzle format
+        """
+        queue = self._queues.get(difficulty)
+        if queue is None:
+            queue = self._add_queue(difficulty)
+        puzzle = None
+        for _ in range(self.MAX_SKIPS):
+            try:
+                candidate = queue.popleft()
+            except IndexError:
+                break
+            if seen is None or puzzle_key(candidate) not in seen:
+                puzzle = candidate
+                break
+
+        if puzzle is not None:
+            self.hits += 1
+            if seen is not None:
+                seen.add(puzzle_key(puzzle))
+        else:
+            self.misses += 1
+            puzzle = self.generator.generate_unseen(difficulty, seen, self.rng)
+
+        if len(queue) < self._low_water(difficulty):
+            if self.background:
+                self._refill_needed.set()
+            else:
+                self._refill(difficulty)
+
+        return puzzle
+
+    def _capacity(self, difficulty: str) -> int:
+        return self.capacity if difficulty in PuzzleGenerator.DIFFICULTY_CONFIG else self.level_capacity
+
+    def _low_water(self, difficulty: str) -> int:
+        return self.low_water * self._capacity(difficulty) // self.capacity
+
+    def _add_queue(self, difficulty: str) -> deque:
+        """Create and fill the queue for a scale level on its first request"""
+        if not self.generator.has_difficulty(difficulty):
+            raise ValueError(f"unknown difficulty {difficulty!r}")
+        queue = self._queues.setdefault(difficulty, deque())
+        self._refill(difficulty)
+        return queue
+
+    def _refill(self, difficulty: str):
+        """Top a difficulty queue back up to capacity"""
+        with self._refill_lock:
+            queue = self._queues[difficulty]
+            missing = self._capacity(difficulty) - len(queue)
+            if missing <= 0:
+                return
+            start = time.perf_counter()
+            seed = self._seed_sequence.spawn(1)[0] if self._seed_sequence is not None else None
+            queue.extend(self.generator.generate_batch(difficulty, missing, seed=seed))
+            self.refill_latencies.append(time.perf_counter() - start)
+            self.refills += 1
+
+    def _run(self):
+        """Background loop refilling every queue below the low-water mark"""
+        while True:
+            self._refill_needed.wait()
+            self._refill_needed.clear()
+            if self._closed:
+                return
+            for difficulty, queue in list(self._queues.items()):
+                if len(queue) < self._low_water(difficulty):
+                    self._refill(difficulty)
+
+    def close(self):
+        """Stop the background refill thread"""
+        self._closed = True
+        self._refill_needed.set()
+        if self._worker is not None:
+            self._worker.join()
+
+    def metrics(self) -> Dict:
+        """
+        Get pool hit/miss counts and refill latency
+
+        Returns:
+            Dictionary of pool metrics
+        """
+        requests = self.hits + self.misses
+        latencies = sorted(self.refill_latencies)
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / requests, 4) if requests else 0.0,
+            'refills': self.refills,
+            'refill_latency_ms_p50': round(latencies[len(latencies) // 2] * 1000, 3) if latencies else 0.0,
+            'refill_latency_ms_max': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+            'queued': {difficulty: len(queue) for difficulty, queue in self._queues.items()}
+        }
@@ -0,0 +1,230 @@
+"""
+Quantile Sketch Module
+Mergeable streaming quantile estimates in bounded memory (KLL sketch)
+"""
+import math
+import random
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Dict, Iterable, List, Tuple
+
+# Capacity ratio between adjacent compactor levels, as in the KLL paper
+_CAPACITY_RATIO = 2 / 3
+_MIN_CAPACITY = 2
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch over a stream of floats
+
+    Values enter level 0; when the sketch is full, the lowest over-capacity
+    level is sorted and every other item (random offset) is promoted to the
+    next level with twice the weight. Lower levels get geometrically smaller
+    capacities, so roughly 3·k values are retained no matter how long the
+    stream is, and the rank error is about 1.7/k with high probability.
+    Until the first compaction every value is kept and quantiles are exact.
+
+    Sketches with the same k can be merged, so per-learner sketches combine
+    into cohort-level percentiles.
+
+    The compaction offsets come from the sketch's own random source, so the
+    same stream gives the same sketch unless another rng is passed.
+
+    The sorted items and their cumulative weights are cached until the next
+    update or merge, so repeated quantile queries cost a binary search each.
+    """
+
+    __slots__ = ('k', 'count', 'levels', '_size', '_max_size', 'min_value', 'max_value', '_rng', '_sorted')
+
+    def __init__(self, k: int = 200, rng: random.Random = None):
+        """
+        Initialize an empty sketch
+
+        Args:
+            k: Accuracy parameter; larger values retain more items
+            rng: Random source of the compaction offsets, seeded with k on the
+                first compaction if omitted
+        """
+        self.k = k
+        self._rng = rng
+        # (values, cumulative weights) in value order, None when stale
+        self._sorted = None
+        self.count = 0
+        self.levels: List[List[float]] = [[]]
+        self._size = 0
+        self._max_size = self._level_capacity(0)
+        self.min_value = math.inf
+        self.max_value = -math.inf
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def retained(self) -> int:
+        """Number of values currently stored"""
+        return self._size
+
+    def _level_capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(_MIN_CAPACITY, int(math.ceil(self.k * _CAPACITY_RATIO ** depth)))
+
+    def _update_max_size(self):
+        self._max_size = sum(self._level_capacity(level) for level in range(len(self.levels)))
+
+    def update(self, value: float):
+        """
+        Add one value to the sketch
+
+        Args:
+            value: Observed value
+        """
+        self.levels[0].append(value)
+        self._sorted = None
+        self.count += 1
+        self._size += 1
+        if value < self.min_value:
+            self.min_value = value
+        if value > self.max_value:
+            self.max_value = value
+        if self._size >= self._max_size:
+            self._compress()
+
+    def _compress(self):
+        """Compact levels until the retained items fit the capacity again"""
+        while self._size >= self._max_size:
+            for level, items in enumerate(self.levels):
+                if len(items) >= self._level_capacity(level):
+                    break
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+                self._update_max_size()
+
+            if self._rng is None:
+                # Most sketches never compact, so the generator is only created when needed
+                self._rng = random.Random(self.k)
+            items.sort()
+            leftover = [items.pop()] if len(items) % 2 else []
+            promoted = items[self._rng.getrandbits(1)::2]
+            self.levels[level + 1].extend(promoted)
+            self.levels[level] = leftover
+            self._size -= len(items) - len(promoted)
+
+    def merge(self, other: 'KLLSketch'):
+        """
+        Fold another sketch into this one
+
+        Args:
+            other: Sketch to merge; it is left unchanged
+        """
+        if other.count == 0:
+            return
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self._sorted = None
+        self.count += other.count
+        self._size += other._size
+        self.min_value = min(self.min_value, other.min_value)
+        self.max_value = max(self.max_value, other.max_value)
+        self._update_max_size()
+        self._compress()
+
+    @classmethod
+    def merged(cls, sketches: Iterable['KLLSketch'], k: int = 200, rng: random.Random = None) -> 'KLLSketch':
+        """
+        Combine several sketches into a new one
+
+        Args:
+            sketches: Sketches to combine
+            k: Accuracy parameter of the result
+            rng: Random source of the result's compaction offsets
+
+        Returns:
+            New sketch summarizing all inputs
+        """
+        result = cls(k, rng)
+        for sketch in sketches:
+            result.merge(sketch)
+        return result
+
+    def _sorted_view(self) -> Tuple[List[float], List[int]]:
+        """Retained values in order and their cumulative weights, cached until the next change"""
+        if self._sorted is None:
+            items = sorted((value, 1 << level) for level, values in enumerate(self.levels) for value in values)
+            cumulative = list(accumulate(weight for _, weight in items))
+            self._sorted = ([value for value, _ in items], cumulative)
+        return self._sorted
+
+    def quantiles(self, qs: Iterable[float]) -> List[float]:
+        """
+        Estimate several quantiles in one pass
+
+        Args:
+            qs: Quantiles in [0, 1]
+
+        Returns:
+            Estimated values, NaN for an empty sketch
+        """
+        qs = list(qs)
+        if self.count == 0:
+            return [math.nan] * len(qs)
+        values, cumulative = self._sorted_view()
+        total = cumulative[-1]
+        results = []
+        for q in qs:
+            if q <= 0:
+                results.append(self.min_value)
+                continue
+            if q >= 1:
+                results.append(self.max_value)
+                continue
+            # First value whose cumulative weight reaches the target rank
+            results.append(values[bisect_left(cumulative, max(1, math.ceil(q * total)))])
+        return results
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a single quantile
+
+        Args:
+            q: Quantile in [0, 1], e.g. 0.5 for the median
+
+        Returns:
+            Estimated value, NaN for an empty sketch
+        """
+        return self.quantiles([q])[0]
+
+    def rank(self, value: float) -> float:
+        """
+        Estimate the fraction of observed values that are <= value
+
+        Args:
+            value: Value to rank
+
+        Returns:
+            Normalized rank in [0, 1]
+        """
+        if self.count == 0:
+            return math.nan
+        values, cumulative = self._sorted_view()
+        below = bisect_right(values, value)
+        return (cumulative[below - 1] if below else 0) / cumulative[-1]
+
+    def to_dict(self) -> Dict:
+        """Serialize the sketch to JSON-compatible data"""
+        return {'k': self.k, 'count': self.count, 'min': self.min_value, 'max': self.max_value,
+                'levels': [list(values) for values in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'KLLSketch':
+        """Rebuild a sketch serialized with to_dict"""
+        sketch = cls(data['k'])
+        sketch.count = data['count']
+        sketch.min_value = data['min']
+        sketch.max_value = data['max']
+        sketch.levels = [list(values) for values in data['levels']]
+        sketch._sorted = None
+        sketch._size = sum(len(values) for values in sketch.levels)
+        sketch._update_max_size()
+        return sketch
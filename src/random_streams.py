@@ -0,0 +1,92 @@
+"""
+Random Streams Module
+Independent, seedable per-learner random streams with constant-size state
+"""
+import hashlib
+import secrets
+
+_MASK = (1 << 64) - 1
+_GAMMA = 0x9E3779B97F4A7C15
+_UNIT = 1.0 / (1 << 53)
+
+
+def _mix(z: int) -> int:
+    """SplitMix64 finalizer: a bijective 64-bit hash"""
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    return z ^ (z >> 31)
+
+
+def new_seed() -> int:
+    """Fresh 64-bit seed from the OS entropy source"""
+    return secrets.randbits(64)
+
+
+def derive_seed(seed: int, *keys) -> int:
+    """
+    Child seed for a named sub-stream of a root seed
+
+    Like numpy's SeedSequence.spawn, but keyed by name (learner ID, worker
+    index, ...) rather than by creation order, so a learner's stream does not
+    depend on which other learners were created first or in which process.
+
+    Args:
+        seed: Root seed
+        keys: Strings or ints naming the sub-stream
+
+    Returns:
+        64-bit seed
+    """
+    digest = hashlib.blake2b(repr((seed, *keys)).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+class RandomStream:
+    """
+    Counter-based random stream
+
+    Draw n is the SplitMix64 hash of seed + n * gamma, so the whole state is
+    the seed and a draw counter: it costs a few dozen bytes per learner,
+    snapshots and restores exactly, and jumping to any position is free. As
+    in Java's SplittableRandom the odd gamma is derived from the seed, so
+    streams with different seeds are not shifted copies of one sequence.
+    Provides the subset of random.Random that puzzle generation uses.
+    """
+
+    __slots__ = ('seed', 'position', '_gamma')
+
+    def __init__(self, seed: int = None, position: int = 0):
+        """
+        Initialize the stream
+
+        Args:
+            seed: 64-bit seed, a fresh one from new_seed() if omitted
+            position: Number of draws already taken, to resume a stream
+        """
+        self.seed = new_seed() if seed is None else seed & _MASK
+        self.position = position
+        self._gamma = _mix(self.seed ^ _GAMMA) | 1
+
+    def random(self) -> float:
+        """Next float in [0, 1)"""
+        self.position = position = self.position + 1
+        # _mix inlined: this is on every puzzle draw
+        z = (self.seed + position * self._gamma) & _MASK
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+        return ((z ^ (z >> 31)) >> 11) * _UNIT
+
+    def randint(self, a: int, b: int) -> int:
+        """Next int in [a, b]"""
+        return a + int(self.random() * (b - a + 1))
+
+    def choice(self, seq):
+        """Next element of a non-empty sequence"""
+        return seq[int(self.random() * len(seq))]
+
+    def spawn(self, *keys) -> 'RandomStream':
+        """Independent child stream, see derive_seed"""
+        return RandomStream(derive_seed(self.seed, *keys))
+
+    def __repr__(self) -> str:
+        return f"RandomStream(seed={self.seed}, position={self.position})"
@@ -0,0 +1,396 @@
+"""
+Review Scheduler Module
+Spaced-repetition review of missed puzzles with per-learner heaps and a global timing wheel
+"""
+import heapq
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from puzzle_generator import PuzzleGenerator, puzzle_key
+
+OPERATIONS = PuzzleGenerator.OPERATIONS
+
+# Leitner boxes: seconds until the next review after a miss (box 0) and
+# after each further correct review; a correct answer in the last box retires the puzzle
+DEFAULT_INTERVALS = (60, 600, 3600, 86400, 3 * 86400, 7 * 86400, 21 * 86400)
+
+# A pending review is one int: due << 64 | box << 60 | level code << 48 | puzzle_key,
+# so heaps order by due time and hold no per-item objects besides the int
+_KEY_MASK = (1 << 48) - 1
+_DUE_SHIFT = 64
+_BOX_SHIFT = 60
+_LEVEL_SHIFT = 48
+
+
+class TimingWheel:
+    """
+    Hashed timing wheel indexing items by due time
+
+    Time is cut into ticks of resolution seconds and every tick within the
+    next slots ticks has its own bucket; later items wait in an overflow
+    heap and move into the wheel as it turns. Collecting what is due walks
+    only the buckets of the elapsed ticks, so it costs time proportional to
+    the number of due items (plus elapsed ticks), not to the number indexed.
+    """
+
+    def __init__(self, resolution: float = 60.0, slots: int = 4096):
+        """
+        Initialize an empty wheel
+
+        Args:
+            resolution: Seconds per tick
+            slots: Ticks covered by the wheel itself
+        """
+        if resolution <= 0 or slots < 1:
+            raise ValueError("resolution must be positive and slots at least 1")
+        self.resolution = resolution
+        self.buckets: List[List[Tuple[float, object]]] = [[] for _ in range(slots)]
+        self.overflow: List[Tuple[int, int, float, object]] = []
+        self.cursor: Optional[int] = None  # first tick not yet collected
+        self._sequence = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def start(self, now: float):
+        """Start an empty wheel's cursor at now; otherwise it starts at the first item's due time"""
+        if self.cursor is None:
+            self.cursor = int(now // self.resolution)
+
+    def add(self, due: float, item):
+        """
+        Index an item; items already due are collected on the next pop_due
+
+        Args:
+            due: Due time in seconds
+            item: Any object
+        """
+        tick = int(due // self.resolution)
+        if self.cursor is None:
+            self.cursor = tick
+        tick = max(tick, self.cursor)
+        if tick >= self.cursor + len(self.buckets):
+            heapq.heappush(self.overflow, (tick, self._sequence, due, item))
+            self._sequence += 1
+        else:
+            self.buckets[tick % len(self.buckets)].append((due, item))
+        self._size += 1
+
+    def pop_due(self, now: float) -> List[Tuple[float, object]]:
+        """
+        Remove and return every item due at or before now
+
+        Args:
+            now: Current time in seconds
+
+        Returns:
+            (due, item) pairs, in no particular order
+        """
+        if self.cursor is None:
+            return []
+        now_tick = int(now // self.resolution)
+        slots = len(self.buckets)
+        due_items = []
+        while self.cursor < now_tick:
+            bucket = self.buckets[self.cursor % slots]
+            due_items.extend(bucket)
+            bucket.clear()
+            self.cursor += 1
+            # The tick just entering the wheel's range reuses the emptied bucket
+            limit = self.cursor + slots
+            while self.overflow and self.overflow[0][0] < limit:
+                tick, _, due, item = heapq.heappop(self.overflow)
+                self.buckets[max(tick, self.cursor) % slots].append((due, item))
+        # The current tick is only partly over, and items added after their
+        # due time were put in it as well
+        bucket = self.buckets[self.cursor % slots]
+        ready = [entry for entry in bucket if entry[0] <= now]
+        if ready:
+            bucket[:] = [entry for entry in bucket if entry[0] > now]
+            due_items.extend(ready)
+        self._size -= len(due_items)
+        return due_items
+
+
+class ReviewScheduler:
+    """
+    Spaced-repetition queue of the puzzles each learner got wrong
+
+    A missed (or skipped) puzzle is due for review a minute later; every
+    correct review moves it to the next Leitner box and a longer interval,
+    a wrong one back to the first. Each learner's pending reviews sit in a
+    heap of packed ints, so the learner's next review is found in O(1) and
+    taken in O(log n). A global TimingWheel indexes each learner under the
+    due time of their earliest review, so pull_due finds every due review
+    across all learners without looking at the learners with none due;
+    entries for a learner whose earliest review changed are skipped lazily.
+
+    The scheduler is rebuilt from attempt-log records with observe_log:
+    reviews are logged with their box, see PerformanceTracker.log_attempt.
+    """
+
+    def __init__(self, intervals: Tuple[float, ...] = DEFAULT_INTERVALS, resolution: float = 60.0,
+                 slots: int = 4096):
+        """
+        Initialize an empty scheduler
+
+        Args:
+            intervals: Seconds until the next review, per box (at most 16)
+            resolution: Seconds per timing-wheel tick
+            slots: Timing-wheel ticks before items go to its overflow heap
+        """
+        if not 1 <= len(intervals) <= 16:
+            raise ValueError("between 1 and 16 review intervals are supported")
+        self.intervals = tuple(intervals)
+        self.wheel = TimingWheel(resolution, slots)
+        self.heaps: Dict[str, List[int]] = {}
+        # (difficulty, level) pairs by code, so a review is served at the level it was missed at
+        self._levels: List[Tuple[str, Optional[str]]] = []
+        self._level_codes: Dict[Tuple[str, Optional[str]], int] = {}
+        self._lock = threading.Lock()
+        self._last_timestamp = None
+        self._last_seconds = 0.0
+
+    def __len__(self) -> int:
+        """Number of pending reviews across all learners"""
+        return sum(len(heap) for heap in self.heaps.values())
+
+    def pending(self, learner_id: str) -> int:
+        """Number of the learner's pending reviews"""
+        return len(self.heaps.get(learner_id, ()))
+
+    def _level_code(self, difficulty: str, level: Optional[str]) -> int:
+        code = self._level_codes.get((difficulty, level))
+        if code is None:
+            code = self._level_codes[(difficulty, level)] = len(self._levels)
+            self._levels.append((difficulty, level))
+        return code
+
+    def schedule(self, learner_id: str, puzzle: Dict, box: int = 0, now: float = None):
+        """
+        Queue a puzzle for review after the interval of its box
+
+        Args:
+            learner_id: Learner identifier
+            puzzle: Puzzle dictionary
+            box: Leitner box, 0 for a fresh miss
+            now: Current time in seconds, time.time() if omitted
+        """
+        if now is None:
+            now = time.time()
+        due = int(now + self.intervals[box])
+        item = ((due << _DUE_SHIFT) | (box << _BOX_SHIFT)
+                | (self._level_code(puzzle['difficulty'], puzzle.get('level')) << _LEVEL_SHIFT) | puzzle_key(puzzle))
+        with self._lock:
+            self.wheel.start(now)
+            heap = self.heaps.get(learner_id)
+            if heap is None:
+                heap = self.heaps[learner_id] = []
+            if not heap or item < heap[0]:
+                self.wheel.add(due, learner_id)
+            heapq.heappush(heap, item)
+
+    def record(self, learner_id: str, puzzle: Dict, is_correct: bool, now: float = None):
+        """
+        Update the queue with an answered puzzle
+
+        A missed puzzle (skips count as misses) goes to the first box; a
+        correctly answered review moves on to the next box or retires.
+
+        Args:
+            learner_id: Learner identifier
+            puzzle: The answered puzzle; reviews carry their box under 'review'
+            is_correct: Whether the answer was correct
+            now: Time of the answer in seconds, time.time() if omitted
+        """
+        box = puzzle.get('review')
+        if not is_correct:
+            self.schedule(learner_id, puzzle, 0, now)
+        elif box is not None and box + 1 < len(self.intervals):
+            self.schedule(learner_id, puzzle, box + 1, now)
+
+    def observe(self, record: Dict):
+        """
+        Update the queue with an attempt-log record
+
+        Args:
+            record: Attempt record as written by PerformanceTracker to its sink
+        """
+        if record.get('kind', 'attempt') != 'attempt' or record.get('learner_id') is None:
+            return
+        num1, operation, num2 = record['puzzle'].split(' ')
+        puzzle = {'difficulty': record['difficulty'], 'operation': operation, 'numbers': [int(num1), int(num2)]}
+        if 'level' in record:
+            puzzle['level'] = record['level']
+        now = self._seconds(record['timestamp'])
+        if 'review' in record:
+            # The review was taken from the queue when it was served
+            puzzle['review'] = record['review']
+            self._discard(record['learner_id'], puzzle)
+        self.record(record['learner_id'], puzzle, record['is_correct'], now)
+
+    def _discard(self, learner_id: str, puzzle: Dict):
+        """Remove a learner's earliest pending review of a puzzle in its box, if any"""
+        item = (puzzle['review'] << _BOX_SHIFT) \
+            | (self._level_code(puzzle['difficulty'], puzzle.get('level')) << _LEVEL_SHIFT) | puzzle_key(puzzle)
+        with self._lock:
+            heap = self.heaps.get(learner_id)
+            if not heap:
+                return
+            matches = [index for index, pending in enumerate(heap) if pending & ((1 << _DUE_SHIFT) - 1) == item]
+            if not matches:
+                return
+            index = min(matches, key=heap.__getitem__)
+            was_top = index == 0
+            heap[index] = heap[-1]
+            heap.pop()
+            heapq.heapify(heap)
+            if not heap:
+                del self.heaps[learner_id]
+            elif was_top:
+                self.wheel.add(heap[0] >> _DUE_SHIFT, learner_id)
+
+    def release(self, learner_id: str) -> List[List]:
+        """
+        Remove and return a learner's pending reviews, e.g. to move the learner to another worker
+
+        Args:
+            learner_id: Learner identifier
+
+        Returns:
+            [due, box, difficulty, level, puzzle key] per review in due order,
+            JSON-compatible and independent of this scheduler's level codes
+        """
+        with self._lock:
+            # The learner's wheel entry goes stale and is skipped by pull_due
+            heap = self.heaps.pop(learner_id, [])
+        return [[item >> _DUE_SHIFT, (item >> _BOX_SHIFT) & 0xF, *self._levels[(item >> _LEVEL_SHIFT) & 0xFFF],
+                 item & _KEY_MASK] for item in sorted(heap)]
+
+    def restore(self, learner_id: str, reviews: Iterable[List]):
+        """
+        Queue reviews returned by release, replacing the learner's pending ones
+
+        Args:
+            learner_id: Learner identifier
+            reviews: Entries as returned by release
+        """
+        heap = [(due << _DUE_SHIFT) | (box << _BOX_SHIFT) | (self._level_code(difficulty, level) << _LEVEL_SHIFT) | key
+                for due, box, difficulty, level, key in reviews]
+        heapq.heapify(heap)
+        with self._lock:
+            if not heap:
+                self.heaps.pop(learner_id, None)
+                return
+            self.heaps[learner_id] = heap
+            self.wheel.add(heap[0] >> _DUE_SHIFT, learner_id)
+
+    def observe_log(self, records: Iterable[Dict]) -> int:
+        """
+        Rebuild the queues from attempt-log records in write order
+
+        Args:
+            records: e.g. AttemptLog.replay() or attempt_log.LogReader(directory)
+
+        Returns:
+            Number of records observed
+        """
+        count = 0
+        for record in records:
+            self.observe(record)
+            count += 1
+        return count
+
+    def _seconds(self, timestamp: str) -> float:
+        """Epoch seconds of a local 'YYYY-MM-DD HH:MM:SS' log timestamp"""
+        if timestamp != self._last_timestamp:
+            self._last_seconds = time.mktime(time.strptime(timestamp, '%Y-%m-%d %H:%M:%S'))
+            self._last_timestamp = timestamp
+        return self._last_seconds
+
+    def next_due(self, learner_id: str) -> Optional[float]:
+        """Due time of the learner's earliest review, None if nothing is pending"""
+        heap = self.heaps.get(learner_id)
+        return heap[0] >> _DUE_SHIFT if heap else None
+
+    def has_due(self, learner_id: str, now: float = None) -> bool:
+        """Whether one of the learner's reviews is due"""
+        heap = self.heaps.get(learner_id)
+        return bool(heap) and heap[0] >> _DUE_SHIFT <= (time.time() if now is None else now)
+
+    def take_due(self, learner_id: str, now: float = None) -> Optional[Dict]:
+        """
+        Remove and return the learner's earliest due review
+
+        Args:
+            learner_id: Learner identifier
+            now: Current time in seconds, time.time() if omitted
+
+        Returns:
+            Puzzle dictionary with its box under 'review', or None if no review is due
+        """
+        if now is None:
+            now = time.time()
+        with self._lock:
+            heap = self.heaps.get(learner_id)
+            if not heap or heap[0] >> _DUE_SHIFT > now:
+                return None
+            item = heapq.heappop(heap)
+            if heap:
+                self.wheel.add(heap[0] >> _DUE_SHIFT, learner_id)
+            else:
+                del self.heaps[learner_id]
+        return self._puzzle(item)
+
+    def pull_due(self, now: float = None) -> List[Tuple[str, Dict]]:
+        """
+        Remove and return every due review across all learners
+
+        Args:
+            now: Current time in seconds, time.time() if omitted
+
+        Returns:
+            (learner_id, puzzle) pairs, each learner's in due order
+        """
+        if now is None:
+            now = time.time()
+        due_reviews = []
+        with self._lock:
+            for due, learner_id in self.wheel.pop_due(now):
+                heap = self.heaps.get(learner_id)
+                if not heap or heap[0] >> _DUE_SHIFT != due:
+                    continue  # stale: the learner's earliest review has changed since
+                while heap and heap[0] >> _DUE_SHIFT <= now:
+                    due_reviews.append((learner_id, self._puzzle(heapq.heappop(heap))))
+                if heap:
+                    self.wheel.add(heap[0] >> _DUE_SHIFT, learner_id)
+                else:
+                    del self.heaps[learner_id]
+        return due_reviews
+
+    def _puzzle(self, item: int) -> Dict:
+        """Rebuild a puzzle dictionary from a packed review"""
+        key = item & _KEY_MASK
+        num1, num2, operation = key >> 24, (key >> 4) & 0xFFFFF, OPERATIONS[key & 0xF]
+        if operation == '+':
+            answer = num1 + num2
+        elif operation == '-':
+            answer = num1 - num2
+        elif operation == '×':
+            answer = num1 * num2
+        else:
+            answer = num1 // num2
+        difficulty, level = self._levels[(item >> _LEVEL_SHIFT) & 0xFFF]
+        puzzle = {
+            'question': f"{num1} {operation} {num2}",
+            'answer': answer,
+            'difficulty': difficulty,
+            'operation': operation,
+            'numbers': [num1, num2],
+            'review': (item >> _BOX_SHIFT) & 0xF
+        }
+        if level is not None:
+            puzzle['level'] = level
+        return puzzle
@@ -0,0 +1,470 @@
+"""
+Rule Engine Module
+Declarative adaptation rules compiled into precomputed decision tables
+"""
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEVELS = ['Easy', 'Medium', 'Hard']
+
+CONDITIONS = ('min_correct', 'max_correct', 'min_accuracy', 'max_accuracy',
+              'max_avg_time', 'min_avg_time', 'min_trend_accuracy', 'levels')
+
+
+def default_config(window_size: int = 3, promote_correct: int = 2, demote_correct: int = 1,
+                   time_threshold: float = 8.0, levels: List[str] = None) -> Dict:
+    """
+    Rule configuration equivalent to the engine's built-in thresholds
+
+    Args:
+        window_size: Number of recent attempts the rules look at
+        promote_correct: Minimum correct answers in the window to increase difficulty
+        demote_correct: Maximum correct answers in the window to decrease difficulty
+        time_threshold: Average seconds per answer must stay below this to increase
+        levels: Difficulty levels from easiest to hardest
+
+    Returns:
+        Rule configuration dictionary accepted by RuleSet
+    """
+    return {
+        'name': 'default',
+        'levels': list(levels or DEFAULT_LEVELS),
+        'window_size': window_size,
+        'min_attempts': 2,
+        'rules': [
+            {
+                'name': 'promote',
+                'when': {'min_correct': promote_correct, 'max_avg_time': time_threshold,
+                         'min_trend_accuracy': promote_correct / window_size},
+                'step': 1,
+                'reason': "Great work! Moving to {to} (accuracy: {correct}/{total})",
+                'explanation': "🎯 You're doing excellent! Ready for a challenge."
+            },
+            {
+                'name': 'demote',
+                'when': {'max_correct': demote_correct},
+                'step': -1,
+                'reason': "Let's try {to} level (accuracy: {correct}/{total})",
+                'explanation': "💪 Let's work on building confidence at an easier level."
+            }
+        ],
+        'explanation': "✨ You're at the perfect difficulty level. Keep it up!",
+        'warmup_explanation': "Building your performance profile... Keep going!"
+    }
+
+
+@functools.lru_cache(maxsize=64)
+def default_rules(window_size: int = 3, promote_correct: int = 2, demote_correct: int = 1,
+                  time_threshold: float = 8.0) -> 'RuleSet':
+    """Compiled default_config, shared between engines built with the same thresholds"""
+    return RuleSet(default_config(window_size, promote_correct, demote_correct, time_threshold))
+
+
+def load_config(path: str) -> Dict:
+    """
+    Read a rule configuration from a JSON or YAML file
+
+    Args:
+        path: File ending in .json, .yaml or .yml; YAML needs PyYAML
+
+    Returns:
+        Configuration dictionary
+    """
+    text = Path(path).read_text(encoding='utf-8')
+    if str(path).endswith(('.yaml', '.yml')):
+        import yaml
+        return yaml.safe_load(text)
+    return json.loads(text)
+
+
+class Rule:
+    """One parsed rule: conditions on the window summary and a level step"""
+
+    __slots__ = ('name', 'step', 'reason', 'explanation', 'min_correct', 'max_correct',
+                 'min_accuracy', 'max_accuracy', 'max_avg_time', 'min_avg_time',
+                 'min_trend_accuracy', 'levels')
+
+    def __init__(self, config: Dict, index: int):
+        when = config.get('when', {})
+        unknown = set(when) - set(CONDITIONS)
+        if unknown:
+            raise ValueError(f"rule {index}: unknown conditions {sorted(unknown)}")
+        self.name = config.get('name', f"rule_{index}")
+        self.step = int(config.get('step', 0))
+        self.reason = config.get('reason', "Moving to {to} (accuracy: {correct}/{total})")
+        self.explanation = config.get('explanation')
+        self.min_correct = when.get('min_correct')
+        self.max_correct = when.get('max_correct')
+        self.min_accuracy = when.get('min_accuracy')
+        self.max_accuracy = when.get('max_accuracy')
+        self.max_avg_time = when.get('max_avg_time')
+        self.min_avg_time = when.get('min_avg_time')
+        self.min_trend_accuracy = when.get('min_trend_accuracy')
+        self.levels = set(when['levels']) if 'levels' in when else None
+
+    def matches(self, level: str, correct: int, total: int, avg_time: float,
+                trend_accuracy: Optional[float]) -> bool:
+        """Whether the rule's conditions hold; a missing trend accuracy passes trend conditions"""
+        if self.levels is not None and level not in self.levels:
+            return False
+        if self.min_correct is not None and correct < self.min_correct:
+            return False
+        if self.max_correct is not None and correct > self.max_correct:
+            return False
+        if self.min_accuracy is not None and correct < self.min_accuracy * total:
+            return False
+        if self.max_accuracy is not None and correct > self.max_accuracy * total:
+            return False
+        if self.max_avg_time is not None and not avg_time < self.max_avg_time:
+            return False
+        if self.min_avg_time is not None and not avg_time >= self.min_avg_time:
+            return False
+        if (self.min_trend_accuracy is not None and trend_accuracy is not None
+                and trend_accuracy < self.min_trend_accuracy):
+            return False
+        return True
+
+
+class RuleSet:
+    """
+    Adaptation rules compiled into a flat decision table
+
+    Rules are tried in order and the first whose conditions hold and whose
+    step leads to a different level decides; a matching rule with step 0
+    holds the level and ends the search. Because the window holds a
+    bounded number of attempts and the rules only compare the average time
+    and trend accuracy against fixed thresholds, every possible input falls
+    into one of finitely many cells: (level, attempts, correct, time bucket,
+    trend bucket). The winning rule for every cell is computed once, so a
+    decision is two bisects and a list lookup however many rules there are.
+    """
+
+    def __init__(self, config: Dict):
+        """
+        Parse and compile a rule configuration
+
+        Args:
+            config: Dictionary with levels, window_size, min_attempts, rules
+                and optional explanation texts (see default_config)
+        """
+        self.config = config
+        self.name = config.get('name', 'default')
+        self.levels: List[str] = list(config.get('levels', DEFAULT_LEVELS))
+        if not self.levels or len(set(self.levels)) != len(self.levels):
+            raise ValueError("levels must be a non-empty list of distinct names")
+        self.level_index: Dict[str, int] = {level: i for i, level in enumerate(self.levels)}
+        self.window_size = int(config.get('window_size', 3))
+        if self.window_size < 1:
+            raise ValueError("window_size must be at least 1")
+        self.min_attempts = int(config.get('min_attempts', 2))
+        self.explanation = config.get('explanation', '')
+        self.warmup_explanation = config.get('warmup_explanation', '')
+        self.rules = [Rule(rule, i) for i, rule in enumerate(config.get('rules', []))]
+        for rule in self.rules:
+            if rule.levels is not None and not rule.levels <= set(self.levels):
+                raise ValueError(f"rule {rule.name!r} names unknown levels {sorted(rule.levels - set(self.levels))}")
+
+        self._time_cuts = sorted({t for rule in self.rules for t in (rule.max_avg_time, rule.min_avg_time)
+                                  if t is not None})
+        self._trend_cuts = sorted({rule.min_trend_accuracy for rule in self.rules
+                                   if rule.min_trend_accuracy is not None})
+        self._compile()
+
+    @classmethod
+    def from_file(cls, path: str) -> 'RuleSet':
+        """Compile the rules in a JSON or YAML file"""
+        return cls(load_config(path))
+
+    def _bucket_values(self, cuts: List[float]) -> List[float]:
+        """A representative value for each interval between sorted thresholds"""
+        if not cuts:
+            return [0.0]
+        return [cuts[0] - 1.0] + cuts
+
+    def _compile(self):
+        """Fill the decision and explanation tables"""
+        sizes = self.window_size + 1
+        times = self._bucket_values(self._time_cuts)
+        # The last trend bucket passes every trend condition, as does having no trend window
+        trends = self._bucket_values(self._trend_cuts)
+        self._trend_buckets = len(trends)
+        self._correct_stride = len(times) * len(trends)
+        self._total_stride = sizes * self._correct_stride
+        self._level_stride = sizes * self._total_stride
+
+        table, shared = [], {}
+        for level in range(len(self.levels)):
+            for total in range(sizes):
+                for correct in range(sizes):
+                    for avg_time in times:
+                        for trend in trends:
+                            decision = self._first_match(level, correct, total, avg_time, trend)
+                            table.append(shared.setdefault(decision, decision))
+        self._table = table
+
+        explanations = []
+        for total in range(sizes):
+            for correct in range(sizes):
+                for avg_time in times:
+                    explanations.append(self._explanation_for(correct, total, avg_time))
+        self._explanations = explanations
+
+    def _reason(self, rule: Rule, level: int, target: int, correct: int, total: int) -> Optional[str]:
+        """Render the rule's reason, or None if it quotes the average time and must wait for it"""
+        if '{avg_time' in rule.reason:
+            return None
+        return rule.reason.format(**{'from': self.levels[level], 'to': self.levels[target],
+                                     'correct': correct, 'total': total})
+
+    def _target(self, level: int, step: int) -> int:
+        return min(max(level + step, 0), len(self.levels) - 1)
+
+    def _first_match(self, level: int, correct: int, total: int, avg_time: float,
+                     trend_accuracy: Optional[float]) -> Optional[Tuple[int, Rule, Optional[str]]]:
+        """Walk the rules in order; returns (target level, deciding rule, reason), or None to stay"""
+        if total < self.min_attempts or correct > total:
+            return None
+        name = self.levels[level]
+        for rule in self.rules:
+            if rule.matches(name, correct, total, avg_time, trend_accuracy):
+                target = self._target(level, rule.step)
+                if rule.step == 0:
+                    return None
+                if target != level:
+                    return target, rule, self._reason(rule, level, target, correct, total)
+        return None
+
+    def _explanation_for(self, correct: int, total: int, avg_time: float) -> str:
+        """Explanation of the first rule whose conditions hold, ignoring level bounds and trend"""
+        for rule in self.rules:
+            if rule.levels is None and rule.matches('', correct, total, avg_time, None):
+                return rule.explanation or self.explanation
+        return self.explanation
+
+    def decide(self, level: int, correct: int, total: int, avg_time: float,
+               trend_accuracy: float = None) -> Optional[Tuple[int, Rule, Optional[str]]]:
+        """
+        Look up the decision for a summarized window
+
+        Args:
+            level: Index of the current level in levels
+            correct: Correct answers in the window
+            total: Attempts in the window
+            avg_time: Average seconds per attempt
+            trend_accuracy: Accuracy over a longer window, None if not tracked
+
+        Returns:
+            Tuple of (target level index, deciding rule, rendered reason or None
+            if the reason quotes avg_time), or None if the level stays
+        """
+        if total > self.window_size:
+            return self._first_match(level, correct, total, avg_time, trend_accuracy)
+        trend_cuts = self._trend_cuts
+        return self._table[
+            level * self._level_stride + total * self._total_stride + correct * self._correct_stride
+            + bisect.bisect_right(self._time_cuts, avg_time) * self._trend_buckets
+            + (len(trend_cuts) if trend_accuracy is None else bisect.bisect_right(trend_cuts, trend_accuracy))
+        ]
+
+    def evaluate_rules(self, level: int, correct: int, total: int, avg_time: float,
+                       trend_accuracy: float = None) -> Optional[Tuple[int, Rule, Optional[str]]]:
+        """Uncompiled reference evaluation of decide(), walking the rules in order"""
+        return self._first_match(level, correct, total, avg_time, trend_accuracy)
+
+    def explain(self, correct: int, total: int, avg_time: float) -> str:
+        """
+        Explanation text for a summarized window, ignoring level bounds
+
+        Args:
+            correct: Correct answers in the window
+            total: Attempts in the window
+            avg_time: Average seconds per attempt
+
+        Returns:
+            Explanation of the rule the window falls under
+        """
+        if total > self.window_size:
+            return self._explanation_for(correct, total, avg_time)
+        time_bucket = bisect.bisect_right(self._time_cuts, avg_time)
+        return self._explanations[(total * (self.window_size + 1) + correct) * (len(self._time_cuts) + 1) + time_bucket]
+
+
+class RuleRegistry:
+    """
+    Named rule variants for A/B tests, hot-swappable while serving
+
+    Learners are assigned to a variant explicitly (e.g. by cohort) or by a
+    stable hash of their ID weighted across variants. Replacing a variant
+    swaps one reference, so decisions in flight finish on the rules they
+    started with. When loaded from a file, the file is re-read whenever its
+    modification time changes, checked at most every check_interval seconds;
+    a version that fails to parse or validate is logged and skipped, and the
+    rules already installed stay in place.
+    """
+
+    def __init__(self, variants: Dict[str, RuleSet] = None, weights: Dict[str, float] = None,
+                 assignments: Dict[str, str] = None, path: str = None, check_interval: float = 2.0):
+        """
+        Initialize the registry
+
+        Args:
+            variants: Compiled rule sets by variant name
+            weights: Share of hashed learners per variant, defaults to equal shares
+            assignments: Fixed variant per learner ID
+            path: Rule file to watch for changes
+            check_interval: Minimum seconds between two checks of the file
+        """
+        self.path = path
+        self.check_interval = check_interval
+        # Reentrant, so set_variant can hold it across its read and _install
+        self._lock = threading.RLock()
+        self._mtime = None
+        self._rejected_mtime = None
+        self._checked = time.monotonic()
+        self._variants: Dict[str, RuleSet] = {}
+        self._assignments: Dict[str, str] = {}
+        self._weights: Dict[str, float] = {}
+        self._buckets: List[Tuple[int, str]] = []
+        if path is not None:
+            self.reload()
+        else:
+            self._install(variants or {'default': RuleSet(default_config())}, weights, assignments or {})
+
+    @classmethod
+    def from_file(cls, path: str, check_interval: float = 2.0) -> 'RuleRegistry':
+        """
+        Load variants from a rule file
+
+        The file holds either a single rule configuration, or
+        {"variants": {name: config}, "weights": {name: share},
+        "assignments": {learner_id: name}}.
+        """
+        return cls(path=path, check_interval=check_interval)
+
+    def _install(self, variants: Dict[str, RuleSet], weights: Dict[str, float], assignments: Dict[str, str]):
+        """Swap in a new set of variants, weights and assignments"""
+        if not variants:
+            raise ValueError("a rule registry needs at least one variant")
+        weights = weights or {name: 1.0 for name in variants}
+        unknown = (set(weights) | set(assignments.values())) - set(variants)
+        if unknown:
+            raise ValueError(f"unknown rule variants {sorted(unknown)}")
+        total = sum(weights.values())
+        buckets, cumulative = [], 0.0
+        for name, weight in weights.items():
+            cumulative += weight
+            buckets.append((round(cumulative / total * 0xFFFFFFFF), name))
+        with self._lock:
+            self._variants, self._weights = variants, weights
+            self._assignments, self._buckets = dict(assignments), buckets
+
+    def reload(self):
+        """
+        Re-read the rule file and swap in its variants
+
+        The whole file is parsed and validated before anything is swapped,
+        so a broken file raises and leaves the current rules in place.
+        """
+        mtime = os.stat(self.path).st_mtime_ns
+        config = load_config(self.path)
+        if 'variants' in config:
+            variants = {name: RuleSet(dict(variant, name=name))
+                        for name, variant in config['variants'].items()}
+            weights, assignments = config.get('weights'), config.get('assignments', {})
+        else:
+            rules = RuleSet(config)
+            variants, weights, assignments = {rules.name: rules}, None, {}
+        self._install(variants, weights, assignments)
+        self._mtime = mtime
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reload the rule file if it changed since the last load
+
+        Returns:
+            Whether new rules were swapped in
+        """
+        self._checked = time.monotonic()
+        if self.path is None:
+            return False
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as exc:
+            logger.warning("Cannot check rule file %s, keeping the current rules: %s", self.path, exc)
+            return False
+        if mtime in (self._mtime, self._rejected_mtime):
+            return False
+        try:
+            self.reload()
+        except Exception as exc:
+            # Keep serving with the current rules; the file is tried again once it changes
+            self._rejected_mtime = mtime
+            logger.warning("Ignoring rule file %s, keeping the current rules: %s", self.path, exc)
+            return False
+        return True
+
+    def set_variant(self, name: str, rules: RuleSet, weight: float = None):
+        """
+        Add or replace a variant
+
+        Args:
+            name: Variant name
+            rules: Compiled rules for the variant
+            weight: New hashing share; keeps the current share (none for a new variant) if omitted
+        """
+        with self._lock:
+            variants = dict(self._variants, **{name: rules})
+            weights = dict(self._weights)
+            if weight is not None:
+                weights[name] = weight
+            self._install(variants, weights, self._assignments)
+
+    def assign(self, learner_id: str, variant: str):
+        """Pin a learner (or cohort member) to a variant"""
+        with self._lock:
+            if variant not in self._variants:
+                raise ValueError(f"unknown rule variant {variant!r}")
+            self._assignments[learner_id] = variant
+
+    def _check_file(self):
+        """Reload the rule file if check_interval has passed since the last check"""
+        if self.path is not None and time.monotonic() - self._checked >= self.check_interval:
+            self.reload_if_changed()
+
+    def _variant_for(self, learner_id: str) -> str:
+        """Variant of a learner; the caller holds the lock"""
+        variant = self._assignments.get(learner_id)
+        if variant is not None:
+            return variant
+        point = zlib.crc32(str(learner_id).encode('utf-8'))
+        for bound, name in self._buckets:
+            if point <= bound:
+                return name
+        return self._buckets[-1][1]
+
+    def variant_for(self, learner_id: str) -> str:
+        """Name of the variant serving a learner"""
+        self._check_file()
+        with self._lock:
+            return self._variant_for(learner_id)
+
+    def rules_for(self, learner_id: str) -> RuleSet:
+        """Compiled rules serving a learner"""
+        self._check_file()
+        # Variant and rules are looked up together, so a swap in between cannot drop the variant
+        with self._lock:
+            return self._variants[self._variant_for(learner_id)]
+
+    def variants(self) -> Dict[str, RuleSet]:
+        """Current variants by name"""
+        return dict(self._variants)
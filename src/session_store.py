@@ -0,0 +1,229 @@
+"""
+Session Store Module
+Learner sessions kept in memory up to a budget, with idle ones spilled to disk
+"""
+import json
+import os
+import struct
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional
+
+from instrumentation import metrics
+from learning_service import LearnerSession
+from quantile_sketch import KLLSketch
+
+# Estimated memory of a session: tracker, learner state and aggregates,
+# plus an attempt record and a seen-set entry per answer (measured with
+# tracemalloc on LearningService sessions; columnar trackers use less)
+SESSION_BYTES = 4096
+ATTEMPT_BYTES = 600
+
+SUFFIX = '.session'
+
+# Length of the JSON header in front of the snapshot; the header is padded
+# to 8 bytes so the snapshot's columns stay aligned
+_HEADER = struct.Struct('<I4x')
+
+
+class SessionStore:
+    """
+    Learner sessions by ID, bounded by an estimated memory budget
+
+    Used by LearningService in place of a dict. Sessions are kept in least
+    recently used order; a session idle for longer than ttl, or the least
+    recently used ones while the budget is exceeded, are spilled to one file
+    each in the directory: a snapshot of tracker and learner (see
+    snapshot.dump_session) behind a small JSON header with the puzzle on
+    screen. Looking a spilled session up restores it, including its
+    difficulty_history, random stream position and current_attempt_start,
+    so the learner carries on where they left off.
+
+    A session's size is estimated from its attempt count. The session
+    returned by the last lookup is assumed to change until the next one and
+    is re-estimated then, so bookkeeping stays O(1) per request. Spilled
+    files outlive the process; a new store on the same directory picks them
+    up.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 2**20, ttl: float = 1800.0, sink=None,
+                 compress: bool = False):
+        """
+        Initialize the store
+
+        Args:
+            directory: Directory for spilled sessions, created if missing
+            max_bytes: Estimated memory budget of resident sessions
+            ttl: Seconds of inactivity after which a session is spilled
+            sink: Attempt log handed to restored trackers, usually the service's
+            compress: Compress spilled snapshots with zstd
+        """
+        if max_bytes <= 0 or ttl <= 0:
+            raise ValueError("max_bytes and ttl must be positive")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sink = sink
+        self.compress = compress
+        self.resident: 'OrderedDict[str, LearnerSession]' = OrderedDict()
+        # File names are the hex-encoded learner IDs, so the index can be rebuilt from a listing
+        self.spilled = {bytes.fromhex(name[:-len(SUFFIX)]).decode('utf-8')
+                        for name in os.listdir(directory) if name.endswith(SUFFIX)}
+        self.resident_bytes = 0
+        self._sizes: Dict[str, int] = {}
+        self._touched = None
+        self.spills = 0
+        self.restores = 0
+        self.restore_seconds = KLLSketch()
+
+    def __len__(self) -> int:
+        return len(self.resident) + len(self.spilled)
+
+    def __contains__(self, learner_id: str) -> bool:
+        return learner_id in self.resident or learner_id in self.spilled
+
+    def __iter__(self) -> Iterator[str]:
+        yield from list(self.resident)
+        yield from list(self.spilled)
+
+    def __getitem__(self, learner_id: str) -> LearnerSession:
+        session = self.get(learner_id)
+        if session is None:
+            raise KeyError(learner_id)
+        return session
+
+    def __setitem__(self, learner_id: str, session: LearnerSession):
+        self._forget(learner_id)
+        self.resident[learner_id] = session
+        self._resize(learner_id)
+        self._settle(learner_id)
+
+    def __delitem__(self, learner_id: str):
+        if learner_id not in self:
+            raise KeyError(learner_id)
+        self._forget(learner_id)
+
+    def get(self, learner_id: str, default: LearnerSession = None) -> Optional[LearnerSession]:
+        """
+        Look a session up, restoring it from disk if it was spilled
+
+        Args:
+            learner_id: Learner identifier
+            default: Returned if the learner has no session
+
+        Returns:
+            The learner's session
+        """
+        session = self.resident.get(learner_id)
+        if session is not None:
+            self.resident.move_to_end(learner_id)
+        elif learner_id in self.spilled:
+            session = self.resident[learner_id] = self._restore(learner_id)
+            self._resize(learner_id)
+        else:
+            self._settle(None)
+            return default
+        session.last_active = time.time()
+        self._settle(learner_id)
+        return session
+
+    def evict_idle(self, now: float = None) -> int:
+        """
+        Spill every session idle for longer than ttl
+
+        Args:
+            now: Current time in seconds, time.time() if omitted
+
+        Returns:
+            Number of sessions spilled
+        """
+        deadline = (time.time() if now is None else now) - self.ttl
+        spilled = 0
+        # Least recently used first, so the scan stops at the first recent session
+        while self.resident:
+            learner_id, session = next(iter(self.resident.items()))
+            if session.last_active >= deadline:
+                break
+            self._spill(learner_id)
+            spilled += 1
+        return spilled
+
+    def stats(self) -> Dict:
+        """Resident and spilled session counts, memory estimate and restore latency"""
+        restore_ms = ([round(value * 1000, 3) for value in self.restore_seconds.quantiles((0.5, 0.99))]
+                      if len(self.restore_seconds) else [None, None])
+        return {
+            'resident': len(self.resident),
+            'spilled': len(self.spilled),
+            'resident_mb': round(self.resident_bytes / 2**20, 1),
+            'budget_mb': round(self.max_bytes / 2**20, 1),
+            'spills': self.spills,
+            'restores': self.restores,
+            'restore_ms_p50': restore_ms[0],
+            'restore_ms_p99': restore_ms[1]
+        }
+
+    def _path(self, learner_id: str) -> str:
+        return os.path.join(self.directory, learner_id.encode('utf-8').hex() + SUFFIX)
+
+    def _settle(self, learner_id: Optional[str]):
+        """Re-estimate the session handed out before, evict, and remember the one handed out now"""
+        if self._touched is not None and self._touched in self.resident:
+            self._resize(self._touched)
+        self._touched = learner_id
+        self.evict_idle()
+        # The least recently used go first; the session just handed out is the most recent
+        while self.resident_bytes > self.max_bytes and len(self.resident) > 1:
+            self._spill(next(iter(self.resident)))
+
+    def _resize(self, learner_id: str):
+        session = self.resident[learner_id]
+        size = SESSION_BYTES + ATTEMPT_BYTES * len(session.tracker.attempts)
+        self.resident_bytes += size - self._sizes.get(learner_id, 0)
+        self._sizes[learner_id] = size
+
+    def _forget(self, learner_id: str):
+        if learner_id in self.resident:
+            del self.resident[learner_id]
+            self.resident_bytes -= self._sizes.pop(learner_id)
+        elif learner_id in self.spilled:
+            self.spilled.discard(learner_id)
+            os.remove(self._path(learner_id))
+
+    def _spill(self, learner_id: str):
+        """Write a resident session to disk and drop it from memory"""
+        from snapshot import dump_session
+
+        with metrics.timer('session_store_spill_seconds', 'SessionStore spill wall time'):
+            session = self.resident[learner_id]
+            header = json.dumps({'current_puzzle': session.current_puzzle}).encode('utf-8')
+            header += b' ' * (-len(header) % 8)
+            with open(self._path(learner_id), 'wb') as f:
+                f.write(_HEADER.pack(len(header)))
+                f.write(header)
+                f.write(dump_session(session.tracker, session.learner, compress=self.compress))
+        del self.resident[learner_id]
+        self.resident_bytes -= self._sizes.pop(learner_id)
+        self.spilled.add(learner_id)
+        self.spills += 1
+
+    def _restore(self, learner_id: str) -> LearnerSession:
+        """Read a spilled session back and delete its file"""
+        from snapshot import SessionSnapshot
+
+        start = time.perf_counter()
+        with metrics.timer('session_store_restore_seconds', 'SessionStore restore wall time'):
+            path = self._path(learner_id)
+            with open(path, 'rb') as f:
+                data = f.read()
+            length, = _HEADER.unpack_from(data)
+            header = json.loads(data[_HEADER.size:_HEADER.size + length])
+            snapshot = SessionSnapshot(memoryview(data)[_HEADER.size + length:])
+            session = LearnerSession(snapshot.restore_learner(), snapshot.restore_tracker(sink=self.sink))
+            session.current_puzzle = header['current_puzzle']
+            os.remove(path)
+        self.spilled.discard(learner_id)
+        self.restores += 1
+        self.restore_seconds.update(time.perf_counter() - start)
+        return session
@@ -0,0 +1,402 @@
+"""
+Shard Router Module
+HTTP front end that consistent-hashes learners to API server workers over Unix sockets
+"""
+import argparse
+import asyncio
+import bisect
+import hashlib
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Iterable, List, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from api_server import HTTPError, bind_socket, encode_response, read_request, reject
+
+# Points per worker on the ring; more points spread the load more evenly
+VNODES = 160
+
+Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+def ring_hash(key: str) -> int:
+    """64-bit position of a key on the ring"""
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping learner IDs to workers
+
+    Every worker is placed at vnodes pseudo-random points on a 64-bit ring,
+    and a key belongs to the worker of the first point at or after the
+    key's own position. A new worker takes over only the keys just before
+    its points, about 1/N of them, a little from every other worker; a
+    removed worker's keys go to the points after its own. No other key
+    changes owner, where hashing modulo N would move almost all of them.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = VNODES):
+        """
+        Initialize the ring
+
+        Args:
+            nodes: Worker names
+            vnodes: Points per worker
+        """
+        self.vnodes = vnodes
+        self.nodes: List[str] = []
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def copy(self) -> 'HashRing':
+        return HashRing(self.nodes, self.vnodes)
+
+    def add(self, node: str):
+        """Place a worker on the ring"""
+        if node in self.nodes:
+            raise ValueError(f"{node!r} is already on the ring")
+        self.nodes.append(node)
+        self._place()
+
+    def remove(self, node: str):
+        """Take a worker off the ring"""
+        if node not in self.nodes:
+            raise ValueError(f"{node!r} is not on the ring")
+        self.nodes.remove(node)
+        self._place()
+
+    def _place(self):
+        points = sorted((ring_hash(f"{node}#{replica}"), node) for node in self.nodes for replica in range(self.vnodes))
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key: str) -> str:
+        """Worker owning a key"""
+        if not self._points:
+            raise ValueError("the ring has no workers")
+        index = bisect.bisect_left(self._points, ring_hash(key))
+        return self._owners[index % len(self._owners)]
+
+
+async def call(connection: Connection, method: str, target: str, body: bytes = b'') -> Tuple[bytes, bytes]:
+    """
+    Send one keep-alive request over a worker connection
+
+    Returns:
+        Response head (including the blank line) and body
+    """
+    reader, writer = connection
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: shard\r\nContent-Length: {len(body)}\r\n\r\n"
+                 .encode('latin-1') + body)
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    length = 0
+    for line in head.split(b'\r\n'):
+        if line[:15].lower() == b'content-length:':
+            length = int(line[15:])
+    return head, await reader.readexactly(length) if length else b''
+
+
+class ShardRouter:
+    """
+    Forwards every request to the worker owning its learner
+
+    Each worker is an api_server process on its own Unix socket holding
+    the sessions of its shard, so N workers use N cores. The router keeps
+    one worker connection per client connection and worker, and relays
+    requests as they are; it only parses the learner ID out of them.
+
+    Workers can be added and removed while serving. Routing pauses, the
+    sessions whose owner changes are handed over with the workers'
+    /release_session and /import_session endpoints (a snapshot and the
+    pending reviews each, see LearningService.release_session), and routing
+    resumes on the new ring. If a hand-over fails, the sessions already
+    moved go back to their old workers and the old ring stays in place.
+    """
+
+    def __init__(self, workers: Dict[str, str], vnodes: int = VNODES):
+        """
+        Initialize the router
+
+        Args:
+            workers: Unix socket path by worker name; names place workers on the ring
+            vnodes: Ring points per worker
+        """
+        self.workers = dict(workers)
+        self.ring = HashRing(self.workers, vnodes)
+        self._open = asyncio.Event()
+        self._open.set()
+        self._inflight = 0
+
+    @staticmethod
+    def learner_id(method: str, target: str, body: bytes) -> str:
+        """Learner ID of a request, from the query string or the JSON body"""
+        if method == 'GET':
+            learner_id = parse_qs(urlsplit(target).query).get('learner_id', [None])[0]
+        else:
+            try:
+                payload = json.loads(body or b'{}')
+            except json.JSONDecodeError as exc:
+                raise HTTPError(400, f"invalid JSON: {exc}")
+            learner_id = payload.get('learner_id') if isinstance(payload, dict) else None
+        if not learner_id or not isinstance(learner_id, str):
+            raise HTTPError(400, "learner_id is required")
+        return learner_id
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Relay requests on one client connection until the client closes it"""
+        upstreams: Dict[str, Connection] = {}
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HTTPError as exc:
+                    await reject(writer, exc)
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self._open.wait()
+                self._inflight += 1
+                try:
+                    response = await self.route(method, target, body, upstreams)
+                    if not keep_alive:
+                        response = response.replace(b'Connection: keep-alive', b'Connection: close', 1)
+                except HTTPError as exc:
+                    response = encode_response(exc.status, {'error': str(exc)}, keep_alive)
+                finally:
+                    self._inflight -= 1
+                writer.write(response)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            for _, upstream in upstreams.values():
+                upstream.close()
+            writer.close()
+
+    async def route(self, method: str, target: str, body: bytes, upstreams: Dict[str, Connection]) -> bytes:
+        """Forward one request and return the worker's raw response"""
+        if urlsplit(target).path == '/store_stats':
+            return encode_response(200, await self.store_stats(upstreams))
+        name = self.ring.node_for(self.learner_id(method, target, body))
+        head, payload = await self._forward(name, method, target, body, upstreams)
+        return head + payload
+
+    async def _forward(self, name: str, method: str, target: str, body: bytes,
+                       upstreams: Dict[str, Connection], workers: Dict[str, str] = None) -> Tuple[bytes, bytes]:
+        connection = upstreams.get(name)
+        try:
+            if connection is None:
+                path = (workers or self.workers)[name]
+                connection = upstreams[name] = await asyncio.open_unix_connection(path)
+            return await call(connection, method, target, body)
+        except (OSError, asyncio.IncompleteReadError) as exc:
+            upstreams.pop(name, None)
+            raise HTTPError(502, f"worker {name} unavailable: {exc}")
+
+    async def _admin(self, name: str, method: str, target: str, payload: Dict,
+                     connections: Dict[str, Connection], workers: Dict[str, str]) -> Dict:
+        """Admin request to a worker, raising if it fails"""
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        head, response = await self._forward(name, method, target, body, connections, workers)
+        if not head.startswith(b'HTTP/1.1 200'):
+            raise HTTPError(502, f"worker {name}: {target} failed: {response.decode('utf-8', 'replace')}")
+        return json.loads(response)
+
+    async def store_stats(self, upstreams: Dict[str, Connection]) -> Dict:
+        """Session counts summed over the workers, and each worker's own"""
+        stats = {}
+        for name in self.ring.nodes:
+            _, payload = await self._forward(name, 'GET', '/store_stats', b'', upstreams)
+            stats[name] = json.loads(payload)
+        return {'resident': sum(entry['resident'] for entry in stats.values()),
+                'spilled': sum(entry['spilled'] for entry in stats.values()),
+                'workers': stats}
+
+    async def add_worker(self, name: str, path: str) -> int:
+        """
+        Put a running worker on the ring and move the sessions it now owns to it
+
+        Args:
+            name: Worker name, which places it on the ring
+            path: Unix socket the worker serves on
+
+        Returns:
+            Number of sessions moved
+        """
+        ring = self.ring.copy()
+        ring.add(name)
+        workers = dict(self.workers, **{name: path})
+        return await self._rebalance(ring, workers, sources=list(self.workers))
+
+    async def remove_worker(self, name: str) -> int:
+        """
+        Move a worker's sessions to the workers now owning them and take it off the ring
+
+        Args:
+            name: Worker name; the worker can be stopped afterwards
+
+        Returns:
+            Number of sessions moved
+        """
+        ring = self.ring.copy()
+        ring.remove(name)
+        moved = await self._rebalance(ring, self.workers, sources=[name])
+        del self.workers[name]
+        return moved
+
+    async def _rebalance(self, ring: HashRing, workers: Dict[str, str], sources: List[str]) -> int:
+        """Hand over every session of the source workers whose owner differs on the new ring"""
+        self._open.clear()
+        connections: Dict[str, Connection] = {}
+        try:
+            # Let requests already forwarded finish; new ones wait for the new ring
+            while self._inflight:
+                await asyncio.sleep(0.001)
+            moved: List[Tuple[str, str, str]] = []
+            try:
+                for source in sources:
+                    listing = await self._admin(source, 'GET', '/sessions', None, connections, workers)
+                    for learner_id in listing['learner_ids']:
+                        owner = ring.node_for(learner_id)
+                        if owner == source:
+                            continue
+                        await self._move(learner_id, source, owner, connections, workers)
+                        moved.append((learner_id, source, owner))
+            except HTTPError:
+                # Routing stays on the old ring, so sessions go back to where it looks for them
+                for learner_id, source, owner in reversed(moved):
+                    await self._move(learner_id, owner, source, connections, workers)
+                raise
+            self.ring, self.workers = ring, dict(workers)
+            return len(moved)
+        finally:
+            for _, writer in connections.values():
+                writer.close()
+            self._open.set()
+
+    async def _move(self, learner_id: str, source: str, target: str,
+                    connections: Dict[str, Connection], workers: Dict[str, str]):
+        """Hand one session from source to target, giving it back to source if the import fails"""
+        released = await self._admin(source, 'POST', '/release_session', {'learner_id': learner_id},
+                                     connections, workers)
+        handover = {'snapshot': released['snapshot'], 'current_puzzle': released['current_puzzle'],
+                    'reviews': released['reviews']}
+        try:
+            await self._admin(target, 'POST', '/import_session', handover, connections, workers)
+        except HTTPError:
+            await self._admin(source, 'POST', '/import_session', handover, connections, workers)
+            raise
+
+    async def serve(self, sock):
+        """Run the router on a listening socket until cancelled"""
+        server = await asyncio.start_server(self.handle_connection, sock=sock)
+        async with server:
+            await server.serve_forever()
+
+
+def start_workers(count: int, socket_dir: str, worker_args: List[str], first: int = 0) -> Dict[str, Tuple]:
+    """
+    Start api_server workers on Unix sockets
+
+    Args:
+        count: Number of workers
+        socket_dir: Directory for the sockets
+        worker_args: Extra api_server options, e.g. ['--seed', '1']
+        first: Number of the first worker
+
+    Returns:
+        (socket path, process) by worker name, once every socket accepts connections
+    """
+    server = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api_server.py')
+    workers = {}
+    for index in range(first, first + count):
+        name = f"shard-{index}"
+        path = os.path.join(socket_dir, f"{name}.sock")
+        if os.path.exists(path):
+            os.unlink(path)
+        workers[name] = (path, subprocess.Popen([sys.executable, server, '--unix-socket', path, *worker_args]))
+    deadline = time.time() + 30
+    for name, (path, process) in workers.items():
+        while not os.path.exists(path):
+            if process.poll() is not None or time.time() > deadline:
+                raise RuntimeError(f"worker {name} did not start")
+            time.sleep(0.05)
+    return workers
+
+
+def run_router(host: str, port: int, reuse_port: bool, workers: Dict[str, str], vnodes: int = VNODES):
+    """Run one router process on its own event loop"""
+    sock = bind_socket(host, port, reuse_port)
+    try:
+        asyncio.run(ShardRouter(workers, vnodes).serve(sock))
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     epilog='Other options, e.g. --seed or --spill-dir, are passed on to the workers')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='api_server worker processes')
+    parser.add_argument('--routers', type=int, default=1,
+                        help='router processes sharing the port via SO_REUSEPORT; they route alike')
+    parser.add_argument('--vnodes', type=int, default=VNODES, help='ring points per worker')
+    parser.add_argument('--socket-dir', help='directory for the worker sockets, a temporary one if omitted')
+    args, worker_args = parser.parse_known_args()
+
+    def shut_down(signum, frame):
+        raise SystemExit(0)
+
+    # The workers are stopped on the way out, also when the router is terminated
+    signal.signal(signal.SIGTERM, shut_down)
+    socket_dir = args.socket_dir or tempfile.mkdtemp(prefix='shards-')
+    workers = start_workers(args.workers, socket_dir, worker_args)
+    paths = {name: path for name, (path, _) in workers.items()}
+    routers = []
+    try:
+        if args.routers == 1:
+            run_router(args.host, args.port, False, paths, args.vnodes)
+            return
+        for _ in range(args.routers):
+            pid = os.fork()
+            if pid == 0:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                try:
+                    run_router(args.host, args.port, True, paths, args.vnodes)
+                finally:
+                    os._exit(0)
+            routers.append(pid)
+        try:
+            for pid in routers:
+                os.waitpid(pid, 0)
+        except KeyboardInterrupt:
+            pass
+    finally:
+        for pid in routers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for _, process in workers.values():
+            process.terminate()
+        for _, process in workers.values():
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
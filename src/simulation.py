@@ -0,0 +1,268 @@
+"""
+Simulation Module
+Headless multi-learner simulator for benchmarking and tuning the adaptation rules
+"""
+import argparse
+import itertools
+import math
+import random
+import time
+from multiprocessing import Pool
+from typing import Dict, List, Tuple
+
+from adaptive_engine import AdaptiveEngine
+from puzzle_generator import PuzzleGenerator
+from random_streams import RandomStream, derive_seed
+from tracker import PerformanceTracker
+
+# How much harder each level is on the learner's skill scale
+LEVEL_OFFSETS = {'Easy': -1.0, 'Medium': 0.0, 'Hard': 1.0}
+
+# Relative response time per level
+LEVEL_TIME_FACTORS = {'Easy': 0.7, 'Medium': 1.0, 'Hard': 1.6}
+
+
+class SyntheticLearner:
+    """
+    Synthetic learner answering puzzles from a simple parametric model
+
+    The chance of a correct answer is a logistic function of the learner's
+    skill for the puzzle's operation minus the level offset, and response
+    times are log-normal. Fatigue lowers accuracy and slows answers as the
+    session goes on.
+    """
+
+    def __init__(self, skills: Dict[str, float], base_time: float, time_sigma: float,
+                 fatigue: float, rng: random.Random):
+        """
+        Initialize the learner model
+
+        Args:
+            skills: Skill per operation symbol, 0 means a 50% chance at Medium
+            base_time: Median seconds per answer at Medium without fatigue
+            time_sigma: Log-normal sigma of the response time
+            fatigue: Skill lost (and relative slowdown) per attempt
+            rng: Random stream used for answers and times
+        """
+        self.skills = skills
+        self.base_time = base_time
+        self.time_sigma = time_sigma
+        self.fatigue = fatigue
+        self.rng = rng
+
+    @classmethod
+    def random(cls, rng: random.Random) -> 'SyntheticLearner':
+        """Draw a learner with random skills, speed and fatigue"""
+        ability = rng.gauss(0.5, 1.0)
+        skills = {op: ability + rng.gauss(0.0, 0.5) for op in PuzzleGenerator.OPERATIONS}
+        return cls(skills, rng.uniform(3.0, 10.0), rng.uniform(0.2, 0.6), rng.uniform(0.0, 0.05), rng)
+
+    def success_probability(self, difficulty: str, operation: str, attempt_index: int = 0) -> float:
+        """Probability of answering correctly at the given point of the session"""
+        logit = self.skills[operation] - LEVEL_OFFSETS[difficulty] - self.fatigue * attempt_index
+        return 1.0 / (1.0 + math.exp(-logit))
+
+    def answer(self, puzzle: Dict, attempt_index: int) -> Tuple[bool, float]:
+        """
+        Answer a puzzle
+
+        Args:
+            puzzle: The puzzle dictionary
+            attempt_index: Position of the puzzle within the session
+
+        Returns:
+            Tuple of (is_correct, time_spent)
+        """
+        p = self.success_probability(puzzle['difficulty'], puzzle['operation'], attempt_index)
+        is_correct = self.rng.random() < p
+        median = self.base_time * LEVEL_TIME_FACTORS[puzzle['difficulty']] * (1 + self.fatigue * attempt_index)
+        time_spent = self.rng.lognormvariate(math.log(median), self.time_sigma)
+        return is_correct, time_spent
+
+    def target_difficulty(self, target_accuracy: float = 0.7) -> str:
+        """
+        The hardest level at which the fresh learner reaches the target accuracy
+
+        Args:
+            target_accuracy: Expected accuracy that counts as the right level
+
+        Returns:
+            Difficulty level the engine should converge to
+        """
+        target = AdaptiveEngine.DIFFICULTY_LEVELS[0]
+        for difficulty in AdaptiveEngine.DIFFICULTY_LEVELS:
+            operations = PuzzleGenerator.DIFFICULTY_CONFIG[difficulty]['operations']
+            accuracy = sum(self.success_probability(difficulty, op) for op in operations) / len(operations)
+            if accuracy >= target_accuracy:
+                target = difficulty
+        return target
+
+
+def count_oscillations(difficulty_history: List[Dict]) -> int:
+    """
+    Count direction reversals in an engine's difficulty history
+
+    Args:
+        difficulty_history: AdaptiveEngine.difficulty_history
+
+    Returns:
+        Number of times a move up was followed by a move down or vice versa
+    """
+    levels = AdaptiveEngine.DIFFICULTY_LEVELS
+    directions = [levels.index(event['to']) - levels.index(event['from']) for event in difficulty_history]
+    return sum(1 for prev, cur in zip(directions, directions[1:]) if prev * cur < 0)
+
+
+def simulate_session(learner: SyntheticLearner, engine_params: Dict, puzzles: int,
+                     start_difficulty: str = 'Medium', rng: RandomStream = None) -> Dict:
+    """
+    Run one headless session through the generator, tracker and engine
+
+    Args:
+        learner: Synthetic learner answering the puzzles
+        engine_params: Keyword arguments for AdaptiveEngine
+        puzzles: Number of puzzles in the session
+        start_difficulty: Starting difficulty level
+        rng: Stream the session's puzzles are drawn from
+
+    Returns:
+        Dictionary with convergence, oscillation and accuracy results
+    """
+    generator = PuzzleGenerator()
+    tracker = PerformanceTracker()
+    engine = AdaptiveEngine(**engine_params)
+    tracker.start_session()
+    window = tracker.get_window(engine.window_size)
+
+    target = learner.target_difficulty()
+    difficulty = start_difficulty
+    converged_at = 0 if difficulty == target else None
+
+    for index in range(puzzles):
+        puzzle = generator.generate_puzzle(difficulty, rng)
+        is_correct, time_spent = learner.answer(puzzle, index)
+        tracker.log_attempt(puzzle, puzzle['answer'] if is_correct else 0, is_correct, time_spent)
+        difficulty = engine.adapt_difficulty(window, difficulty)
+        if converged_at is None and difficulty == target:
+            converged_at = index + 1
+
+    return {
+        'converged_at': converged_at,
+        'final_on_target': difficulty == target,
+        'oscillations': count_oscillations(engine.difficulty_history),
+        'switches': len(engine.difficulty_history),
+        'accuracy': tracker.get_session_stats()['accuracy']
+    }
+
+
+def simulate_chunk(task: Tuple[int, int, int, Dict, int]) -> Dict:
+    """
+    Simulate a contiguous chunk of learners and return partial totals
+
+    Args:
+        task: Tuple of (seed, first learner index, learner count, engine params, puzzles)
+
+    Returns:
+        Dictionary of summed results for the chunk
+    """
+    seed, first, count, engine_params, puzzles = task
+    totals = _empty_totals()
+    for index in range(first, first + count):
+        learner = SyntheticLearner.random(random.Random(seed * 1_000_003 + index))
+        # Per-learner puzzle streams: results don't depend on chunking or worker count
+        result = simulate_session(learner, engine_params, puzzles,
+                                  rng=RandomStream(derive_seed(seed, 'puzzles', index)))
+        totals['sessions'] += 1
+        if result['converged_at'] is not None:
+            totals['converged'] += 1
+            totals['convergence_attempts'] += result['converged_at']
+        totals['final_on_target'] += result['final_on_target']
+        totals['oscillations'] += result['oscillations']
+        totals['switches'] += result['switches']
+        totals['accuracy'] += result['accuracy']
+    return totals
+
+
+def run_simulation(learners: int, engine_params: Dict = None, puzzles: int = 10,
+                   workers: int = None, chunk_size: int = 1000, seed: int = 0) -> Dict:
+    """
+    Simulate many learners in parallel across a process pool
+
+    Args:
+        learners: Number of learner sessions to simulate
+        engine_params: Keyword arguments for AdaptiveEngine
+        puzzles: Number of puzzles per session
+        workers: Number of worker processes, defaults to the CPU count
+        chunk_size: Learners per task sent to a worker
+        seed: Seed making the whole run reproducible
+
+    Returns:
+        Report with convergence, oscillation, accuracy and throughput figures
+    """
+    engine_params = engine_params or {}
+    tasks = [(seed, first, min(chunk_size, learners - first), engine_params, puzzles)
+             for first in range(0, learners, chunk_size)]
+
+    start = time.perf_counter()
+    if workers == 1:
+        totals = _sum_totals(map(simulate_chunk, tasks))
+    else:
+        with Pool(workers) as pool:
+            totals = _sum_totals(pool.imap_unordered(simulate_chunk, tasks))
+    elapsed = time.perf_counter() - start
+
+    sessions = totals['sessions']
+    # Rates of an empty run are reported as 0 rather than dividing by zero
+    runs = max(sessions, 1)
+    return {
+        'engine_params': engine_params,
+        'sessions': sessions,
+        'converged_rate': round(totals['converged'] / runs, 3),
+        'mean_attempts_to_converge': round(totals['convergence_attempts'] / max(totals['converged'], 1), 2),
+        'final_on_target_rate': round(totals['final_on_target'] / runs, 3),
+        'mean_oscillations': round(totals['oscillations'] / runs, 3),
+        'mean_switches': round(totals['switches'] / runs, 3),
+        'mean_accuracy': round(totals['accuracy'] / runs, 1),
+        'sessions_per_sec': round(sessions / elapsed, 1)
+    }
+
+
+def _empty_totals() -> Dict:
+    return {'sessions': 0, 'converged': 0, 'convergence_attempts': 0,
+            'final_on_target': 0, 'oscillations': 0, 'switches': 0, 'accuracy': 0.0}
+
+
+def _sum_totals(partials) -> Dict:
+    # Starts from zeros so a run without any chunk still has every total
+    totals = _empty_totals()
+    for partial in partials:
+        for key, value in partial.items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--learners', type=int, default=100_000)
+    parser.add_argument('--puzzles', type=int, default=10, help='puzzles per session')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: CPU count)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--window-size', type=int, nargs='+', default=[3])
+    parser.add_argument('--promote-correct', type=int, nargs='+', default=[2])
+    parser.add_argument('--demote-correct', type=int, nargs='+', default=[1])
+    parser.add_argument('--time-threshold', type=float, nargs='+', default=[8.0])
+    args = parser.parse_args()
+
+    grid = itertools.product(args.window_size, args.promote_correct, args.demote_correct, args.time_threshold)
+    for window_size, promote_correct, demote_correct, time_threshold in grid:
+        report = run_simulation(
+            args.learners,
+            {'window_size': window_size, 'promote_correct': promote_correct,
+             'demote_correct': demote_correct, 'time_threshold': time_threshold},
+            puzzles=args.puzzles, workers=args.workers, seed=args.seed
+        )
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+"""
+Skill Model Module
+Per-learner, per-operation skill estimates (Elo/Rasch) and an adaptive engine driven by them
+"""
+import argparse
+import json
+import math
+import time
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from adaptive_engine import AdaptiveEngine
+from attempt_log import LogReader
+from difficulty_scale import DifficultyScale, default_specs
+from instrumentation import metrics
+from puzzle_generator import PuzzleGenerator
+
+# Prior difficulty offset of each operation relative to its level
+OPERATION_OFFSETS = {'+': -0.5, '-': -0.25, '×': 0.25, '÷': 0.5}
+
+# Largest change of a skill or difficulty in one fit_rasch sweep, in logits
+MAX_STEP = 1.0
+
+# Version of the difficulty parameter file written by SkillModel.save
+PARAMETERS_FORMAT = 1
+
+
+def _sigmoid(x: float) -> float:
+    return 1.0 / (1.0 + math.exp(-x))
+
+
+def _logit(p: float) -> float:
+    return math.log(p / (1.0 - p))
+
+
+class SkillModel:
+    """
+    Rasch (1PL) model of puzzle difficulty with Elo-style online updates
+
+    A learner with skill θ answers an item of difficulty b correctly with
+    probability σ(θ - b). Items are (level, operation) pairs and their
+    difficulties are shared by every learner; each learner has one skill per
+    operation, stored on LearnerState.skills as operation → [θ, attempts].
+    An answer updates that single skill in constant time, with a step size
+    that shrinks as the learner's estimate settles. Item difficulties stay
+    fixed online (unless item_k is set) and are recalibrated in batch by
+    refit().
+    """
+
+    def __init__(self, level_operations: Dict[str, Dict[str, float]], level_spread: float = 1.0,
+                 difficulties: Dict[Tuple[str, str], float] = None, k_factor: float = 0.6,
+                 k_min: float = 0.15, k_decay: float = 0.1, item_k: float = 0.0):
+        """
+        Initialize the model
+
+        Args:
+            level_operations: Relative weight of each operation per level, easiest level first
+            level_spread: Prior difficulty of the easiest and hardest level is ∓level_spread
+            difficulties: Calibrated item difficulties overriding the prior
+            k_factor: Skill step size of a learner's first answer
+            k_min: Smallest skill step size
+            k_decay: How fast the step size shrinks with the learner's attempts
+            item_k: Item difficulty step size for online updates, 0 to keep them fixed
+        """
+        self.levels = list(level_operations)
+        self.level_index: Dict[str, int] = {level: i for i, level in enumerate(self.levels)}
+        self.level_operations: Dict[str, List[Tuple[str, float]]] = {}
+        for level, weights in level_operations.items():
+            total = sum(w for w in weights.values() if w > 0)
+            self.level_operations[level] = [(op, w / total) for op, w in weights.items() if w > 0]
+        self.level_spread = level_spread
+        self.k_factor = k_factor
+        self.k_min = k_min
+        self.k_decay = k_decay
+        self.item_k = item_k
+        self.difficulties: Dict[Tuple[str, str], float] = {
+            (level, op): self.prior(level, op) for level, ops in self.level_operations.items() for op, _ in ops
+        }
+        if difficulties:
+            self.difficulties.update(difficulties)
+
+    @classmethod
+    def for_generator(cls, generator: PuzzleGenerator, path: str = None, **kwargs) -> 'SkillModel':
+        """
+        Build a model over the generator's levels and operation mix
+
+        Args:
+            generator: Puzzle generator, with or without a difficulty scale
+            path: Optional parameter file written by save()
+            **kwargs: Further SkillModel arguments
+
+        Returns:
+            Skill model
+        """
+        if generator.scale is not None:
+            level_operations = {spec.name: spec.weights for spec in generator.scale.specs}
+            kwargs.setdefault('level_spread', 2.0)
+        else:
+            level_operations = {difficulty: {op: 1.0 for op in config['operations']}
+                                for difficulty, config in generator.DIFFICULTY_CONFIG.items()}
+        model = cls(level_operations, **kwargs)
+        if path:
+            model.load(path)
+        return model
+
+    def prior(self, level: str, op: str) -> float:
+        """Prior difficulty of an item: evenly spaced levels plus an operation offset"""
+        index = self.level_index.get(level, 0)
+        position = index / (len(self.levels) - 1) if len(self.levels) > 1 else 0.5
+        return self.level_spread * (2 * position - 1) + OPERATION_OFFSETS.get(op, 0.0)
+
+    def difficulty(self, level: str, op: str) -> float:
+        b = self.difficulties.get((level, op))
+        return self.prior(level, op) if b is None else b
+
+    def level_difficulty(self, level: str) -> float:
+        """Mean item difficulty of a level under its operation mix"""
+        return sum(share * self.difficulty(level, op) for op, share in self.level_operations[level])
+
+    def seed(self, skills: Dict[str, List[float]], level: str, offset: float):
+        """
+        Give a new learner the same skill in every operation
+
+        Args:
+            skills: The learner's (empty) skill table
+            level: Level the learner starts at
+            offset: Skill relative to the level's mean difficulty
+        """
+        theta = self.level_difficulty(level) + offset
+        for op in OPERATION_OFFSETS:
+            skills.setdefault(op, [theta, 0])
+
+    def update(self, skills: Dict[str, List[float]], level: str, op: str, is_correct: bool) -> float:
+        """
+        Elo update of one skill after an answer
+
+        Args:
+            skills: The learner's skill table, seeded beforehand
+            level: Level of the answered puzzle
+            op: Operation of the answered puzzle
+            is_correct: Whether the answer was correct
+
+        Returns:
+            Predicted success probability before the update
+        """
+        b = self.difficulty(level, op)
+        entry = skills.get(op)
+        if entry is None:
+            entry = skills[op] = [sum(e[0] for e in skills.values()) / len(skills) if skills else b, 0]
+        p = _sigmoid(entry[0] - b)
+        residual = (1.0 if is_correct else 0.0) - p
+        entry[0] += max(self.k_min, self.k_factor / (1.0 + self.k_decay * entry[1])) * residual
+        entry[1] += 1
+        if self.item_k:
+            self.difficulties[(level, op)] = b - self.item_k * residual
+        return p
+
+    def success_probability(self, skills: Dict[str, List[float]], level: str) -> float:
+        """Predicted success rate at a level, averaged over its operation mix"""
+        return sum(share * _sigmoid(skills[op][0] - self.difficulty(level, op))
+                   for op, share in self.level_operations[level])
+
+    @metrics.timed('skill_refit_seconds', 'SkillModel.refit wall time')
+    def refit(self, records: Iterable[Dict], iterations: int = 30, item_reg: float = 1.0,
+              skill_reg: float = 0.3) -> Dict:
+        """
+        Recalibrate item difficulties from stored attempts
+
+        Learner skills are fitted jointly but not kept; online skills keep
+        evolving from the new difficulties. Attempts at levels the model does
+        not know are skipped.
+
+        Args:
+            records: Attempt records, e.g. AttemptLog.replay()
+            iterations: Newton sweeps, see fit_rasch
+            item_reg: Pull of each difficulty towards its prior, in attempts
+            skill_reg: Pull of each skill towards 0, in attempts
+
+        Returns:
+            Summary with attempt, item and skill counts, mean absolute
+            difficulty change, log loss and seconds taken
+        """
+        start = time.perf_counter()
+        levels = self.level_index
+        persons, items, correct, _, item_keys = load_attempts(
+            record for record in records if record.get('level', record.get('difficulty')) in levels)
+        if not len(correct):
+            return {'attempts': 0, 'items': 0, 'skills': 0, 'mean_shift': 0.0, 'log_loss': None, 'seconds': 0.0}
+        prior = np.array([self.prior(*key) for key in item_keys])
+        before = np.array([self.difficulty(*key) for key in item_keys])
+        theta, b = fit_rasch(persons, items, correct, prior=prior, initial=before, iterations=iterations,
+                             item_reg=item_reg, skill_reg=skill_reg)
+        for key, value in zip(item_keys, b.tolist()):
+            self.difficulties[key] = value
+        return {
+            'attempts': len(correct),
+            'items': len(item_keys),
+            'skills': len(theta),
+            'mean_shift': round(float(np.abs(b - before).mean()), 4),
+            'log_loss': round(log_loss(theta[persons] - b[items], correct), 4),
+            'seconds': round(time.perf_counter() - start, 2)
+        }
+
+    def save(self, path: str):
+        """Write the item difficulties as JSON"""
+        data = {'format': PARAMETERS_FORMAT,
+                'difficulties': {f"{level}|{op}": round(b, 4) for (level, op), b in self.difficulties.items()}}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+
+    def load(self, path: str):
+        """Read item difficulties written by save(); items of unknown levels are ignored"""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('format') != PARAMETERS_FORMAT:
+            raise ValueError(f"unsupported parameter file format {data.get('format')!r}")
+        for key, b in data['difficulties'].items():
+            level, op = key.rsplit('|', 1)
+            if level in self.level_index:
+                self.difficulties[(level, op)] = float(b)
+
+
+def load_attempts(records: Iterable[Dict]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List, List]:
+    """
+    Encode attempt records as integer-coded columns
+
+    Args:
+        records: Attempt records with learner_id, difficulty (and level for
+            scale puzzles), operation and is_correct
+
+    Returns:
+        Tuple of (skill code, item code, correct) arrays plus the
+        (learner_id, operation) and (level, operation) keys of the codes
+    """
+    person_codes: Dict[Tuple, int] = {}
+    item_codes: Dict[Tuple, int] = {}
+    persons = []
+    items = []
+    correct = []
+    for record in records:
+        if record.get('kind', 'attempt') != 'attempt':
+            continue
+        op = record['operation']
+        person = (record.get('learner_id'), op)
+        item = (record.get('level', record['difficulty']), op)
+        code = person_codes.get(person)
+        if code is None:
+            code = person_codes[person] = len(person_codes)
+        persons.append(code)
+        code = item_codes.get(item)
+        if code is None:
+            code = item_codes[item] = len(item_codes)
+        items.append(code)
+        correct.append(record['is_correct'])
+    return (np.asarray(persons, dtype=np.int64), np.asarray(items, dtype=np.int64),
+            np.asarray(correct, dtype=np.float64), list(person_codes), list(item_codes))
+
+
+def fit_rasch(persons: np.ndarray, items: np.ndarray, correct: np.ndarray, prior: np.ndarray,
+              initial: np.ndarray = None, iterations: int = 30, item_reg: float = 1.0,
+              skill_reg: float = 0.3) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Regularized joint maximum-likelihood Rasch fit
+
+    Alternates one Newton step for every skill and one for every item
+    difficulty. Gradients and curvatures are per-code sums over attempts,
+    computed with np.bincount, so each sweep is a few vectorized passes over
+    the attempt columns. Steps are clipped to MAX_STEP logits, since a
+    full Newton step from a poor start overshoots. The Gaussian priors keep learners or items with all
+    answers right (or wrong) finite and fix the scale's origin.
+
+    Args:
+        persons: Skill code of each attempt
+        items: Item code of each attempt
+        correct: 1.0 for correct attempts, 0.0 otherwise
+        prior: Prior difficulty per item code
+        initial: Starting difficulties, the prior if omitted
+        iterations: Newton sweeps
+        item_reg: Prior precision of difficulties, in attempts
+        skill_reg: Prior precision of skills around 0, in attempts
+
+    Returns:
+        Tuple of (skill per skill code, difficulty per item code)
+    """
+    n_persons = int(persons.max()) + 1
+    n_items = len(prior)
+    b = np.array(prior if initial is None else initial, dtype=np.float64)
+    # Start every skill where its first item is answered correctly half the time
+    theta = np.zeros(n_persons)
+    theta[persons[::-1]] = b[items[::-1]]
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(b[items] - theta[persons]))
+        residual = correct - p
+        weight = p * (1.0 - p)
+        theta += np.clip((np.bincount(persons, residual, n_persons) - skill_reg * theta)
+                         / (np.bincount(persons, weight, n_persons) + skill_reg), -MAX_STEP, MAX_STEP)
+        p = 1.0 / (1.0 + np.exp(b[items] - theta[persons]))
+        residual = correct - p
+        weight = p * (1.0 - p)
+        b -= np.clip((np.bincount(items, residual, n_items) + item_reg * (b - prior))
+                     / (np.bincount(items, weight, n_items) + item_reg), -MAX_STEP, MAX_STEP)
+    return theta, b
+
+
+def log_loss(logits: np.ndarray, correct: np.ndarray) -> float:
+    """Mean negative log-likelihood of the answers"""
+    return float(np.mean(np.logaddexp(0.0, -logits) + (1.0 - correct) * logits))
+
+
+class SkillEngine(AdaptiveEngine):
+    """
+    Adaptive engine choosing the level whose predicted success rate is closest to a target
+
+    Every answer updates the learner's skill in the puzzle's operation (see
+    SkillModel), so a learner who only struggles with division is judged on
+    division, not on their last three answers. After the warm-up, the level
+    is kept while its predicted success rate stays within tolerance of the
+    target; otherwise the engine moves to the level, at most max_step away,
+    whose prediction is closest to the target.
+
+    adapt_learner and record_attempt use the skill model; evaluate and
+    adapt_difficulty, which see no per-attempt operations, keep the
+    inherited rules.
+    """
+
+    def __init__(self, model: SkillModel, target: float = 0.75, tolerance: float = 0.1,
+                 max_step: int = 3, min_attempts: int = 2, window_size: int = 3):
+        """
+        Initialize the engine
+
+        Args:
+            model: Skill model shared by every learner
+            target: Success probability to aim for
+            tolerance: Allowed distance from the target before moving level
+            max_step: Most levels moved in one adaptation
+            min_attempts: Answers needed before the first adaptation
+            window_size: Recent attempts summarized in adaptation events
+        """
+        super().__init__(window_size=window_size)
+        if not 0.0 < target < 1.0:
+            raise ValueError("target must be between 0 and 1")
+        self.model = model
+        self.target = target
+        self.tolerance = tolerance
+        self.max_step = max_step
+        self.min_attempts = min_attempts
+        self._seed_offset = _logit(target)
+
+    def record_attempt(self, learner, puzzle: Dict, is_correct: bool, time_spent: float):
+        """Count the answer and update the learner's skill in the puzzle's operation"""
+        learner.record(is_correct, time_spent)
+        level = puzzle.get('level', puzzle['difficulty'])
+        if not learner.skills:
+            self.model.seed(learner.skills, learner.current_difficulty, self._seed_offset)
+        self.model.update(learner.skills, level, puzzle['operation'], is_correct)
+
+    def predict(self, learner, level: str) -> float:
+        """Predicted success rate of the learner at a level"""
+        if not learner.skills:
+            self.model.seed(learner.skills, learner.current_difficulty, self._seed_offset)
+        return self.model.success_probability(learner.skills, level)
+
+    @metrics.timed('engine_adapt_seconds', 'AdaptiveEngine adaptation wall time')
+    def adapt_learner(self, learner, trend_window=None) -> str:
+        """
+        Move the learner towards the level matching the target success rate
+
+        Args:
+            learner: LearnerState whose skills, current_difficulty and
+                difficulty_history are read and updated
+            trend_window: Ignored; the skills already summarize the history
+
+        Returns:
+            Recommended difficulty level
+        """
+        current = learner.current_difficulty
+        index = self.model.level_index.get(current)
+        if index is None:
+            raise ValueError(f"unknown difficulty {current!r}")
+        if learner.attempt_count < self.min_attempts:
+            return current
+
+        p_current = self.predict(learner, current)
+        if abs(p_current - self.target) <= self.tolerance:
+            return current
+        best, best_p = index, p_current
+        levels = self.model.levels
+        for candidate in range(max(index - self.max_step, 0), min(index + self.max_step + 1, len(levels))):
+            p = self.model.success_probability(learner.skills, levels[candidate])
+            if abs(p - self.target) < abs(best_p - self.target):
+                best, best_p = candidate, p
+        if best == index:
+            return current
+
+        new_difficulty = levels[best]
+        window = learner.window
+        learner.difficulty_history.append({
+            'from': current,
+            'to': new_difficulty,
+            'reason': f"Moving to {new_difficulty}: predicted success {best_p:.0%} "
+                      f"(was {p_current:.0%} at {current})",
+            'correct_count': window.correct_count,
+            'total_attempts': window.count,
+            'avg_time': round(window.avg_time, 2),
+            'rule': 'skill_target',
+            'rules': 'skill_model',
+            'p_success': round(p_current, 3),
+            'p_next': round(best_p, 3)
+        })
+        metrics.inc('engine_difficulty_changes_total', help='Difficulty changes made by the engine')
+        learner.current_difficulty = new_difficulty
+        return new_difficulty
+
+    def skill_summary(self, learner) -> Dict[str, float]:
+        """Predicted success rate per operation at the learner's current level"""
+        if not learner.skills:
+            return {}
+        level = learner.current_difficulty
+        return {op: round(_sigmoid(learner.skills[op][0] - self.model.difficulty(level, op)), 3)
+                for op, _ in self.model.level_operations[level]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalibrate puzzle difficulties from an attempt log")
+    parser.add_argument('directory', help='attempt log directory')
+    parser.add_argument('--out', required=True, help='parameter file to write')
+    parser.add_argument('--levels', type=int, help='fine-grained difficulty scale with this many levels')
+    parser.add_argument('--init', help='start from an earlier parameter file')
+    parser.add_argument('--iterations', type=int, default=30)
+    args = parser.parse_args()
+
+    scale = DifficultyScale(default_specs(args.levels)) if args.levels else None
+    model = SkillModel.for_generator(PuzzleGenerator(scale), args.init)
+    summary = model.refit(LogReader(args.directory), iterations=args.iterations)
+    model.save(args.out)
+    print(f"{summary['attempts']:,} attempts, {summary['items']} items, {summary['skills']:,} learner skills "
+          f"in {summary['seconds']}s; mean difficulty change {summary['mean_shift']}, "
+          f"log loss {summary['log_loss']}")
+
+
+if __name__ == '__main__':
+    main()
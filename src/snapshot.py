@@ -0,0 +1,638 @@
+"""
+Snapshot Module
+Versioned binary snapshots of tracker, engine and learner state
+"""
+import json
+import mmap
+import struct
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from adaptive_engine import AdaptiveEngine
+from attempt_store import AttemptStore, ColumnarPerformanceTracker
+from learner_state import LearnerState
+from quantile_sketch import KLLSketch
+from random_streams import RandomStream
+from tracker import PerformanceTracker, RunningStats
+
+MAGIC = b'MASS'
+FORMAT_VERSION = 2
+FLAG_ZSTD = 1
+
+# magic, format version, flags, uncompressed body length
+_HEADER = struct.Struct('<4sHHQ')
+# tag, reserved, payload length; payloads are padded to 8 bytes so columns stay aligned
+_SECTION = struct.Struct('<4sIQ')
+# learner ref, version, epoch, session start, attempt start, columnar flag, window count
+_TRACKER = struct.Struct('<IQQddB3xI')
+# kind, label ref, count, correct, total, min, max, mean, m2
+_STATS = struct.Struct('<B3xIQQddddd')
+# k, level count, count, min, max
+_SKETCH = struct.Struct('<IIQdd')
+# learner ref, current difficulty ref, attempt count, correct count, window size
+_LEARNER = struct.Struct('<IIQQI4x')
+# learner stream seed and position
+_STREAM = struct.Struct('<QQ')
+
+NO_REF = 0xFFFFFFFF
+NO_LEVEL = 0xFFFF
+NO_REVIEW = 0xFF
+
+# Attempt columns in file order; labels are string table codes
+ATTEMPT_COLUMNS = (
+    ('timestamp', '<i8'),       # wall-clock seconds, as datetime64[s]
+    ('correct_answer', '<i8'),
+    ('user_answer', '<i8'),
+    ('num1', '<i4'),
+    ('num2', '<i4'),
+    ('time_spent', '<u4'),      # centiseconds
+    ('difficulty', '<u2'),
+    ('level', '<u2'),           # NO_LEVEL for puzzles without a scale level
+    ('operation', '<u2'),
+    ('is_correct', '?'),
+    ('review', '<u1')           # Leitner box of a review attempt, NO_REVIEW otherwise
+)
+# Format 1 snapshots have no review column
+_ATTEMPT_COLUMNS_V1 = tuple(column for column in ATTEMPT_COLUMNS if column[0] != 'review')
+
+# Adaptation event columns in file order; other keys go to 'extra' as JSON
+EVENT_COLUMNS = (
+    ('avg_time', '<f8'),
+    ('from', '<u4'),
+    ('to', '<u4'),
+    ('reason', '<u4'),
+    ('correct_count', '<u4'),
+    ('total_attempts', '<u4'),
+    ('rule', '<u4'),
+    ('rules', '<u4'),
+    ('extra', '<u4')
+)
+_EVENT_STRINGS = ('from', 'to', 'reason', 'rule', 'rules')
+_EVENT_FIELDS = frozenset(name for name, _ in EVENT_COLUMNS if name != 'extra')
+
+
+def _padding(size: int) -> int:
+    return -size % 8
+
+
+def _format_timestamps(seconds: np.ndarray) -> List[str]:
+    """'YYYY-MM-DD HH:MM:SS' strings of wall-clock seconds, assembled as a character array"""
+    days, inverse = np.unique(seconds // 86400, return_inverse=True)
+    dates = np.datetime_as_string(days.astype('datetime64[D]')).astype('U10')
+    chars = np.empty((len(seconds), 19), dtype=np.uint32)
+    chars[:, :10] = dates.view(np.uint32).reshape(-1, 10)[inverse]
+    chars[:, 10] = ord(' ')
+    chars[:, 13] = chars[:, 16] = ord(':')
+    clock = seconds % 86400
+    for start, value in ((11, clock // 3600), (14, clock // 60 % 60), (17, clock % 60)):
+        chars[:, start] = ord('0') + value // 10
+        chars[:, start + 1] = ord('0') + value % 10
+    return chars.view('U19').ravel().tolist()
+
+
+def _local_offsets(epoch_seconds: np.ndarray) -> np.ndarray:
+    """Local UTC offset in seconds at each instant, looked up once per distinct hour"""
+    hours, inverse = np.unique(epoch_seconds // 3600, return_inverse=True)
+    offsets = [datetime.fromtimestamp(hour * 3600).astimezone().utcoffset().total_seconds()
+               for hour in hours.tolist()]
+    return np.asarray(offsets, dtype=np.int64)[inverse]
+
+
+class _SnapshotWriter:
+    """Collects sections and interns their strings"""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self.sections: List[Tuple[bytes, List]] = []
+
+    def ref(self, value: Optional[str]) -> int:
+        """String table code of a string, NO_REF for None"""
+        if value is None:
+            return NO_REF
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+    def refs(self, values: List[Optional[str]]) -> List[int]:
+        """String table codes of many strings, interning each distinct one once"""
+        mapping = {value: self.ref(value) for value in dict.fromkeys(values)}
+        return list(map(mapping.__getitem__, values))
+
+    def label_codes(self, values: List[Optional[str]]) -> np.ndarray:
+        """Codes of attempt labels for the 16-bit label columns, NO_LEVEL for None"""
+        mapping = {value: NO_LEVEL if value is None else self.ref(value) for value in dict.fromkeys(values)}
+        if len(self.strings) >= NO_LEVEL:
+            raise ValueError("too many distinct labels for a snapshot")
+        return np.array(list(map(mapping.__getitem__, values)), dtype='<u2')
+
+    def add(self, tag: bytes, parts: List):
+        self.sections.append((tag, parts))
+
+    def columns(self, spec, values: Dict[str, np.ndarray]) -> List:
+        """Row count followed by each column, padded to 8 bytes"""
+        count = len(next(iter(values.values()))) if values else 0
+        parts = [struct.pack('<Q', count)]
+        for name, dtype in spec:
+            data = np.ascontiguousarray(values[name], dtype=dtype).tobytes()
+            parts.append(data)
+            parts.append(b'\0' * _padding(len(data)))
+        return parts
+
+    def finish(self, compress: bool) -> bytes:
+        encoded = [value.encode('utf-8') for value in self.strings]
+        offsets = np.zeros(len(encoded) + 1, dtype='<u4')
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        self.add(b'STRS', [struct.pack('<Q', len(encoded)), offsets.tobytes(),
+                           b'\0' * _padding(offsets.nbytes), b''.join(encoded)])
+
+        chunks = []
+        for tag, parts in self.sections:
+            size = sum(len(part) for part in parts)
+            chunks.append(_SECTION.pack(tag, 0, size))
+            chunks.extend(parts)
+            chunks.append(b'\0' * _padding(size))
+        body = b''.join(chunks)
+        flags = 0
+        if compress:
+            import zstandard
+            body = zstandard.ZstdCompressor(level=3).compress(body)
+            flags |= FLAG_ZSTD
+        return _HEADER.pack(MAGIC, FORMAT_VERSION, flags, sum(len(chunk) for chunk in chunks)) + body
+
+
+def _encode_attempts(writer: _SnapshotWriter, tracker: PerformanceTracker) -> Dict[str, np.ndarray]:
+    """Attempt columns of a tracker, read straight from the store of a columnar one"""
+    if isinstance(tracker, ColumnarPerformanceTracker):
+        store = tracker.store
+        epoch = np.floor(store.column('timestamp')).astype(np.int64)
+        difficulty_refs = writer.label_codes(store.difficulty_labels)
+        operation_refs = writer.label_codes(store.operation_labels)
+        return {
+            'timestamp': epoch + _local_offsets(epoch),
+            'correct_answer': store.column('correct_answer'),
+            'user_answer': store.column('user_answer'),
+            'num1': store.column('num1'),
+            'num2': store.column('num2'),
+            'time_spent': np.rint(store.column('time_spent') * 100),
+            'difficulty': difficulty_refs[store.column('difficulty')],
+            # The store marks a missing level with -1, which picks the appended NO_LEVEL
+            'level': np.append(writer.label_codes(store.level_labels), NO_LEVEL)[store.column('level')],
+            'operation': operation_refs[store.column('operation')],
+            'is_correct': store.column('is_correct'),
+            'review': np.where(store.column('review') < 0, NO_REVIEW, store.column('review'))
+        }
+
+    attempts = tracker.attempts
+    operations = [attempt['operation'] for attempt in attempts]
+    # Questions are 'num1 op num2': drop the operators and parse all operands in one go
+    text = ' '.join([attempt['puzzle'] for attempt in attempts])
+    for operation in dict.fromkeys(operations):
+        text = text.replace(f" {operation} ", ' ')
+    operands = np.fromstring(text, dtype=np.int64, sep=' ') if attempts else np.empty(0, dtype=np.int64)
+    if len(operands) != 2 * len(attempts):
+        raise ValueError("attempt questions must have the form 'num1 op num2'")
+    return {
+        'timestamp': np.array([attempt['timestamp'] for attempt in attempts], dtype='datetime64[s]').view(np.int64),
+        'correct_answer': [attempt['correct_answer'] for attempt in attempts],
+        'user_answer': [attempt['user_answer'] for attempt in attempts],
+        'num1': operands[0::2],
+        'num2': operands[1::2],
+        'time_spent': np.rint(np.array([attempt['time_spent'] for attempt in attempts], dtype=np.float64) * 100),
+        'difficulty': writer.label_codes([attempt['difficulty'] for attempt in attempts]),
+        'level': writer.label_codes([attempt.get('level') for attempt in attempts]),
+        'operation': writer.label_codes(operations),
+        'is_correct': [attempt['is_correct'] for attempt in attempts],
+        'review': [attempt.get('review', NO_REVIEW) for attempt in attempts]
+    }
+
+
+def _encode_stats(writer: _SnapshotWriter, kind: int, label: Optional[str], stats: RunningStats) -> List:
+    sketch = stats.time_sketch
+    lengths = np.array([len(values) for values in sketch.levels], dtype='<u4')
+    return [
+        _STATS.pack(kind, writer.ref(label), stats.count, stats.correct, stats.total_time,
+                    stats.min_time, stats.max_time, stats.mean_time, stats._m2),
+        _SKETCH.pack(sketch.k, len(lengths), sketch.count, sketch.min_value, sketch.max_value),
+        lengths.tobytes(), b'\0' * _padding(lengths.nbytes),
+        np.array([value for values in sketch.levels for value in values], dtype='<f8').tobytes()
+    ]
+
+
+def _encode_history(writer: _SnapshotWriter, history: List[Dict]) -> List:
+    columns = {name: writer.refs([event.get(name) for event in history]) for name in _EVENT_STRINGS}
+    columns['correct_count'] = [event.get('correct_count', 0) for event in history]
+    columns['total_attempts'] = [event.get('total_attempts', 0) for event in history]
+    columns['avg_time'] = [event.get('avg_time', 0.0) for event in history]
+    columns['extra'] = [NO_REF] * len(history)
+    for index, event in enumerate(history):
+        if not _EVENT_FIELDS.issuperset(event):
+            extra = {key: value for key, value in event.items() if key not in _EVENT_FIELDS}
+            columns['extra'][index] = writer.ref(json.dumps(extra, sort_keys=True))
+    return writer.columns(EVENT_COLUMNS, columns)
+
+
+def dump_session(tracker: PerformanceTracker = None, learner: LearnerState = None,
+                 engine: AdaptiveEngine = None, compress: bool = False) -> bytes:
+    """
+    Serialize session state into a snapshot
+
+    Attempts are stored as fixed-width columns with difficulty, level and
+    operation labels interned into a string table and the Leitner box of
+    review attempts in a column of its own, and the tracker's
+    running aggregates (including the quantile sketches) are stored as they
+    are, so restoring does not replay the history. Times are kept in
+    centiseconds, the resolution log_attempt rounds to. The sink is not
+    part of the snapshot.
+
+    Args:
+        tracker: PerformanceTracker or ColumnarPerformanceTracker
+        learner: LearnerState of the session
+        engine: AdaptiveEngine whose own current difficulty and history to keep
+        compress: Compress with zstd (needs the zstandard package); loading
+            then decompresses into memory instead of reading zero-copy
+
+    Returns:
+        Snapshot bytes
+    """
+    writer = _SnapshotWriter()
+    if tracker is not None:
+        columnar = isinstance(tracker, ColumnarPerformanceTracker)
+        writer.add(b'ATTS', writer.columns(ATTEMPT_COLUMNS, _encode_attempts(writer, tracker)))
+        sizes = np.array(list(tracker.windows), dtype='<u4')
+        writer.add(b'TRAK', [
+            _TRACKER.pack(writer.ref(tracker.learner_id), tracker.version, tracker.epoch,
+                          np.nan if tracker.session_start is None else tracker.session_start,
+                          np.nan if tracker.current_attempt_start is None else tracker.current_attempt_start,
+                          columnar, len(sizes)),
+            sizes.tobytes()
+        ])
+        parts = _encode_stats(writer, 0, None, tracker._overall)
+        for difficulty, stats in tracker._by_difficulty.items():
+            parts += _encode_stats(writer, 1, difficulty, stats)
+        for operation, stats in tracker._by_operation.items():
+            parts += _encode_stats(writer, 2, operation, stats)
+        writer.add(b'AGGS', [struct.pack('<Q', 1 + len(tracker._by_difficulty) + len(tracker._by_operation))] + parts)
+
+    if learner is not None:
+        window = learner.window
+        recent = [(window._next - offset) % window.size for offset in range(window.count, 0, -1)]
+        writer.add(b'LRNR', [
+            _LEARNER.pack(writer.ref(learner.learner_id), writer.ref(learner.current_difficulty),
+                          learner.attempt_count, learner.correct_count, window.size),
+            *writer.columns((('time', '<u4'), ('correct', '?')),
+                            {'time': [window._times[slot] for slot in recent],
+                             'correct': [window._correct[slot] for slot in recent]}),
+            *writer.columns((('key', '<i8'),), {'key': sorted(learner.seen_puzzles)}),
+            *writer.columns((('skill', '<f8'), ('attempts', '<u4'), ('operation', '<u4')),
+                            {'skill': [entry[0] for entry in learner.skills.values()],
+                             'attempts': [entry[1] for entry in learner.skills.values()],
+                             'operation': [writer.ref(op) for op in learner.skills]})
+        ])
+        writer.add(b'LHST', _encode_history(writer, learner.difficulty_history))
+        writer.add(b'RAND', [_STREAM.pack(learner.rng.seed, learner.rng.position)])
+
+    if engine is not None:
+        writer.add(b'ENGN', [struct.pack('<I4x', writer.ref(engine.current_difficulty))])
+        writer.add(b'EHST', _encode_history(writer, engine.difficulty_history))
+    return writer.finish(compress)
+
+
+def save_session(path: str, tracker: PerformanceTracker = None, learner: LearnerState = None,
+                 engine: AdaptiveEngine = None, compress: bool = False) -> int:
+    """
+    Write a snapshot file, see dump_session
+
+    Returns:
+        Number of bytes written
+    """
+    data = dump_session(tracker, learner, engine, compress)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+class SessionSnapshot:
+    """
+    Read access to a snapshot held in bytes, a memoryview or a memory map
+
+    Columns are NumPy views straight into the buffer, so opening even a
+    million-attempt snapshot only parses the section table; attempts are
+    turned into dicts when asked for, one at a time through attempts or all
+    at once by restore_tracker.
+    """
+
+    def __init__(self, buffer):
+        """
+        Parse the header and section table
+
+        Args:
+            buffer: Snapshot bytes or any object supporting the buffer protocol
+        """
+        view = memoryview(buffer)
+        if len(view) < _HEADER.size:
+            raise ValueError("not a session snapshot")
+        magic, version, flags, length = _HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("not a session snapshot")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"snapshot format {version} is newer than supported ({FORMAT_VERSION})")
+        self.version = version
+        body = view[_HEADER.size:]
+        if flags & FLAG_ZSTD:
+            import zstandard
+            body = memoryview(zstandard.ZstdDecompressor().decompress(body, max_output_size=length))
+
+        self._sections: Dict[bytes, memoryview] = {}
+        offset = 0
+        while offset < len(body):
+            tag, _, size = _SECTION.unpack_from(body, offset)
+            offset += _SECTION.size
+            self._sections[tag] = body[offset:offset + size]
+            offset += size + _padding(size)
+
+        strings = self._sections[b'STRS']
+        count, = struct.unpack_from('<Q', strings)
+        offsets = np.frombuffer(strings, dtype='<u4', count=count + 1, offset=8).tolist()
+        start = 8 + 4 * (count + 1)
+        start += _padding(start)
+        blob = bytes(strings[start:])
+        self.strings: List[str] = [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(count)]
+        spec = ATTEMPT_COLUMNS if version >= 2 else _ATTEMPT_COLUMNS_V1
+        self._columns = self._read_columns(b'ATTS', spec)[0] if b'ATTS' in self._sections else {}
+        if self._columns and 'review' not in self._columns:
+            self._columns['review'] = np.full(len(self._columns['timestamp']), NO_REVIEW, dtype='<u1')
+
+    @classmethod
+    def open(cls, path: str) -> 'SessionSnapshot':
+        """Map a snapshot file read-only; it stays mapped while the snapshot or any column is in use"""
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _read_columns(self, tag: bytes, spec, offset: int = 0) -> Tuple[Dict[str, np.ndarray], int]:
+        """Column views of a section part written by _SnapshotWriter.columns, and the offset after it"""
+        data = self._sections[tag]
+        count, = struct.unpack_from('<Q', data, offset)
+        offset += 8
+        columns = {}
+        for name, dtype in spec:
+            columns[name] = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+            offset += columns[name].nbytes + _padding(columns[name].nbytes)
+        return columns, offset
+
+    def _string(self, code: int) -> Optional[str]:
+        return None if code == NO_REF else self.strings[code]
+
+    def __len__(self) -> int:
+        """Number of attempts in the snapshot"""
+        return len(self._columns['timestamp']) if self._columns else 0
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only view of an attempt column in its stored encoding, see ATTEMPT_COLUMNS"""
+        return self._columns[name]
+
+    def _decode(self, codes: np.ndarray, missing: int) -> np.ndarray:
+        """Strings of a code column as an object array, None for the missing code"""
+        table = np.array(self.strings + [None], dtype=object)
+        codes = codes.astype(np.int64)
+        codes[codes == missing] = len(self.strings)
+        return table[codes]
+
+    def labels(self, name: str) -> np.ndarray:
+        """Label strings of a difficulty, level or operation column (None where absent)"""
+        return self._decode(self._columns[name], NO_LEVEL)
+
+    @property
+    def attempts(self) -> 'SnapshotAttempts':
+        """Lazy sequence of attempt dicts"""
+        return SnapshotAttempts(self)
+
+    def row(self, index: int) -> Dict:
+        """Materialize one attempt in the PerformanceTracker dict format"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("attempt index out of range")
+        columns = self._columns
+        operation = self.strings[columns['operation'][index]]
+        timestamp = np.datetime64(int(columns['timestamp'][index]), 's')
+        attempt = {
+            'timestamp': str(timestamp).replace('T', ' '),
+            'puzzle': f"{columns['num1'][index]} {operation} {columns['num2'][index]}",
+            'correct_answer': int(columns['correct_answer'][index]),
+            'user_answer': int(columns['user_answer'][index]),
+            'is_correct': bool(columns['is_correct'][index]),
+            'time_spent': int(columns['time_spent'][index]) / 100,
+            'difficulty': self.strings[columns['difficulty'][index]],
+            'operation': operation
+        }
+        if columns['level'][index] != NO_LEVEL:
+            attempt['level'] = self.strings[columns['level'][index]]
+        if columns['review'][index] != NO_REVIEW:
+            attempt['review'] = int(columns['review'][index])
+        return attempt
+
+    def attempt_dicts(self) -> List[Dict]:
+        """All attempts in the PerformanceTracker dict format, built column by column"""
+        if not self._columns:
+            return []
+        columns = self._columns
+        attempts = [
+            {'timestamp': timestamp, 'puzzle': f"{num1} {operation} {num2}", 'correct_answer': answer,
+             'user_answer': user_answer, 'is_correct': is_correct, 'time_spent': time_spent,
+             'difficulty': difficulty, 'operation': operation}
+            for timestamp, num1, operation, num2, answer, user_answer, is_correct, time_spent, difficulty in zip(
+                _format_timestamps(columns['timestamp']), columns['num1'].tolist(), self.labels('operation').tolist(),
+                columns['num2'].tolist(), columns['correct_answer'].tolist(), columns['user_answer'].tolist(),
+                columns['is_correct'].tolist(), (columns['time_spent'] / 100).tolist(),
+                self.labels('difficulty').tolist())
+        ]
+        with_level = np.flatnonzero(columns['level'] != NO_LEVEL)
+        for index, level in zip(with_level.tolist(), self.labels('level')[with_level].tolist()):
+            attempts[index]['level'] = level
+        with_review = np.flatnonzero(columns['review'] != NO_REVIEW)
+        for index, box in zip(with_review.tolist(), columns['review'][with_review].tolist()):
+            attempts[index]['review'] = box
+        return attempts
+
+    def _recode(self, name: str, code_for, dtype=np.int8) -> np.ndarray:
+        """Translate a label column into another interning, calling code_for once per distinct label (None if absent)"""
+        codes, inverse = np.unique(self._columns[name], return_inverse=True)
+        return np.array([code_for(None if code == NO_LEVEL else self.strings[code]) for code in codes.tolist()],
+                        dtype=dtype)[inverse]
+
+    def _read_stats(self) -> List[Tuple[int, Optional[str], RunningStats]]:
+        data = self._sections[b'AGGS']
+        count, = struct.unpack_from('<Q', data)
+        offset = 8
+        entries = []
+        for _ in range(count):
+            kind, label, *values = _STATS.unpack_from(data, offset)
+            offset += _STATS.size
+            stats = RunningStats()
+            (stats.count, stats.correct, stats.total_time, stats.min_time,
+             stats.max_time, stats.mean_time, stats._m2) = values
+            k, levels, sketch_count, sketch_min, sketch_max = _SKETCH.unpack_from(data, offset)
+            offset += _SKETCH.size
+            lengths = np.frombuffer(data, dtype='<u4', count=levels, offset=offset).tolist()
+            offset += 4 * levels + _padding(4 * levels)
+            values = np.frombuffer(data, dtype='<f8', count=sum(lengths), offset=offset).tolist()
+            offset += 8 * len(values)
+            start = 0
+            sketch_levels = []
+            for length in lengths:
+                sketch_levels.append(values[start:start + length])
+                start += length
+            stats.time_sketch = KLLSketch.from_dict({'k': k, 'count': sketch_count, 'min': sketch_min,
+                                                     'max': sketch_max, 'levels': sketch_levels})
+            entries.append((kind, self._string(label), stats))
+        return entries
+
+    def _read_history(self, tag: bytes) -> List[Dict]:
+        columns, _ = self._read_columns(tag, EVENT_COLUMNS)
+        strings = {name: self._decode(columns[name], NO_REF) for name in _EVENT_STRINGS}
+        history = [
+            {'from': source, 'to': target, 'reason': reason, 'correct_count': correct,
+             'total_attempts': total, 'avg_time': avg_time}
+            for source, target, reason, correct, total, avg_time in zip(
+                strings['from'].tolist(), strings['to'].tolist(), strings['reason'].tolist(),
+                columns['correct_count'].tolist(), columns['total_attempts'].tolist(),
+                columns['avg_time'].tolist())
+        ]
+        for name in ('rule', 'rules'):
+            present = np.flatnonzero(columns[name] != NO_REF)
+            for index, value in zip(present.tolist(), strings[name][present].tolist()):
+                history[index][name] = value
+        for index in np.flatnonzero(columns['extra'] != NO_REF).tolist():
+            history[index].update(json.loads(self.strings[columns['extra'][index]]))
+        return history
+
+    def restore_tracker(self, sink=None, columnar: bool = None) -> PerformanceTracker:
+        """
+        Rebuild the tracker with its attempts and aggregates
+
+        Args:
+            sink: Durable log for attempts logged from now on
+            columnar: Restore into a ColumnarPerformanceTracker (True) or a
+                dict-based PerformanceTracker (False) instead of the saved
+                kind; the columnar one is filled without building a dict per
+                attempt
+
+        Returns:
+            PerformanceTracker or ColumnarPerformanceTracker
+        """
+        if b'TRAK' not in self._sections:
+            raise ValueError("snapshot has no tracker")
+        data = self._sections[b'TRAK']
+        learner_id, version, epoch, session_start, attempt_start, saved_columnar, window_count = \
+            _TRACKER.unpack_from(data)
+        sizes = np.frombuffer(data, dtype='<u4', count=window_count, offset=_TRACKER.size).tolist()
+        if columnar is None:
+            columnar = saved_columnar
+        cls = ColumnarPerformanceTracker if columnar else PerformanceTracker
+        tracker = cls(window_sizes=sizes, learner_id=self._string(learner_id), sink=sink)
+        columns = self._columns
+
+        if columnar:
+            store = tracker.store = AttemptStore(capacity=max(len(self), 1))
+            wall_clock = columns['timestamp']
+            # Local offset at the wall-clock time itself; exact except within a DST change
+            epoch_seconds = wall_clock - _local_offsets(wall_clock - _local_offsets(wall_clock))
+            store.extend(
+                timestamp=epoch_seconds.astype(np.float64),
+                time_spent=columns['time_spent'] / 100,
+                is_correct=columns['is_correct'],
+                difficulty=self._recode('difficulty', store.difficulty_code),
+                operation=self._recode('operation', store.operation_code),
+                num1=columns['num1'], num2=columns['num2'],
+                correct_answer=columns['correct_answer'], user_answer=columns['user_answer'],
+                level=self._recode('level', store.level_code, np.int16),
+                review=np.where(columns['review'] == NO_REVIEW, -1, columns['review']).astype(np.int8))
+        else:
+            tracker._attempts = self.attempt_dicts()
+
+        for kind, label, stats in self._read_stats():
+            if kind == 0:
+                tracker._overall = stats
+            elif kind == 1:
+                tracker._by_difficulty[label] = stats
+            else:
+                tracker._by_operation[label] = stats
+        if tracker.keep_operation_times and columns:
+            times = columns['time_spent'] / 100
+            for operation in tracker._by_operation:
+                code = self.strings.index(operation)
+                tracker._operation_times[operation] = times[columns['operation'] == code].tolist()
+        else:
+            tracker._operation_times = {operation: [] for operation in tracker._by_operation}
+        for size, window in tracker.windows.items():
+            for index in range(max(len(self) - size, 0), len(self)):
+                window.push(bool(columns['is_correct'][index]), int(columns['time_spent'][index]) / 100)
+
+        tracker.version = version
+        tracker.epoch = epoch
+        tracker.session_start = None if np.isnan(session_start) else session_start
+        tracker.current_attempt_start = None if np.isnan(attempt_start) else attempt_start
+        return tracker
+
+    def restore_learner(self) -> LearnerState:
+        """Rebuild the learner's adaptation state"""
+        if b'LRNR' not in self._sections:
+            raise ValueError("snapshot has no learner")
+        learner_id, difficulty, attempt_count, correct_count, window_size = \
+            _LEARNER.unpack_from(self._sections[b'LRNR'])
+        learner = LearnerState(self._string(learner_id), self._string(difficulty), window_size)
+        learner.attempt_count = attempt_count
+        learner.correct_count = correct_count
+        window, offset = self._read_columns(b'LRNR', (('time', '<u4'), ('correct', '?')), _LEARNER.size)
+        for centiseconds, is_correct in zip(window['time'].tolist(), window['correct'].tolist()):
+            learner.window.push(is_correct, centiseconds / 100)
+        seen, offset = self._read_columns(b'LRNR', (('key', '<i8'),), offset)
+        learner.seen_puzzles = set(seen['key'].tolist())
+        skills, _ = self._read_columns(b'LRNR', (('skill', '<f8'), ('attempts', '<u4'), ('operation', '<u4')),
+                                       offset)
+        for skill, attempts, operation in zip(skills['skill'].tolist(), skills['attempts'].tolist(),
+                                              skills['operation'].tolist()):
+            learner.skills[self.strings[operation]] = [skill, attempts]
+        learner.difficulty_history = self._read_history(b'LHST')
+        if b'RAND' in self._sections:
+            learner.rng = RandomStream(*_STREAM.unpack_from(self._sections[b'RAND']))
+        return learner
+
+    def restore_engine(self, engine: AdaptiveEngine = None) -> AdaptiveEngine:
+        """
+        Restore an engine's own current difficulty and history
+
+        Args:
+            engine: Engine to restore into, a default AdaptiveEngine if omitted
+
+        Returns:
+            The engine
+        """
+        if b'ENGN' not in self._sections:
+            raise ValueError("snapshot has no engine state")
+        engine = engine or AdaptiveEngine()
+        code, = struct.unpack_from('<I', self._sections[b'ENGN'])
+        engine.current_difficulty = self._string(code)
+        engine.difficulty_history = self._read_history(b'EHST')
+        return engine
+
+
+class SnapshotAttempts(Sequence):
+    """Read-only sequence of attempt dicts backed by a SessionSnapshot"""
+
+    def __init__(self, snapshot: SessionSnapshot):
+        self.snapshot = snapshot
+
+    def __len__(self) -> int:
+        return len(self.snapshot)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.snapshot.row(i) for i in range(*index.indices(len(self.snapshot)))]
+        return self.snapshot.row(index)
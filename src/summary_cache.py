@@ -0,0 +1,207 @@
+"""
+Summary Cache Module
+Version-keyed memoization and an incrementally built attempt table for the summary view
+"""
+from typing import TYPE_CHECKING, Callable, Dict, Sequence, Tuple
+
+import numpy as np
+
+from puzzle_generator import PuzzleGenerator
+
+if TYPE_CHECKING:
+    # pandas is imported on first use: the summary view is the only consumer
+    import pandas as pd
+
+
+class AttemptTable:
+    """
+    Attempt log as growable column buffers behind a single DataFrame
+
+    The table is not fed by log_attempt: SummaryCache.attempt_table appends
+    only the attempts logged since its last call, so the play loop pays
+    nothing for it and each attempt is converted once, when the summary
+    view next renders. The DataFrame is built over the filled part only
+    when requested after an append, and display pages are sliced straight
+    from the buffers, so a long session is never rebuilt from dicts.
+    """
+
+    COLUMNS = {
+        'Question': object,
+        'Your Answer': np.int64,
+        'Correct Answer': np.int64,
+        'Correct': bool,
+        'Time (s)': np.float64,
+        'Difficulty': np.int8
+    }
+
+    DIFFICULTIES = list(PuzzleGenerator.DIFFICULTY_CONFIG)
+    _difficulty_labels = np.array(DIFFICULTIES, dtype=object)
+
+    def __init__(self, capacity: int = 256):
+        self._columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in self.COLUMNS.items()}
+        self._size = 0
+        self._frame = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _reserve(self, extra: int):
+        """Grow the buffers geometrically so appends are amortized O(1)"""
+        needed = self._size + extra
+        capacity = len(self._columns['Question'])
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, column in self._columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+
+    def extend(self, attempts: Sequence[Dict]):
+        """
+        Append attempt dictionaries in the PerformanceTracker format
+
+        Args:
+            attempts: Attempts not yet in the table
+        """
+        n = len(attempts)
+        if n == 0:
+            return
+        self._reserve(n)
+        start, stop = self._size, self._size + n
+        columns = self._columns
+        columns['Question'][start:stop] = [a['puzzle'] for a in attempts]
+        columns['Your Answer'][start:stop] = [a['user_answer'] for a in attempts]
+        columns['Correct Answer'][start:stop] = [a['correct_answer'] for a in attempts]
+        columns['Correct'][start:stop] = [a['is_correct'] for a in attempts]
+        columns['Time (s)'][start:stop] = [a['time_spent'] for a in attempts]
+        columns['Difficulty'][start:stop] = [self.DIFFICULTIES.index(a['difficulty']) for a in attempts]
+        self._size = stop
+        self._frame = None
+
+    @property
+    def frame(self) -> 'pd.DataFrame':
+        """DataFrame over every attempt in the table"""
+        if self._frame is None:
+            import pandas as pd
+
+            n = self._size
+            data = {name: column[:n] for name, column in self._columns.items() if name != 'Difficulty'}
+            data['Difficulty'] = pd.Categorical.from_codes(self._columns['Difficulty'][:n], self.DIFFICULTIES)
+            self._frame = pd.DataFrame(data, copy=False)
+        return self._frame
+
+    def page(self, page: int, page_size: int) -> 'pd.DataFrame':
+        """
+        Get one page of the attempt log formatted for display
+
+        Args:
+            page: Zero-based page number
+            page_size: Rows per page
+
+        Returns:
+            DataFrame with the page's rows and a ✅/❌ Result column
+        """
+        import pandas as pd
+
+        start = min(page * page_size, self._size)
+        stop = min(start + page_size, self._size)
+        columns = self._columns
+        return pd.DataFrame({
+            'Question': columns['Question'][start:stop],
+            'Your Answer': columns['Your Answer'][start:stop],
+            'Correct Answer': columns['Correct Answer'][start:stop],
+            'Result': np.where(columns['Correct'][start:stop], '✅', '❌'),
+            'Time (s)': columns['Time (s)'][start:stop],
+            'Difficulty': self._difficulty_labels[columns['Difficulty'][start:stop]]
+        }, index=pd.RangeIndex(start, stop))
+
+
+def difficulty_chart(tracker):
+    """Build the difficulty distribution bar chart"""
+    import plotly.express as px
+
+    diff_dist = tracker.get_difficulty_distribution()
+    fig = px.bar(
+        x=list(diff_dist.keys()),
+        y=list(diff_dist.values()),
+        labels={'x': 'Difficulty', 'y': 'Number of Puzzles'},
+        color=list(diff_dist.keys()),
+        color_discrete_map={'Easy': '#10b981', 'Medium': '#f59e0b', 'Hard': '#ef4444'}
+    )
+    fig.update_layout(showlegend=False, height=300)
+    return fig
+
+
+def operation_chart(tracker):
+    """Build the per-operation accuracy bar chart, or None before any attempt"""
+    import plotly.express as px
+
+    op_stats = tracker.get_operation_performance()
+    if not op_stats:
+        return None
+    operations = list(op_stats.keys())
+    accuracies = [op_stats[op]['accuracy'] for op in operations]
+    fig = px.bar(
+        x=operations,
+        y=accuracies,
+        labels={'x': 'Operation', 'y': 'Accuracy (%)'},
+        color=accuracies,
+        color_continuous_scale='Viridis'
+    )
+    fig.update_layout(showlegend=False, height=300)
+    return fig
+
+
+class SummaryCache:
+    """
+    Per-tracker memo for the summary view
+
+    Derived values (figures, tables) are rebuilt only when the tracker's
+    version or epoch changes, so reruns without new attempts reuse them.
+    """
+
+    def __init__(self, tracker):
+        """
+        Initialize the cache
+
+        Args:
+            tracker: PerformanceTracker whose attempts the cached values derive from
+        """
+        self.tracker = tracker
+        self.table = AttemptTable()
+        self._table_epoch = tracker.epoch
+        self._entries: Dict[str, Tuple[Tuple[int, int], object]] = {}
+
+    def get(self, name: str, build: Callable[[], object]):
+        """
+        Return the cached value for name, rebuilding it if the tracker changed
+
+        Args:
+            name: Cache key, e.g. 'difficulty_chart'
+            build: Builds the value from the tracker's current state
+
+        Returns:
+            The cached or newly built value
+        """
+        key = (self.tracker.epoch, self.tracker.version)
+        entry = self._entries.get(name)
+        if entry is None or entry[0] != key:
+            entry = self._entries[name] = (key, build())
+        return entry[1]
+
+    def attempt_table(self) -> AttemptTable:
+        """
+        Bring the attempt table up to date with the tracker and return it
+
+        Attempts logged since the last call are appended; the table is only
+        started over when the tracker's epoch changes, i.e. its attempts were replaced wholesale.
+        """
+        attempts = self.tracker.attempts
+        if self.tracker.epoch != self._table_epoch:
+            self.table = AttemptTable()
+            self._table_epoch = self.tracker.epoch
+        if len(self.table) < len(attempts):
+            self.table.extend(attempts[len(self.table):])
+        return self.table
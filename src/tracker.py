@@ -2,19 +2,278 @@
 Performance Tracker Module
 Tracks user performance metrics and session data
 """
+import math
 import time
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from datetime import datetime
 
-class PerformanceTracker:
-    """Tracks user performance across puzzle attempts"""
+from instrumentation import metrics
+from quantile_sketch import KLLSketch
+
+class RunningStats:
+    """
+    Incrementally maintained attempt counters and response-time statistics
+    
+    Mean and variance of the time spent are updated with Welford's algorithm,
+    so every statistic is available in constant time. Percentiles come from a
+    bounded-memory KLL sketch that can be merged across learners.
+    """
+    
+    __slots__ = ('count', 'correct', 'total_time', 'min_time', 'max_time', 'mean_time', '_m2', 'time_sketch')
     
     def __init__(self):
-        """Initialize the performance tracker"""
+        """Initialize empty statistics"""
+        self.count = 0
+        self.correct = 0
+        self.total_time = 0.0
+        self.min_time = math.inf
+        self.max_time = -math.inf
+        self.mean_time = 0.0
+        self._m2 = 0.0
+        self.time_sketch = KLLSketch()
+    
+    def push(self, time_spent: float, is_correct: bool):
+        """
+        Add one attempt to the statistics
+        
+        Args:
+            time_spent: Seconds spent on the attempt
+            is_correct: Whether the answer was correct
+        """
+        self.count += 1
+        if is_correct:
+            self.correct += 1
+        self.total_time += time_spent
+        if time_spent < self.min_time:
+            self.min_time = time_spent
+        if time_spent > self.max_time:
+            self.max_time = time_spent
+        delta = time_spent - self.mean_time
+        self.mean_time += delta / self.count
+        self._m2 += delta * (time_spent - self.mean_time)
+        self.time_sketch.update(time_spent)
+    
+    @property
+    def time_variance(self) -> float:
+        """Sample variance of the time spent"""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+    
+    def time_percentiles(self, qs=(0.5, 0.9)) -> List[float]:
+        """Estimated time-spent quantiles, rounded to the timer resolution"""
+        return [round(value, 2) for value in self.time_sketch.quantiles(qs)]
+    
+    def time_summary(self) -> Dict:
+        """Return count, mean, variance, standard deviation and percentiles of the time spent"""
+        p50, p90 = self.time_percentiles()
+        return {
+            'count': self.count,
+            'mean': round(self.mean_time, 2),
+            'variance': round(self.time_variance, 2),
+            'std_dev': round(math.sqrt(self.time_variance), 2),
+            'p50': p50,
+            'p90': p90
+        }
+
+class RecentWindow:
+    """
+    Fixed-size ring buffer over the most recent attempts
+    
+    Keeps a rolling correct count and time sum, so adaptation inputs are
+    available in constant time without slicing the attempt list. Times are
+    held in whole centiseconds so the rolling sum never drifts.
+    """
+    
+    __slots__ = ('size', 'count', 'correct_count', '_time_total', '_correct', '_times', '_next')
+    
+    def __init__(self, size: int = 3):
+        """
+        Initialize an empty window
+        
+        Args:
+            size: Number of most recent attempts to keep
+        """
+        if size < 1:
+            raise ValueError("window size must be at least 1")
+        self.size = size
+        self.clear()
+    
+    def clear(self):
+        """Drop every attempt from the window"""
+        self.count = 0
+        self.correct_count = 0
+        self._time_total = 0
+        self._correct = [False] * self.size
+        self._times = [0] * self.size
+        self._next = 0
+    
+    def push(self, is_correct: bool, time_spent: float):
+        """
+        Add an attempt, evicting the oldest one when the window is full
+        
+        Args:
+            is_correct: Whether the answer was correct
+            time_spent: Seconds spent on the attempt
+        """
+        slot = self._next
+        if self.count == self.size:
+            self.correct_count -= self._correct[slot]
+            self._time_total -= self._times[slot]
+        else:
+            self.count += 1
+        centiseconds = round(time_spent * 100)
+        self._correct[slot] = is_correct
+        self._times[slot] = centiseconds
+        self.correct_count += is_correct
+        self._time_total += centiseconds
+        self._next = (slot + 1) % self.size
+    
+    def resized(self, size: int) -> 'RecentWindow':
+        """
+        Copy of the window with another size, keeping the most recent attempts that fit
+        
+        Args:
+            size: Number of most recent attempts the copy keeps
+            
+        Returns:
+            New RecentWindow
+        """
+        window = RecentWindow(size)
+        keep = min(self.count, size)
+        for offset in range(keep, 0, -1):
+            slot = (self._next - offset) % self.size
+            window.push(self._correct[slot], self._times[slot] / 100)
+        return window
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    @property
+    def total_time(self) -> float:
+        return self._time_total / 100
+    
+    @property
+    def avg_time(self) -> float:
+        return self._time_total / 100 / self.count if self.count else 0.0
+    
+    @property
+    def accuracy(self) -> float:
+        return self.correct_count / self.count if self.count else 0.0
+
+class PerformanceTracker:
+    """
+    Tracks user performance across puzzle attempts
+    
+    Aggregates are updated as each attempt is logged, so the stats getters
+    run in constant time regardless of session length.
+    """
+    
+    # Keep per-operation time lists for get_operation_performance
+    keep_operation_times = True
+    
+    def __init__(self, window_sizes: Tuple[int, ...] = (3,), learner_id: str = None, sink=None):
+        """
+        Initialize the performance tracker
+        
+        Args:
+            window_sizes: Sizes of the recent-attempt windows to maintain
+            learner_id: Identifier stored with every persisted attempt
+            sink: Optional durable log (e.g. AttemptLog) receiving each attempt
+        """
+        self.learner_id = learner_id
+        self.sink = sink
+        self.windows: Dict[int, RecentWindow] = {size: RecentWindow(size) for size in window_sizes}
+        # version changes with every logged attempt, epoch whenever attempts
+        # are replaced wholesale; views cache derived data against both
+        self.version = 0
+        self.epoch = 0
         self.attempts: List[Dict] = []
         self.session_start = None
         self.current_attempt_start = None
     
+    @property
+    def attempts(self) -> List[Dict]:
+        return self._attempts
+    
+    @attempts.setter
+    def attempts(self, attempts: List[Dict]):
+        self._attempts = attempts
+        self._rebuild_aggregates(attempts)
+    
+    def _rebuild_aggregates(self, attempts: List[Dict]):
+        """Reset the running aggregates and replay the given attempts into them"""
+        self.epoch += 1
+        self._overall = RunningStats()
+        self._by_difficulty: Dict[str, RunningStats] = {}
+        self._by_operation: Dict[str, RunningStats] = {}
+        self._operation_times: Dict[str, List[float]] = {}
+        for window in self.windows.values():
+            window.clear()
+        for attempt in attempts:
+            self._update_aggregates(attempt['time_spent'], attempt['is_correct'],
+                                    attempt['difficulty'], attempt['operation'])
+    
+    def _update_aggregates(self, time_spent: float, is_correct: bool, difficulty: str, operation: str):
+        """Fold a single attempt into the running aggregates"""
+        self.version += 1
+        self._overall.push(time_spent, is_correct)
+        
+        difficulty_stats = self._by_difficulty.get(difficulty)
+        if difficulty_stats is None:
+            difficulty_stats = self._by_difficulty[difficulty] = RunningStats()
+        difficulty_stats.push(time_spent, is_correct)
+        
+        operation_stats = self._by_operation.get(operation)
+        if operation_stats is None:
+            operation_stats = self._by_operation[operation] = RunningStats()
+            self._operation_times[operation] = []
+        operation_stats.push(time_spent, is_correct)
+        if self.keep_operation_times:
+            self._operation_times[operation].append(time_spent)
+        
+        for window in self.windows.values():
+            window.push(is_correct, time_spent)
+    
+    def _persist(self, attempt: Dict):
+        """Hand the attempt to the durable sink, if one is configured"""
+        if self.sink is not None:
+            self.sink.append({'kind': 'attempt', 'learner_id': self.learner_id, **attempt})
+    
+    def log_adaptation(self, event: Dict):
+        """
+        Hand a difficulty change to the durable sink, if one is configured
+        
+        The learner's difficulty_history keeps the event itself; the log
+        record adds learner, time and the number of attempts so far.
+        
+        Args:
+            event: Adaptation event as appended to difficulty_history
+        """
+        if self.sink is not None:
+            self.sink.append({'kind': 'adaptation', 'learner_id': self.learner_id,
+                              'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                              'attempt': len(self.attempts), **event})
+    
+    def log_session(self, seed: int, difficulty: str):
+        """
+        Hand the start of a game to the durable sink, if one is configured
+
+        With the learner's stream seed and starting difficulty, the game's
+        logged answers are enough to replay it, see
+        learning_service.logged_session.
+
+        Args:
+            seed: Seed of the learner's puzzle stream
+            difficulty: Starting difficulty level
+        """
+        if self.sink is not None:
+            self.sink.append({'kind': 'session', 'learner_id': self.learner_id,
+                              'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                              'seed': seed, 'difficulty': difficulty})
+    
+    def _times_for_operation(self, operation: str) -> List[float]:
+        """Return the recorded times for an operation"""
+        return self._operation_times[operation]
+    
     def start_session(self):
         """Start a new tracking session"""
         self.session_start = time.time()
@@ -25,7 +284,8 @@ class PerformanceTracker:
         """Start timing a new puzzle attempt"""
         self.current_attempt_start = time.time()
     
-    def log_attempt(self, puzzle: Dict, user_answer: int, is_correct: bool):
+    @metrics.timed('tracker_log_attempt_seconds', 'PerformanceTracker.log_attempt wall time')
+    def log_attempt(self, puzzle: Dict, user_answer: int, is_correct: bool, time_spent: float = None):
         """
         Log a puzzle attempt with performance metrics
         
@@ -33,8 +293,10 @@ class PerformanceTracker:
             puzzle: The puzzle dictionary
             user_answer: User's submitted answer
             is_correct: Whether the answer was correct
+            time_spent: Seconds spent, measured from the attempt start if omitted
         """
-        time_spent = time.time() - self.current_attempt_start
+        if time_spent is None:
+            time_spent = time.time() - self.current_attempt_start
         
         attempt = {
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
@@ -46,10 +308,17 @@ class PerformanceTracker:
             'difficulty': puzzle['difficulty'],
             'operation': puzzle['operation']
         }
+        if 'level' in puzzle:
+            attempt['level'] = puzzle['level']
+        if 'review' in puzzle:
+            attempt['review'] = puzzle['review']
         
         self.attempts.append(attempt)
+        self._persist(attempt)
+        self._update_aggregates(attempt['time_spent'], is_correct, attempt['difficulty'], attempt['operation'])
         self.start_attempt()  # Start timing next attempt
     
+    @metrics.timed('tracker_session_stats_seconds', 'PerformanceTracker.get_session_stats wall time')
     def get_session_stats(self) -> Dict:
         """
         Calculate session statistics
@@ -57,7 +326,8 @@ class PerformanceTracker:
         Returns:
             Dictionary containing various performance metrics
         """
-        if not self.attempts:
+        overall = self._overall
+        if overall.count == 0:
             return {
                 'total_attempts': 0,
                 'correct_count': 0,
@@ -66,19 +336,17 @@ class PerformanceTracker:
                 'total_time': 0.0
             }
         
-        correct_count = sum(1 for attempt in self.attempts if attempt['is_correct'])
-        total_time = sum(attempt['time_spent'] for attempt in self.attempts)
-        
         stats = {
-            'total_attempts': len(self.attempts),
-            'correct_count': correct_count,
-            'incorrect_count': len(self.attempts) - correct_count,
-            'accuracy': round((correct_count / len(self.attempts)) * 100, 1),
-            'average_time': round(total_time / len(self.attempts), 2),
-            'total_time': round(total_time, 2),
-            'fastest_time': min(a['time_spent'] for a in self.attempts),
-            'slowest_time': max(a['time_spent'] for a in self.attempts)
+            'total_attempts': overall.count,
+            'correct_count': overall.correct,
+            'incorrect_count': overall.count - overall.correct,
+            'accuracy': round((overall.correct / overall.count) * 100, 1),
+            'average_time': round(overall.total_time / overall.count, 2),
+            'total_time': round(overall.total_time, 2),
+            'fastest_time': overall.min_time,
+            'slowest_time': overall.max_time
         }
+        stats['median_time'], stats['p90_time'] = overall.time_percentiles()
         
         return stats
     
@@ -94,6 +362,27 @@ class PerformanceTracker:
         """
         return self.attempts[-n:] if len(self.attempts) >= n else self.attempts
     
+    def get_window(self, size: int = 3) -> RecentWindow:
+        """
+        Get the rolling window over the n most recent attempts
+        
+        Windows of a new size are created on first use and seeded with the
+        latest attempts; afterwards they are updated by log_attempt.
+        
+        Args:
+            size: Number of recent attempts covered by the window
+            
+        Returns:
+            RecentWindow for the requested size
+        """
+        window = self.windows.get(size)
+        if window is None:
+            window = self.windows[size] = RecentWindow(size)
+            for attempt in self.get_recent_performance(size):
+                window.push(attempt['is_correct'], attempt['time_spent'])
+        return window
+    
+    @metrics.timed('tracker_difficulty_distribution_seconds', 'PerformanceTracker.get_difficulty_distribution wall time')
     def get_difficulty_distribution(self) -> Dict[str, int]:
         """
         Get count of attempts by difficulty level
@@ -101,12 +390,9 @@ class PerformanceTracker:
         Returns:
             Dictionary mapping difficulty levels to attempt counts
         """
-        distribution = {}
-        for attempt in self.attempts:
-            difficulty = attempt['difficulty']
-            distribution[difficulty] = distribution.get(difficulty, 0) + 1
-        return distribution
+        return {difficulty: stats.count for difficulty, stats in self._by_difficulty.items()}
     
+    @metrics.timed('tracker_operation_performance_seconds', 'PerformanceTracker.get_operation_performance wall time')
     def get_operation_performance(self) -> Dict[str, Dict]:
         """
         Get performance statistics by operation type
@@ -116,24 +402,56 @@ class PerformanceTracker:
         """
         operation_stats = {}
         
-        for attempt in self.attempts:
-            op = attempt['operation']
-            if op not in operation_stats:
-                operation_stats[op] = {
-                    'total': 0,
-                    'correct': 0,
-                    'times': []
-                }
-            
-            operation_stats[op]['total'] += 1
-            if attempt['is_correct']:
-                operation_stats[op]['correct'] += 1
-            operation_stats[op]['times'].append(attempt['time_spent'])
-        
-        # Calculate accuracy and average time for each operation
-        for op in operation_stats:
-            stats = operation_stats[op]
-            stats['accuracy'] = round((stats['correct'] / stats['total']) * 100, 1)
-            stats['avg_time'] = round(sum(stats['times']) / len(stats['times']), 2)
-        
-        return operation_stats
\ No newline at end of file
+        for op, stats in self._by_operation.items():
+            operation_stats[op] = {
+                'total': stats.count,
+                'correct': stats.correct,
+                'times': self._times_for_operation(op),
+                'accuracy': round((stats.correct / stats.count) * 100, 1),
+                'avg_time': round(stats.total_time / stats.count, 2),
+                'median_time': stats.time_percentiles((0.5,))[0]
+            }
+        
+        return operation_stats
+    
+    def get_operation_counts(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Get correct and total attempts per operation type
+        
+        A constant-time subset of get_operation_performance, cheap enough to
+        consult before every puzzle.
+        
+        Returns:
+            Dictionary mapping operations to (correct, total)
+        """
+        return {op: (stats.correct, stats.count) for op, stats in self._by_operation.items()}
+    
+    @metrics.timed('tracker_time_statistics_seconds', 'PerformanceTracker.get_time_statistics wall time')
+    def get_time_statistics(self) -> Dict[str, Dict]:
+        """
+        Get response-time mean, variance, standard deviation and percentiles
+        
+        Returns:
+            Dictionary with overall, per-difficulty and per-operation time statistics
+        """
+        return {
+            'overall': self._overall.time_summary(),
+            'by_difficulty': {d: stats.time_summary() for d, stats in self._by_difficulty.items()},
+            'by_operation': {op: stats.time_summary() for op, stats in self._by_operation.items()}
+        }
+    
+    def get_time_sketches(self) -> Dict:
+        """
+        Get the response-time quantile sketches
+        
+        Sketches from many trackers can be combined with KLLSketch.merged to
+        compute cohort-level percentiles.
+        
+        Returns:
+            Dictionary with the overall, per-difficulty and per-operation KLLSketch
+        """
+        return {
+            'overall': self._overall.time_sketch,
+            'by_difficulty': {d: stats.time_sketch for d, stats in self._by_difficulty.items()},
+            'by_operation': {op: stats.time_sketch for op, stats in self._by_operation.items()}
+        }
@@ -2,12 +2,111 @@
 Streamlit UI Module
 Interactive user interface for the adaptive learning system
 """
+import atexit
+import os
+import uuid
+from typing import TYPE_CHECKING, Dict
 import streamlit as st
-import plotly.graph_objects as go
-import plotly.express as px
 from puzzle_generator import PuzzleGenerator
 from tracker import PerformanceTracker
 from adaptive_engine import AdaptiveEngine
+from attempt_log import AttemptLog
+from instrumentation import metrics
+from learner_state import LearnerState
+from review_scheduler import ReviewScheduler
+from rule_engine import RuleRegistry, RuleSet
+
+# NumPy, pandas and plotly are imported where first needed (scales, the
+# skill engine, the summary screen) so the welcome page renders without them
+if TYPE_CHECKING:
+    from summary_cache import SummaryCache
+
+# Rows per page of the detailed attempt log
+ATTEMPT_PAGE_SIZE = 50
+
+# Chance of serving a due review instead of a fresh puzzle
+REVIEW_SHARE = 0.5
+
+@st.cache_resource
+def get_scale():
+    """Fine-grained difficulty scale with MATH_ADVENTURES_LEVELS levels, if set"""
+    levels = os.environ.get('MATH_ADVENTURES_LEVELS')
+    if not levels:
+        return None
+    from difficulty_scale import DifficultyScale, default_specs
+    return DifficultyScale(default_specs(int(levels)))
+
+@st.cache_resource
+def get_generator():
+    """Process-wide puzzle generator shared by every session"""
+    return PuzzleGenerator(get_scale())
+
+@st.cache_resource
+def get_engine():
+    """
+    Process-wide adaptive engine shared by every session, with rules from
+    MATH_ADVENTURES_RULES if set, or skill-based when MATH_ADVENTURES_ENGINE=skill
+    """
+    if os.environ.get('MATH_ADVENTURES_ENGINE') == 'skill':
+        from skill_model import SkillEngine, SkillModel
+        return SkillEngine(SkillModel.for_generator(get_generator(), os.environ.get('MATH_ADVENTURES_DIFFICULTIES')))
+    path = os.environ.get('MATH_ADVENTURES_RULES')
+    scale = get_scale()
+    return AdaptiveEngine(rules=RuleSet(scale.rule_config()) if scale else None,
+                          registry=RuleRegistry.from_file(path) if path else None)
+
+@st.cache_resource
+def get_attempt_log():
+    """
+    Process-wide durable attempt log, enabled by setting MATH_ADVENTURES_LOG_DIR
+
+    Closed when the process exits, so records still queued for the writer
+    thread reach the disk on shutdown.
+    """
+    directory = os.environ.get('MATH_ADVENTURES_LOG_DIR')
+    if not directory:
+        return None
+    log = AttemptLog(directory)
+    atexit.register(log.close)
+    return log
+
+def get_review_scheduler() -> ReviewScheduler:
+    """
+    Queue of the current game's missed puzzles due for review
+
+    Kept in the session state rather than shared by the process, so the
+    queue goes away with the browser session and each game's learner ID
+    starts with an empty queue.
+    """
+    return st.session_state.review_scheduler
+
+def new_learner() -> LearnerState:
+    """Create the adaptation state for a new game, with a fresh learner ID"""
+    learner_id = uuid.uuid4().hex
+    return LearnerState(learner_id, window_size=get_engine().rules_for(learner_id).window_size)
+
+def next_puzzle(learner: LearnerState, difficulty: str) -> Dict:
+    """
+    Serve a due review or the learner's next unseen puzzle
+
+    Drawn from the learner's own stream exactly as LearningService does,
+    so a game replays from the seed logged at its start and its answers
+    (see learning_service.logged_session).
+    """
+    return get_generator().next_puzzle(difficulty, learner.seen_puzzles, learner.rng, get_review_scheduler(),
+                                       learner.learner_id, REVIEW_SHARE)
+
+def adapt(learner: LearnerState) -> str:
+    """Adapt the learner's difficulty, logging a change to the attempt log"""
+    changes = len(learner.difficulty_history)
+    new_difficulty = get_engine().adapt_learner(learner)
+    if len(learner.difficulty_history) > changes:
+        st.session_state.tracker.log_adaptation(learner.difficulty_history[-1])
+    return new_difficulty
+
+def new_tracker(learner: LearnerState) -> PerformanceTracker:
+    """Create the tracker for a new game, logging under the learner's ID"""
+    return PerformanceTracker(window_sizes=(), learner_id=learner.learner_id, sink=get_attempt_log())
 
 def initialize_session_state():
     """Initialize Streamlit session state variables"""
@@ -15,16 +114,14 @@ def initialize_session_state():
         st.session_state.game_state = 'welcome'
     if 'player_name' not in st.session_state:
         st.session_state.player_name = ''
-    if 'generator' not in st.session_state:
-        st.session_state.generator = PuzzleGenerator()
+    if 'learner' not in st.session_state:
+        st.session_state.learner = new_learner()
     if 'tracker' not in st.session_state:
-        st.session_state.tracker = PerformanceTracker()
-    if 'engine' not in st.session_state:
-        st.session_state.engine = AdaptiveEngine()
+        st.session_state.tracker = new_tracker(st.session_state.learner)
+    if 'review_scheduler' not in st.session_state:
+        st.session_state.review_scheduler = ReviewScheduler()
     if 'current_puzzle' not in st.session_state:
         st.session_state.current_puzzle = None
-    if 'puzzle_count' not in st.session_state:
-        st.session_state.puzzle_count = 0
     if 'max_puzzles' not in st.session_state:
         st.session_state.max_puzzles = 10
 
@@ -53,7 +150,7 @@ def welcome_screen():
         )
         
         # Show difficulty info
-        info = st.session_state.generator.get_difficulty_info(difficulty)
+        info = get_generator().get_difficulty_info(difficulty)
         st.info(f"ℹ️ {info}")
         
         st.markdown("### 📊 Session Settings")
@@ -61,13 +158,15 @@ def welcome_screen():
         
         if st.button("🚀 Start Adventure!", use_container_width=True, type="primary"):
             if player_name.strip():
+                difficulty = get_generator().resolve_difficulty(difficulty)
+                # The name is only shown; sessions are keyed by the generated learner ID,
+                # so two players with the same name stay apart in the log and analytics
                 st.session_state.player_name = player_name
-                st.session_state.generator.set_difficulty(difficulty)
-                st.session_state.engine.current_difficulty = difficulty
+                st.session_state.learner.reset(difficulty)
                 st.session_state.tracker.start_session()
+                st.session_state.tracker.log_session(st.session_state.learner.rng.seed, difficulty)
                 st.session_state.max_puzzles = max_puzzles
-                st.session_state.puzzle_count = 0
-                st.session_state.current_puzzle = st.session_state.generator.generate_puzzle()
+                st.session_state.current_puzzle = next_puzzle(st.session_state.learner, difficulty)
                 st.session_state.game_state = 'playing'
                 st.rerun()
             else:
@@ -80,7 +179,7 @@ def playing_screen():
     
     with col1:
         st.markdown(f"### Hello, {st.session_state.player_name}! 👋")
-        st.markdown(f"**Question {st.session_state.puzzle_count + 1} of {st.session_state.max_puzzles}**")
+        st.markdown(f"**Question {st.session_state.learner.attempt_count + 1} of {st.session_state.max_puzzles}**")
     
     with col2:
         stats = st.session_state.tracker.get_session_stats()
@@ -88,11 +187,12 @@ def playing_screen():
     
     with col3:
         difficulty = st.session_state.current_puzzle['difficulty']
+        level = st.session_state.current_puzzle.get('level', difficulty)
         color = {'Easy': '🟢', 'Medium': '🟡', 'Hard': '🔴'}
-        st.metric("Level", f"{color[difficulty]} {difficulty}")
+        st.metric("Level", f"{color[difficulty]} {level}")
     
     # Progress bar
-    progress = st.session_state.puzzle_count / st.session_state.max_puzzles
+    progress = st.session_state.learner.attempt_count / st.session_state.max_puzzles
     st.progress(progress)
     
     st.markdown("---")
@@ -135,10 +235,13 @@ def playing_screen():
 def check_answer(user_answer):
     """Check user's answer and update state"""
     puzzle = st.session_state.current_puzzle
+    learner = st.session_state.learner
     is_correct = (user_answer == puzzle['answer'])
     
     # Log the attempt
     st.session_state.tracker.log_attempt(puzzle, user_answer, is_correct)
+    get_review_scheduler().record(learner.learner_id, puzzle, is_correct)
+    get_engine().record_attempt(learner, puzzle, is_correct, st.session_state.tracker.attempts[-1]['time_spent'])
     
     # Show feedback
     if is_correct:
@@ -148,44 +251,34 @@ def check_answer(user_answer):
         st.error(f"❌ Not quite. The correct answer was {puzzle['answer']}")
     
     # Move to next puzzle
-    st.session_state.puzzle_count += 1
-    
-    if st.session_state.puzzle_count >= st.session_state.max_puzzles:
+    if learner.attempt_count >= st.session_state.max_puzzles:
         st.session_state.game_state = 'summary'
         st.rerun()
     else:
         # Adapt difficulty
-        recent = st.session_state.tracker.get_recent_performance(3)
-        new_difficulty = st.session_state.engine.adapt_difficulty(
-            recent, 
-            st.session_state.current_puzzle['difficulty']
-        )
+        new_difficulty = adapt(learner)
         
-        if new_difficulty != st.session_state.current_puzzle['difficulty']:
+        if new_difficulty != puzzle.get('level', puzzle['difficulty']):
             st.info(f"🎯 Adjusting to {new_difficulty} level!")
         
         # Generate next puzzle
-        st.session_state.generator.set_difficulty(new_difficulty)
-        st.session_state.current_puzzle = st.session_state.generator.generate_puzzle()
+        st.session_state.current_puzzle = next_puzzle(learner, new_difficulty)
         
         st.rerun()
 
 def skip_puzzle():
     """Skip current puzzle"""
     puzzle = st.session_state.current_puzzle
+    learner = st.session_state.learner
     st.session_state.tracker.log_attempt(puzzle, 0, False)
-    st.session_state.puzzle_count += 1
+    get_review_scheduler().record(learner.learner_id, puzzle, False)
+    get_engine().record_attempt(learner, puzzle, False, st.session_state.tracker.attempts[-1]['time_spent'])
     
-    if st.session_state.puzzle_count >= st.session_state.max_puzzles:
+    if learner.attempt_count >= st.session_state.max_puzzles:
         st.session_state.game_state = 'summary'
     else:
-        recent = st.session_state.tracker.get_recent_performance(3)
-        new_difficulty = st.session_state.engine.adapt_difficulty(
-            recent, 
-            st.session_state.current_puzzle['difficulty']
-        )
-        st.session_state.generator.set_difficulty(new_difficulty)
-        st.session_state.current_puzzle = st.session_state.generator.generate_puzzle()
+        new_difficulty = adapt(learner)
+        st.session_state.current_puzzle = next_puzzle(learner, new_difficulty)
     
     st.rerun()
 
@@ -198,6 +291,14 @@ def display_mini_stats():
     col2.metric("Avg Time", f"{stats['average_time']}s")
     col3.metric("Total Time", f"{stats['total_time']}s")
 
+def get_summary_cache() -> 'SummaryCache':
+    """Get the summary cache for the current tracker, replacing it after a restart"""
+    from summary_cache import SummaryCache
+    cache = st.session_state.get('summary_cache')
+    if cache is None or cache.tracker is not st.session_state.tracker:
+        cache = st.session_state.summary_cache = SummaryCache(st.session_state.tracker)
+    return cache
+
 def summary_screen():
     """Display final performance summary"""
     st.markdown(f"""
@@ -207,7 +308,11 @@ def summary_screen():
         </div>
     """, unsafe_allow_html=True)
     
-    stats = st.session_state.tracker.get_session_stats()
+    from summary_cache import difficulty_chart, operation_chart
+
+    tracker = st.session_state.tracker
+    cache = get_summary_cache()
+    stats = tracker.get_session_stats()
     
     # Main stats
     col1, col2, col3, col4 = st.columns(4)
@@ -219,7 +324,7 @@ def summary_screen():
     with col3:
         st.metric("⏱️ Avg Time", f"{stats['average_time']}s")
     with col4:
-        st.metric("📊 Final Level", st.session_state.engine.current_difficulty)
+        st.metric("📊 Final Level", st.session_state.learner.current_difficulty)
     
     st.markdown("---")
     
@@ -229,54 +334,30 @@ def summary_screen():
     with col1:
         # Difficulty distribution
         st.markdown("### 📈 Difficulty Progression")
-        diff_dist = st.session_state.tracker.get_difficulty_distribution()
-        
-        fig = px.bar(
-            x=list(diff_dist.keys()),
-            y=list(diff_dist.values()),
-            labels={'x': 'Difficulty', 'y': 'Number of Puzzles'},
-            color=list(diff_dist.keys()),
-            color_discrete_map={'Easy': '#10b981', 'Medium': '#f59e0b', 'Hard': '#ef4444'}
-        )
-        fig.update_layout(showlegend=False, height=300)
-        st.plotly_chart(fig, use_container_width=True)
+        with metrics.timer('ui_summary_chart_seconds', 'Summary chart build and render wall time'):
+            fig = cache.get('difficulty_chart', lambda: difficulty_chart(tracker))
+            st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         # Operation performance
         st.markdown("### 🔢 Performance by Operation")
-        op_stats = st.session_state.tracker.get_operation_performance()
-        
-        if op_stats:
-            operations = list(op_stats.keys())
-            accuracies = [op_stats[op]['accuracy'] for op in operations]
-            
-            fig = px.bar(
-                x=operations,
-                y=accuracies,
-                labels={'x': 'Operation', 'y': 'Accuracy (%)'},
-                color=accuracies,
-                color_continuous_scale='Viridis'
-            )
-            fig.update_layout(showlegend=False, height=300)
-            st.plotly_chart(fig, use_container_width=True)
+        with metrics.timer('ui_summary_chart_seconds', 'Summary chart build and render wall time'):
+            fig = cache.get('operation_chart', lambda: operation_chart(tracker))
+            if fig is not None:
+                st.plotly_chart(fig, use_container_width=True)
     
     # Detailed attempt log
     with st.expander("📋 View Detailed Attempt Log"):
-        attempts = st.session_state.tracker.attempts
-        st.dataframe(
-            [{
-                'Question': a['puzzle'],
-                'Your Answer': a['user_answer'],
-                'Correct Answer': a['correct_answer'],
-                'Result': '✅' if a['is_correct'] else '❌',
-                'Time (s)': a['time_spent'],
-                'Difficulty': a['difficulty']
-            } for a in attempts],
-            use_container_width=True
-        )
+        table = cache.attempt_table()
+        pages = max(1, -(-len(table) // ATTEMPT_PAGE_SIZE))
+        page = 1
+        if pages > 1:
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1)
+        rows = cache.get(f'attempt_page_{page}', lambda: table.page(page - 1, ATTEMPT_PAGE_SIZE))
+        st.dataframe(rows, use_container_width=True)
     
     # Adaptation history
-    adaptations = st.session_state.engine.get_adaptation_summary()
+    adaptations = st.session_state.learner.difficulty_history
     if adaptations:
         with st.expander("🎯 Difficulty Adaptations"):
             for adapt in adaptations:
@@ -289,9 +370,10 @@ def summary_screen():
         if st.button("🔄 Play Again!", use_container_width=True, type="primary"):
             # Reset session
             st.session_state.game_state = 'welcome'
-            st.session_state.puzzle_count = 0
-            st.session_state.tracker = PerformanceTracker()
-            st.session_state.engine = AdaptiveEngine()
+            st.session_state.learner = new_learner()
+            st.session_state.tracker = new_tracker(st.session_state.learner)
+            # Reviews belong to the previous learner ID and would never come due again
+            st.session_state.review_scheduler = ReviewScheduler()
             st.rerun()
 
 def main():
@@ -331,7 +413,3 @@ def main():
 # if __name__ == "__main__":
 
 #     main()
-
-
-
-
@@ -0,0 +1,366 @@
+"""
+What-If Module
+Replays archived attempt logs under alternative adaptation rules, streaming and in parallel
+"""
+import argparse
+import itertools
+import json
+import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from adaptive_engine import AdaptiveEngine
+from attempt_log import LogReader, log_segments
+from rule_engine import RuleSet, default_config, load_config
+from tracker import RecentWindow
+
+# Active sessions are checked for the session gap every this many records
+SWEEP_INTERVAL = 65_536
+
+
+class _Track:
+    """A session's counterfactual path under one rule configuration"""
+
+    __slots__ = ('level', 'window', 'direction', 'final_level', 'final_attempts', 'final_correct')
+
+    def __init__(self, level: str, window_size: int):
+        self.level = level
+        self.window = RecentWindow(window_size)
+        self.direction = 0
+        # The session's latest run of attempts at one level
+        self.final_level = level
+        self.final_attempts = 0
+        self.final_correct = 0
+
+
+class _Session:
+    """A learner's open session: when it was last active and one track per configuration"""
+
+    __slots__ = ('last_seen', 'tracks')
+
+    def __init__(self, last_seen: int, tracks: List[_Track]):
+        self.last_seen = last_seen
+        self.tracks = tracks
+
+
+class ConfigSummary:
+    """
+    Mergeable outcome of replaying sessions under one rule configuration
+
+    Per level: attempts, correct answers and seconds spent there. Level
+    switches and reversals (a switch against the direction of the previous
+    one in the same session) are counted as they happen. When a session
+    ends, the level of its last attempt is counted along with the accuracy
+    over its last run of attempts at that level, pooled over sessions.
+    Only these totals are kept, never the sessions themselves.
+    """
+
+    def __init__(self, name: str, levels: List[str]):
+        self.name = name
+        self.levels = list(levels)
+        self.sessions = 0
+        self.switches = 0
+        self.reversals = 0
+        self.matched = 0
+        # level -> [attempts, correct, seconds]
+        self.cells: Dict[str, list] = {level: [0, 0, 0.0] for level in self.levels}
+        self.final_levels: Dict[str, int] = {}
+        self.final_attempts = 0
+        self.final_correct = 0
+
+    def add_session(self, track: _Track):
+        """Fold a finished session into the summary"""
+        self.sessions += 1
+        self.final_levels[track.final_level] = self.final_levels.get(track.final_level, 0) + 1
+        self.final_attempts += track.final_attempts
+        self.final_correct += track.final_correct
+
+    def merge(self, other: 'ConfigSummary'):
+        """Fold in the summary of another partition replayed under the same configuration"""
+        for name in ('sessions', 'switches', 'reversals', 'matched', 'final_attempts', 'final_correct'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for level, (attempts, correct, seconds) in other.cells.items():
+            cell = self.cells[level]
+            cell[0] += attempts
+            cell[1] += correct
+            cell[2] += seconds
+        for level, count in other.final_levels.items():
+            self.final_levels[level] = self.final_levels.get(level, 0) + count
+
+    def report(self) -> Dict:
+        """
+        Comparison figures for the configuration
+
+        Returns:
+            Dictionary with totals, per-session switch rates, the accuracy at
+            the final level, the share of time spent at each level, the final
+            level distribution and how often the replayed level matched the
+            logged one
+        """
+        sessions = self.sessions or 1
+        attempts = sum(cell[0] for cell in self.cells.values())
+        correct = sum(cell[1] for cell in self.cells.values())
+        seconds = sum(cell[2] for cell in self.cells.values()) or 1.0
+        visited = {level: cell for level, cell in self.cells.items() if cell[0]}
+        return {
+            'config': self.name,
+            'sessions': self.sessions,
+            'attempts': attempts,
+            'accuracy': round(correct / attempts * 100, 1) if attempts else 0.0,
+            'switches_per_session': round(self.switches / sessions, 3),
+            'reversals_per_session': round(self.reversals / sessions, 3),
+            'final_level_accuracy': round(self.final_correct / self.final_attempts * 100, 1)
+            if self.final_attempts else 0.0,
+            'matched_logged_level': round(self.matched / attempts * 100, 1) if attempts else 0.0,
+            'time_share': {level: round(cell[2] / seconds * 100, 1) for level, cell in visited.items()},
+            'level_seconds': {level: round(cell[2], 2) for level, cell in visited.items()},
+            'level_accuracy': {level: round(cell[1] / cell[0] * 100, 1) for level, cell in visited.items()},
+            'final_levels': {level: self.final_levels[level] for level in self.levels if level in self.final_levels}
+        }
+
+
+class _Replayer:
+    """Replays one partition's attempts under every configuration at once"""
+
+    def __init__(self, configs: List[Dict], session_gap: float):
+        self.rules = [RuleSet(config) for config in configs]
+        # evaluate() only reads its arguments, so one engine serves every configuration
+        self.engine = AdaptiveEngine()
+        self.session_gap = session_gap
+        self.summaries = [ConfigSummary(rules.name, rules.levels) for rules in self.rules]
+        self.sessions: Dict[str, _Session] = {}
+        self.records = 0
+        self.peak_sessions = 0
+        self._days: Dict[str, int] = {}
+        self._last_timestamp = None
+        self._last_seconds = 0
+
+    def _seconds(self, timestamp: str) -> int:
+        """Seconds since the epoch of a 'YYYY-MM-DD HH:MM:SS' log timestamp"""
+        if timestamp == self._last_timestamp:
+            # Concurrent sessions log many attempts within the same second
+            return self._last_seconds
+        day = self._days.get(timestamp[:10])
+        if day is None:
+            day = self._days[timestamp[:10]] = (date.fromisoformat(timestamp[:10]).toordinal() - 719163) * 86400
+        seconds = day + int(timestamp[11:13]) * 3600 + int(timestamp[14:16]) * 60 + int(timestamp[17:19])
+        self._last_timestamp, self._last_seconds = timestamp, seconds
+        return seconds
+
+    def _start_level(self, rules: RuleSet, record: Dict) -> str:
+        """Level a replayed session starts at: the logged one if the rules know it"""
+        for level in (record.get('level'), record.get('difficulty')):
+            if level in rules.level_index:
+                return level
+        return rules.levels[len(rules.levels) // 2]
+
+    def _close(self, session: _Session):
+        for summary, track in zip(self.summaries, session.tracks):
+            summary.add_session(track)
+
+    def sweep(self, now: int):
+        """Close the sessions idle for longer than the session gap"""
+        cutoff = now - self.session_gap
+        idle = [learner for learner, session in self.sessions.items() if session.last_seen < cutoff]
+        for learner in idle:
+            self._close(self.sessions.pop(learner))
+
+    def finish(self):
+        """Close every open session"""
+        for session in self.sessions.values():
+            self._close(session)
+        self.sessions.clear()
+
+    def feed(self, record: Dict):
+        """Replay one attempt for its learner under every configuration"""
+        now = self._seconds(record['timestamp'])
+        learner = record.get('learner_id')
+        session = self.sessions.get(learner)
+        if session is not None and now - session.last_seen > self.session_gap:
+            self._close(self.sessions.pop(learner))
+            session = None
+        if session is None:
+            session = self.sessions[learner] = _Session(now, [
+                _Track(self._start_level(rules, record), rules.window_size) for rules in self.rules])
+            if len(self.sessions) > self.peak_sessions:
+                self.peak_sessions = len(self.sessions)
+        session.last_seen = now
+
+        is_correct = record['is_correct']
+        time_spent = record['time_spent']
+        logged = record.get('level', record['difficulty'])
+        evaluate = self.engine.evaluate
+        for rules, summary, track in zip(self.rules, self.summaries, session.tracks):
+            level = track.level
+            cell = summary.cells[level]
+            cell[0] += 1
+            cell[1] += is_correct
+            cell[2] += time_spent
+            summary.matched += level == logged
+            if level != track.final_level:
+                track.final_level = level
+                track.final_attempts = track.final_correct = 0
+            track.final_attempts += 1
+            track.final_correct += is_correct
+            # Same order as the live loop: record the answer, then adapt
+            track.window.push(is_correct, time_spent)
+            new_level, event = evaluate(track.window, level, rules=rules)
+            if event is not None:
+                summary.switches += 1
+                direction = 1 if rules.level_index[new_level] > rules.level_index[level] else -1
+                summary.reversals += direction == -track.direction
+                track.direction = direction
+                track.level = new_level
+
+        self.records += 1
+        if self.records % SWEEP_INTERVAL == 0:
+            self.sweep(now)
+
+
+def replay_partition(paths: List[Path], configs: List[Dict], partition: int = 0, partitions: int = 1,
+                     session_gap: float = 1800) -> Tuple[List[ConfigSummary], Dict]:
+    """
+    Replay one learner partition of the log under every configuration
+
+    A learner's attempts start a new session after more than session_gap
+    seconds of inactivity. Sessions idle for that long are closed and folded
+    into the summaries as the stream moves on, so memory is bounded by the
+    number of concurrently active learners, not by the size of the log.
+
+    Args:
+        paths: Log segments in write order
+        configs: Rule configurations accepted by RuleSet
+        partition: Partition to replay
+        partitions: Number of partitions learners are hashed into
+        session_gap: Seconds of inactivity that end a session
+
+    Returns:
+        Tuple of (one summary per configuration, stats with the record count,
+        the peak number of open sessions and the process's peak RSS in MB)
+    """
+    replayer = _Replayer(configs, session_gap)
+    feed = replayer.feed
+    for record in LogReader(paths, 'attempt', partition, partitions):
+        feed(record)
+    replayer.finish()
+    stats = {'records': replayer.records, 'peak_sessions': replayer.peak_sessions,
+             'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+    return replayer.summaries, stats
+
+
+def _replay_partition_task(args) -> Tuple[List[ConfigSummary], Dict]:
+    return replay_partition(*args)
+
+
+def run_what_if(directory: str, configs: List[Dict], workers: int = None, session_gap: float = 1800) -> Dict:
+    """
+    Replay an attempt log under alternative rule configurations
+
+    Learners are hashed into one partition per worker. Every worker streams
+    the whole log but decodes only its own learners' records and evaluates
+    each of them under all configurations, so the log is parsed once however
+    many configurations are compared. The answers are those that were
+    logged: the replay shows where each configuration would have placed the
+    learner, not how the learner would have answered there.
+
+    Args:
+        directory: AttemptLog directory
+        configs: Rule configurations accepted by RuleSet
+        workers: Processes, os.cpu_count() if omitted
+        session_gap: Seconds of inactivity that end a session
+
+    Returns:
+        Dictionary with one report per configuration and throughput figures
+    """
+    if not configs:
+        raise ValueError("at least one rule configuration is required")
+    names = [config.get('name', 'default') for config in configs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"configuration names must be distinct, got {names}")
+    paths = log_segments(directory)
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    tasks = [(paths, configs, partition, workers, session_gap) for partition in range(workers)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_replay_partition_task, tasks))
+    else:
+        results = [_replay_partition_task(task) for task in tasks]
+    elapsed = time.perf_counter() - start
+
+    summaries, _ = results[0]
+    for partial, _ in results[1:]:
+        for summary, other in zip(summaries, partial):
+            summary.merge(other)
+    records = sum(stats['records'] for _, stats in results)
+    return {
+        'configs': [summary.report() for summary in summaries],
+        'records': records,
+        'workers': workers,
+        'seconds': round(elapsed, 2),
+        'attempts_per_sec': round(records / elapsed) if elapsed else 0,
+        'decisions_per_sec': round(records * len(configs) / elapsed) if elapsed else 0,
+        'peak_sessions': max(stats['peak_sessions'] for _, stats in results),
+        'peak_rss_mb': max(stats['peak_rss_mb'] for _, stats in results)
+    }
+
+
+def print_report(result: Dict):
+    """Print the per-configuration comparison as a table"""
+    print(f"{result['records']:,} attempts in {result['seconds']} s with {result['workers']} workers: "
+          f"{result['attempts_per_sec']:,} attempts/s, {result['decisions_per_sec']:,} decisions/s, "
+          f"peak {result['peak_sessions']:,} open sessions, {result['peak_rss_mb']} MB RSS per worker")
+    print(f"\n{'config':>20} {'sessions':>9} {'switches':>9} {'reversals':>9} {'final acc':>9} "
+          f"{'matched':>8}  time share per level")
+    for report in result['configs']:
+        shares = report['time_share']
+        if len(shares) > 6:
+            top = sorted(shares.items(), key=lambda item: -item[1])[:5]
+            shares_text = ', '.join(f"{level} {share}%" for level, share in top) + f" (+{len(shares) - 5} levels)"
+        else:
+            shares_text = ', '.join(f"{level} {share}%" for level, share in shares.items())
+        print(f"{report['config']:>20} {report['sessions']:>9,} {report['switches_per_session']:>9.2f} "
+              f"{report['reversals_per_session']:>9.2f} {report['final_level_accuracy']:>8.1f}% "
+              f"{report['matched_logged_level']:>7.1f}%  {shares_text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('directory', help='attempt log directory')
+    parser.add_argument('--rules', nargs='+', default=[], help='JSON or YAML rule configurations to compare')
+    parser.add_argument('--window-size', type=int, nargs='+', default=[3])
+    parser.add_argument('--promote-correct', type=int, nargs='+', default=[2])
+    parser.add_argument('--demote-correct', type=int, nargs='+', default=[1])
+    parser.add_argument('--time-threshold', type=float, nargs='+', default=[8.0])
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--session-gap', type=float, default=1800, help='seconds of inactivity ending a session')
+    parser.add_argument('--json', help='also write the full report to this file')
+    args = parser.parse_args()
+
+    # The threshold grid (the built-in default alone unless widened) plus any rule files
+    configs = []
+    grid = itertools.product(args.window_size, args.promote_correct, args.demote_correct, args.time_threshold)
+    for window_size, promote_correct, demote_correct, time_threshold in grid:
+        config = default_config(window_size, promote_correct, demote_correct, time_threshold)
+        if (window_size, promote_correct, demote_correct, time_threshold) != (3, 2, 1, 8.0):
+            config['name'] = f"w{window_size}-p{promote_correct}-d{demote_correct}-t{time_threshold:g}"
+        configs.append(config)
+    for path in args.rules:
+        config = load_config(path)
+        config.setdefault('name', Path(path).stem)
+        configs.append(config)
+
+    result = run_what_if(args.directory, configs, workers=args.workers, session_gap=args.session_gap)
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+HTTP routing, status codes and error bodies of the API server
+"""
+import asyncio
+import json
+
+import pytest
+
+from api_server import MAX_BODY_BYTES, APIServer
+from learning_service import LearningService
+
+
+def request(method: str, target: str, body: bytes = b'', headers: str = None) -> bytes:
+    if headers is None:
+        headers = f"Content-Length: {len(body)}\r\n"
+    return f"{method} {target} HTTP/1.1\r\nHost: test\r\n{headers}\r\n".encode('latin-1') + body
+
+
+def post(target: str, payload) -> bytes:
+    return request('POST', target, json.dumps(payload).encode('utf-8'))
+
+
+async def read_response(reader: asyncio.StreamReader):
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    headers = dict(line.lower().split(': ', 1) for line in head[1:] if line)
+    body = await reader.readexactly(int(headers['content-length']))
+    return int(head[0].split(' ')[1]), json.loads(body), headers['connection']
+
+
+def exchange(*requests, server: APIServer = None) -> list:
+    """Send requests over one connection; returns (status, payload, connection) per response received"""
+    async def run():
+        api = server or APIServer(LearningService(seed=1))
+        listener = await asyncio.start_server(api.handle_connection, '127.0.0.1', 0)
+        reader, writer = await asyncio.open_connection('127.0.0.1', listener.sockets[0].getsockname()[1])
+        responses = []
+        for data in requests:
+            writer.write(data)
+            await writer.drain()
+            try:
+                responses.append(await read_response(reader))
+            except asyncio.IncompleteReadError:
+                break
+        writer.close()
+        listener.close()
+        return responses
+    return asyncio.run(run())
+
+
+def test_a_session_over_one_connection():
+    server = APIServer(LearningService(seed=1))
+    (status, shown, connection), = exchange(post('/next_puzzle', {'learner_id': 'a', 'difficulty': 'Easy'}),
+                                            server=server)
+    assert status == 200 and connection == 'keep-alive'
+    assert shown['difficulty'] == 'Easy' and shown['puzzle_number'] == 1
+    correct = server.service.sessions['a'].current_puzzle['answer']
+
+    responses = exchange(post('/submit_answer', {'learner_id': 'a', 'answer': correct}),
+                         request('GET', '/session_stats?learner_id=a'), request('GET', '/store_stats'),
+                         server=server)
+    assert [status for status, _, _ in responses] == [200, 200, 200]
+    assert responses[0][1]['is_correct'] and responses[0][1]['correct_answer'] == correct
+    assert responses[1][1]['total_attempts'] == 1 and responses[1][1]['correct_count'] == 1
+    assert responses[2][1] == {'resident': 1, 'spilled': 0}
+
+
+@pytest.mark.parametrize('data, status', [
+    (post('/next_puzzle', {}), 400),
+    (request('POST', '/next_puzzle', b'{not json'), 400),
+    (post('/next_puzzle', [1]), 400),
+    (post('/next_puzzle', "x"), 400),
+    (post('/next_puzzle', {'learner_id': 'a', 'difficulty': 'Impossible'}), 400),
+    (post('/submit_answer', {'learner_id': 'a', 'answer': '3'}), 400),
+    (post('/submit_answer', {'learner_id': 'a', 'answer': True}), 400),
+    (request('GET', '/session_stats'), 400),
+    (request('GET', '/session_stats?learner_id=nobody'), 404),
+    (post('/submit_answer', {'learner_id': 'nobody', 'answer': 3}), 404),
+    (request('GET', '/teapot'), 404),
+    (request('GET', '/next_puzzle'), 405),
+    (post('/store_stats', {}), 405),
+    (request('GET', '/sessions'), 404),
+])
+def test_errors_are_answered_and_the_connection_kept(data, status):
+    responses = exchange(data, post('/next_puzzle', {'learner_id': 'b'}))
+    assert responses[0][0] == status and isinstance(responses[0][1]['error'], str)
+    assert responses[1][0] == 200
+
+
+@pytest.mark.parametrize('data, status', [
+    (request('POST', '/next_puzzle', headers=f"Content-Length: {MAX_BODY_BYTES + 1}\r\n"), 413),
+    (request('POST', '/next_puzzle', headers="Content-Length: ten\r\n"), 400),
+    (request('POST', '/next_puzzle', headers="Content-Length: -4\r\n"), 400),
+    (b"NONSENSE\r\n\r\n", 400),
+    (b"GET /store_stats HTTP/1.1\r\nX-Padding: " + b"x" * 70_000 + b"\r\n\r\n", 431),
+])
+def test_unframeable_requests_are_answered_then_closed(data, status):
+    responses = exchange(data, request('GET', '/store_stats'))
+    assert len(responses) == 1
+    assert responses[0][0] == status and responses[0][2] == 'close'
+
+
+def test_unexpected_errors_become_500(monkeypatch):
+    server = APIServer(LearningService(seed=1))
+    monkeypatch.setattr(server.service, 'store_stats', lambda: 1 / 0)
+    responses = exchange(request('GET', '/store_stats'), post('/next_puzzle', {'learner_id': 'c'}), server=server)
+    assert responses[0][:2] == (500, {'error': 'internal server error'})
+    assert responses[1][0] == 200
+
+
+def test_admin_bodies_must_be_objects():
+    responses = exchange(post('/release_session', [1]), post('/import_session', {}),
+                         server=APIServer(LearningService(seed=1), admin=True))
+    assert [status for status, _, _ in responses] == [400, 400]
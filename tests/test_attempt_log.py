@@ -0,0 +1,135 @@
+"""
+Attempt log storage and its read-only reader
+"""
+import json
+import os
+import time
+
+import pytest
+
+from attempt_log import AttemptLog, LogReader, log_segments
+
+
+def record(index: int, kind: str = 'attempt') -> dict:
+    return {'kind': kind, 'learner_id': f"learner-{index % 7}", 'timestamp': '2026-10-01 10:00:00',
+            'puzzle': f"{index} + 1", 'correct_answer': index + 1, 'user_answer': index + 1, 'is_correct': True,
+            'time_spent': 2.0, 'difficulty': 'Easy', 'operation': '+', 'index': index}
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    """A log of several segments, compacted once, with a torn record at the end"""
+    directory = tmp_path / 'log'
+    with AttemptLog(directory, fsync='never', segment_bytes=2048) as log:
+        for index in range(60):
+            log.append(record(index, 'adaptation' if index % 10 == 9 else 'attempt'))
+            if index % 5 == 4:
+                log.flush()  # one group commit per 5 records, so segments fill up and rotate
+        assert log.compact() > 1
+        for index in range(60, 80):
+            log.append(record(index))
+    with open(log_segments(directory)[-1], 'ab') as f:
+        f.write(json.dumps(record(80)).encode('utf-8')[:40])
+    return directory
+
+
+def test_reader_yields_every_complete_record_in_order(log_dir):
+    indexes = [entry['index'] for entry in LogReader(log_dir)]
+    assert indexes == list(range(80))
+    with AttemptLog(log_dir) as log:
+        # Opening the log for writing drops the torn record; the reader saw the same records
+        assert [entry['index'] for entry in log.replay()] == indexes
+
+
+def test_reader_filters_kind_and_partitions(log_dir):
+    attempts = [entry['index'] for entry in LogReader(log_dir, 'attempt')]
+    assert attempts == [index for index in range(80) if index >= 60 or index % 10 != 9]
+    assert [entry['index'] for entry in LogReader(log_dir, 'adaptation')] == [9, 19, 29, 39, 49, 59]
+
+    partitions = [list(LogReader(log_dir, 'attempt', partition, 3)) for partition in range(3)]
+    assert sorted(entry['index'] for part in partitions for entry in part) == attempts
+    for part in partitions:
+        learners = {entry['learner_id'] for entry in part}
+        assert all(learners.isdisjoint(entry['learner_id'] for entry in other)
+                   for other in partitions if other is not part)
+
+
+def test_reader_resumes_a_segment_at_its_offset(log_dir):
+    segment = log_segments(log_dir)[-1]
+    first = LogReader([segment])
+    head = [entry['index'] for _, entry in zip(range(5), first)]
+    resumed = LogReader([segment], start=first.offset)
+    rest = [entry['index'] for entry in resumed]
+    assert head + rest == [entry['index'] for entry in LogReader([segment])]
+    # The torn record is not consumed, so a later read starts at it
+    assert resumed.offset == segment.stat().st_size - 40
+
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    """Count fsync calls instead of waiting on the disk"""
+    calls = []
+    monkeypatch.setattr(os, 'fsync', calls.append)
+    return calls
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_interval_policy_syncs_an_idle_log(tmp_path, fsyncs):
+    with AttemptLog(tmp_path / 'log', fsync='interval', fsync_interval=0.1) as log:
+        log.append(record(0))
+        log.flush()
+        # No further append arrives, yet the write is synced once the interval has passed
+        assert wait_for(lambda: len(fsyncs) == 1)
+        time.sleep(0.5)
+        assert len(fsyncs) == 1
+        for index in range(1, 4):
+            log.append(record(index))
+            log.flush()
+        # The first write after the idle gap syncs at once; the two that follow share the idle sync
+        assert wait_for(lambda: len(fsyncs) == 3)
+        time.sleep(0.3)
+        assert len(fsyncs) == 3
+    assert [entry['index'] for entry in LogReader(tmp_path / 'log')] == [0, 1, 2, 3]
+
+
+@pytest.mark.parametrize('policy, expected', (('always', 4), ('never', 0)))
+def test_fsync_policies(tmp_path, fsyncs, policy, expected):
+    with AttemptLog(tmp_path / 'log', fsync=policy) as log:
+        for index in range(3):
+            log.append(record(index))
+            log.flush()
+    # 'always' syncs every group commit and once more on close
+    assert len(fsyncs) == expected
+    with pytest.raises(ValueError):
+        AttemptLog(tmp_path / 'other', fsync='sometimes')
+
+
+def test_group_commit_rotates_segments(tmp_path):
+    with AttemptLog(tmp_path / 'log', fsync='never', segment_bytes=1024, max_batch=4) as log:
+        for index in range(40):
+            log.append(record(index))
+    segments = log_segments(tmp_path / 'log')
+    assert len(segments) > 1
+    # Only the active segment may stay under the size limit
+    assert all(os.path.getsize(segment) >= 1024 for segment in segments[:-1])
+    assert [entry['index'] for entry in LogReader(tmp_path / 'log')] == list(range(40))
+
+
+def test_writer_errors_surface_to_callers(tmp_path):
+    log = AttemptLog(tmp_path / 'log', fsync='never')
+    try:
+        log.append({'value': object()})
+        with pytest.raises(RuntimeError):
+            log.flush()
+        with pytest.raises(RuntimeError):
+            log.append(record(0))
+    finally:
+        log.close()
@@ -0,0 +1,142 @@
+"""
+Cohort aggregates over an attempt log
+"""
+import pickle
+
+import pytest
+
+from attempt_log import AttemptLog
+from cohort_analytics import DIFFICULTIES, CohortAnalytics
+
+
+def attempt(learner_id: str, difficulty: str, **extra) -> dict:
+    return {'kind': 'attempt', 'learner_id': learner_id, 'timestamp': '2026-10-01 10:00:00', 'puzzle': '2 + 3',
+            'correct_answer': 5, 'user_answer': 5, 'is_correct': True, 'time_spent': 3.0,
+            'difficulty': difficulty, 'operation': '+', **extra}
+
+
+def adaptation(learner_id: str, source: str, target: str) -> dict:
+    return {'kind': 'adaptation', 'learner_id': learner_id, 'timestamp': '2026-10-01 10:00:00',
+            'from': source, 'to': target, 'rule': 'promote', 'attempt': 1}
+
+
+def cells(transitions) -> dict:
+    """Non-zero cells of a transition matrix"""
+    return {(source, target): int(transitions.loc[source, target])
+            for source in DIFFICULTIES for target in DIFFICULTIES if transitions.loc[source, target]}
+
+
+def test_reviews_are_left_out_of_transitions(tmp_path):
+    with AttemptLog(tmp_path / 'log', fsync='never') as log:
+        for record in (attempt('a', 'Easy'), attempt('a', 'Easy'),
+                       attempt('a', 'Hard', review=1),
+                       attempt('a', 'Medium'), attempt('a', 'Easy', review=0), attempt('a', 'Medium'),
+                       attempt('b', 'Hard', review=2), attempt('b', 'Medium'), attempt('b', 'Hard')):
+            log.append(record)
+
+    analytics = CohortAnalytics(tmp_path / 'log', cohorts={'a': 'class-1', 'b': 'class-2'}, workers=1, chunk_size=2)
+    assert analytics.refresh() == 9
+    transitions = analytics.difficulty_transitions()
+    assert transitions.loc['Easy', 'Easy'] == 1
+    assert transitions.loc['Easy', 'Medium'] == 1
+    assert transitions.loc['Medium', 'Medium'] == 1
+    assert transitions.loc['Medium', 'Hard'] == 1
+    assert int(transitions.to_numpy().sum()) == 4
+    assert 'Hard' not in transitions.index[transitions.sum(axis=1) > 0]
+    assert analytics.difficulty_distribution() == {'Easy': 3, 'Medium': 3, 'Hard': 3}
+    assert analytics.difficulty_distribution('class-1') == {'Easy': 3, 'Medium': 2, 'Hard': 1}
+
+
+LOGGED = [
+    # a: two games; the second starts at Hard without an adaptation
+    attempt('a', 'Easy'), attempt('a', 'Easy'), attempt('a', 'Easy'), adaptation('a', 'Easy', 'Medium'),
+    attempt('a', 'Medium'), attempt('a', 'Hard', review=1), attempt('a', 'Medium'), adaptation('a', 'Medium', 'Easy'),
+    attempt('a', 'Easy'), attempt('a', 'Hard'),
+    # c: scale levels, reported in their bands
+    attempt('c', 'Medium', level='L30'), attempt('c', 'Medium', level='L30'), adaptation('c', 'L30', 'L31'),
+    attempt('c', 'Medium', level='L31'), adaptation('c', 'L31', 'L56'), attempt('c', 'Hard', level='L56'),
+    {'kind': 'session', 'learner_id': 'c', 'timestamp': '2026-10-01 11:00:00', 'seed': 1, 'difficulty': 'L56'}
+]
+
+
+def append_all(directory, records) -> AttemptLog:
+    """Write records one group commit each, so small segments seal as they go"""
+    with AttemptLog(directory, fsync='never', segment_bytes=700) as log:
+        for record in records:
+            log.append(record)
+            log.flush()
+    return log
+
+
+@pytest.mark.parametrize('workers', (1, 2))
+def test_logged_adaptations_drive_the_transitions(tmp_path, workers):
+    assert len(append_all(tmp_path / 'log', LOGGED).segments()) > 2
+
+    analytics = CohortAnalytics(tmp_path / 'log', cohorts={'a': 'class-1', 'c': 'class-2'}, workers=workers,
+                                chunk_size=2)
+    assert analytics.refresh() == 12
+    # The second game's Hard start is not an Easy -> Hard change, and the review is left out
+    assert cells(analytics.difficulty_transitions('class-1')) == {
+        ('Easy', 'Easy'): 3, ('Easy', 'Medium'): 1, ('Medium', 'Medium'): 1, ('Medium', 'Easy'): 1,
+        ('Hard', 'Hard'): 1}
+    # L30 -> L31 stays within Medium
+    assert cells(analytics.difficulty_transitions('class-2')) == {
+        ('Medium', 'Medium'): 2, ('Medium', 'Hard'): 1, ('Hard', 'Hard'): 1}
+    transitions = analytics.difficulty_transitions()
+    assert int(transitions.to_numpy().sum()) == 11
+    assert transitions.loc['Medium', 'Medium'] == 3
+    assert list(analytics.difficulty_transitions('class-1', normalize=True).loc['Easy']) == [0.75, 0.25, 0.0]
+    assert analytics.difficulty_distribution() == {'Easy': 4, 'Medium': 5, 'Hard': 3}
+
+
+def test_old_logs_compare_consecutive_attempts(tmp_path):
+    with AttemptLog(tmp_path / 'log', fsync='never') as log:
+        for record in LOGGED:
+            if record['kind'] == 'attempt':
+                log.append(record)
+
+    analytics = CohortAnalytics(tmp_path / 'log', cohorts={'a': 'class-1', 'c': 'class-2'}, workers=1)
+    assert analytics.refresh() == 12
+    assert cells(analytics.difficulty_transitions('class-1')) == {
+        ('Easy', 'Easy'): 2, ('Easy', 'Medium'): 1, ('Medium', 'Medium'): 1, ('Medium', 'Easy'): 1,
+        ('Easy', 'Hard'): 1}
+
+
+def test_cache_resumes_and_invalidates(tmp_path):
+    directory, cache = tmp_path / 'log', tmp_path / 'aggregates.pickle'
+    cohorts = {'a': 'class-1', 'c': 'class-2'}
+    append_all(directory, LOGGED)
+    first = CohortAnalytics(directory, cohorts=cohorts, cache_path=cache, workers=1)
+    assert first.refresh() == 12
+    expected = cells(first.difficulty_transitions())
+
+    # A new process resumes from the cache and only folds what was appended since
+    resumed = CohortAnalytics(directory, cohorts=cohorts, cache_path=cache, workers=1)
+    assert resumed.refresh() == 0
+    assert cells(resumed.difficulty_transitions()) == expected
+    append_all(directory, [attempt('c', 'Hard', level='L56'), adaptation('c', 'L56', 'L55'),
+                           attempt('c', 'Hard', level='L55')])
+    resumed = CohortAnalytics(directory, cohorts=cohorts, cache_path=cache, workers=1)
+    assert resumed.refresh() == 2
+    assert resumed.aggregates.attempts == 14
+    assert cells(resumed.difficulty_transitions('class-2'))[('Hard', 'Hard')] == 3
+
+    # Another cohort mapping or cache format starts over
+    regrouped = CohortAnalytics(directory, cohorts={'a': 'class-2'}, cache_path=cache, workers=1)
+    assert regrouped.aggregates.attempts == 0
+    assert regrouped.refresh() == 14
+    with open(cache, 'rb') as f:
+        cached = pickle.load(f)
+    with open(cache, 'wb') as f:
+        pickle.dump({**cached, 'format': cached['format'] - 1}, f)
+    assert CohortAnalytics(directory, cohorts={'a': 'class-2'}, cache_path=cache, workers=1).refresh() == 14
+
+    # Compaction rewrites segments, so the aggregates are recomputed from what is left
+    log = AttemptLog(directory, fsync='never', segment_bytes=700)
+    try:
+        assert log.compact(keep=lambda record: record.get('learner_id') != 'a') > 0
+    finally:
+        log.close()
+    compacted = CohortAnalytics(directory, cohorts=cohorts, cache_path=cache, workers=1)
+    assert compacted.refresh() == 6
+    assert compacted.cohort_names() == ['class-2']
@@ -0,0 +1,186 @@
+"""
+Alias-table sampling and the invariants of every difficulty scale category
+"""
+import random
+
+import numpy as np
+import pytest
+
+from difficulty_scale import AliasTable, DifficultyScale, default_specs
+from puzzle_generator import PuzzleBatch, PuzzleGenerator
+from rule_engine import RuleSet
+
+# Chi-square critical values at p = 0.001 by degrees of freedom; seeded draws keep the tests deterministic
+CRITICAL = {1: 10.83, 2: 13.82, 3: 16.27, 4: 18.47, 5: 20.52}
+DRAWS = 20000
+
+
+def chi_square(counts, probabilities) -> float:
+    """Pearson statistic of observed counts against expected probabilities, skipping impossible outcomes"""
+    total = sum(counts)
+    statistic = 0.0
+    for count, probability in zip(counts, probabilities):
+        if probability == 0:
+            assert count == 0
+            continue
+        expected = total * probability
+        statistic += (count - expected) ** 2 / expected
+    return statistic
+
+
+def assert_fits(counts, probabilities):
+    degrees = sum(probability > 0 for probability in probabilities) - 1
+    assert chi_square(counts, probabilities) < CRITICAL[degrees]
+
+
+@pytest.fixture(scope='module')
+def scale():
+    return DifficultyScale(default_specs(100))
+
+
+@pytest.mark.parametrize('weights', ([1, 2, 3, 0, 4], [5], [0.1, 0.1, 9.8], [1, 1, 1, 1, 1, 1]))
+def test_alias_table_reproduces_weights(weights):
+    table = AliasTable(weights)
+    probabilities = [weight / sum(weights) for weight in weights]
+
+    # Each column keeps prob[i] of its own outcome and hands the rest to its alias
+    n = len(table)
+    exact = [prob / n for prob in table.prob]
+    for i, (prob, alias) in enumerate(zip(table.prob, table.alias)):
+        exact[alias] += (1.0 - prob) / n
+    assert exact == pytest.approx(probabilities)
+
+    rng = random.Random(17)
+    scalar = np.bincount([table.sample(rng) for _ in range(DRAWS)], minlength=n)
+    batch = np.bincount(table.sample_many(np.random.default_rng(17), DRAWS), minlength=n)
+    if n > 1:
+        assert_fits(scalar, probabilities)
+        assert_fits(batch, probabilities)
+    else:
+        assert scalar[0] == batch[0] == DRAWS
+
+
+@pytest.mark.parametrize('weights', ([], [0, 0]))
+def test_alias_table_needs_a_positive_weight(weights):
+    with pytest.raises(ValueError):
+        AliasTable(weights)
+
+
+def category_of(num1: int, num2: int, operation: str) -> int:
+    """Index into DifficultyScale.CATEGORIES of a generated puzzle"""
+    code = PuzzleGenerator.OPERATIONS.index(operation)
+    if code == 0:
+        regroup = num1 % 10 + num2 % 10 >= 10
+    elif code == 1:
+        regroup = num1 % 10 < num2 % 10
+    else:
+        regroup = False
+    return DifficultyScale.CATEGORIES.index((code, regroup))
+
+
+def category_probabilities(scale: DifficultyScale, level: str) -> list:
+    spec = scale.spec(level)
+    weights = []
+    for code, regroup in DifficultyScale.CATEGORIES:
+        weight = spec.weights.get(PuzzleGenerator.OPERATIONS[code], 0.0)
+        if code < 2:
+            weight *= spec.regroup if regroup else 1.0 - spec.regroup
+        weights.append(weight)
+    return [weight / sum(weights) for weight in weights]
+
+
+def check_puzzle(scale: DifficultyScale, level: str, puzzle: dict):
+    spec = scale.spec(level)
+    num1, num2 = puzzle['numbers']
+    assert puzzle['question'] == f"{num1} {puzzle['operation']} {num2}"
+    assert puzzle['difficulty'] == spec.band and puzzle['level'] == level
+    assert spec.weights[puzzle['operation']] > 0
+    if puzzle['operation'] in '+-':
+        assert 1 <= num1 <= spec.add_max and 1 <= num2 <= spec.add_max
+        if puzzle['operation'] == '+':
+            assert puzzle['answer'] == num1 + num2
+        else:
+            assert num1 >= num2 and puzzle['answer'] == num1 - num2
+    elif puzzle['operation'] == '×':
+        assert 1 <= num1 <= spec.factor_max and 1 <= num2 <= spec.factor_max
+        assert puzzle['answer'] == num1 * num2
+    else:
+        assert 1 <= num2 <= spec.factor_max and 1 <= puzzle['answer'] <= spec.factor_max
+        assert puzzle['answer'] * num2 == num1
+
+
+@pytest.mark.parametrize('level', ('L1', 'L30', 'L45', 'L65', 'L100'))
+def test_generate_and_sample_batch_agree(scale, level):
+    probabilities = category_probabilities(scale, level)
+
+    rng = random.Random(23)
+    scalar = [0] * len(DifficultyScale.CATEGORIES)
+    for _ in range(DRAWS):
+        puzzle = scale.generate(level, rng)
+        check_puzzle(scale, level, puzzle)
+        scalar[category_of(*puzzle['numbers'], puzzle['operation'])] += 1
+
+    num1, num2, op, answer = scale.sample_batch(level, DRAWS, np.random.default_rng(23))
+    batch = PuzzleBatch(scale.spec(level).band, num1, num2, op, answer, level=level)
+    counts = [0] * len(DifficultyScale.CATEGORIES)
+    for puzzle in batch:
+        check_puzzle(scale, level, puzzle)
+        counts[category_of(*puzzle['numbers'], puzzle['operation'])] += 1
+
+    assert_fits(scalar, probabilities)
+    assert_fits(counts, probabilities)
+
+
+@pytest.mark.parametrize('add_max', (10, 27, 100))
+def test_pairs_split_by_carry_and_borrow(scale, add_max):
+    pairs = scale._pairs_for(add_max)
+    every = {(num1, num2) for num1 in range(1, add_max + 1) for num2 in range(1, add_max + 1)}
+
+    (plain1, plain2), (carry1, carry2) = pairs[0]
+    plain = set(zip(plain1.tolist(), plain2.tolist()))
+    carry = set(zip(carry1.tolist(), carry2.tolist()))
+    assert plain | carry == every and not plain & carry
+    assert all(num1 % 10 + num2 % 10 >= 10 for num1, num2 in carry)
+    assert all(num1 % 10 + num2 % 10 < 10 for num1, num2 in plain)
+
+    (plain1, plain2), (borrow1, borrow2) = pairs[1]
+    plain = set(zip(plain1.tolist(), plain2.tolist()))
+    borrow = set(zip(borrow1.tolist(), borrow2.tolist()))
+    assert plain | borrow == {(num1, num2) for num1, num2 in every if num1 >= num2} and not plain & borrow
+    assert all(num1 % 10 < num2 % 10 for num1, num2 in borrow)
+    assert all(num1 % 10 >= num2 % 10 for num1, num2 in plain)
+
+    # Enumerated once per operand range
+    assert scale._pairs_for(add_max) is pairs
+
+
+def test_level_for_maps_bands_to_their_first_level(scale):
+    bands = [spec.band for spec in scale.specs]
+    # Bands only ever get harder along the scale
+    assert bands == sorted(bands, key=('Easy', 'Medium', 'Hard').index)
+    for band in ('Easy', 'Medium', 'Hard'):
+        level = scale.level_for(band)
+        assert scale.spec(level).band == band
+        assert bands.index(band) == scale.level_index[level]
+    assert scale.level_for('L42') == 'L42'
+    with pytest.raises(ValueError):
+        scale.level_for('Impossible')
+
+
+def test_rule_config_steps_through_the_scale(scale):
+    rules = RuleSet(scale.rule_config(window_size=3, time_threshold=8.0, leap=3, drop=2))
+    assert rules.levels == scale.names() and rules.window_size == 3
+    level = scale.level_index['L50']
+
+    def target(correct: int, avg_time: float, trend: float = None):
+        decision = rules.decide(level, correct, 3, avg_time, trend)
+        return None if decision is None else rules.levels[decision[0]]
+
+    assert target(3, 2.0) == 'L53'
+    assert target(2, 6.0, 2 / 3) == 'L51'
+    assert target(2, 6.0, 0.5) is None
+    assert target(0, 6.0) == 'L48'
+    assert target(1, 6.0) == 'L49'
+    # Steps stop at the ends of the scale
+    assert rules.decide(0, 0, 3, 6.0) is None
+    assert rules.levels[rules.decide(len(scale) - 2, 3, 3, 2.0)[0]] == 'L100'
@@ -0,0 +1,40 @@
+"""
+Metrics registry and its exporters
+"""
+import socket
+import urllib.request
+
+from instrumentation import METRICS_ENV, Metrics
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_port_is_bound_only_by_start_server(monkeypatch):
+    port = free_port()
+    monkeypatch.setenv(METRICS_ENV, str(port))
+    metrics = Metrics.from_env()
+    # Building the registry, as importing an instrumented module does, leaves the port free
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', port))
+
+    metrics.inc('answers_total', help='Answers')
+    metrics.start_server()
+    metrics.start_server()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert 'answers_total 1' in response.read().decode('utf-8')
+    finally:
+        metrics._server.shutdown()
+        metrics._server.server_close()
+
+
+def test_disabled_registry_serves_nothing(monkeypatch):
+    monkeypatch.delenv(METRICS_ENV, raising=False)
+    metrics = Metrics.from_env()
+    metrics.start_server()
+    assert metrics._server is None
+    assert metrics.timed('unused_seconds')(len) is len
@@ -0,0 +1,43 @@
+"""
+Sessions share one stateless generator and engine and keep their own state in slotted records
+"""
+import copy
+import random
+
+import pytest
+
+from learner_state import LearnerState
+from learning_service import LearningService
+from random_streams import RandomStream
+from tracker import RecentWindow
+
+
+def test_sessions_share_the_generator_and_engine():
+    service = LearningService(seed=4)
+    generator, engine = service.generator, service.engine
+    generator_state = copy.deepcopy(vars(generator))
+    engine_state = copy.deepcopy({key: value for key, value in vars(engine).items() if key != 'rules'})
+    rng = random.Random(4)
+    for _ in range(40):
+        learner_id = rng.choice(('a', 'b'))
+        service.next_puzzle(learner_id)
+        service.submit_answer(learner_id, rng.choice((None, -1, service.sessions[learner_id].current_puzzle['answer'])),
+                              2.0)
+
+    assert service.generator is generator and service.engine is engine
+    assert service.sessions['a'] is not service.sessions['b']
+    assert service.sessions['a'].learner.rng.seed != service.sessions['b'].learner.rng.seed
+    # Everything learner-specific went into the sessions, nothing into the shared objects
+    assert {key: value for key, value in vars(engine).items() if key != 'rules'} == engine_state
+    assert {key: value for key, value in vars(generator).items() if key != 'rng'} == \
+        {key: value for key, value in generator_state.items() if key != 'rng'}
+    assert vars(generator)['rng'].getstate() == generator_state['rng'].getstate()
+    assert sum(len(session.learner.difficulty_history) for session in service.sessions.values()) > 0
+
+
+@pytest.mark.parametrize('record', [LearnerState('learner'), RecentWindow(3), RandomStream(1)],
+                         ids=lambda record: type(record).__name__)
+def test_learner_records_are_slot_only(record):
+    assert not hasattr(record, '__dict__')
+    with pytest.raises(AttributeError):
+        record.unexpected = 1
@@ -0,0 +1,90 @@
+"""
+Attempt log export to partitioned Parquet
+"""
+import random
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+ds = pytest.importorskip('pyarrow.dataset')
+
+from attempt_log import AttemptLog, LogReader
+from learning_service import LearningService
+from parquet_export import TABLES, ParquetExporter, export_log, open_dataset
+
+
+@pytest.fixture(scope='module')
+def log_dir(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('log')
+    rng = random.Random(1)
+    with AttemptLog(str(directory), fsync='never') as log:
+        service = LearningService(seed=1, sink=log)
+        for _ in range(600):
+            learner_id = f"learner-{rng.randrange(15)}"
+            service.next_puzzle(learner_id)
+            correct = service.sessions[learner_id].current_puzzle['answer']
+            roll = rng.random()
+            service.submit_answer(learner_id, None if roll < 0.05 else correct if roll < 0.7 else correct + 1,
+                                  round(rng.uniform(1, 20), 2))
+    return directory
+
+
+def rows(table: str, records) -> list:
+    difficulty = 'difficulty' if table == 'attempts' else 'from'
+    return sorted(tuple(str(record.get(name)) for name, _ in TABLES[table])
+                  + (record['timestamp'][:10], record[difficulty]) for record in records)
+
+
+def test_every_record_reads_back_unchanged(log_dir, tmp_path):
+    # Small batches and few open files, so partitions are flushed and reopened
+    counts = export_log(str(log_dir), str(tmp_path), batch_rows=40, max_open_files=2)
+    logged = {'attempts': [], 'adaptations': []}
+    for record in LogReader(str(log_dir)):
+        logged['attempts' if record['kind'] == 'attempt' else 'adaptations'].append(record)
+    assert logged['adaptations'], "the session mix should produce difficulty changes"
+
+    for table in TABLES:
+        exported = open_dataset(str(tmp_path), table).to_table().to_pylist()
+        for row in exported:
+            row['timestamp'] = row['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
+        assert counts[table] == len(logged[table])
+        assert sorted(tuple(str(row[name]) for name, _ in TABLES[table]) + (row['date'], row['difficulty'])
+                      for row in exported) == rows(table, logged[table])
+
+
+def test_layout_and_encoding(log_dir, tmp_path):
+    export_log(str(log_dir), str(tmp_path))
+    dataset = open_dataset(str(tmp_path))
+    schema = dataset.schema
+    for name in ('operation', 'level', 'date', 'difficulty'):
+        assert pa.types.is_dictionary(schema.field(name).type)
+    assert all('/date=' in path and '/difficulty=' in path for path in dataset.files)
+    medium = dataset.to_table(filter=ds.field('difficulty') == 'Medium')
+    assert medium.num_rows == sum(record['difficulty'] == 'Medium' for record in LogReader(str(log_dir), 'attempt'))
+
+
+def test_buffers_and_open_files_stay_bounded(tmp_path):
+    exporter = ParquetExporter(str(tmp_path), batch_rows=10, max_open_files=3)
+    peak_rows = peak_files = 0
+    for index in range(2000):
+        exporter.add({'kind': 'attempt', 'learner_id': 'learner', 'timestamp': f"2026-10-{index % 9 + 1:02d} 12:00:00",
+                      'puzzle': '1 + 2', 'correct_answer': 3, 'user_answer': 3, 'is_correct': True,
+                      'time_spent': 1.5, 'difficulty': ('Easy', 'Medium', 'Hard')[index % 3], 'operation': '+'})
+        peak_rows = max(peak_rows, exporter._buffered)
+        peak_files = max(peak_files, len(exporter._writers))
+    assert peak_rows <= 2 * 10 + 1 and peak_files <= 3
+    assert exporter.close() == {'attempts': 2000, 'adaptations': 0, 'files': exporter.files}
+    assert open_dataset(str(tmp_path)).count_rows() == 2000
+
+
+def test_a_second_export_adds_files(log_dir, tmp_path):
+    first = export_log(str(log_dir), str(tmp_path))
+    files = set(open_dataset(str(tmp_path)).files)
+    export_log(str(log_dir), str(tmp_path))
+    assert files < set(open_dataset(str(tmp_path)).files)
+    assert open_dataset(str(tmp_path)).count_rows() == 2 * first['attempts']
+
+
+def test_unknown_table(tmp_path):
+    with pytest.raises(ValueError):
+        open_dataset(str(tmp_path), 'events')
@@ -0,0 +1,100 @@
+"""
+Constrained sampling from the indexed puzzle bank
+"""
+import random
+from itertools import product
+
+import pytest
+
+from puzzle_bank import PuzzleBank, needs_regrouping, question_digits, weakest_operation
+from puzzle_generator import PuzzleGenerator
+
+
+@pytest.fixture(scope='module')
+def bank():
+    return PuzzleBank(seed=1)
+
+
+def every_puzzle(difficulty):
+    """The level's puzzle space, enumerated independently of the bank"""
+    config = PuzzleGenerator.DIFFICULTY_CONFIG[difficulty]
+    values = range(config['range'][0], config['range'][1] + 1)
+    for operation, (a, b) in product(config['operations'], product(values, values)):
+        if operation == '+':
+            yield operation, a, b, a + b
+        elif operation == '-' and a >= b:
+            yield operation, a, b, a - b
+        elif operation == '×':
+            yield operation, a, b, a * b
+        elif operation == '÷':
+            yield operation, a * b, b, a
+
+
+def matches(puzzle, operation, answer, regroup, digits):
+    op, num1, num2, result = puzzle
+    low, high = answer or (None, None)
+    return ((operation is None or op == operation) and (low is None or result >= low)
+            and (high is None or result <= high)
+            and (regroup is None or needs_regrouping(op, num1, num2) == regroup)
+            and (digits is None or question_digits(num1, num2) == digits))
+
+
+@pytest.mark.parametrize('case', range(60))
+def test_count_and_sample_agree_with_a_full_scan(bank, case):
+    rng = random.Random(case)
+    difficulty = rng.choice(list(PuzzleGenerator.DIFFICULTY_CONFIG))
+    operation = rng.choice([None] + PuzzleGenerator.DIFFICULTY_CONFIG[difficulty]['operations'])
+    low = rng.choice([None, rng.randrange(0, 60)])
+    answer = rng.choice([None, (low, None if low is None else low + rng.randrange(0, 200))])
+    regroup = rng.choice([None, True, False])
+    digits = rng.choice([None, 1, 2, 4])
+    expected = [p for p in every_puzzle(difficulty) if matches(p, operation, answer, regroup, digits)]
+
+    assert bank.count(difficulty, operation, answer, regroup, digits) == len(expected)
+    puzzle = bank.sample(difficulty, operation, answer, regroup, digits, rng=rng)
+    if not expected:
+        assert puzzle is None
+        return
+    num1, num2 = puzzle['numbers']
+    assert (puzzle['operation'], num1, num2, puzzle['answer']) in expected
+    assert puzzle['question'] == f"{num1} {puzzle['operation']} {num2}" and puzzle['difficulty'] == difficulty
+
+
+def test_regrouping():
+    assert needs_regrouping('+', 18, 5) and not needs_regrouping('+', 12, 7)
+    assert needs_regrouping('-', 32, 17) and not needs_regrouping('-', 38, 17)
+    assert not needs_regrouping('×', 9, 9)
+
+
+def test_matching_puzzles_are_drawn_uniformly(bank):
+    rng = random.Random(3)
+    drawn = {}
+    for _ in range(4000):
+        puzzle = bank.sample('Medium', '×', answer=(50, 60), rng=rng)
+        drawn[puzzle['question']] = drawn.get(puzzle['question'], 0) + 1
+    assert len(drawn) == bank.count('Medium', '×', answer=(50, 60))
+    assert max(drawn.values()) < 2 * min(drawn.values())
+
+
+def test_sample_unseen_avoids_repeats_until_exhausted(bank):
+    seen = set()
+    rng = random.Random(0)
+    size = bank.count('Easy', '+', answer=(None, 4))
+    questions = [bank.sample_unseen('Easy', seen, rng, attempts=200, operation='+', answer=(None, 4))['question']
+                 for _ in range(size)]
+    assert len(set(questions)) == size
+    assert bank.sample_unseen('Easy', seen, rng, operation='+', answer=(None, 4)) is not None
+
+
+def test_unknown_difficulty_or_operation(bank):
+    with pytest.raises(ValueError):
+        bank.sample('Expert')
+    with pytest.raises(ValueError):
+        bank.count('Easy', '^')
+    assert bank.sample('Easy', '×') is None
+
+
+def test_weakest_operation():
+    counts = {'+': (9, 10), '-': (4, 10), '×': (0, 2)}
+    assert weakest_operation(counts, ['+', '-', '×']) == '-'
+    assert weakest_operation({'+': (9, 10)}, ['+', '-']) is None
@@ -0,0 +1,77 @@
+"""
+Scalar and vectorised puzzle generation
+"""
+import random
+
+import numpy as np
+import pytest
+
+from puzzle_generator import PuzzleGenerator
+
+
+def check_puzzle(puzzle: dict, difficulty: str):
+    config = PuzzleGenerator.DIFFICULTY_CONFIG[difficulty]
+    low, high = config['range']
+    num1, num2 = puzzle['numbers']
+    operation = puzzle['operation']
+    assert operation in config['operations']
+    assert puzzle['question'] == f"{num1} {operation} {num2}"
+    if operation == '÷':
+        # The dividend is built as quotient × divisor, so only the divisor and quotient are in range
+        assert low <= num2 <= high
+        assert num1 % num2 == 0
+        assert puzzle['answer'] == num1 // num2
+        assert low <= puzzle['answer'] <= high
+        return
+    assert low <= num1 <= high and low <= num2 <= high
+    if operation == '+':
+        assert puzzle['answer'] == num1 + num2
+    elif operation == '-':
+        assert num1 >= num2
+        assert puzzle['answer'] == num1 - num2
+    else:
+        assert puzzle['answer'] == num1 * num2
+
+
+@pytest.mark.parametrize('difficulty', sorted(PuzzleGenerator.DIFFICULTY_CONFIG))
+def test_batch_respects_difficulty_invariants(difficulty):
+    batch = PuzzleGenerator().generate_batch(difficulty, 5000, seed=11)
+    assert len(batch) == 5000
+    for puzzle in batch:
+        assert puzzle['difficulty'] == difficulty
+        check_puzzle(puzzle, difficulty)
+    
+    # Every operation of the level turns up, and the operand range is covered end to end
+    operations = PuzzleGenerator.DIFFICULTY_CONFIG[difficulty]['operations']
+    assert {PuzzleGenerator.OPERATIONS[code] for code in np.unique(batch.op)} == set(operations)
+    low, high = PuzzleGenerator.DIFFICULTY_CONFIG[difficulty]['range']
+    assert batch.num2.min() == low and batch.num2.max() == high
+    assert list(batch.questions()) == [puzzle['question'] for puzzle in batch]
+
+
+def test_batch_is_reproducible_from_its_seed():
+    first = PuzzleGenerator(seed=1).generate_batch('Hard', 500, seed=7)
+    second = PuzzleGenerator(seed=2).generate_batch('Hard', 500, seed=7)
+    for column in ('num1', 'num2', 'op', 'answer'):
+        assert np.array_equal(getattr(first, column), getattr(second, column))
+
+
+@pytest.mark.parametrize('difficulty', sorted(PuzzleGenerator.DIFFICULTY_CONFIG))
+def test_scalar_puzzles_respect_difficulty_invariants(difficulty):
+    generator = PuzzleGenerator()
+    rng = random.Random(5)
+    for _ in range(2000):
+        check_puzzle(generator.generate_puzzle(difficulty, rng), difficulty)
+
+
+def test_division_answer_is_the_quotient():
+    generator = PuzzleGenerator()
+    rng = random.Random(3)
+    divisions = [puzzle for puzzle in (generator.generate_puzzle('Hard', rng) for _ in range(400))
+                 if puzzle['operation'] == '÷']
+    batch = [puzzle for puzzle in generator.generate_batch('Hard', 400, seed=3) if puzzle['operation'] == '÷']
+    assert divisions and batch
+    for puzzle in divisions + batch:
+        num1, num2 = puzzle['numbers']
+        # The scalar path once answered with the divisor ('46 ÷ 23' -> 23)
+        assert puzzle['answer'] * num2 == num1
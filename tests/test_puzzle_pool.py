@@ -0,0 +1,27 @@
+"""
+Pre-generated puzzle pools
+"""
+from puzzle_generator import PuzzleGenerator, puzzle_key
+from puzzle_pool import PuzzlePool
+
+
+def draw(pool: PuzzlePool, count: int, seen: set) -> list:
+    return [pool.next_puzzle(('Easy', 'Medium', 'Hard')[index % 3], seen)['question'] for index in range(count)]
+
+
+def test_seeded_pools_repeat_their_sequence_through_misses():
+    sequences = []
+    for generator_seed in (1, 2):
+        # Without refills the queues run dry and every later puzzle is a miss
+        pool = PuzzlePool(PuzzleGenerator(seed=generator_seed), capacity=8, low_water=0, seed=42)
+        sequences.append(draw(pool, 60, set()))
+        assert pool.misses == 60 - 3 * 8
+    assert sequences[0] == sequences[1]
+
+
+def test_pool_skips_seen_puzzles():
+    pool = PuzzlePool(PuzzleGenerator(), capacity=64, low_water=16, seed=3)
+    seen = set()
+    puzzles = [pool.next_puzzle('Easy', seen) for _ in range(40)]
+    assert len({puzzle_key(puzzle) for puzzle in puzzles}) == 40
+    assert seen == {puzzle_key(puzzle) for puzzle in puzzles}
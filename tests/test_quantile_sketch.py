@@ -0,0 +1,98 @@
+"""
+KLL sketch quantiles against exact quantiles of the stream
+"""
+import bisect
+import math
+import random
+
+import pytest
+
+from quantile_sketch import KLLSketch
+
+QUANTILES = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+# About 1.7/k with high probability; a fixed seed keeps the test deterministic
+MAX_RANK_ERROR = 2.5 / 200
+
+
+def exact_rank(ordered, value: float) -> float:
+    """Fraction of the stream <= value"""
+    return bisect.bisect_right(ordered, value) / len(ordered)
+
+
+def rank_errors(sketch: KLLSketch, values) -> list:
+    ordered = sorted(values)
+    return [abs(exact_rank(ordered, estimate) - q) for q, estimate in zip(QUANTILES, sketch.quantiles(QUANTILES))]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_rank_error_within_bound(seed):
+    rng = random.Random(seed)
+    values = [rng.lognormvariate(2, 0.6) for _ in range(50_000)]
+    sketch = KLLSketch(200, random.Random(seed))
+    for value in values:
+        sketch.update(value)
+    assert sketch.retained < 3 * 200 + 50
+    assert max(rank_errors(sketch, values)) <= MAX_RANK_ERROR
+    assert sketch.min_value == min(values) and sketch.max_value == max(values)
+
+
+def test_merged_rank_error_within_bound():
+    rng = random.Random(11)
+    sketches, values = [], []
+    for learner in range(40):
+        sketch = KLLSketch(200, random.Random(learner))
+        for _ in range(rng.randrange(100, 3000)):
+            value = rng.uniform(1, 30)
+            sketch.update(value)
+            values.append(value)
+        sketches.append(sketch)
+    merged = KLLSketch.merged(sketches, 200, random.Random(0))
+    assert merged.count == len(values)
+    assert max(rank_errors(merged, values)) <= MAX_RANK_ERROR
+
+
+def test_exact_before_first_compaction():
+    rng = random.Random(3)
+    values = [round(rng.uniform(0, 10), 2) for _ in range(150)]
+    sketch = KLLSketch()
+    for value in values:
+        sketch.update(value)
+    ordered = sorted(values)
+    assert sketch.quantiles(QUANTILES) == [ordered[max(1, math.ceil(q * len(ordered))) - 1] for q in QUANTILES]
+
+
+def test_same_stream_gives_same_sketch():
+    rng = random.Random(4)
+    values = [rng.random() for _ in range(20_000)]
+    first, second = KLLSketch(), KLLSketch()
+    for value in values:
+        first.update(value)
+        second.update(value)
+    assert first.to_dict() == second.to_dict()
+
+    random.seed(1)
+    third = KLLSketch(rng=random.Random(9))
+    random.seed(2)
+    fourth = KLLSketch(rng=random.Random(9))
+    for value in values:
+        third.update(value)
+        fourth.update(value)
+    assert third.to_dict() == fourth.to_dict()
+
+
+def test_queries_follow_updates():
+    sketch = KLLSketch()
+    for value in (5.0, 1.0, 3.0):
+        sketch.update(value)
+    assert sketch.quantiles((0.5, 0.9)) == [3.0, 5.0]
+    assert sketch.rank(3.0) == pytest.approx(2 / 3)
+    view = sketch._sorted_view()
+    assert sketch._sorted_view() is view
+    sketch.update(0.5)
+    sketch.update(0.7)
+    assert sketch.quantile(0.5) == 1.0
+    assert sketch.rank(3.0) == pytest.approx(4 / 5)
+    other = KLLSketch()
+    other.update(10.0)
+    sketch.merge(other)
+    assert sketch.quantile(0.99) == 10.0
@@ -0,0 +1,157 @@
+"""
+Sessions replay exactly from a learner's stream seed and answer log
+"""
+import random
+
+import numpy as np
+import pytest
+
+from adaptive_engine import AdaptiveEngine
+from difficulty_scale import DifficultyScale, default_specs
+from learner_state import LearnerState
+from learning_service import LearningService, answers_from_attempts, logged_session, replay_session
+from puzzle_generator import PuzzleGenerator
+from review_scheduler import ReviewScheduler
+from rule_engine import RuleSet
+from simulation import run_simulation
+from skill_model import SkillEngine, SkillModel
+from tracker import PerformanceTracker
+
+SEED = 2024
+
+
+def rules():
+    return PuzzleGenerator(), AdaptiveEngine()
+
+
+def scale_rules():
+    scale = DifficultyScale(default_specs(100))
+    return PuzzleGenerator(scale), AdaptiveEngine(rules=RuleSet(scale.rule_config()))
+
+
+def skill():
+    generator = PuzzleGenerator()
+    return generator, SkillEngine(SkillModel.for_generator(generator))
+
+
+CONFIGURATIONS = [rules, scale_rules, skill]
+
+
+def play(service: LearningService, learner_id: str, puzzles: int, rng: random.Random, start: str = None):
+    """Answer puzzles with a mix of right, wrong and skipped answers"""
+    for _ in range(puzzles):
+        service.next_puzzle(learner_id, start)
+        answer = service.sessions[learner_id].current_puzzle['answer']
+        roll = rng.random()
+        if roll < 0.1:
+            answer = None
+        elif roll < 0.35:
+            answer = answer + rng.choice((-1, 1)) if rng.random() < 0.8 else 0
+        service.submit_answer(learner_id, answer, round(rng.uniform(1.0, 12.0), 2))
+
+
+def fingerprint(session) -> tuple:
+    """Everything a replay must reproduce, without wall-clock timestamps"""
+    attempts = [{key: value for key, value in attempt.items() if key != 'timestamp'}
+                for attempt in session.tracker.attempts]
+    learner = session.learner
+    return (attempts, learner.difficulty_history, learner.current_difficulty, sorted(learner.seen_puzzles),
+            learner.skills, learner.rng.position)
+
+
+@pytest.mark.parametrize('factory', CONFIGURATIONS, ids=lambda factory: factory.__name__)
+def test_sessions_replay_from_seed_and_answers(factory):
+    rng = random.Random(SEED)
+    generator, engine = factory()
+    service = LearningService(generator, engine, seed=SEED)
+    starts = {f"learner-{index}": rng.choice((None, 'Easy', 'Hard')) for index in range(12)}
+    for learner_id, start in starts.items():
+        play(service, learner_id, 25, rng, start)
+
+    for learner_id, start in starts.items():
+        original = service.sessions[learner_id]
+        generator, engine = factory()
+        replay = replay_session(learner_id, service.learner_seed(learner_id),
+                                answers_from_attempts(original.tracker.attempts), generator, engine, start)
+        assert fingerprint(replay) == fingerprint(original)
+        assert replay.tracker.get_session_stats() == original.tracker.get_session_stats()
+
+
+@pytest.mark.parametrize('factory', CONFIGURATIONS, ids=lambda factory: factory.__name__)
+def test_snapshot_midway_continues_like_an_uninterrupted_session(factory):
+    for index in range(5):
+        generator, engine = factory()
+        straight = LearningService(generator, engine, seed=SEED)
+        play(straight, 'learner', 30, random.Random(index))
+
+        answer_rng = random.Random(index)
+        generator, engine = factory()
+        first = LearningService(generator, engine, seed=SEED)
+        play(first, 'learner', 15, answer_rng)
+        second = LearningService(generator, engine)
+        second.import_session(first.export_session('learner'))
+        play(second, 'learner', 15, answer_rng)
+        assert fingerprint(second.sessions['learner']) == fingerprint(straight.sessions['learner'])
+
+
+def play_ui_game(generator, engine, learner_id: str, start: str, puzzles: int, rng: random.Random) -> list:
+    """Play one game through the calls ui.py makes, returning its attempt-log records"""
+    records = []
+    learner = LearnerState(learner_id, window_size=engine.rules_for(learner_id).window_size)
+    tracker = PerformanceTracker(window_sizes=(), learner_id=learner_id, sink=records)
+    reviews = ReviewScheduler()
+    learner.reset(start)
+    tracker.start_session()
+    tracker.log_session(learner.rng.seed, start)
+    difficulty = start
+    for number in range(puzzles):
+        puzzle = generator.next_puzzle(difficulty, learner.seen_puzzles, learner.rng, reviews, learner_id, 0.5)
+        roll = rng.random()
+        answer = 0 if roll < 0.1 else puzzle['answer'] + (roll < 0.35)
+        is_correct = answer == puzzle['answer']
+        tracker.log_attempt(puzzle, answer, is_correct, round(rng.uniform(1.0, 12.0), 2))
+        reviews.record(learner_id, puzzle, is_correct)
+        engine.record_attempt(learner, puzzle, is_correct, tracker.attempts[-1]['time_spent'])
+        # The UI shows the summary after the last answer instead of adapting
+        if number + 1 < puzzles:
+            changes = len(learner.difficulty_history)
+            difficulty = engine.adapt_learner(learner)
+            if len(learner.difficulty_history) > changes:
+                tracker.log_adaptation(learner.difficulty_history[-1])
+    return records
+
+
+@pytest.mark.parametrize('factory', CONFIGURATIONS, ids=lambda factory: factory.__name__)
+def test_ui_games_replay_from_the_logged_seed(factory):
+    generator, engine = factory()
+    start = generator.resolve_difficulty('Easy')
+    records = play_ui_game(generator, engine, 'ui-learner', start, 25, random.Random(SEED))
+    seed, difficulty, answers = logged_session(records, 'ui-learner')
+    assert difficulty == start and len(answers) == 25
+
+    generator, engine = factory()
+    replay = replay_session('ui-learner', seed, answers, generator, engine, difficulty)
+    attempts = [{key: value for key, value in record.items() if key not in ('kind', 'learner_id', 'timestamp')}
+                for record in records if record['kind'] == 'attempt']
+    assert [{key: value for key, value in attempt.items() if key != 'timestamp'}
+            for attempt in replay.tracker.attempts] == attempts
+    adaptations = [{key: value for key, value in record.items() if key not in ('kind', 'learner_id', 'timestamp',
+                                                                                 'attempt')}
+                   for record in records if record['kind'] == 'adaptation']
+    assert replay.learner.difficulty_history[:len(adaptations)] == adaptations
+
+
+def test_simulation_does_not_depend_on_chunking():
+    reports = [run_simulation(60, puzzles=10, workers=1, chunk_size=size, seed=SEED) for size in (1, 7, 60)]
+    for report in reports:
+        report.pop('sessions_per_sec')
+    assert reports[1] == reports[0] and reports[2] == reports[0]
+
+
+def test_batches_from_spawned_seeds_are_reproducible():
+    children = np.random.SeedSequence(SEED).spawn(3)
+    first = [PuzzleGenerator().generate_batch('Hard', 1000, seed=child) for child in children]
+    second = [PuzzleGenerator(seed=1).generate_batch('Hard', 1000, seed=child) for child in children]
+    for a, b in zip(first, second):
+        assert np.array_equal(a.num1, b.num1) and np.array_equal(a.num2, b.num2) and np.array_equal(a.op, b.op)
+    assert len({batch.num1.tobytes() for batch in first}) == 3
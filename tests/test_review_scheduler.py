@@ -0,0 +1,141 @@
+"""
+Spaced-repetition review queue and its timing wheel
+"""
+import random
+import time
+
+import pytest
+
+from puzzle_generator import PuzzleGenerator
+from review_scheduler import DEFAULT_INTERVALS, ReviewScheduler, TimingWheel
+from tracker import PerformanceTracker
+
+NOW = 1_800_000_000
+
+
+def puzzle(num1: int, num2: int = 3, operation: str = '+', difficulty: str = 'Easy', **extra):
+    answer = {'+': num1 + num2, '-': num1 - num2, '×': num1 * num2, '÷': num1 // num2}[operation]
+    return {'question': f"{num1} {operation} {num2}", 'answer': answer, 'difficulty': difficulty,
+            'operation': operation, 'numbers': [num1, num2], **extra}
+
+
+@pytest.mark.parametrize('slots', [1, 8, 4096])
+def test_wheel_pops_exactly_the_due_items(slots):
+    rng = random.Random(slots)
+    wheel = TimingWheel(resolution=10.0, slots=slots)
+    wheel.start(NOW)
+    pending = {}
+    for item in range(2000):
+        pending[item] = NOW + rng.uniform(-50, 5000)
+        wheel.add(pending[item], item)
+    now = NOW
+    while pending:
+        now += rng.uniform(0, 400)
+        popped = wheel.pop_due(now)
+        assert sorted(item for _, item in popped) == sorted(item for item, due in pending.items() if due <= now)
+        for _, item in popped:
+            del pending[item]
+        assert len(wheel) == len(pending)
+
+
+def test_reviews_climb_the_leitner_boxes():
+    scheduler = ReviewScheduler()
+    missed = puzzle(7)
+    scheduler.record('learner', missed, False, now=NOW)
+    assert scheduler.next_due('learner') == NOW + DEFAULT_INTERVALS[0]
+    assert scheduler.take_due('learner', now=NOW + 59) is None
+
+    now = NOW + 60
+    for box in range(len(DEFAULT_INTERVALS)):
+        review = scheduler.take_due('learner', now=now)
+        assert review['review'] == box and review['question'] == missed['question'] and review['answer'] == 10
+        scheduler.record('learner', review, True, now=now)
+        if box + 1 < len(DEFAULT_INTERVALS):
+            assert scheduler.next_due('learner') == now + DEFAULT_INTERVALS[box + 1]
+            now = scheduler.next_due('learner')
+    # A correct answer in the last box retires the puzzle
+    assert scheduler.pending('learner') == 0 and len(scheduler) == 0
+
+
+def test_a_wrong_review_starts_over():
+    scheduler = ReviewScheduler()
+    scheduler.schedule('learner', puzzle(4, 2, '×', 'Medium', level='Level 5'), box=3, now=NOW)
+    review = scheduler.take_due('learner', now=NOW + DEFAULT_INTERVALS[3])
+    assert review['review'] == 3 and review['level'] == 'Level 5' and review['answer'] == 8
+    scheduler.record('learner', review, False, now=NOW + DEFAULT_INTERVALS[3])
+    assert scheduler.next_due('learner') == NOW + DEFAULT_INTERVALS[3] + DEFAULT_INTERVALS[0]
+
+
+def test_pull_due_across_learners():
+    rng = random.Random(5)
+    scheduler = ReviewScheduler(resolution=30.0, slots=64)
+    expected = {}
+    for index in range(300):
+        learner_id = f"learner-{index}"
+        for _ in range(rng.randrange(1, 6)):
+            offset = rng.uniform(-3000, 3000)
+            box = rng.randrange(len(DEFAULT_INTERVALS))
+            scheduler.schedule(learner_id, puzzle(rng.randrange(1, 40), rng.randrange(1, 40)), box,
+                               now=NOW + offset - DEFAULT_INTERVALS[box])
+            expected.setdefault(learner_id, []).append(int(NOW + offset))
+    # Taking a learner's first review leaves a stale wheel entry behind
+    taken = scheduler.take_due('learner-0', now=NOW + 3000)
+    expected['learner-0'].remove(min(expected['learner-0']))
+    assert taken is not None
+
+    pulled = {}
+    for learner_id, _ in scheduler.pull_due(now=NOW):
+        pulled[learner_id] = pulled.get(learner_id, 0) + 1
+    assert pulled == {learner_id: sum(due <= NOW for due in dues) for learner_id, dues in expected.items()
+                      if any(due <= NOW for due in dues)}
+    assert len(scheduler) == sum(due > NOW for dues in expected.values() for due in dues)
+    assert scheduler.pull_due(now=NOW) == []
+
+
+def test_release_and_restore_keep_the_queue():
+    first = ReviewScheduler()
+    for index in range(5):
+        first.schedule('learner', puzzle(index + 1, level='Level 2'), box=index % 3, now=NOW + index * 10 ** 5)
+    reviews = first.release('learner')
+    assert first.pending('learner') == 0 and first.pull_due(now=NOW + 10 ** 7) == []
+
+    second = ReviewScheduler()
+    second.schedule('other', puzzle(1, operation='-'), now=NOW)
+    second.restore('learner', reviews)
+    assert second.release('learner') == reviews
+    second.restore('learner', reviews)
+    due = second.pull_due(now=NOW + 10 ** 7)
+    assert [entry['question'] for learner_id, entry in due if learner_id == 'other'] == ['1 - 3']
+    pulled = [entry for learner_id, entry in due if learner_id == 'learner']
+    assert [entry['question'] for entry in pulled] == [f"{index + 1} + 3" for index in range(5)]
+    assert [entry['review'] for entry in pulled] == [index % 3 for index in range(5)]
+    assert all(entry['level'] == 'Level 2' for entry in pulled)
+
+
+def test_queue_is_rebuilt_from_the_attempt_log():
+    records = []
+    tracker = PerformanceTracker(learner_id='learner', sink=records)
+    live = ReviewScheduler()
+    for index in range(12):
+        shown = puzzle(index + 2, 2, PuzzleGenerator.OPERATIONS[index % 4])
+        correct = index % 3 != 0
+        tracker.log_attempt(shown, shown['answer'] if correct else 0, correct, time_spent=2.0)
+        live.record('learner', shown, correct, now=time.mktime(time.strptime(
+            tracker.attempts[-1]['timestamp'], '%Y-%m-%d %H:%M:%S')))
+    tracker.log_adaptation({'from': 'Easy', 'to': 'Medium'})
+
+    rebuilt = ReviewScheduler()
+    assert rebuilt.observe_log(records) == len(records)
+    assert rebuilt.release('learner') == live.release('learner')
+
+
+def test_generator_interleaves_due_reviews():
+    scheduler = ReviewScheduler()
+    scheduler.record('learner', puzzle(9, 9, '×', 'Medium'), False, now=time.time() - 120)
+    generator = PuzzleGenerator(seed=1)
+    fresh = generator.next_puzzle('Medium', set(), reviews=scheduler, learner_id='learner', review_share=0.0)
+    assert 'review' not in fresh
+    review = generator.next_puzzle('Medium', set(), reviews=scheduler, learner_id='learner', review_share=1.0)
+    assert review['review'] == 0 and review['question'] == '9 × 9'
+    assert 'review' not in generator.next_puzzle('Medium', set(), reviews=scheduler, learner_id='learner',
+                                                 review_share=1.0)
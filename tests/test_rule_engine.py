@@ -0,0 +1,97 @@
+"""
+Hot reloading of rule files
+"""
+import json
+import logging
+import os
+import threading
+
+import pytest
+
+from rule_engine import RuleRegistry, RuleSet, default_config
+
+
+def write(path, config, step: int):
+    """Write a rule file with a modification time that differs from every earlier one"""
+    path.write_text(config if isinstance(config, str) else json.dumps(config), encoding='utf-8')
+    os.utime(path, ns=(step * 10**9, step * 10**9))
+
+
+def variants(threshold_a: float, threshold_b: float) -> dict:
+    return {'variants': {'a': default_config(time_threshold=threshold_a),
+                         'b': default_config(time_threshold=threshold_b)},
+            'weights': {'a': 1, 'b': 1}}
+
+
+def thresholds(registry: RuleRegistry) -> dict:
+    return {name: rules.config['rules'][0]['when']['max_avg_time'] for name, rules in registry.variants().items()}
+
+
+@pytest.mark.parametrize('broken', [
+    '{"variants": {',                                                    # not JSON
+    json.dumps({'variants': {'a': default_config()}, 'weights': {'c': 1}}),  # unknown variant
+    json.dumps({'variants': {'a': dict(default_config(), window_size='three')}}),
+])
+def test_broken_file_keeps_current_rules(tmp_path, caplog, broken):
+    path = tmp_path / 'rules.json'
+    write(path, variants(8.0, 6.0), 1)
+    registry = RuleRegistry.from_file(str(path))
+    before = thresholds(registry)
+    assignment = registry.variant_for('learner-1')
+
+    write(path, broken, 2)
+    with caplog.at_level(logging.WARNING, logger='rule_engine'):
+        assert registry.reload_if_changed() is False
+    assert thresholds(registry) == before
+    assert registry.variant_for('learner-1') == assignment
+    assert 'keeping the current rules' in caplog.text
+
+    # The rejected version is not parsed again, a fixed one is picked up
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger='rule_engine'):
+        assert registry.reload_if_changed() is False
+    assert caplog.text == ''
+    write(path, variants(9.0, 5.0), 3)
+    assert registry.reload_if_changed() is True
+    assert thresholds(registry) == {'a': 9.0, 'b': 5.0}
+    assert registry.reload_if_changed() is False
+
+
+def test_broken_file_fails_the_first_load(tmp_path):
+    path = tmp_path / 'rules.json'
+    write(path, '{"variants": {', 1)
+    with pytest.raises(ValueError):
+        RuleRegistry.from_file(str(path))
+
+
+def test_assignments_wait_for_a_reload_in_progress(tmp_path):
+    path = tmp_path / 'rules.json'
+    write(path, variants(8.0, 6.0), 1)
+    registry = RuleRegistry.from_file(str(path))
+    results = {}
+
+    def assign_and_read():
+        registry.assign('learner-1', 'b')
+        results['rules'] = registry.rules_for('learner-1')
+
+    # Holding the lock stands in for a reload that is swapping the variants
+    with registry._lock:
+        worker = threading.Thread(target=assign_and_read)
+        worker.start()
+        worker.join(0.2)
+        assert worker.is_alive()
+        registry._install({'b': RuleSet(default_config(time_threshold=4.0))}, None, {})
+    worker.join()
+    assert registry.variant_for('learner-1') == 'b'
+    assert results['rules'] is registry.variants()['b']
+    with pytest.raises(ValueError):
+        registry.assign('learner-2', 'a')
+
+
+def test_set_variant_keeps_assignments():
+    registry = RuleRegistry()
+    registry.set_variant('fast', RuleSet(default_config(time_threshold=4.0)), weight=0)
+    registry.assign('learner-1', 'fast')
+    registry.set_variant('slow', RuleSet(default_config(time_threshold=12.0)), weight=1)
+    assert registry.variant_for('learner-1') == 'fast'
+    assert registry.rules_for('learner-1') is registry.variants()['fast']
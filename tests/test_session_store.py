@@ -0,0 +1,91 @@
+"""
+Bounded session store: spilled sessions come back as they were
+"""
+import random
+
+import pytest
+
+from learning_service import LearnerNotFound, LearningService
+from session_store import ATTEMPT_BYTES, SESSION_BYTES, SessionStore
+
+
+def play(service: LearningService, learners: int, answers: int, seed: int = 0):
+    """Answer puzzles for learners in random order; returns every puzzle and result served"""
+    rng = random.Random(seed)
+    transcript = []
+    for _ in range(learners * answers):
+        learner_id = f"learner-{rng.randrange(learners)}"
+        shown = service.next_puzzle(learner_id)
+        correct = service.sessions[learner_id].current_puzzle['answer']
+        roll = rng.random()
+        result = service.submit_answer(learner_id, None if roll < 0.1 else correct if roll < 0.7 else correct + 1,
+                                       round(rng.uniform(1, 20), 2))
+        transcript.append((learner_id, shown, result))
+    return transcript
+
+
+def test_spilling_does_not_change_any_session(tmp_path):
+    # Room for about three short sessions, so nearly every switch of learner spills one
+    store = SessionStore(str(tmp_path), max_bytes=3 * (SESSION_BYTES + 10 * ATTEMPT_BYTES))
+    bounded = LearningService(seed=3, store=store)
+    unbounded = LearningService(seed=3)
+    assert play(bounded, 20, 15) == play(unbounded, 20, 15)
+    assert store.spills > 0 and store.restores > 0
+    assert store.resident_bytes <= store.max_bytes or len(store.resident) == 1
+
+    for learner_id in unbounded.sessions:
+        kept, restored = unbounded.sessions[learner_id], bounded.sessions[learner_id]
+        assert restored.learner.difficulty_history == kept.learner.difficulty_history
+        assert restored.learner.seen_puzzles == kept.learner.seen_puzzles
+        assert restored.learner.current_difficulty == kept.learner.current_difficulty
+        assert [{**attempt, 'timestamp': None} for attempt in restored.tracker.attempts] == \
+            [{**attempt, 'timestamp': None} for attempt in kept.tracker.attempts]
+    stats = bounded.store_stats()
+    assert stats['resident'] + stats['spilled'] == 20 and stats['restore_ms_p50'] is not None
+
+
+def test_idle_sessions_are_spilled_with_their_puzzle_and_timer(tmp_path):
+    store = SessionStore(str(tmp_path), ttl=60)
+    service = LearningService(seed=1, store=store)
+    shown = service.next_puzzle('learner')
+    session = store.resident['learner']
+    started = session.tracker.current_attempt_start
+    puzzle = session.current_puzzle
+
+    assert store.evict_idle(now=session.last_active + 30) == 0
+    assert store.evict_idle(now=session.last_active + 61) == 1
+    assert 'learner' in store and 'learner' not in store.resident
+
+    assert service.next_puzzle('learner') == shown
+    restored = store.resident['learner']
+    assert restored.current_puzzle == puzzle and restored.tracker.current_attempt_start == started
+
+
+def test_spilled_sessions_outlive_the_store(tmp_path):
+    service = LearningService(seed=2, store=SessionStore(str(tmp_path)))
+    play(service, 3, 4)
+    expected = {learner_id: service.session_stats(learner_id) for learner_id in service.sessions}
+    service.store.evict_idle(now=float('inf'))
+
+    reopened = LearningService(seed=2, store=SessionStore(str(tmp_path)))
+    assert sorted(reopened.sessions) == sorted(expected)
+    for learner_id, stats in expected.items():
+        assert reopened.session_stats(learner_id)['total_attempts'] == stats['total_attempts']
+        assert reopened.session_stats(learner_id)['adaptations'] == stats['adaptations']
+
+
+def test_deleting_a_spilled_session_removes_its_file(tmp_path):
+    store = SessionStore(str(tmp_path))
+    service = LearningService(store=store)
+    service.next_puzzle('learner')
+    store.evict_idle(now=float('inf'))
+    assert len(list(tmp_path.iterdir())) == 1
+    del store['learner']
+    assert len(store) == 0 and not list(tmp_path.iterdir())
+    with pytest.raises(LearnerNotFound):
+        service.session_stats('learner')
+
+
+def test_budget_and_ttl_must_be_positive(tmp_path):
+    with pytest.raises(ValueError):
+        SessionStore(str(tmp_path), max_bytes=0)
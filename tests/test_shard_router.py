@@ -0,0 +1,132 @@
+"""
+Consistent hash ring and session hand-over between shard workers
+"""
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from api_server import APIServer, HTTPError
+from learning_service import LearningService
+from review_scheduler import ReviewScheduler
+from shard_router import HashRing, ShardRouter, call
+
+LEARNERS = [f"learner-{index}" for index in range(200)]
+
+
+def test_ring_moves_only_the_new_workers_share():
+    ring = HashRing(['shard-0', 'shard-1', 'shard-2'])
+    owners = {learner_id: ring.node_for(learner_id) for learner_id in LEARNERS}
+    grown = ring.copy()
+    grown.add('shard-3')
+    moved = [learner_id for learner_id in LEARNERS if grown.node_for(learner_id) != owners[learner_id]]
+    assert all(grown.node_for(learner_id) == 'shard-3' for learner_id in moved)
+    assert 0.1 < len(moved) / len(LEARNERS) < 0.4
+
+    shrunk = ring.copy()
+    shrunk.remove('shard-0')
+    for learner_id in LEARNERS:
+        if owners[learner_id] != 'shard-0':
+            assert shrunk.node_for(learner_id) == owners[learner_id]
+    loads = [list(owners.values()).count(node) for node in ring.nodes]
+    assert max(loads) / (len(LEARNERS) / 3) < 1.5
+
+
+async def get(connection, target: str) -> dict:
+    _, body = await call(connection, 'GET', target)
+    return json.loads(body)
+
+
+async def post(connection, target: str, payload: dict) -> dict:
+    _, body = await call(connection, 'POST', target, json.dumps(payload).encode('utf-8'))
+    return json.loads(body)
+
+
+@pytest.fixture
+def socket_dir():
+    # Unix socket paths are limited to about 100 bytes, so keep them short
+    directory = tempfile.mkdtemp()
+    yield directory
+    shutil.rmtree(directory)
+
+
+async def start_workers(socket_dir: str, names):
+    """In-process admin-enabled API servers with review schedulers, by name"""
+    servers, paths = {}, {}
+    for name in names:
+        servers[name] = APIServer(LearningService(seed=5, reviews=ReviewScheduler(), review_share=0.0), admin=True)
+        paths[name] = os.path.join(socket_dir, f"{name}.sock")
+        await asyncio.start_unix_server(servers[name].handle_connection, paths[name])
+    return servers, paths
+
+
+async def play(router: ShardRouter, learner_ids) -> tuple:
+    """Answer a few puzzles per learner, all wrong so reviews pile up, and leave one on screen"""
+    server = await asyncio.start_server(router.handle_connection, '127.0.0.1', 0)
+    connection = await asyncio.open_connection('127.0.0.1', server.sockets[0].getsockname()[1])
+    for _ in range(3):
+        for learner_id in learner_ids:
+            await post(connection, '/next_puzzle', {'learner_id': learner_id})
+            await post(connection, '/submit_answer', {'learner_id': learner_id, 'answer': -1})
+    shown = {learner_id: await post(connection, '/next_puzzle', {'learner_id': learner_id})
+             for learner_id in learner_ids}
+    stats = {learner_id: await get(connection, f"/session_stats?learner_id={learner_id}")
+             for learner_id in learner_ids}
+    return server, connection, shown, stats
+
+
+def holders(servers: dict, learner_id: str) -> list:
+    return [name for name, server in servers.items() if learner_id in server.service.sessions]
+
+
+def test_moved_sessions_keep_state_and_reviews(socket_dir):
+    async def scenario():
+        servers, paths = await start_workers(socket_dir, ['shard-0', 'shard-1', 'shard-2'])
+        router = ShardRouter({name: paths[name] for name in ('shard-0', 'shard-1')})
+        learner_ids = LEARNERS[:40]
+        server, connection, shown, stats = await play(router, learner_ids)
+        pending = {learner_id: sum(s.service.reviews.pending(learner_id) for s in servers.values())
+                   for learner_id in learner_ids}
+        assert all(count == 3 for count in pending.values())
+
+        moved = await router.add_worker('shard-2', paths['shard-2'])
+        assert moved == sum(router.ring.node_for(learner_id) == 'shard-2' for learner_id in learner_ids) > 0
+        await router.remove_worker('shard-0')
+        for learner_id in learner_ids:
+            owner = router.ring.node_for(learner_id)
+            assert holders(servers, learner_id) == [owner]
+            # The old workers dropped their copy of the reviews, the owner has all of them
+            assert [name for name, s in servers.items() if s.service.reviews.pending(learner_id)] == [owner]
+            assert servers[owner].service.reviews.pending(learner_id) == pending[learner_id]
+            assert await get(connection, f"/session_stats?learner_id={learner_id}") == stats[learner_id]
+            assert await post(connection, '/next_puzzle', {'learner_id': learner_id}) == shown[learner_id]
+        connection[1].close()
+        server.close()
+
+    asyncio.run(scenario())
+
+
+def test_failed_handover_keeps_sessions_on_the_old_ring(socket_dir):
+    async def scenario():
+        servers, paths = await start_workers(socket_dir, ['shard-0', 'shard-1'])
+        router = ShardRouter(paths)
+        learner_ids = LEARNERS[:40]
+        server, connection, shown, stats = await play(router, learner_ids)
+        owners = {learner_id: router.ring.node_for(learner_id) for learner_id in learner_ids}
+
+        # Nothing listens on the new worker's socket, so every import into it fails
+        with pytest.raises(HTTPError):
+            await router.add_worker('shard-2', os.path.join(socket_dir, 'missing.sock'))
+        assert sorted(router.workers) == ['shard-0', 'shard-1']
+        for learner_id in learner_ids:
+            assert holders(servers, learner_id) == [owners[learner_id]]
+            assert servers[owners[learner_id]].service.reviews.pending(learner_id) == 3
+            assert await get(connection, f"/session_stats?learner_id={learner_id}") == stats[learner_id]
+            assert await post(connection, '/next_puzzle', {'learner_id': learner_id}) == shown[learner_id]
+        connection[1].close()
+        server.close()
+
+    asyncio.run(scenario())
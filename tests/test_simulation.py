@@ -0,0 +1,21 @@
+"""
+Parallel learner simulation
+"""
+import pytest
+
+from simulation import run_simulation
+
+
+@pytest.mark.parametrize('learners', [0, -3])
+def test_empty_run_reports_zeros(learners):
+    report = run_simulation(learners, workers=1)
+    assert report['sessions'] == 0
+    assert report['converged_rate'] == 0 and report['mean_accuracy'] == 0
+
+
+def test_worker_pool_matches_single_process():
+    single = run_simulation(40, puzzles=8, workers=1, chunk_size=9, seed=3)
+    pooled = run_simulation(40, puzzles=8, workers=2, chunk_size=9, seed=3)
+    single.pop('sessions_per_sec')
+    pooled.pop('sessions_per_sec')
+    assert single == pooled and single['sessions'] == 40
@@ -0,0 +1,68 @@
+"""
+Session snapshots round-trip attempts, including review boxes
+"""
+import pytest
+
+import snapshot
+from attempt_store import ColumnarPerformanceTracker
+from snapshot import SessionSnapshot, dump_session
+from tracker import PerformanceTracker
+
+
+def puzzle(index: int, **extra):
+    return {'question': f"{index} + 2", 'answer': index + 2, 'difficulty': 'Easy', 'operation': '+',
+            'numbers': (index, 2), **extra}
+
+
+def tracker_with_reviews() -> PerformanceTracker:
+    tracker = PerformanceTracker(learner_id='learner')
+    for index in range(6):
+        extra = {'review': index % 3} if index % 2 else {}
+        if index == 5:
+            extra['level'] = 'Level 3'
+        tracker.log_attempt(puzzle(index, **extra), index + 2, True, time_spent=1.5)
+    return tracker
+
+
+def test_review_boxes_survive_a_round_trip():
+    tracker = tracker_with_reviews()
+    restored = SessionSnapshot(dump_session(tracker)).restore_tracker()
+    assert restored.attempts == tracker.attempts
+    assert [attempt.get('review') for attempt in restored.attempts] == [None, 1, None, 0, None, 2]
+
+
+@pytest.mark.parametrize('saved_columnar', (False, True))
+def test_columnar_restore_keeps_levels_and_reviews(saved_columnar):
+    tracker = tracker_with_reviews()
+    if saved_columnar:
+        columnar = ColumnarPerformanceTracker(learner_id='learner')
+        columnar.attempts = tracker.attempts
+        tracker = columnar
+    restored = SessionSnapshot(dump_session(tracker)).restore_tracker(columnar=True)
+    assert isinstance(restored, ColumnarPerformanceTracker)
+    assert list(restored.attempts) == list(tracker.attempts)
+    assert restored.attempts[5]['level'] == 'Level 3'
+
+
+def test_row_matches_attempt_dicts():
+    snap = SessionSnapshot(dump_session(tracker_with_reviews()))
+    assert [snap.row(index) for index in range(len(snap))] == snap.attempt_dicts()
+
+
+def test_format_1_snapshots_load_without_reviews(monkeypatch):
+    tracker = tracker_with_reviews()
+    monkeypatch.setattr(snapshot, 'ATTEMPT_COLUMNS', snapshot._ATTEMPT_COLUMNS_V1)
+    monkeypatch.setattr(snapshot, 'FORMAT_VERSION', 1)
+    data = dump_session(tracker)
+    monkeypatch.undo()
+    snap = SessionSnapshot(data)
+    assert snap.version == 1
+    assert snap.attempt_dicts() == [{key: value for key, value in attempt.items() if key != 'review'}
+                                    for attempt in tracker.attempts]
+
+
+def test_newer_format_is_rejected():
+    data = bytearray(dump_session(tracker_with_reviews()))
+    data[4] = snapshot.FORMAT_VERSION + 1
+    with pytest.raises(ValueError):
+        SessionSnapshot(bytes(data))
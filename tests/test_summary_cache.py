@@ -0,0 +1,49 @@
+"""
+The summary view's attempt table catches up with the tracker incrementally
+"""
+from summary_cache import AttemptTable, SummaryCache
+from tracker import PerformanceTracker
+
+
+def log(tracker: PerformanceTracker, count: int):
+    for index in range(count):
+        puzzle = {'question': f"{index} × 3", 'answer': index * 3, 'difficulty': 'Medium', 'operation': '×',
+                  'numbers': (index, 3)}
+        tracker.log_attempt(puzzle, index * 3 if index % 4 else -1, bool(index % 4), time_spent=2.25)
+
+
+def test_table_appends_only_new_attempts():
+    tracker = PerformanceTracker()
+    cache = SummaryCache(tracker)
+    log(tracker, 300)
+    table = cache.attempt_table()
+    frame = table.frame
+    assert len(frame) == 300 and cache.attempt_table() is table and table.frame is frame
+
+    log(tracker, 5)
+    assert cache.attempt_table() is table and len(table) == 305
+    assert table.frame is not frame
+    assert table.frame['Correct'].tolist() == [attempt['is_correct'] for attempt in tracker.attempts]
+    assert table.frame['Difficulty'].astype(str).unique().tolist() == ['Medium']
+
+
+def test_table_starts_over_when_attempts_are_replaced():
+    tracker = PerformanceTracker()
+    cache = SummaryCache(tracker)
+    log(tracker, 10)
+    first = cache.attempt_table()
+    tracker.attempts = tracker.attempts[:3]
+    table = cache.attempt_table()
+    assert table is not first and len(table) == 3
+
+
+def test_page_is_sliced_from_the_buffers():
+    table = AttemptTable(capacity=2)
+    tracker = PerformanceTracker()
+    log(tracker, 25)
+    table.extend(tracker.attempts)
+    page = table.page(2, 10)
+    assert page.index.tolist() == list(range(20, 25))
+    assert page['Question'].tolist() == [attempt['puzzle'] for attempt in tracker.attempts[20:]]
+    assert page['Result'].tolist() == ['✅' if attempt['is_correct'] else '❌' for attempt in tracker.attempts[20:]]
+    assert len(table.page(5, 10)) == 0
@@ -0,0 +1,263 @@
+"""
+Incremental tracker statistics against a full scan of the attempts
+"""
+import math
+import random
+import statistics
+
+import pytest
+
+from attempt_store import ColumnarPerformanceTracker
+from tracker import PerformanceTracker, RecentWindow, RunningStats
+
+DIFFICULTIES = ('Easy', 'Medium', 'Hard')
+OPERATIONS = ('+', '-', '×', '÷')
+TRACKERS = (PerformanceTracker, ColumnarPerformanceTracker)
+
+
+def random_attempts(seed: int, count: int):
+    """Puzzle, answer, correctness and time of count random attempts"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        num1, num2 = rng.randrange(1, 20), rng.randrange(1, 20)
+        operation = rng.choice(OPERATIONS)
+        answer = {'+': num1 + num2, '-': num1 - num2, '×': num1 * num2, '÷': num1 // num2}[operation]
+        puzzle = {'question': f"{num1} {operation} {num2}", 'answer': answer, 'numbers': [num1, num2],
+                  'difficulty': rng.choice(DIFFICULTIES), 'operation': operation}
+        correct = rng.random() < 0.7
+        yield puzzle, answer if correct else answer + 1, correct, round(rng.uniform(0.5, 30), 2)
+
+
+def nearest_rank(values, q: float) -> float:
+    """Exact q-quantile, the ceil(q * n)-th smallest value"""
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(q * len(ordered))) - 1]
+
+
+def scan_session_stats(attempts) -> dict:
+    """get_session_stats recomputed from the attempt list"""
+    if not attempts:
+        return {'total_attempts': 0, 'correct_count': 0, 'accuracy': 0.0, 'average_time': 0.0, 'total_time': 0.0}
+    times = [attempt['time_spent'] for attempt in attempts]
+    correct = sum(attempt['is_correct'] for attempt in attempts)
+    return {
+        'total_attempts': len(attempts),
+        'correct_count': correct,
+        'incorrect_count': len(attempts) - correct,
+        'accuracy': round(correct / len(attempts) * 100, 1),
+        'average_time': round(sum(times) / len(times), 2),
+        'total_time': round(sum(times), 2),
+        'fastest_time': min(times),
+        'slowest_time': max(times),
+        'median_time': nearest_rank(times, 0.5),
+        'p90_time': nearest_rank(times, 0.9)
+    }
+
+
+def group(attempts, field: str) -> dict:
+    groups = {}
+    for attempt in attempts:
+        groups.setdefault(attempt[field], []).append(attempt)
+    return groups
+
+
+def filled_tracker(tracker_class, seed: int, count: int):
+    tracker = tracker_class()
+    for puzzle, answer, correct, time_spent in random_attempts(seed, count):
+        tracker.log_attempt(puzzle, answer, correct, time_spent)
+    return tracker
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_running_stats_match_full_scan(seed):
+    rng = random.Random(seed)
+    times = [round(rng.uniform(0.5, 30), 2) for _ in range(rng.randrange(1, 150))]
+    outcomes = [rng.random() < 0.5 for _ in times]
+    stats = RunningStats()
+    for time_spent, correct in zip(times, outcomes):
+        stats.push(time_spent, correct)
+
+    assert stats.count == len(times)
+    assert stats.correct == sum(outcomes)
+    assert stats.min_time == min(times)
+    assert stats.max_time == max(times)
+    assert stats.total_time == pytest.approx(sum(times))
+    assert stats.mean_time == pytest.approx(statistics.mean(times))
+    expected_variance = statistics.variance(times) if len(times) > 1 else 0.0
+    assert stats.time_variance == pytest.approx(expected_variance, abs=1e-9)
+    # The sketch holds every value until its first compaction, so percentiles are exact
+    assert stats.time_percentiles() == [nearest_rank(times, 0.5), nearest_rank(times, 0.9)]
+
+
+@pytest.mark.parametrize('tracker_class', TRACKERS)
+def test_empty_session_stats(tracker_class):
+    assert tracker_class().get_session_stats() == scan_session_stats([])
+
+
+@pytest.mark.parametrize('tracker_class', TRACKERS)
+@pytest.mark.parametrize('seed', range(10))
+def test_session_stats_match_full_scan(tracker_class, seed):
+    tracker = filled_tracker(tracker_class, seed, random.Random(seed).randrange(1, 180))
+    attempts = list(tracker.attempts)
+    assert tracker.get_session_stats() == scan_session_stats(attempts)
+
+
+@pytest.mark.parametrize('tracker_class', TRACKERS)
+@pytest.mark.parametrize('seed', range(10))
+def test_group_statistics_match_full_scan(tracker_class, seed):
+    tracker = filled_tracker(tracker_class, seed, 120)
+    attempts = list(tracker.attempts)
+    by_difficulty = group(attempts, 'difficulty')
+    by_operation = group(attempts, 'operation')
+
+    assert tracker.get_difficulty_distribution() == {level: len(rows) for level, rows in by_difficulty.items()}
+
+    performance = tracker.get_operation_performance()
+    assert set(performance) == set(by_operation)
+    for operation, rows in by_operation.items():
+        times = [row['time_spent'] for row in rows]
+        correct = sum(row['is_correct'] for row in rows)
+        entry = performance[operation]
+        assert entry['total'] == len(rows)
+        assert entry['correct'] == correct
+        assert list(entry['times']) == times
+        assert entry['accuracy'] == round(correct / len(rows) * 100, 1)
+        assert entry['avg_time'] == round(sum(times) / len(times), 2)
+        assert entry['median_time'] == nearest_rank(times, 0.5)
+
+    statistics_ = tracker.get_time_statistics()
+    groups = [('overall', {'all': attempts}), ('by_difficulty', by_difficulty), ('by_operation', by_operation)]
+    for section, grouped in groups:
+        for key, rows in grouped.items():
+            summary = statistics_['overall'] if section == 'overall' else statistics_[section][key]
+            times = [row['time_spent'] for row in rows]
+            variance = statistics.variance(times) if len(times) > 1 else 0.0
+            assert summary['count'] == len(times)
+            assert summary['mean'] == pytest.approx(round(statistics.mean(times), 2), abs=0.011)
+            assert summary['variance'] == pytest.approx(round(variance, 2), abs=0.011)
+            assert summary['p50'] == nearest_rank(times, 0.5)
+            assert summary['p90'] == nearest_rank(times, 0.9)
+
+
+@pytest.mark.parametrize('tracker_class', TRACKERS)
+def test_assigning_attempts_rebuilds_statistics(tracker_class):
+    source = filled_tracker(tracker_class, 7, 90)
+    attempts = list(source.attempts)
+    tracker = tracker_class()
+    tracker.attempts = attempts[:40]
+    assert tracker.get_session_stats() == scan_session_stats(attempts[:40])
+    for attempt in attempts[40:]:
+        num1, _, num2 = attempt['puzzle'].split(' ')
+        puzzle = {'question': attempt['puzzle'], 'answer': attempt['correct_answer'],
+                  'numbers': [int(num1), int(num2)], 'difficulty': attempt['difficulty'], 'operation': attempt['operation']}
+        tracker.log_attempt(puzzle, attempt['user_answer'], attempt['is_correct'], attempt['time_spent'])
+    assert tracker.get_session_stats() == scan_session_stats(attempts)
+    assert tracker.get_difficulty_distribution() == source.get_difficulty_distribution()
+
+
+@pytest.mark.parametrize('tracker_class', TRACKERS)
+def test_persisted_records_keep_level_and_review(tracker_class):
+    records = []
+    tracker = tracker_class(learner_id='learner-1', sink=records)
+    puzzle = {'question': '3 + 4', 'answer': 7, 'numbers': [3, 4], 'difficulty': 'Level 2', 'operation': '+',
+              'level': 2, 'review': 1}
+    tracker.log_attempt(puzzle, 7, True, 2.5)
+    tracker.log_attempt({**puzzle, 'review': 0}, 6, False, 4.0)
+    assert [(record['level'], record['review'], record['is_correct']) for record in records] == \
+        [(2, 1, True), (2, 0, False)]
+    assert all(record['kind'] == 'attempt' and record['learner_id'] == 'learner-1' for record in records)
+
+
+def window_summary(window: RecentWindow) -> tuple:
+    return len(window), window.correct_count, window.total_time
+
+
+def expected_summary(outcomes, times) -> tuple:
+    return len(outcomes), sum(outcomes), sum(round(time_spent * 100) for time_spent in times) / 100
+
+
+@pytest.mark.parametrize('size', (1, 3, 7))
+def test_recent_window_wraps_around(size):
+    rng = random.Random(size)
+    window = RecentWindow(size)
+    outcomes, times = [], []
+    for _ in range(5 * size + 2):
+        outcomes.append(rng.random() < 0.5)
+        times.append(round(rng.uniform(0.5, 30), 2))
+        window.push(outcomes[-1], times[-1])
+        # Once full, each push evicts exactly the oldest attempt
+        assert window_summary(window) == expected_summary(outcomes[-size:], times[-size:])
+    assert window.accuracy == sum(outcomes[-size:]) / size
+    window.clear()
+    assert window_summary(window) == (0, 0, 0.0) and window.avg_time == 0.0
+
+
+def test_recent_window_stores_rounded_centiseconds():
+    window = RecentWindow(2)
+    window.push(True, 1.004)
+    window.push(False, 2.006)
+    assert window.total_time == 3.01
+    assert window.avg_time == 1.505
+    # Thousands of evictions of times that are inexact in binary leave no drift
+    for _ in range(10000):
+        window.push(True, 0.1)
+    window.push(True, 0.2)
+    assert window.total_time == 0.3
+    with pytest.raises(ValueError):
+        RecentWindow(0)
+
+
+def test_get_window_keeps_the_latest_attempts_in_order():
+    tracker = filled_tracker(PerformanceTracker, 3, 20)
+    attempts = list(tracker.attempts)
+    outcomes = [attempt['is_correct'] for attempt in attempts]
+    times = [attempt['time_spent'] for attempt in attempts]
+
+    # The default window followed every log_attempt; the size-5 one is seeded from the attempt list
+    for size in (3, 5):
+        window = tracker.get_window(size)
+        assert window_summary(window) == expected_summary(outcomes[-size:], times[-size:])
+        for keep in range(1, size + 1):
+            assert window_summary(window.resized(keep)) == expected_summary(outcomes[-keep:], times[-keep:])
+
+    for puzzle, answer, correct, time_spent in random_attempts(4, 4):
+        tracker.log_attempt(puzzle, answer, correct, time_spent)
+        outcomes.append(correct)
+        times.append(time_spent)
+    for size in (3, 5):
+        window = tracker.get_window(size)
+        assert window_summary(window) == expected_summary(outcomes[-size:], times[-size:])
+        assert window_summary(window.resized(1)) == expected_summary(outcomes[-1:], times[-1:])
+
+
+def without_timestamps(attempts) -> list:
+    return [{key: value for key, value in attempt.items() if key != 'timestamp'} for attempt in attempts]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_attempt_store_returns_the_tracker_shapes(seed):
+    trackers = [PerformanceTracker(), ColumnarPerformanceTracker()]
+    for index, (puzzle, answer, correct, time_spent) in enumerate(random_attempts(seed, 150)):
+        if index % 3 == 0:
+            puzzle['level'] = f"L{index % 7 + 1}"
+        if index % 5 == 0:
+            puzzle['review'] = index % 4
+        for tracker in trackers:
+            tracker.log_attempt(puzzle, answer, correct, time_spent)
+    reference, columnar = trackers
+    store = columnar.store
+
+    # The view keeps level and review, so the columnar tracker's attempts read like the dict-based ones
+    assert without_timestamps(columnar.attempts) == without_timestamps(reference.attempts)
+    assert without_timestamps(columnar.attempts[-10:]) == without_timestamps(reference.attempts[-10:])
+
+    expected = reference.get_operation_performance()
+    performance = store.operation_performance()
+    assert list(performance) == list(expected)
+    for operation, entry in performance.items():
+        assert {**entry, 'times': list(entry['times'])} == expected[operation]
+    assert store.session_stats() == reference.get_session_stats()
+
+    rebuilt = ColumnarPerformanceTracker()
+    rebuilt.attempts = list(reference.attempts)
+    assert list(rebuilt.attempts) == list(reference.attempts)
@@ -0,0 +1,73 @@
+"""
+Replaying a fixed attempt log under alternative rule configurations
+"""
+import pytest
+
+from attempt_log import AttemptLog
+from what_if import run_what_if
+
+# Moves up after every correct answer and down after every wrong one
+EAGER = {'name': 'eager', 'levels': ['Easy', 'Medium', 'Hard'], 'window_size': 1, 'min_attempts': 1,
+         'rules': [{'name': 'up', 'when': {'min_correct': 1}, 'step': 1},
+                   {'name': 'down', 'when': {'max_correct': 0}, 'step': -1}]}
+# Never moves
+STAY = {'name': 'stay', 'levels': ['Easy', 'Medium', 'Hard'], 'rules': []}
+
+# learner, seconds after the start, logged level, correct, time spent
+ATTEMPTS = [
+    ('a', 0, 'Easy', True, 2.0),
+    ('b', 1, 'Hard', False, 5.0),
+    ('a', 10, 'Easy', True, 4.0),
+    ('a', 20, 'Easy', False, 6.0),
+    ('b', 21, 'Hard', False, 5.0),
+    ('a', 30, 'Easy', True, 3.0),
+]
+
+
+@pytest.fixture(scope='module')
+def log_dir(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('log')
+    with AttemptLog(str(directory), fsync='never') as log:
+        for learner_id, offset, level, correct, seconds in ATTEMPTS:
+            log.append({'kind': 'attempt', 'learner_id': learner_id, 'timestamp': f"2026-10-01 09:00:{offset:02d}",
+                        'puzzle': '1 + 1', 'correct_answer': 2, 'user_answer': 2 if correct else 3,
+                        'is_correct': correct, 'time_spent': seconds, 'difficulty': level, 'operation': '+'})
+        log.append({'kind': 'adaptation', 'learner_id': 'a', 'timestamp': '2026-10-01 09:00:31',
+                    'from': 'Easy', 'to': 'Medium'})
+    return str(directory)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_per_config_summaries(log_dir, workers):
+    result = run_what_if(log_dir, [EAGER, STAY], workers=workers)
+    assert result['records'] == len(ATTEMPTS)
+    eager, stay = result['configs']
+
+    # a: Easy ✓ → Medium ✓ → Hard ✗ → Medium ✓ → Hard; b: Hard ✗ → Medium ✗ → Easy
+    assert eager['sessions'] == 2 and eager['attempts'] == 6
+    assert eager['switches_per_session'] == 3.0 and eager['reversals_per_session'] == 1.0
+    assert eager['level_seconds'] == {'Easy': 2.0, 'Medium': 12.0, 'Hard': 11.0}
+    assert eager['time_share'] == {'Easy': 8.0, 'Medium': 48.0, 'Hard': 44.0}
+    assert eager['level_accuracy'] == {'Easy': 100.0, 'Medium': 66.7, 'Hard': 0.0}
+    # Both sessions end with a single attempt at Medium, one right and one wrong
+    assert eager['final_levels'] == {'Medium': 2} and eager['final_level_accuracy'] == 50.0
+    assert eager['matched_logged_level'] == 33.3
+
+    assert stay['switches_per_session'] == 0.0 and stay['reversals_per_session'] == 0.0
+    assert stay['level_seconds'] == {'Easy': 15.0, 'Hard': 10.0}
+    assert stay['time_share'] == {'Easy': 60.0, 'Hard': 40.0}
+    assert stay['final_levels'] == {'Easy': 1, 'Hard': 1} and stay['final_level_accuracy'] == 50.0
+    assert stay['matched_logged_level'] == 100.0 and stay['accuracy'] == 50.0
+
+
+def test_a_long_pause_starts_a_new_session(log_dir):
+    result = run_what_if(log_dir, [STAY], workers=1, session_gap=5)
+    # a's answers are 10 s apart, b's 20 s, so every attempt is its own session
+    assert result['configs'][0]['sessions'] == len(ATTEMPTS)
+
+
+def test_configs_need_distinct_names(log_dir):
+    with pytest.raises(ValueError):
+        run_what_if(log_dir, [STAY, STAY], workers=1)
+    with pytest.raises(ValueError):
+        run_what_if(log_dir, [], workers=1)